@@ -20,9 +20,12 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 We undertake not to change the open source license (MIT license) applicable to the current version of
 the project delivered to anyone in the future.
 """
+import time
+from contextlib import contextmanager
 from typing import Any, Dict
 
 from apps.api import TransferApi
+from apps.log_esquery import metrics
 from apps.log_esquery.constants import DEFAULT_SCHEMA
 from apps.log_esquery.esquery.client.QueryClientTemplate import QueryClientTemplate
 from apps.log_esquery.exceptions import (
@@ -36,6 +39,7 @@ from apps.log_esquery.exceptions import (
 )
 from apps.log_esquery.type_constants import type_mapping_dict
 from apps.log_esquery.utils.es_client import es_socket_ping, get_es_client
+from apps.log_esquery.utils.es_client_pool import EsClientRegistry
 from apps.utils.cache import cache_five_minute
 from django.conf import settings
 from django.utils.translation import ugettext as _
@@ -51,7 +55,7 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
         self._client: Elasticsearch
 
     def query(self, index: str, body: Dict[str, Any], scroll=None, track_total_hits=False):
-        self._build_connection(check_ping=False)
+        self._build_connection(check_ping=False, operation="query")
 
         # 如果版本不是5.0且track_total_hits为True时
         if track_total_hits and not isinstance(self._client, Elasticsearch5):
@@ -59,24 +63,27 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
 
         try:
             params = {"request_timeout": settings.ES_QUERY_TIMEOUT}
-            return self._client.search(index=index, body=body, scroll=scroll, params=params)
+            with self._observe_query_latency("query"):
+                return self._client.search(index=index, body=body, scroll=scroll, params=params)
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise EsClientSearchException(EsClientSearchException.MESSAGE.format(error=e))
 
     def mapping(self, index: str) -> Dict:
-        self._build_connection(check_ping=False)
+        self._build_connection(check_ping=False, operation="mapping")
         try:
-            mapping_dict: type_mapping_dict = self._client.indices.get_mapping(index=index)
+            with self._observe_query_latency("mapping"):
+                mapping_dict: type_mapping_dict = self._client.indices.get_mapping(index=index)
             return mapping_dict
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise BaseSearchFieldsException(BaseSearchFieldsException.MESSAGE.format(error=e))
 
     def scroll(self, index: str, scroll_id: str, scroll: str) -> Dict:
-        self._build_connection(check_ping=False)
+        self._build_connection(check_ping=False, operation="scroll")
         try:
-            return self._client.scroll(scroll_id=scroll_id, scroll=scroll)
+            with self._observe_query_latency("scroll"):
+                return self._client.scroll(scroll_id=scroll_id, scroll=scroll)
         except Exception as e:  # pylint: disable=broad-except
             self.catch_timeout_raise(e)
             raise EsClientScrollException(EsClientScrollException.MESSAGE.format(error=e))
@@ -113,9 +120,28 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
             self.catch_timeout_raise(e)
             raise
 
-    def _build_connection(self, check_ping: bool = True):
+    @contextmanager
+    def _observe_query_latency(self, operation: str):
+        """
+        记录 ES 请求耗时(不含获取客户端的耗时)
+        """
+        start_at = time.time()
+        try:
+            yield
+        finally:
+            metrics.ESQUERY_QUERY_LATENCY.labels(
+                storage_cluster_id=self.storage_cluster_id, operation=operation
+            ).observe(time.time() - start_at)
+
+    def _build_connection(self, check_ping: bool = True, operation: str = "other"):
         if not self._active:
+            start_at = time.time()
             self._get_connection(check_ping=check_ping)
+            metrics.ESQUERY_CONNECT_LATENCY.labels(
+                storage_cluster_id=self.storage_cluster_id,
+                operation=operation,
+                pooled=str(settings.ES_CLIENT_POOL_ENABLED).lower(),
+            ).observe(time.time() - start_at)
             if check_ping and not self._active:
                 raise EsClientSearchException(EsClientSearchException.MESSAGE.format(error=_("EsClient链接失败")))
             else:
@@ -129,22 +155,40 @@ class QueryClientEs(QueryClientTemplate):  # pylint: disable=invalid-name
         )
         self._active: bool = False
 
+        if settings.ES_CLIENT_POOL_ENABLED:
+            # 复用进程内的长连接客户端，连接信息变化时重建
+            self._client, self._active = EsClientRegistry.get_client(
+                storage_cluster_id=self.storage_cluster_id,
+                connect_info=(self.host, self.port, self.username, self.password, self.version, self.schema),
+                create_client=self._create_client,
+                check_ping=check_ping,
+            )
+            return
+
         # es socket ping
         es_socket_ping(host=self.host, port=self.port)
 
-        self._client: Elasticsearch = get_es_client(
-            version=self.version,
-            hosts=[self.host],
-            username=self.username,
-            password=self.password,
-            scheme=self.schema,
-            port=self.port,
-            sniffer_timeout=600,
-            verify_certs=False,
+        self._client: Elasticsearch = self._create_client(
+            (self.host, self.port, self.username, self.password, self.version, self.schema)
         )
         if not check_ping or self._client.ping():
             self._active = True
 
+    @staticmethod
+    def _create_client(connect_info: tuple) -> Elasticsearch:
+        host, port, username, password, version, schema = connect_info
+        return get_es_client(
+            version=version,
+            hosts=[host],
+            username=username,
+            password=password,
+            scheme=schema,
+            port=port,
+            sniffer_timeout=600,
+            verify_certs=False,
+            maxsize=settings.ES_CLIENT_POOL_MAXSIZE,
+        )
+
     @staticmethod
     @cache_five_minute("_connect_info_{storage_cluster_id}", need_md5=True)
     def _connect_info(storage_cluster_id: int) -> tuple:
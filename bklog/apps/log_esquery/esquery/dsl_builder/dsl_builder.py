@@ -45,6 +45,7 @@ class DslBuilder(object):
         search_after=[],
         use_time_range=True,
         mappings: list = [],
+        slice_info: dict = None,
     ):  # pylint: disable=dangerous-default-value
         """
 
@@ -63,6 +64,7 @@ class DslBuilder(object):
         :
         :param begin {int} 0:
         :param size: {int} 30
+        :param slice_info: {dict} {"id": 0, "max": 2}
         """
 
         # init params
@@ -127,6 +129,10 @@ class DslBuilder(object):
             self._body.update({"search_after": self.search_after})
             self._body.pop("from")
 
+        # 启用slice scroll模式
+        if slice_info:
+            self._body.update({"slice": slice_info})
+
     @property
     def body(self):
         return self._body
@@ -178,6 +178,7 @@ class EsQuery(object):
             search_after=search_after,
             use_time_range=use_time_range,
             mappings=mappings,
+            slice_info=self.search_dict.get("slice"),
         ).body
 
         logger.info(f"scenario_id => [{scenario_id}], indices => [{index}], body => [{body}]")
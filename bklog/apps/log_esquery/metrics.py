@@ -19,3 +19,21 @@ ESQUERY_SEARCH_COUNT = register_metric(
     documentation="search count of esquery search API",
     labelnames=("index_set_id", "indices", "scenario_id", "storage_cluster_id", "status", "source_app_code"),
 )
+
+
+ESQUERY_CONNECT_LATENCY = register_metric(
+    Histogram,
+    name="esquery_connect_latency",
+    documentation="latency of getting es client before query",
+    labelnames=("storage_cluster_id", "operation", "pooled"),
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, INF),
+)
+
+
+ESQUERY_QUERY_LATENCY = register_metric(
+    Histogram,
+    name="esquery_query_latency",
+    documentation="latency of es request without connect time",
+    labelnames=("storage_cluster_id", "operation"),
+    buckets=(0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 7.5, 10.0, 20.0, 30.0, 60.0, INF),
+)
@@ -89,6 +89,8 @@ class EsQuerySearchAttrSerializer(serializers.Serializer):
 
     # search_after 支持
     search_after = serializers.ListField(required=False, allow_empty=True, default=[], allow_null=True)
+    # slice scroll 支持 {"id": 0, "max": 2}
+    slice = serializers.DictField(required=False, default=None, allow_null=True)
     # 6.8之后的版本搜索可选择带该参数以返回正确total hits, 如果为5+版本将自动去掉该字段以免引发异常(在5+版本本身返回去正确的total值)
     track_total_hits = serializers.BooleanField(required=False, default=True)
 
@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making BK-LOG 蓝鲸日志平台 available.
+Copyright (C) 2021 THL A29 Limited, a Tencent company.  All rights reserved.
+BK-LOG 蓝鲸日志平台 is licensed under the MIT License.
+License for BK-LOG 蓝鲸日志平台:
+--------------------------------------------------------------------
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial
+portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+We undertake not to change the open source license (MIT license) applicable to the current version of
+the project delivered to anyone in the future.
+"""
+"""
+进程内 ES 客户端注册表
+1. 按 storage_cluster_id 复用长连接客户端(客户端线程安全，内部维护连接池)，避免每次查询重新建连、握手及 ping
+2. 连接信息(_connect_info)变化时，按连接指纹淘汰旧客户端并重建
+3. 后台线程定期 ping 已注册的客户端刷新健康状态，并清理长时间未使用的客户端
+"""
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from django.conf import settings
+
+from apps.log_esquery.utils.es_client import es_socket_ping
+from apps.utils.log import logger
+
+# 后台健康检查的 ping 超时时间(秒)
+HEALTH_CHECK_TIMEOUT = 3
+
+
+def get_connect_fingerprint(connect_info: tuple) -> str:
+    """
+    连接指纹：连接信息(host, port, username, password, version, schema)任意一项变化时指纹变化
+    """
+    return hashlib.md5("|".join(str(item) for item in connect_info).encode("utf-8")).hexdigest()
+
+
+class PooledEsClient(object):
+    def __init__(self, client, fingerprint: str):
+        self.client = client
+        self.fingerprint = fingerprint
+        # 最近一次健康检查结果，创建时未检查
+        self.active: Optional[bool] = None
+        self.last_used_time = time.time()
+
+    def ping(self, request_timeout=HEALTH_CHECK_TIMEOUT) -> bool:
+        try:
+            self.active = bool(self.client.ping(request_timeout=request_timeout))
+        except Exception:  # pylint: disable=broad-except
+            self.active = False
+        return self.active
+
+    def close(self):
+        try:
+            self.client.transport.close()
+        except Exception as e:  # pylint: disable=broad-except
+            logger.warning("[EsClientRegistry] close es client failed: %s", e)
+
+
+class EsClientRegistry(object):
+    """
+    进程内 ES 客户端注册表
+    """
+
+    _lock = threading.Lock()
+    _clients: Dict[int, PooledEsClient] = {}
+    _pid: int = 0
+    _health_checker: Optional[threading.Thread] = None
+
+    @classmethod
+    def get_client(cls, storage_cluster_id: int, connect_info: tuple, create_client: Callable, check_ping=True):
+        """
+        获取存储集群的客户端
+        :param storage_cluster_id: 存储集群ID
+        :param connect_info: 连接信息 (host, port, username, password, version, schema)
+        :param create_client: 创建客户端的方法，参数为连接信息
+        :param check_ping: 是否需要确认集群可用，最近一次健康检查成功时不再 ping
+        :return: (客户端, 是否可用)
+        """
+        fingerprint = get_connect_fingerprint(connect_info)
+        with cls._lock:
+            cls._check_process()
+            pooled_client = cls._clients.get(storage_cluster_id)
+            if pooled_client and pooled_client.fingerprint != fingerprint:
+                # 连接信息变化，淘汰旧客户端
+                logger.info("[EsClientRegistry] connect info of cluster(%s) changed, evict client", storage_cluster_id)
+                cls._clients.pop(storage_cluster_id).close()
+                pooled_client = None
+            if pooled_client:
+                # 在锁内刷新使用时间，避免与健康检查的空闲淘汰交错
+                pooled_client.last_used_time = time.time()
+
+        if pooled_client is None:
+            host, port = connect_info[0], connect_info[1]
+            es_socket_ping(host=host, port=port)
+            new_client = PooledEsClient(create_client(connect_info), fingerprint)
+            with cls._lock:
+                # 并发创建时以先注册的为准
+                pooled_client = cls._clients.setdefault(storage_cluster_id, new_client)
+                pooled_client.last_used_time = time.time()
+            if pooled_client is not new_client:
+                new_client.close()
+            cls._start_health_checker()
+
+        if check_ping and not pooled_client.active:
+            pooled_client.ping(request_timeout=HEALTH_CHECK_TIMEOUT)
+        return pooled_client.client, bool(pooled_client.active) or not check_ping
+
+    @classmethod
+    def evict(cls, storage_cluster_id: int):
+        with cls._lock:
+            pooled_client = cls._clients.pop(storage_cluster_id, None)
+        if pooled_client:
+            pooled_client.close()
+
+    @classmethod
+    def _check_process(cls):
+        """
+        fork 后的子进程不能复用父进程的连接，需要清空注册表
+        """
+        pid = os.getpid()
+        if cls._pid != pid:
+            cls._pid = pid
+            cls._clients = {}
+            cls._health_checker = None
+
+    @classmethod
+    def _start_health_checker(cls):
+        with cls._lock:
+            if cls._health_checker is not None and cls._health_checker.is_alive():
+                return
+            cls._health_checker = threading.Thread(target=cls._health_check_loop, name="es_client_health_checker")
+            cls._health_checker.daemon = True
+            cls._health_checker.start()
+
+    @classmethod
+    def _health_check_loop(cls):
+        while True:
+            time.sleep(settings.ES_CLIENT_HEALTH_CHECK_INTERVAL)
+            try:
+                cls.health_check()
+            except Exception as e:  # pylint: disable=broad-except
+                logger.exception("[EsClientRegistry] health check failed: %s", e)
+
+    @classmethod
+    def health_check(cls):
+        """
+        刷新客户端健康状态，清理长时间未使用的客户端
+        """
+        now = time.time()
+        idle_clients = []
+        with cls._lock:
+            # 空闲判断与淘汰在同一个锁内完成，获取客户端时同样在锁内刷新使用时间，不会淘汰刚取出的客户端
+            for storage_cluster_id, pooled_client in list(cls._clients.items()):
+                if now - pooled_client.last_used_time > settings.ES_CLIENT_IDLE_TIMEOUT:
+                    idle_clients.append(cls._clients.pop(storage_cluster_id))
+            clients = list(cls._clients.items())
+
+        for pooled_client in idle_clients:
+            pooled_client.close()
+
+        for storage_cluster_id, pooled_client in clients:
+            if not pooled_client.ping():
+                logger.warning("[EsClientRegistry] es cluster(%s) is not alive", storage_cluster_id)
@@ -124,6 +124,11 @@ ASYNC_EXPORT_TIME_RANGE = "customized"
 # 异步导出目录
 ASYNC_APP_CODE = settings.APP_CODE.replace("-", "_")
 ASYNC_DIR = f"/tmp/{ASYNC_APP_CODE}"
+# 异步导出文件格式
+ASYNC_EXPORT_COMPRESS_TAR = "tar.gz"
+ASYNC_EXPORT_COMPRESS_GZIP = "gz"
+# 异步导出进度上报间隔(秒)
+ASYNC_EXPORT_PROGRESS_INTERVAL = 10
 # 异步导出配置名称
 FEATURE_ASYNC_EXPORT_COMMON = "feature_async_export"
 # 外部版异步导出配置名称
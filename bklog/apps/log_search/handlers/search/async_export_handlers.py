@@ -212,6 +212,8 @@ class AsyncExportHandlers(object):
             "export_created_at": export_task_history["created_at"],
             "export_created_by": export_task_history["created_by"],
             "export_completed_at": export_task_history["completed_at"],
+            "export_count": export_task_history["export_count"],
+            "export_speed": export_task_history["export_speed"],
             "download_able": download_able,
             "retry_able": retry_able,
             "index_set_type": export_task_history["index_set_type"],
@@ -22,6 +22,8 @@ the project delivered to anyone in the future.
 import copy
 import datetime
 import hashlib
+import heapq
+import itertools
 import json
 import operator
 from typing import Any, Dict, List, Union
@@ -99,7 +101,7 @@ from apps.log_search.models import (
     UserIndexSetFieldsConfig,
     UserIndexSetSearchHistory,
 )
-from apps.log_search.utils import sort_func
+from apps.log_search.utils import is_unique_sort, merge_sorted
 from apps.utils.cache import cache_five_minute
 from apps.utils.core.cache.cmdb_host import CmdbHostCache
 from apps.utils.db import array_group
@@ -135,6 +137,37 @@ def fields_config(name: str, is_active: bool = False):
     return decorator
 
 
+class SearchAfterSource(object):
+    """
+    单个存储集群的有序检索结果
+    迭代时先返回首页数据，取完后再通过 search_after 拉取下一页(每页数量翻倍)，只拉取归并实际消费的数据
+    """
+
+    def __init__(self, params: dict, first_result: dict):
+        self.params = params
+        self.first_result = first_result
+
+    def __iter__(self):
+        hits = self.first_result.get("hits", {}).get("hits", [])
+        page_size = self.params["size"]
+        fetched = len(hits)
+        while True:
+            yield from hits
+            if not hits or len(hits) < page_size:
+                return
+
+            page_size = min(page_size * 2, MAX_RESULT_WINDOW)
+            # 后续分页不需要重复聚合
+            params = dict(self.params, size=page_size, aggs={}, scroll=None)
+            if hits[-1].get("sort") and is_unique_sort(self.params.get("sort_list")):
+                params.update({"start": 0, "search_after": hits[-1]["sort"]})
+            else:
+                # 没有排序值或排序值不唯一时退化为 offset 分页
+                params["start"] = fetched
+            hits = BkLogApi.search(params).get("hits", {}).get("hits", [])
+            fetched += len(hits)
+
+
 class SearchHandler(object):
     def __init__(
         self,
@@ -230,6 +263,14 @@ class SearchHandler(object):
         # 构建排序list
         self.sort_list: list = self._init_sort()
 
+        # search_after 分页游标，指定时从游标之后开始查询，忽略 begin
+        # 排序值不唯一时，排序值与游标相同的日志会被跳过，此时仍按 begin 分页
+        self.search_after: list = search_dict.get("search_after") or []
+        if not is_unique_sort(self.sort_list):
+            self.search_after = []
+        if self.search_after:
+            self.start = 0
+
         # 构建aggs 聚合
         self.aggs: dict = self._init_aggs()
 
@@ -243,7 +284,7 @@ class SearchHandler(object):
         self.is_scroll: bool = settings.FEATURE_EXPORT_SCROLL
 
         # scroll
-        self.scroll = SCROLL if self.is_scroll else None
+        self.scroll = SCROLL if self.is_scroll and not self.search_after else None
 
         # collapse
         self.collapse = self.search_dict.get("collapse")
@@ -522,7 +563,12 @@ class SearchHandler(object):
 
         _scroll_id = result.get("_scroll_id")
 
+        # 各条日志的排序值，联合检索时作为下一页的 search_after 游标
+        sort_values = [hit.get("sort") for hit in result.get("hits", {}).get("hits", [])]
+
         result = self._deal_query_result(result)
+        if self.search_dict.get("is_union_search", False):
+            result["sort_values"] = sort_values if len(sort_values) == len(result["list"]) else []
         # 脱敏配置日志原文检索 提前返回
         if self.search_dict.get("original_search"):
             return result
@@ -569,6 +615,7 @@ class SearchHandler(object):
             "scroll": self.scroll,
             "collapse": self.collapse,
             "include_nested_fields": self.include_nested_fields,
+            "search_after": self.search_after,
         }
 
         storage_cluster_record_objs = StorageClusterRecord.objects.none()
@@ -598,9 +645,9 @@ class SearchHandler(object):
 
         multi_num = 1
 
-        # 查询多个集群数据时 start 每次从0开始
+        # 查询多个集群数据时 start 每次从0开始，各集群先取一页，归并时按需通过 search_after 继续拉取
         params["start"] = 0
-        params["size"] = once_size + self.start
+        multi_params_mapping = {f"multi_search_{multi_num}": params}
 
         # 获取当前使用的存储集群数据
         multi_execute_func.append(result_key=f"multi_search_{multi_num}", func=BkLogApi.search, params=params)
@@ -611,6 +658,7 @@ class SearchHandler(object):
                 multi_params = copy.deepcopy(params)
                 multi_params["storage_cluster_id"] = storage_cluster_record_obj.storage_cluster_id
                 multi_num += 1
+                multi_params_mapping[f"multi_search_{multi_num}"] = multi_params
                 multi_execute_func.append(
                     result_key=f"multi_search_{multi_num}", func=BkLogApi.search, params=multi_params
                 )
@@ -620,11 +668,14 @@ class SearchHandler(object):
 
         # 合并多个集群的检索结果
         merge_result = dict()
+        sources = []
         try:
             for _key, _result in multi_result.items():
                 if not _result:
                     continue
 
+                sources.append(SearchAfterSource(multi_params_mapping[_key], _result))
+
                 if not merge_result:
                     merge_result = _result
                     continue
@@ -644,7 +695,6 @@ class SearchHandler(object):
                 if "hits" not in merge_result:
                     merge_result["hits"] = {"total": 0, "max_score": None, "hits": []}
                 merge_result["hits"]["total"] += _result.get("hits", {}).get("total", 0)
-                merge_result["hits"]["hits"].extend(_result.get("hits", {}).get("hits", []))
 
                 # 处理 aggregations
                 if "aggregations" not in _result:
@@ -675,11 +725,10 @@ class SearchHandler(object):
             if not merge_result:
                 return merge_result
 
-            # hits 排序处理
-            hits = merge_result.get("hits", {}).get("hits", [])
-            if hits:
-                sorted_hits = sort_func(data=hits, sort_list=self.sort_list, key_func=lambda x: x["_source"])
-                merge_result["hits"]["hits"] = sorted_hits[self.start : (once_size + self.start)]
+            # hits 排序处理：各集群的检索结果已有序，k 路归并后只取当前页
+            if "hits" in merge_result:
+                sorted_hits = merge_sorted(sources, sort_list=self.sort_list, key_func=lambda x: x["_source"])
+                merge_result["hits"]["hits"] = list(itertools.islice(sorted_hits, self.start, self.start + once_size))
 
             aggregations = merge_result.get("aggregations", {})
 
@@ -804,11 +853,12 @@ class SearchHandler(object):
 
         return search_result
 
-    def pre_get_result(self, sorted_fields: list, size: int):
+    def pre_get_result(self, sorted_fields: list, size: int, slice_info: dict = None):
         """
         pre_get_result
         @param sorted_fields:
         @param size:
+        @param slice_info: slice scroll 切片 {"id": 0, "max": 2}
         @return:
         """
         if self.scenario_id == Scenario.ES:
@@ -834,6 +884,7 @@ class SearchHandler(object):
                     "time_field_unit": self.time_field_unit,
                     "scroll": SCROLL,
                     "collapse": self.collapse,
+                    "slice": slice_info,
                 },
                 data_api_retry_cls=DataApiRetryClass.create_retry_obj(
                     exceptions=[BaseException],
@@ -2040,6 +2091,9 @@ class UnionSearchHandler(object):
             for union_config in self.union_configs:
                 search_dict = copy.deepcopy(params)
                 search_dict["begin"] = union_config.get("begin", 0)
+                # 非首页时优先使用上一页返回的游标，避免深分页
+                if search_dict["begin"] and union_config.get("search_after"):
+                    search_dict["search_after"] = union_config["search_after"]
                 search_dict["sort_list"] = self._init_sort_list(index_set_id=union_config["index_set_id"])
                 search_dict["is_desensitize"] = union_config.get("is_desensitize", True)
                 search_handler = SearchHandler(index_set_id=union_config["index_set_id"], search_dict=search_dict)
@@ -2052,14 +2106,12 @@ class UnionSearchHandler(object):
             raise UnionSearchErrorException()
 
         # 处理返回结果
-        result_log_list = list()
-        result_origin_log_list = list()
+        results = {
+            index_set_id: multi_result.get(f"union_search_{index_set_id}") for index_set_id in self.index_set_ids
+        }
         total = 0
         took = 0
-        for index_set_id in self.index_set_ids:
-            ret = multi_result.get(f"union_search_{index_set_id}")
-            result_log_list.extend(ret["list"])
-            result_origin_log_list.extend(ret["origin_log_list"])
+        for ret in results.values():
             total += int(ret["total"])
             took = max(took, ret["took"])
 
@@ -2079,47 +2131,44 @@ class UnionSearchHandler(object):
         if len(time_fields) != 1 or len(time_fields_type) != 1 or len(time_fields_unit) != 1:
             # 标准化时间字段
             is_use_custom_time_field = True
-            for info in result_log_list:
-                index_set_obj = index_set_obj_mapping.get(info["__index_set_id__"])
-                num = TIME_FIELD_MULTIPLE_MAPPING.get(index_set_obj.time_field_unit, 1)
-                info["unionSearchTimeStamp"] = int(info[index_set_obj.time_field]) * num
-
-            for info in result_origin_log_list:
-                index_set_obj = index_set_obj_mapping.get(info["__index_set_id__"])
-                num = TIME_FIELD_MULTIPLE_MAPPING.get(index_set_obj.time_field_unit, 1)
-                info["unionSearchTimeStamp"] = int(info[index_set_obj.time_field]) * num
+            for ret in results.values():
+                for info in itertools.chain(ret["list"], ret["origin_log_list"]):
+                    index_set_obj = index_set_obj_mapping.get(info["__index_set_id__"])
+                    num = TIME_FIELD_MULTIPLE_MAPPING.get(index_set_obj.time_field_unit, 1)
+                    info["unionSearchTimeStamp"] = int(info[index_set_obj.time_field]) * num
+
+        # 各索引集的检索结果已按相同规则排好序，k 路归并后只取当前页
+        # 每条数据为 (索引集ID, 日志, 原始日志, 排序值)
+        sources = []
+        for index_set_id, ret in results.items():
+            sort_values = ret.get("sort_values") or [None] * len(ret["list"])
+            sources.append(zip(itertools.repeat(index_set_id), ret["list"], ret["origin_log_list"], sort_values))
 
         if not self.sort_list:
-            # 默认使用时间字段排序
-            if not is_use_custom_time_field:
-                # 时间字段相同 直接以相同时间字段为key进行排序 默认为降序
-                result_log_list = sorted(result_log_list, key=operator.itemgetter(list(time_fields)[0]), reverse=True)
-                result_origin_log_list = sorted(
-                    result_origin_log_list, key=operator.itemgetter(list(time_fields)[0]), reverse=True
-                )
-            else:
-                # 时间字段/时间字段格式/时间字段单位不同  标准化时间字段作为key进行排序 标准字段单位为 millisecond
-                result_log_list = sorted(result_log_list, key=operator.itemgetter("unionSearchTimeStamp"), reverse=True)
-                result_origin_log_list = sorted(
-                    result_origin_log_list, key=operator.itemgetter("unionSearchTimeStamp"), reverse=True
-                )
+            # 默认使用时间字段降序排序
+            # 时间字段/时间字段格式/时间字段单位不同时，使用标准化时间字段排序 标准字段单位为 millisecond
+            time_field = "unionSearchTimeStamp" if is_use_custom_time_field else list(time_fields)[0]
+            merged_logs = heapq.merge(*sources, key=lambda item: item[1][time_field], reverse=True)
         else:
-            result_log_list = sort_func(data=result_log_list, sort_list=self.sort_list)
-            result_origin_log_list = sort_func(data=result_origin_log_list, sort_list=self.sort_list)
+            merged_logs = merge_sorted(sources, sort_list=self.sort_list, key_func=operator.itemgetter(1))
 
         # 处理分页
-        result_log_list = result_log_list[: self.search_dict.get("size")]
-        result_origin_log_list = result_origin_log_list[: self.search_dict.get("size")]
+        merged_logs = list(itertools.islice(merged_logs, self.search_dict.get("size")))
+        result_log_list = [item[1] for item in merged_logs]
+        result_origin_log_list = [item[2] for item in merged_logs]
 
         # 日志导出提前返回
         if is_export:
             return {"origin_log_list": result_origin_log_list}
 
         # 统计返回的数据中各个索引集分别占了多少条数据  用于下次begin查询
-        result_log_index_set_ids = [result_log["__index_set_id__"] for result_log in result_log_list]
-
+        # 同时记录各索引集最后一条数据的排序值 作为下次查询的 search_after 游标
         for union_config in self.union_configs:
-            union_config["begin"] = union_config["begin"] + result_log_index_set_ids.count(union_config["index_set_id"])
+            index_set_logs = [item for item in merged_logs if item[0] == union_config["index_set_id"]]
+            union_config["begin"] = union_config["begin"] + len(index_set_logs)
+            if not index_set_logs:
+                continue
+            union_config["search_after"] = index_set_logs[-1][3] or []
 
         res = {
             "total": total,
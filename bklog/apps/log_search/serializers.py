@@ -302,6 +302,7 @@ class OriginalSearchAttrSerializer(serializers.Serializer):
 class UnionConfigSerializer(serializers.Serializer):
     index_set_id = serializers.IntegerField(label=_("索引集ID"), required=True)
     begin = serializers.IntegerField(required=False, default=0)
+    search_after = serializers.ListField(label=_("分页游标"), required=False, default=list, allow_empty=True)
     is_desensitize = serializers.BooleanField(label=_("是否脱敏"), required=False, default=True)
 
 
@@ -20,9 +20,13 @@ We undertake not to change the open source license (MIT license) applicable to t
 the project delivered to anyone in the future.
 """
 import datetime
+import gzip
 import json
 import os
+import queue
 import tarfile
+import threading
+import time
 
 import arrow
 import pytz
@@ -38,10 +42,12 @@ from apps.feature_toggle.handlers.toggle import FeatureToggleObject
 from apps.log_search.constants import (
     ASYNC_APP_CODE,
     ASYNC_DIR,
+    ASYNC_EXPORT_COMPRESS_TAR,
     ASYNC_EXPORT_EMAIL_ERR_TEMPLATE,
     ASYNC_EXPORT_EMAIL_TEMPLATE,
     ASYNC_EXPORT_EXPIRED,
     ASYNC_EXPORT_FILE_EXPIRED_DAYS,
+    ASYNC_EXPORT_PROGRESS_INTERVAL,
     FEATURE_ASYNC_EXPORT_COMMON,
     FEATURE_ASYNC_EXPORT_EXTERNAL,
     FEATURE_ASYNC_EXPORT_NOTIFY_TYPE,
@@ -56,6 +62,7 @@ from apps.log_search.models import AsyncTask, LogIndexSet, Scenario
 from apps.utils.log import logger
 from apps.utils.notify import NotifyType
 from apps.utils.remote_storage import StorageType
+from apps.utils.thread import MultiExecuteFunc
 
 
 @task(ignore_result=True, queue="async_export")
@@ -83,7 +90,7 @@ def async_export(
     random_hash = get_random_string(length=10)
     time_now = arrow.now().format("YYYYMMDDHHmmss")
     file_name = f"{ASYNC_APP_CODE}_{search_handler.index_set_id}_{time_now}_{random_hash}"
-    tar_file_name = f"{file_name}.tar.gz"
+    tar_file_name = f"{file_name}.{settings.ASYNC_EXPORT_COMPRESS_TYPE}"
     async_task = AsyncTask.objects.filter(id=async_task_id).first()
     async_export_util = AsyncExportUtils(
         search_handler=search_handler,
@@ -92,6 +99,7 @@ def async_export(
         tar_file_name=tar_file_name,
         is_external=is_external,
         external_user_email=external_user_email,
+        async_task_id=async_task_id,
     )
     try:
         if not async_task:
@@ -106,6 +114,8 @@ def async_export(
             raise
 
         async_task.export_status = ExportStatus.EXPORT_PACKAGE
+        async_task.export_count = async_export_util.export_count
+        async_task.export_speed = async_export_util.export_speed
         async_task.file_name = tar_file_name
         async_task.file_size = async_export_util.get_file_size()
         try:
@@ -220,6 +230,7 @@ class AsyncExportUtils(object):
         tar_file_name: str,
         is_external: bool = False,
         external_user_email: str = "",
+        async_task_id: int = None,
     ):
         """
         @param search_handler: the handler cls to search
@@ -227,6 +238,7 @@ class AsyncExportUtils(object):
         @param file_name: the export file name
         @param tar_file_name: the file name which will be tar
         @param is_external: is external_request
+        @param async_task_id: the task to report export progress
         """
         self.search_handler = search_handler
         self.sorted_fields = sorted_fields
@@ -238,6 +250,11 @@ class AsyncExportUtils(object):
         self.tar_file_path = f"{ASYNC_DIR}/{self.tar_file_name}"
         self.storage = self.init_remote_storage()
         self.notify = self.init_notify_type()
+        self.async_task_id = async_task_id
+        self.export_count = 0
+        self.export_speed = None
+        self.export_start_time = None
+        self.progress_report_time = None
 
     def export_package(self):
         """
@@ -246,29 +263,134 @@ class AsyncExportUtils(object):
         if not (os.path.exists(ASYNC_DIR) and os.path.isdir(ASYNC_DIR)):
             os.makedirs(ASYNC_DIR)
 
-        result = self.search_handler.pre_get_result(sorted_fields=self.sorted_fields, size=MAX_RESULT_WINDOW)
+        self.export_start_time = self.progress_report_time = time.time()
+        if settings.ASYNC_EXPORT_COMPRESS_TYPE == ASYNC_EXPORT_COMPRESS_TAR:
+            with open(self.file_path, "a+", encoding="utf-8") as f:
+                self.export_logs(f)
+            with tarfile.open(self.tar_file_path, "w:gz") as tar:
+                tar.add(self.file_path, arcname=self.file_name)
+        else:
+            # 边查询边压缩写入，不产生中间文件
+            with gzip.open(self.tar_file_path, "wt", encoding="utf-8") as f:
+                self.export_logs(f)
+
+        self.report_progress()
+        logger.info(
+            "[async_export] task(%s) export %s logs, cost: %.2fs, speed: %s/s",
+            self.async_task_id,
+            self.export_count,
+            time.time() - self.export_start_time,
+            self.export_speed,
+        )
+
+    def export_logs(self, f):
+        """
+        将检索结果写入文件，ES 场景下按配置切分为多个 slice scroll 并发查询
+        """
+        slice_num = settings.ASYNC_EXPORT_SLICE_NUM if self.search_handler.scenario_id == Scenario.ES else 1
+        if slice_num <= 1:
+            for log_list in self.iter_logs():
+                if not self.write_file(f, log_list):
+                    return
+            return
+
+        log_queue = queue.Queue(maxsize=slice_num * 2)
+        stop_event = threading.Event()
+
+        def put(item) -> bool:
+            while not stop_event.is_set():
+                try:
+                    log_queue.put(item, timeout=1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce(slice_id: int):
+            try:
+                for log_list in self.iter_logs(slice_info={"id": slice_id, "max": slice_num}):
+                    if not put(log_list):
+                        return
+            except Exception:
+                stop_event.set()
+                raise
+            finally:
+                # 结束标记
+                put(None)
+
+        multi_execute_func = MultiExecuteFunc(max_workers=slice_num)
+        for slice_id in range(slice_num):
+            multi_execute_func.append(
+                result_key=f"export_slice_{slice_id}",
+                func=produce,
+                params={"slice_id": slice_id},
+                multi_func_params=True,
+            )
+        producer = threading.Thread(target=multi_execute_func.run, kwargs={"return_exception": True})
+        producer.daemon = True
+        producer.start()
+
+        # 在当前线程写入文件，各 slice 查询到的数据通过队列汇总
+        finished_num = 0
+        try:
+            while finished_num < slice_num and not stop_event.is_set():
+                try:
+                    log_list = log_queue.get(timeout=1)
+                except queue.Empty:
+                    continue
+                if log_list is None:
+                    finished_num += 1
+                elif not self.write_file(f, log_list):
+                    break
+        finally:
+            stop_event.set()
+            producer.join()
+
+        for result in multi_execute_func.results.values():
+            if isinstance(result, Exception):
+                raise result
+
+    def iter_logs(self, slice_info: dict = None):
+        """
+        逐页获取检索结果
+        @param slice_info: slice scroll 切片 {"id": 0, "max": 2}
+        """
+        result = self.search_handler.pre_get_result(
+            sorted_fields=self.sorted_fields, size=MAX_RESULT_WINDOW, slice_info=slice_info
+        )
         # 判断是否成功
         if result["_shards"]["total"] != result["_shards"]["successful"]:
             logger.error("can not create async_export task, reason: {}".format(result["_shards"]["failures"]))
             raise PreCheckAsyncExportException()
-        with open(self.file_path, "a+", encoding="utf-8") as f:
-            result_list = self.search_handler._deal_query_result(result_dict=result).get("origin_log_list")
-            for item in result_list:
-                f.write("%s\n" % json.dumps(item, ensure_ascii=False))
-            if self.search_handler.scenario_id == Scenario.ES:
-                generate_result = self.search_handler.scroll_result(result)
-            else:
-                generate_result = self.search_handler.search_after_result(result, self.sorted_fields)
-            self.write_file(f, generate_result)
-
-        with tarfile.open(self.tar_file_path, "w:gz") as tar:
-            tar.add(self.file_path, arcname=self.file_name)
+        yield self.search_handler._deal_query_result(result_dict=result).get("origin_log_list")
+
+        if self.search_handler.scenario_id == Scenario.ES:
+            generate_result = self.search_handler.scroll_result(result)
+        else:
+            generate_result = self.search_handler.search_after_result(result, self.sorted_fields)
+        for res in generate_result:
+            yield res.get("origin_log_list")
+
+    def report_progress(self):
+        """
+        更新导出任务的进度及速度
+        """
+        self.progress_report_time = time.time()
+        self.export_speed = round(self.export_count / max(self.progress_report_time - self.export_start_time, 1), 2)
+        if self.async_task_id:
+            AsyncTask.objects.filter(id=self.async_task_id).update(
+                export_count=self.export_count, export_speed=self.export_speed
+            )
 
     def export_upload(self):
         """
         文件上传
         """
-        self.storage.export_upload(file_path=self.tar_file_path, file_name=self.tar_file_name)
+        self.storage.export_upload(
+            file_path=self.tar_file_path,
+            file_name=self.tar_file_name,
+            multipart_threshold=settings.ASYNC_EXPORT_MULTIPART_THRESHOLD,
+        )
 
     def generate_download_url(self, url_path: str):
         """
@@ -328,7 +450,8 @@ class AsyncExportUtils(object):
         """
         清空产生的临时文件
         """
-        os.remove(self.file_path)
+        if os.path.exists(self.file_path):
+            os.remove(self.file_path)
         os.remove(self.tar_file_path)
 
     def init_remote_storage(self):
@@ -364,12 +487,15 @@ class AsyncExportUtils(object):
 
         return NotifyType.get_instance(notify_type=notify_type)()
 
-    @classmethod
-    def write_file(cls, f, result):
+    def write_file(self, f, log_list) -> bool:
         """
         将对应数据写到文件中
+        @return: 是否需要继续写入，达到导出条数后返回 False，与单个 scroll 一样以整页为单位
         """
-        for res in result:
-            origin_result_list = res.get("origin_log_list")
-            for item in origin_result_list:
-                f.write("%s\n" % json.dumps(item))
+        for item in log_list:
+            f.write("%s\n" % json.dumps(item, ensure_ascii=False))
+        self.export_count += len(log_list)
+
+        if time.time() - self.progress_report_time >= ASYNC_EXPORT_PROGRESS_INTERVAL:
+            self.report_progress()
+        return self.export_count < self.search_handler.size
@@ -20,15 +20,18 @@ We undertake not to change the open source license (MIT license) applicable to t
 the project delivered to anyone in the future.
 """
 import functools
+import heapq
 import operator
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Iterator
 
+# 排序字段包含以下任一组合时，排序值能唯一确定一条日志
+UNIQUE_SORT_FIELDS = [{"_id"}, {"gseIndex", "iterationIndex"}, {"gseindex", "_iteration_idx"}]
 
-def sort_func(data: List[Dict[str, Any]], sort_list: List[List[str]], key_func=lambda x: x) -> List[Dict[str, Any]]:
+
+def get_sort_key(sort_list: List[List[str]], key_func=lambda x: x):
     """
-    排序函数 提供复杂嵌套的数据结构排序能力
-    params data 源数据  [{"a": {"b": 3}}, {"a": {"b": 7}}, {"a": {"b": 2}}]
+    根据排序规则生成排序 key，支持复杂嵌套的数据结构
     params sort_list 排序规则 [["a.b", "desc"]]
     params key_func 排序字段值获取函数
     """
@@ -70,4 +73,33 @@ def sort_func(data: List[Dict[str, Any]], sort_list: List[List[str]], key_func=l
 
         return 0
 
-    return sorted(data, key=functools.cmp_to_key(_sort_compare))
+    return functools.cmp_to_key(_sort_compare)
+
+
+def sort_func(data: List[Dict[str, Any]], sort_list: List[List[str]], key_func=lambda x: x) -> List[Dict[str, Any]]:
+    """
+    排序函数 提供复杂嵌套的数据结构排序能力
+    params data 源数据  [{"a": {"b": 3}}, {"a": {"b": 7}}, {"a": {"b": 2}}]
+    params sort_list 排序规则 [["a.b", "desc"]]
+    params key_func 排序字段值获取函数
+    """
+    return sorted(data, key=get_sort_key(sort_list, key_func))
+
+
+def merge_sorted(iterables: Iterable[Iterable[Any]], sort_list: List[List[str]], key_func=lambda x: x) -> Iterator[Any]:
+    """
+    k 路归并 各数据源已按排序规则排好序，通过堆逐条合并，只消费实际取出的数据
+    params iterables 各数据源
+    params sort_list 排序规则 [["a.b", "desc"]]
+    params key_func 排序字段值获取函数
+    """
+    return heapq.merge(*iterables, key=get_sort_key(sort_list, key_func))
+
+
+def is_unique_sort(sort_list: List[List[str]]) -> bool:
+    """
+    排序规则能否唯一确定一条日志 唯一时才能使用 search_after 分页，否则排序值相同的日志会被跳过
+    params sort_list 排序规则 [["a.b", "desc"]]
+    """
+    sort_fields = {sort_info[0] for sort_info in sort_list or []}
+    return any(unique_fields <= sort_fields for unique_fields in UNIQUE_SORT_FIELDS)
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making BK-LOG 蓝鲸日志平台 available.
+Copyright (C) 2021 THL A29 Limited, a Tencent company.  All rights reserved.
+BK-LOG 蓝鲸日志平台 is licensed under the MIT License.
+License for BK-LOG 蓝鲸日志平台:
+--------------------------------------------------------------------
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial
+portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+We undertake not to change the open source license (MIT license) applicable to the current version of
+the project delivered to anyone in the future.
+"""
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+from django.test import override_settings
+
+from apps.log_esquery.utils.es_client_pool import EsClientRegistry
+
+CONNECT_INFO = ("127.0.0.1", 9200, "admin", "password", "7.10.0", "http")
+
+
+@patch("apps.log_esquery.utils.es_client_pool.es_socket_ping", lambda host, port: None)
+@patch.object(EsClientRegistry, "_start_health_checker", lambda: None)
+class TestEsClientRegistry(TestCase):
+    def setUp(self):
+        EsClientRegistry._clients = {}
+
+    def tearDown(self):
+        EsClientRegistry._clients = {}
+
+    def test_reuse_client(self):
+        create_client = MagicMock(side_effect=lambda connect_info: MagicMock())
+        client, active = EsClientRegistry.get_client(1, CONNECT_INFO, create_client)
+        self.assertTrue(active)
+
+        # 连接信息不变时复用客户端，且健康状态正常时不再 ping
+        self.assertEqual(EsClientRegistry.get_client(1, CONNECT_INFO, create_client), (client, True))
+        self.assertEqual(create_client.call_count, 1)
+        client.ping.assert_called_once()
+
+        # 连接信息变化时淘汰旧客户端
+        new_connect_info = CONNECT_INFO[:3] + ("new_password",) + CONNECT_INFO[4:]
+        new_client, _ = EsClientRegistry.get_client(1, new_connect_info, create_client)
+        self.assertIsNot(new_client, client)
+        client.transport.close.assert_called_once()
+
+    def test_inactive_client(self):
+        client = MagicMock()
+        client.ping.return_value = False
+        self.assertEqual(EsClientRegistry.get_client(1, CONNECT_INFO, lambda connect_info: client), (client, False))
+        self.assertEqual(
+            EsClientRegistry.get_client(1, CONNECT_INFO, lambda connect_info: client, check_ping=False), (client, True)
+        )
+
+    @override_settings(ES_CLIENT_IDLE_TIMEOUT=60)
+    @patch("apps.log_esquery.utils.es_client_pool.time.time")
+    def test_health_check(self, mock_time):
+        mock_time.return_value = 1000
+        idle_client, _ = EsClientRegistry.get_client(1, CONNECT_INFO, lambda connect_info: MagicMock())
+        mock_time.return_value = 1050
+        down_client, _ = EsClientRegistry.get_client(2, CONNECT_INFO, lambda connect_info: MagicMock())
+        down_client.ping.side_effect = Exception("connection refused")
+
+        mock_time.return_value = 1100
+        EsClientRegistry.health_check()
+
+        # 长时间未使用的客户端被关闭，不可用的客户端在下次获取时重新 ping
+        self.assertNotIn(1, EsClientRegistry._clients)
+        idle_client.transport.close.assert_called_once()
+        self.assertFalse(EsClientRegistry._clients[2].active)
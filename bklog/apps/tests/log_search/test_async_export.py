@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making BK-LOG 蓝鲸日志平台 available.
+Copyright (C) 2021 THL A29 Limited, a Tencent company.  All rights reserved.
+BK-LOG 蓝鲸日志平台 is licensed under the MIT License.
+License for BK-LOG 蓝鲸日志平台:
+--------------------------------------------------------------------
+Permission is hereby granted, free of charge, to any person obtaining a copy of this software and associated
+documentation files (the "Software"), to deal in the Software without restriction, including without limitation
+the rights to use, copy, modify, merge, publish, distribute, sublicense, and/or sell copies of the Software,
+and to permit persons to whom the Software is furnished to do so, subject to the following conditions:
+The above copyright notice and this permission notice shall be included in all copies or substantial
+portions of the Software.
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT
+LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN
+NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY,
+WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+We undertake not to change the open source license (MIT license) applicable to the current version of
+the project delivered to anyone in the future.
+"""
+import gzip
+import json
+from unittest.mock import MagicMock, patch
+
+from django.test import TestCase, override_settings
+
+from apps.log_search.constants import MAX_RESULT_WINDOW
+from apps.log_search.models import Scenario
+from apps.log_search.tasks.async_export import AsyncExportUtils
+
+SLICE_NUM = 3
+PAGE_NUM = 2
+
+
+def make_result(slice_id, page):
+    logs = [{"slice": slice_id, "page": page, "index": index} for index in range(MAX_RESULT_WINDOW)]
+    return {"_shards": {"total": 1, "successful": 1}, "origin_log_list": logs}
+
+
+class FakeSearchHandler(object):
+    scenario_id = Scenario.ES
+    size = SLICE_NUM * PAGE_NUM * MAX_RESULT_WINDOW
+
+    def __init__(self):
+        self.slice_infos = []
+
+    def pre_get_result(self, sorted_fields, size, slice_info=None):
+        self.slice_infos.append(slice_info)
+        return make_result(slice_info["id"], 0)
+
+    def _deal_query_result(self, result_dict):
+        return result_dict
+
+    def scroll_result(self, scroll_result):
+        for page in range(1, PAGE_NUM):
+            yield make_result(scroll_result["origin_log_list"][0]["slice"], page)
+
+
+@override_settings(ASYNC_EXPORT_SLICE_NUM=SLICE_NUM, ASYNC_EXPORT_COMPRESS_TYPE="gz")
+@patch.object(AsyncExportUtils, "init_remote_storage", MagicMock())
+@patch.object(AsyncExportUtils, "init_notify_type", MagicMock())
+class TestAsyncExport(TestCase):
+    def test_export_package(self):
+        search_handler = FakeSearchHandler()
+        export_util = AsyncExportUtils(
+            search_handler=search_handler,
+            sorted_fields=[],
+            file_name="test_export",
+            tar_file_name="test_export.gz",
+        )
+        export_util.export_package()
+
+        # 各 slice 并发查询，直接写入 gzip 文件
+        self.assertEqual(
+            sorted(search_handler.slice_infos, key=lambda x: x["id"]),
+            [{"id": slice_id, "max": SLICE_NUM} for slice_id in range(SLICE_NUM)],
+        )
+        with gzip.open(export_util.tar_file_path, "rt", encoding="utf-8") as f:
+            logs = [json.loads(line) for line in f]
+        self.assertEqual(len(logs), FakeSearchHandler.size)
+        self.assertEqual(len({(log["slice"], log["page"]) for log in logs}), SLICE_NUM * PAGE_NUM)
+        self.assertEqual(export_util.export_count, FakeSearchHandler.size)
+
+        export_util.clean_package()
@@ -19,11 +19,16 @@ SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 We undertake not to change the open source license (MIT license) applicable to the current version of
 the project delivered to anyone in the future.
 """
+import itertools
 from unittest.mock import patch
 
 import arrow
 from apps.log_search.constants import LOG_ASYNC_FIELDS
-from apps.log_search.handlers.search.search_handlers_esquery import SearchHandler
+from apps.log_search.handlers.search.search_handlers_esquery import (
+    SearchAfterSource,
+    SearchHandler,
+)
+from apps.log_search.utils import merge_sorted
 from django.test import TestCase
 
 INDEX_SET_ID = 0
@@ -117,3 +122,50 @@ class TestSearchHandler(TestCase):
             logs_result.extend(result["list"])
 
         self.assertEqual(len(logs_result), 90000)
+
+
+def make_hits(timestamps):
+    return [{"_source": {"dtEventTimeStamp": timestamp}, "sort": [timestamp]} for timestamp in timestamps]
+
+
+UNIQUE_SORT_LIST = [["dtEventTimeStamp", "desc"], ["gseIndex", "desc"], ["iterationIndex", "desc"]]
+
+
+class TestSearchAfterSource(TestCase):
+    def test_merge(self):
+        # 集群 a 的数据都比集群 b 新
+        pages = {(9,): make_hits([8, 7, 6, 5])}
+        search_params = []
+
+        def search(params):
+            search_params.append(params)
+            return {"hits": {"hits": pages[tuple(params["search_after"])]}}
+
+        params = {"size": 2, "start": 0, "search_after": [], "sort_list": UNIQUE_SORT_LIST}
+        sources = [
+            SearchAfterSource(params, {"hits": {"hits": make_hits([10, 9])}}),
+            SearchAfterSource(params, {"hits": {"hits": make_hits([2, 1])}}),
+        ]
+        with patch("apps.api.BkLogApi.search", search):
+            hits = merge_sorted(sources, [["dtEventTimeStamp", "desc"]], key_func=lambda x: x["_source"])
+            page = list(itertools.islice(hits, 2, 6))
+
+        self.assertEqual([hit["_source"]["dtEventTimeStamp"] for hit in page], [8, 7, 6, 5])
+        # 只有集群 a 继续拉取下一页，每页数量翻倍
+        self.assertEqual([(params["search_after"], params["size"]) for params in search_params], [([9], 4)])
+
+    def test_not_unique_sort(self):
+        search_params = []
+
+        def search(params):
+            search_params.append(params)
+            return {"hits": {"hits": make_hits([9, 8])}}
+
+        # 排序值不唯一时按 offset 拉取下一页，避免跳过排序值相同的日志
+        params = {"size": 2, "start": 0, "search_after": [], "sort_list": [["dtEventTimeStamp", "desc"]]}
+        source = SearchAfterSource(params, {"hits": {"hits": make_hits([10, 9])}})
+        with patch("apps.api.BkLogApi.search", search):
+            hits = list(itertools.islice(source, 4))
+
+        self.assertEqual([hit["_source"]["dtEventTimeStamp"] for hit in hits], [10, 9, 9, 8])
+        self.assertEqual([(params["search_after"], params["start"]) for params in search_params], [([], 2)])
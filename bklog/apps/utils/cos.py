@@ -20,12 +20,17 @@ We undertake not to change the open source license (MIT license) applicable to t
 the project delivered to anyone in the future.
 """
 
+import os
 import typing
 
 from django.conf import settings
 from django.utils.translation import ugettext_lazy as _
 from qcloud_cos import CosConfig, CosS3Client
 
+# 分块上传的块大小(MB)及并发数
+COS_MULTIPART_PART_SIZE = 20
+COS_MULTIPART_MAX_THREAD = 5
+
 
 class ConfigMap(typing.NamedTuple):
     target: str
@@ -63,12 +68,22 @@ class QcloudCos(object):
             return url.replace(f"cos.{self._qcloud_cos_region.strip()}.myqcloud.com", settings.EXTRACT_COS_DOMAIN)
         return url
 
-    def upload_file(self, file_path: str, file_name: str):
+    def upload_file(self, file_path: str, file_name: str, multipart_threshold: int = 0):
         """
         从本地路径上传到到cos对应文件
         @param file_path 本地路径
         @param file_name 上传文件名
+        @param multipart_threshold 文件超过该大小(MB)时分块并发上传，0 表示不分块
         """
+        if multipart_threshold and os.path.getsize(file_path) > multipart_threshold * 1024 * 1024:
+            response = self._client.upload_file(
+                Bucket=self._qcloud_cos_bucket.strip(),
+                LocalFilePath=file_path,
+                Key=file_name,
+                PartSize=COS_MULTIPART_PART_SIZE,
+                MAXThread=COS_MULTIPART_MAX_THREAD,
+            )
+            return response["ETag"]
         response = self._client.put_object_from_local_file(
             Bucket=self._qcloud_cos_bucket.strip(), LocalFilePath=file_path, Key=file_name
         )
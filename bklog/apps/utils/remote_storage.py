@@ -59,8 +59,8 @@ class CosStorage(Storage):
         if expired:
             self.qcloud_cos.expired = expired
 
-    def export_upload(self, file_path, file_name, **kwargs):
-        return self.qcloud_cos.upload_file(file_path, file_name)
+    def export_upload(self, file_path, file_name, multipart_threshold=0, **kwargs):
+        return self.qcloud_cos.upload_file(file_path, file_name, multipart_threshold=multipart_threshold)
 
     def generate_download_url(self, file_name, **kwargs):
         return self.qcloud_cos.get_download_url(file_name)
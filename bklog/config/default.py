@@ -842,6 +842,14 @@ ES_COMPATIBILITY = int(os.environ.get("BKAPP_ES_COMPATIBILITY", 0))
 # scroll滚动查询：默认关闭，通过环境变量控制
 FEATURE_EXPORT_SCROLL = os.environ.get("BKAPP_FEATURE_EXPORT_SCROLL", False)
 
+# 异步导出：并行 slice scroll 数量，默认 1 即不切分。切分后导出文件内的日志只在各 slice 内有序
+ASYNC_EXPORT_SLICE_NUM = int(os.environ.get("BKAPP_ASYNC_EXPORT_SLICE_NUM", 1))
+# 异步导出文件格式：默认 tar.gz 先写原始文件再打包，与已有的导出文件及下载方保持一致；
+# 设置为 gz 时边查询边压缩写入，省去中间文件及二次打包，但下载得到的是单个 .gz 文件而非 tar 包
+ASYNC_EXPORT_COMPRESS_TYPE = os.environ.get("BKAPP_ASYNC_EXPORT_COMPRESS_TYPE", "tar.gz")
+# 异步导出文件上传到 COS 时，超过该大小(MB)使用分块上传
+ASYNC_EXPORT_MULTIPART_THRESHOLD = int(os.environ.get("BKAPP_ASYNC_EXPORT_MULTIPART_THRESHOLD", 100))
+
 # BCS
 BCS_API_GATEWAY_TOKEN = os.getenv("BKAPP_BCS_API_GATEWAY_TOKEN", "")
 BCS_CC_SSM_SWITCH = os.getenv("BKAPP_BCS_CC_SSM_SWITCH", "on")
@@ -893,6 +901,15 @@ FRONTEND_REPORT_DATA_URL = os.environ.get("BKAPP_FRONTEND_REPORT_DATA_URL")
 ES_QUERY_ACCESS_LIST: list = ["bkdata", "es", "log"]
 ES_QUERY_TIMEOUT = int(os.environ.get("BKAPP_ES_QUERY_TIMEOUT", 55))
 
+# ES 客户端复用：进程内按存储集群复用长连接客户端，连接信息变化时重建
+ES_CLIENT_POOL_ENABLED = os.getenv("BKAPP_ES_CLIENT_POOL_ENABLED", "on") == "on"
+# 单个客户端到每个 ES 节点的最大连接数
+ES_CLIENT_POOL_MAXSIZE = int(os.environ.get("BKAPP_ES_CLIENT_POOL_MAXSIZE", 10))
+# 客户端健康检查间隔(秒)
+ES_CLIENT_HEALTH_CHECK_INTERVAL = int(os.environ.get("BKAPP_ES_CLIENT_HEALTH_CHECK_INTERVAL", 60))
+# 客户端超过该时间(秒)未使用时关闭
+ES_CLIENT_IDLE_TIMEOUT = int(os.environ.get("BKAPP_ES_CLIENT_IDLE_TIMEOUT", 1800))
+
 # ESQUERY 查询白名单，直接透传
 ESQUERY_EXTRA_WHITE_LIST = [app for app in os.getenv("BKAPP_ESQUERY_WHITE_LIST", "").split(",") if app]
 
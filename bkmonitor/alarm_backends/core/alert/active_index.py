@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+"""
+alert.manager 异常告警调度索引
+
+scan: 每分钟从 ES 全量 scan 异常告警，生成告警检测任务
+index: 在 ALERT_ACTIVE_INDEX_KEY(SortedSet) 中维护异常告警，member 为 "告警ID|策略ID"，score 为下次调度时间
+    1. builder 产生异常告警时加入索引，告警结束或被流控时从索引中移除
+    2. manager 处理完告警后，将已结束、被流控或已不存在的告警从索引中移除
+    3. 调度时通过 lua 脚本取出到期的告警，并将其下次调度时间顺延一个周期，保证同一告警不会被重复调度
+    4. 定期从 ES 全量 scan 一次异常告警对索引进行校正，补充遗漏的告警并清理已不在 ES 中的告警
+通过 ALERT_CHECK_BACKEND 配置切换，索引为空时(如刚切换)仍从 ES 全量拉取，并以拉取结果初始化索引。
+"""
+
+import time
+from typing import List
+
+from alarm_backends.core.alert.alert import Alert, AlertKey
+from alarm_backends.core.cache import key
+
+ALERT_CHECK_BACKEND_SCAN = "scan"
+ALERT_CHECK_BACKEND_INDEX = "index"
+
+# 调度周期
+SCHEDULE_INTERVAL = 60
+
+# 单次脚本调用处理的告警数量，避免单条命令阻塞 redis 过久
+BATCH_SIZE = 5000
+
+# ARGV: 当前时间, 下次调度时间, 数量，返回到期的告警并顺延其调度时间
+POP_DUE_SCRIPT = key.RedisScript(
+    """
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[3])
+for i = 1, #members do
+    redis.call('ZADD', KEYS[1], ARGV[2], members[i])
+end
+return members
+"""
+)
+
+
+class ActiveAlertIndex(object):
+    """
+    异常告警调度索引
+    """
+
+    def __init__(self, client=None):
+        self.client = client or key.ALERT_ACTIVE_INDEX_KEY.client
+        self.index_key = key.ALERT_ACTIVE_INDEX_KEY.get_key()
+
+    @staticmethod
+    def to_member(alert_key: AlertKey) -> str:
+        return str(alert_key)
+
+    @staticmethod
+    def from_member(member: str) -> AlertKey:
+        alert_id, strategy_id = member.split("|", 1)
+        return AlertKey(alert_id=alert_id, strategy_id=int(strategy_id or 0))
+
+    def add(self, alert_keys: List[AlertKey], schedule_time=None):
+        """
+        加入索引，已在索引中的告警保持原有的调度时间
+        """
+        if not alert_keys:
+            return
+
+        schedule_time = int(schedule_time or time.time() + SCHEDULE_INTERVAL)
+        pipeline = self.client.pipeline(transaction=False)
+        for offset in range(0, len(alert_keys), BATCH_SIZE):
+            members = [self.to_member(alert_key) for alert_key in alert_keys[offset : offset + BATCH_SIZE]]
+            pipeline.zadd(self.index_key, {member: schedule_time for member in members}, nx=True)
+        pipeline.expire(self.index_key, key.ALERT_ACTIVE_INDEX_KEY.ttl)
+        pipeline.execute()
+
+    def remove(self, alert_keys: List[AlertKey]):
+        """
+        从索引中移除
+        """
+        if not alert_keys:
+            return
+
+        pipeline = self.client.pipeline(transaction=False)
+        for offset in range(0, len(alert_keys), BATCH_SIZE):
+            members = [self.to_member(alert_key) for alert_key in alert_keys[offset : offset + BATCH_SIZE]]
+            pipeline.zrem(self.index_key, *members)
+        pipeline.execute()
+
+    def update(self, alerts: List[Alert]):
+        """
+        根据告警状态更新索引：未被流控的异常告警加入索引，其他告警从索引中移除
+        """
+        active_keys = []
+        inactive_keys = []
+        for alert in alerts:
+            if alert.is_abnormal() and not alert.is_blocked:
+                active_keys.append(alert.key)
+            else:
+                inactive_keys.append(alert.key)
+        self.add(active_keys)
+        self.remove(inactive_keys)
+
+    def pop_due(self, now=None) -> List[AlertKey]:
+        """
+        按调度时间顺序取出到期的告警，并将其调度时间顺延一个周期
+        """
+        now = int(now or time.time())
+        alert_keys = []
+        while True:
+            args = [now, now + SCHEDULE_INTERVAL, BATCH_SIZE]
+            members = POP_DUE_SCRIPT(self.client, [self.index_key], args, self.index_key.strategy_id) or []
+            alert_keys.extend(self.from_member(member) for member in members)
+            if len(members) < BATCH_SIZE:
+                break
+        self.client.expire(self.index_key, key.ALERT_ACTIVE_INDEX_KEY.ttl)
+        return alert_keys
+
+    def size(self) -> int:
+        return self.client.zcard(self.index_key)
+
+    def reconcile(self, alert_keys: List[AlertKey], scan_start_time):
+        """
+        根据 ES 全量拉取的异常告警校正索引
+        :param alert_keys: ES 中的异常告警
+        :param scan_start_time: 开始拉取的时间，之后加入索引或被调度过的告警不做清理
+        """
+        self.add(alert_keys, schedule_time=scan_start_time + SCHEDULE_INTERVAL)
+
+        members = {self.to_member(alert_key) for alert_key in alert_keys}
+        stale_members = [
+            member
+            for member in self.client.zrangebyscore(self.index_key, "-inf", scan_start_time + SCHEDULE_INTERVAL)
+            if member not in members
+        ]
+        self.remove([self.from_member(member) for member in stale_members])
+        return len(stale_members)
@@ -12,7 +12,8 @@ import copy
 import json
 import logging
 import time
-from typing import List
+from collections import defaultdict
+from typing import Dict, List, Set
 
 from django.conf import settings
 from django.utils.translation import ugettext as _
@@ -21,6 +22,19 @@ from redis.exceptions import RedisError
 
 from alarm_backends.constants import DEFAULT_DEDUPE_FIELDS, NO_DATA_TAG_DIMENSION
 from alarm_backends.core.alert.event import Event
+from alarm_backends.core.alert.snapshot import (
+    decode_alert,
+    encode_alert,
+    encode_reference,
+    snapshot_ttl,
+    use_reference,
+)
+from alarm_backends.core.alert.version import (
+    CONFLICT,
+    compare_and_set,
+    incr_version,
+    use_cas,
+)
 from alarm_backends.core.cache.key import (
     ALERT_BUILD_QOS_COUNTER,
     ALERT_DEDUPE_CONTENT_KEY,
@@ -749,7 +763,7 @@ class Alert:
             return
 
         try:
-            alert_data = json.loads(alert_json)
+            alert_data = decode_alert(alert_json)
             return cls(alert_data)
         except Exception as e:
             logger.warning("load alert failed: %s, origin data: %s", e, alert_json)
@@ -792,7 +806,7 @@ class Alert:
                 alert_ids_not_found.append(alert_keys[index].alert_id)
                 continue
             try:
-                alert_data = json.loads(alert_json)
+                alert_data = decode_alert(alert_json)
                 results.append(cls(alert_data))
             except Exception as e:
                 logger.warning("load alert failed: %s, origin data: %s", e, alert_json)
@@ -804,12 +818,49 @@ class Alert:
 
         return results
 
+    @classmethod
+    def mget_by_references(cls, references: List[dict]) -> List["Alert"]:
+        """
+        根据维度缓存中的引用批量获取告警
+        快照已过期时，已结束的告警直接使用引用中的字段，未结束的告警从ES获取
+        :param references: 引用内容列表
+        :return: 告警 Alert 对象 列表
+        """
+        if not references:
+            return []
+
+        pipeline = ALERT_SNAPSHOT_KEY.client.pipeline(transaction=False)
+        for reference in references:
+            pipeline.get(AlertKey(reference["id"], reference["strategy_id"]).get_snapshot_key())
+        alerts_snapshot = pipeline.execute()
+
+        results = []
+        alert_ids_not_found = []
+        for reference, alert_json in zip(references, alerts_snapshot):
+            if alert_json:
+                try:
+                    results.append(cls(decode_alert(alert_json)))
+                    continue
+                except Exception as e:
+                    logger.warning("load alert failed: %s, origin data: %s", e, alert_json)
+
+            if reference["status"] == EventStatus.ABNORMAL:
+                alert_ids_not_found.append(reference["id"])
+            else:
+                results.append(cls(reference))
+
+        if alert_ids_not_found:
+            for alert_doc in AlertDocument.mget(alert_ids_not_found):
+                results.append(cls(alert_doc.to_dict()))
+
+        return results
+
     def save_snapshot(self):
         """
         保存到redis快照
         """
         key = ALERT_SNAPSHOT_KEY.get_key(strategy_id=self.strategy_id or 0, alert_id=self.id)
-        ALERT_SNAPSHOT_KEY.client.set(key, json.dumps(self.to_dict()), ALERT_SNAPSHOT_KEY.ttl)
+        ALERT_SNAPSHOT_KEY.client.set(key, encode_alert(self.to_dict()), snapshot_ttl())
 
     @property
     def key(self) -> AlertKey:
@@ -1004,6 +1055,10 @@ class AlertCache:
         update_count = 0
         finished_count = 0
         # 通过 pipeline 批量更新告警，由于这些告警维度都各不相同，更新的先后顺序就都无所谓了
+        # 使用引用格式时，告警内容只保存在快照中，由调用方随后通过 save_alert_snapshot 写入
+        reference = use_reference()
+        # 版本号更新方式下，直接写入的同时递增版本号，使并发中的更新产生冲突
+        cas = use_cas()
         pipeline = ALERT_DEDUPE_CONTENT_KEY.client.pipeline(transaction=False)
         for alert in alerts_to_saved.values():
             key = ALERT_DEDUPE_CONTENT_KEY.get_key(strategy_id=alert.strategy_id or 0, dedupe_md5=alert.dedupe_md5)
@@ -1013,21 +1068,73 @@ class AlertCache:
             else:
                 # 如果告警未结束就更新
                 update_count += 1
-            pipeline.set(key, json.dumps(alert.to_dict()), ALERT_DEDUPE_CONTENT_KEY.ttl)
+            pipeline.set(key, AlertCache.encode_content(alert, reference), ALERT_DEDUPE_CONTENT_KEY.ttl)
+            if cas:
+                incr_version(pipeline, alert.strategy_id, alert.dedupe_md5)
         pipeline.execute()
         return update_count, finished_count
 
+    @staticmethod
+    def encode_content(alert: Alert, reference: bool) -> str:
+        alert_data = alert.to_dict()
+        return encode_reference(alert_data) if reference else json.dumps(alert_data)
+
+    @staticmethod
+    def compare_and_save_alerts(
+        alerts: List[Alert], versions: Dict[str, int], snapshot_only_ids: Set[str] = None
+    ) -> Set[str]:
+        """
+        按维度比较版本号，版本号未变化时原子地写入维度缓存及快照
+        :param alerts: 需要保存的告警，同一维度的告警一起写入
+        :param versions: 读取告警缓存前获取的维度版本号
+        :param snapshot_only_ids: 只写入快照，不刷新维度缓存的告警ID
+        :return: 版本冲突的 dedupe_md5
+        """
+        if not alerts:
+            return set()
+
+        snapshot_only_ids = snapshot_only_ids or set()
+        dimension_alerts = defaultdict(list)
+        for alert in alerts:
+            dimension_alerts[alert.dedupe_md5].append(alert)
+
+        reference = use_reference()
+        dedupe_md5_list = []
+        pipeline = ALERT_DEDUPE_CONTENT_KEY.client.pipeline(transaction=False)
+        for dedupe_md5, alerts_to_saved in dimension_alerts.items():
+            # 与 save_alert_to_cache 一致，维度缓存保存创建时间最新的告警
+            content_alerts = [alert for alert in alerts_to_saved if alert.id not in snapshot_only_ids]
+            content = ""
+            if content_alerts:
+                content = AlertCache.encode_content(max(content_alerts, key=lambda a: a.create_time), reference)
+            snapshots = {
+                ALERT_SNAPSHOT_KEY.get_key(strategy_id=alert.strategy_id or 0, alert_id=alert.id): encode_alert(
+                    alert.to_dict()
+                )
+                for alert in alerts_to_saved
+            }
+            compare_and_set(
+                pipeline, alerts_to_saved[0].strategy_id, dedupe_md5, versions.get(dedupe_md5, 0), content, snapshots
+            )
+            dedupe_md5_list.append(dedupe_md5)
+
+        return {dedupe_md5 for dedupe_md5, result in zip(dedupe_md5_list, pipeline.execute()) if result == CONFLICT}
+
     @staticmethod
     def save_alert_snapshot(alerts: List[Alert]):
         if not alerts:
             return 0
 
+        cas = use_cas()
+        ttl = snapshot_ttl()
         pipeline = ALERT_SNAPSHOT_KEY.client.pipeline(transaction=False)
         snapshot_count = 0
         for alert in alerts:
             # 已经结束的告警保存快照备用
             key = ALERT_SNAPSHOT_KEY.get_key(strategy_id=alert.strategy_id or 0, alert_id=alert.id)
-            pipeline.set(key, json.dumps(alert.to_dict()), ALERT_SNAPSHOT_KEY.ttl)
+            pipeline.set(key, encode_alert(alert.to_dict()), ttl)
+            if cas:
+                incr_version(pipeline, alert.strategy_id, alert.dedupe_md5)
             snapshot_count += 1
 
         pipeline.execute()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import base64
+import json
+import zlib
+from typing import Optional
+
+from django.conf import settings
+
+from alarm_backends.core.cache.key import ALERT_DEDUPE_CONTENT_KEY, ALERT_SNAPSHOT_KEY
+
+__doc__ = """
+    告警缓存的存储格式
+    1. json: 告警内容以 json 分别保存到维度缓存(ALERT_DEDUPE_CONTENT_KEY)及快照(ALERT_SNAPSHOT_KEY)
+    2. zlib: 快照保存压缩后的告警内容，维度缓存只保存对快照的引用及告警状态相关的少量字段
+    读取时兼容以上所有格式，因此升级时需要先升级所有读取方，再切换写入格式
+"""
+
+SNAPSHOT_CODEC_JSON = "json"
+SNAPSHOT_CODEC_ZLIB = "zlib"
+
+# 压缩内容前缀，redis 客户端以 utf-8 解码，因此压缩后需要 base64 编码
+COMPRESSED_PREFIX = "z1:"
+# 引用内容前缀
+REFERENCE_PREFIX = "r1:"
+
+COMPRESS_LEVEL = 6
+
+# 引用中保留的字段，快照过期时用于判断维度上的告警是否已结束
+REFERENCE_FIELDS = ("id", "strategy_id", "dedupe_md5", "status", "begin_time", "latest_time", "end_time")
+
+
+def use_reference() -> bool:
+    return settings.ALERT_SNAPSHOT_CODEC == SNAPSHOT_CODEC_ZLIB
+
+
+def snapshot_ttl() -> int:
+    """
+    快照过期时间
+    维度缓存只保存引用时，快照不能早于维度缓存过期，否则引用指向的快照已不存在
+    """
+    if use_reference():
+        return max(ALERT_SNAPSHOT_KEY.ttl, ALERT_DEDUPE_CONTENT_KEY.ttl)
+    return ALERT_SNAPSHOT_KEY.ttl
+
+
+def encode_alert(alert_data: dict) -> str:
+    """
+    编码告警内容
+    """
+    content = json.dumps(alert_data)
+    if settings.ALERT_SNAPSHOT_CODEC != SNAPSHOT_CODEC_ZLIB:
+        return content
+
+    compressed = zlib.compress(content.encode("utf-8"), COMPRESS_LEVEL)
+    compressed = COMPRESSED_PREFIX + base64.b64encode(compressed).decode("ascii")
+    # 内容较少时压缩后反而更长，直接保存原文
+    return compressed if len(compressed) < len(content) else content
+
+
+def decode_alert(value: str) -> dict:
+    """
+    解码告警内容，兼容未压缩的 json 格式
+    """
+    if value.startswith(COMPRESSED_PREFIX):
+        value = zlib.decompress(base64.b64decode(value[len(COMPRESSED_PREFIX) :])).decode("utf-8")
+    elif value.startswith(REFERENCE_PREFIX):
+        raise ValueError("alert reference should be resolved by snapshot")
+    return json.loads(value)
+
+
+def encode_reference(alert_data: dict) -> str:
+    """
+    编码对告警快照的引用
+    """
+    return REFERENCE_PREFIX + json.dumps({field: alert_data.get(field) for field in REFERENCE_FIELDS})
+
+
+def decode_reference(value: str) -> Optional[dict]:
+    """
+    解码对告警快照的引用，非引用格式时返回 None
+    """
+    if not value.startswith(REFERENCE_PREFIX):
+        return None
+    return json.loads(value[len(REFERENCE_PREFIX) :])
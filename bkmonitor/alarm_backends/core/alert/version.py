@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+"""
+告警缓存的并发更新方式
+
+lock: 处理告警前按 dedupe_md5 加锁(ALERT_UPDATE_LOCK)，builder 加锁失败的事件延后 5s 重新投递，manager 等下一轮周期检测
+cas: 不加锁，维度缓存带版本号(ALERT_DEDUPE_VERSION_KEY)
+    1. 读取告警缓存前先读取维度版本号
+    2. 处理完成后通过 lua 脚本比较版本号，一致时原子地写入维度缓存及快照并递增版本号，否则视为冲突
+    3. 只有冲突的维度需要重新处理，builder 在进程内立即重试，多次冲突后再延后投递；manager 等下一轮周期检测
+    4. 其他直接写入告警缓存的模块(如 fta_action)写入时同时递增版本号，使并发中的更新产生冲突
+注意：cas 模式下告警写入 ES 的先后顺序不再由锁保证，以快照为准，由 manager 周期检测修正
+旧版进程写入告警缓存时不递增版本号，因此需先升级所有写入告警缓存的进程，再切换为 cas
+"""
+
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+
+from alarm_backends.core.alert.snapshot import snapshot_ttl
+from alarm_backends.core.cache import key
+
+ALERT_UPDATE_BACKEND_LOCK = "lock"
+ALERT_UPDATE_BACKEND_CAS = "cas"
+
+# 版本冲突时，builder 在进程内立即重试的次数，超过后再延后投递
+CONFLICT_RETRY_TIMES = 3
+
+# 冲突时的返回值
+CONFLICT = -1
+
+# KEYS: 版本号, 维度缓存, 快照...
+# ARGV: 期望的版本号, 维度缓存内容(为空时不写入), 维度缓存过期时间, 快照过期时间, 快照内容...
+# 版本号一致时写入并返回新的版本号，否则返回 -1
+COMPARE_AND_SET_SCRIPT = key.RedisScript(
+    """
+local version = tonumber(redis.call('GET', KEYS[1]) or '0')
+if version ~= tonumber(ARGV[1]) then
+    return -1
+end
+if ARGV[2] ~= '' then
+    redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+end
+for i = 3, #KEYS do
+    redis.call('SET', KEYS[i], ARGV[i + 2], 'EX', ARGV[4])
+end
+version = version + 1
+redis.call('SET', KEYS[1], version, 'EX', ARGV[3])
+return version
+"""
+)
+
+
+def use_cas() -> bool:
+    return settings.ALERT_UPDATE_BACKEND == ALERT_UPDATE_BACKEND_CAS
+
+
+def get_versions(dimensions: Iterable[Tuple[int, str]]) -> Dict[str, int]:
+    """
+    批量获取维度版本号，不存在时为 0
+    :param dimensions: (策略ID, dedupe_md5) 列表
+    :return: dedupe_md5 -> 版本号
+    """
+    dimensions = list(set(dimensions))
+    if not dimensions:
+        return {}
+
+    pipeline = key.ALERT_DEDUPE_VERSION_KEY.client.pipeline(transaction=False)
+    for strategy_id, dedupe_md5 in dimensions:
+        pipeline.get(key.ALERT_DEDUPE_VERSION_KEY.get_key(strategy_id=strategy_id or 0, dedupe_md5=dedupe_md5))
+    return {dedupe_md5: int(version or 0) for (_, dedupe_md5), version in zip(dimensions, pipeline.execute())}
+
+
+def incr_version(pipeline, strategy_id, dedupe_md5):
+    """
+    不比较版本号直接写入告警缓存时，递增维度版本号
+    """
+    version_key = key.ALERT_DEDUPE_VERSION_KEY.get_key(strategy_id=strategy_id or 0, dedupe_md5=dedupe_md5)
+    pipeline.incr(version_key)
+    pipeline.expire(version_key, key.ALERT_DEDUPE_VERSION_KEY.ttl)
+
+
+def compare_and_set(pipeline, strategy_id, dedupe_md5, version: int, content: str, snapshots: Dict[str, str]):
+    """
+    在 pipeline 中加入比较版本号并写入的命令，执行结果为 CONFLICT 时表示版本冲突
+    :param version: 读取告警缓存前获取的版本号
+    :param content: 维度缓存内容，为空时只写入快照
+    :param snapshots: 快照 key -> 快照内容
+    """
+    strategy_id = strategy_id or 0
+    keys = [
+        key.ALERT_DEDUPE_VERSION_KEY.get_key(strategy_id=strategy_id, dedupe_md5=dedupe_md5),
+        key.ALERT_DEDUPE_CONTENT_KEY.get_key(strategy_id=strategy_id, dedupe_md5=dedupe_md5),
+    ]
+    keys.extend(snapshots.keys())
+    args = [version, content or "", key.ALERT_DEDUPE_CONTENT_KEY.ttl, snapshot_ttl()]
+    args.extend(snapshots.values())
+    # 同一策略的维度缓存及快照在同一节点
+    COMPARE_AND_SET_SCRIPT(pipeline, keys, args, strategy_id)
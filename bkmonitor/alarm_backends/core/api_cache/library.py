@@ -32,6 +32,7 @@ from alarm_backends.management.hashring import HashRing
 from api.cmdb import client
 from api.cmdb.define import Host
 from bkmonitor.models import StrategyModel
+from bkmonitor.utils.cache import lru_cache_tier
 from bkmonitor.utils.common_utils import get_local_ip
 from bkmonitor.utils.supervisor_utils import get_supervisor_client
 from core.drf_resource import api
@@ -193,6 +194,7 @@ def gevnet_task_with_close_connections(run, pool, *args, **kwargs):
                 mem_cache = caches["locmem"]
                 mem_cache.clear()
                 del mem_cache
+                lru_cache_tier.clear()
             finally:
                 gc.collect()
 
@@ -11,6 +11,7 @@ specific language governing permissions and limitations under the License.
 
 
 import abc
+import hashlib
 import json
 import time
 
@@ -159,6 +160,13 @@ class RefreshByBizMixin(object):
     def get_biz_cache_key(cls):
         return "{}.biz".format(cls.CACHE_KEY)
 
+    @classmethod
+    def get_version_cache_key(cls):
+        """
+        按业务记录数据版本，业务数据变化时版本号随之变化，供进程内缓存增量更新
+        """
+        return "{}.version".format(cls.CACHE_KEY)
+
     @classmethod
     @abc.abstractmethod
     def refresh_by_biz(cls, bk_biz_id):
@@ -189,6 +197,7 @@ class RefreshByBizMixin(object):
         new_keys = []
 
         biz_cache_key = cls.get_biz_cache_key()
+        version_cache_key = cls.get_version_cache_key()
 
         for bk_biz_id in biz_ids:
             biz_start_time = time.time()
@@ -203,12 +212,17 @@ class RefreshByBizMixin(object):
             else:
                 # 更新对象缓存
                 pipeline = cls.cache.pipeline()
+                version = hashlib.md5()
                 for key, obj in list(objs.items()):
-                    pipeline.hset(cls.CACHE_KEY, key, cls.serialize(obj))
+                    value = cls.serialize(obj)
+                    pipeline.hset(cls.CACHE_KEY, key, value)
+                    version.update("{}={}".format(key, value).encode("utf-8"))
                     new_keys.append(key)
 
                 # 按业务设置key列表，用于差量更新
                 pipeline.hset(biz_cache_key, str(bk_biz_id), json.dumps(list(objs.keys())))
+                pipeline.hset(version_cache_key, str(bk_biz_id), version.hexdigest())
+                pipeline.expire(version_cache_key, cls.CACHE_TIMEOUT)
 
                 pipeline.expire(cls.CACHE_KEY, cls.CACHE_TIMEOUT)
                 pipeline.execute()
@@ -222,6 +236,7 @@ class RefreshByBizMixin(object):
         deleted_biz_ids = old_biz_ids - new_biz_ids
         if deleted_biz_ids:
             cls.cache.hdel(biz_cache_key, *deleted_biz_ids)
+            cls.cache.hdel(version_cache_key, *deleted_biz_ids)
         cls.cache.expire(biz_cache_key, cls.CACHE_TIMEOUT)
 
         biz_cache_keys = cls.cache.hgetall(biz_cache_key) or {}
@@ -255,4 +270,4 @@ class RefreshByBizMixin(object):
         """
         清理缓存
         """
-        cls.cache.delete(cls.CACHE_KEY, cls.get_biz_cache_key())
+        cls.cache.delete(cls.CACHE_KEY, cls.get_biz_cache_key(), cls.get_version_cache_key())
@@ -10,9 +10,14 @@ specific language governing permissions and limitations under the License.
 """
 
 import json
-from collections import defaultdict
+import threading
+import time
+from collections import defaultdict, namedtuple
+from itertools import chain
 from typing import Dict, List, Optional, Set
 
+from django.conf import settings
+
 from alarm_backends.core.cache.cmdb.base import CMDBCacheManager, RefreshByBizMixin
 from api.cmdb.define import Host, TopoTree
 from bkmonitor.utils.local import local
@@ -300,6 +305,131 @@ class HostManager(RefreshByBizMixin, CMDBCacheManager):
         return cls.to_kv(hosts, contains_host_id_key=True)
 
 
+HostIndexEntry = namedtuple("HostIndexEntry", ["host", "topo_nodes", "ignore_monitoring"])
+
+
+class HostIndex(object):
+    """
+    进程内主机索引
+
+    按业务版本号增量加载主机缓存，并预先计算主机所属拓扑节点及是否忽略监控，
+    同时以 bk_host_id 及 ip|bk_cloud_id 作为索引，数据补充及过滤时只需一次字典查询。
+    索引中不存在的主机(如刷新间隔内新增的主机)，由调用方回退到 HostManager 查询。
+    """
+
+    # 单次 HMGET 的主机数量
+    BATCH_SIZE = 1000
+
+    def __init__(self):
+        self.entries: Dict[str, HostIndexEntry] = {}
+        self.biz_versions: Dict[str, str] = {}
+        self.biz_keys: Dict[str, List[str]] = {}
+        # 主机不监控状态为动态配置，变化时需重新计算 ignore_monitoring
+        self.disable_monitor_states = frozenset()
+        self.last_refresh_time = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def get_topo_nodes(topo_link) -> List[str]:
+        if not topo_link:
+            return []
+        return list({node.id for node in chain(*list(topo_link.values()))})
+
+    def refresh(self, force=False):
+        """
+        检查各业务主机缓存版本，仅重新加载有变化的业务
+        """
+        interval = settings.HOST_INDEX_REFRESH_INTERVAL
+        if interval <= 0:
+            return
+
+        with self.lock:
+            now = time.time()
+            if not force and now - self.last_refresh_time < interval:
+                return
+            self.last_refresh_time = now
+
+            try:
+                self._refresh()
+            except Exception as e:  # noqa
+                HostManager.logger.exception("[HostIndex] refresh host index failed: %s", e)
+
+    def _refresh(self):
+        versions = HostManager.cache.hgetall(HostManager.get_version_cache_key()) or {}
+        changed_biz_ids = [biz_id for biz_id, version in versions.items() if self.biz_versions.get(biz_id) != version]
+        removed_biz_ids = [biz_id for biz_id in self.biz_versions if biz_id not in versions]
+        disable_monitor_states = frozenset(settings.HOST_DISABLE_MONITOR_STATES)
+        states_changed = disable_monitor_states != self.disable_monitor_states
+        if not (changed_biz_ids or removed_biz_ids or states_changed):
+            return
+
+        # 在副本上更新后整体替换，查询方不会读到更新了一半的索引
+        if states_changed:
+            entries = {
+                index_key: entry._replace(ignore_monitoring=entry.host.bk_state in disable_monitor_states)
+                for index_key, entry in self.entries.items()
+            }
+        else:
+            entries = dict(self.entries)
+        biz_versions = dict(self.biz_versions)
+        biz_keys = dict(self.biz_keys)
+        for biz_id in chain(removed_biz_ids, changed_biz_ids):
+            biz_versions.pop(biz_id, None)
+            for index_key in biz_keys.pop(biz_id, []):
+                entries.pop(index_key, None)
+
+        host_count = 0
+        biz_cache_keys = []
+        if changed_biz_ids:
+            biz_cache_keys = HostManager.cache.hmget(HostManager.get_biz_cache_key(), changed_biz_ids)
+        for biz_id, cache_keys in zip(changed_biz_ids, biz_cache_keys):
+            # 缓存中同一主机同时以 ip|bk_cloud_id 及 bk_host_id 保存，只需加载 bk_host_id 部分
+            host_ids = [cache_key for cache_key in json.loads(cache_keys or "[]") if "|" not in cache_key]
+            index_keys = []
+            for offset in range(0, len(host_ids), self.BATCH_SIZE):
+                values = HostManager.cache.hmget(HostManager.CACHE_KEY, host_ids[offset : offset + self.BATCH_SIZE])
+                for value in values:
+                    if not value:
+                        continue
+                    host: Host = HostManager.deserialize(value)
+                    entry = HostIndexEntry(
+                        host, self.get_topo_nodes(host.topo_link), host.bk_state in disable_monitor_states
+                    )
+                    host_keys = [str(host.bk_host_id)]
+                    if host.bk_host_innerip:
+                        host_keys.append(HostManager.key_to_internal_value(host.bk_host_innerip, host.bk_cloud_id))
+                    for index_key in host_keys:
+                        entries[index_key] = entry
+                    index_keys.extend(host_keys)
+                    host_count += 1
+            biz_keys[biz_id] = index_keys
+            biz_versions[biz_id] = versions[biz_id]
+
+        self.entries, self.biz_versions, self.biz_keys = entries, biz_versions, biz_keys
+        self.disable_monitor_states = disable_monitor_states
+        HostManager.logger.info(
+            "[HostIndex] refresh host index finished, changed_biz(%s) removed_biz(%s) loaded_hosts(%s)",
+            len(changed_biz_ids),
+            len(removed_biz_ids),
+            host_count,
+        )
+
+    def get(self, ip, bk_cloud_id=0) -> Optional[HostIndexEntry]:
+        return self.entries.get(HostManager.key_to_internal_value(ip, bk_cloud_id))
+
+    def get_by_id(self, bk_host_id) -> Optional[HostIndexEntry]:
+        return self.entries.get(str(bk_host_id))
+
+    def clear(self):
+        with self.lock:
+            self.entries, self.biz_versions, self.biz_keys = {}, {}, {}
+            self.disable_monitor_states = frozenset()
+            self.last_refresh_time = 0
+
+
+host_index = HostIndex()
+
+
 def main():
     HostIDManager.refresh()
     HostManager.refresh()
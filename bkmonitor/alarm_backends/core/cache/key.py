@@ -9,7 +9,10 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 
+import hashlib
+
 from django.conf import settings
+from redis.exceptions import NoScriptError
 
 from alarm_backends.constants import (
     CONST_MINUTES,
@@ -18,7 +21,7 @@ from alarm_backends.constants import (
     CONST_ONE_WEEK,
 )
 from alarm_backends.core.cluster import get_cluster
-from alarm_backends.core.storage.redis_cluster import RedisProxy
+from alarm_backends.core.storage.redis_cluster import PipelineProxy, RedisProxy
 from bkmonitor.utils.text import underscore_to_camel
 
 TTL_NOT_SET = CONST_ONE_WEEK
@@ -108,6 +111,37 @@ class SimilarStr(str):
         self._strategy_id = value
 
 
+class RedisScript(object):
+    """
+    lua 脚本，通过 evalsha 执行，避免每次调用都传输完整脚本
+    集群模式下按策略ID路由，与同一策略的 key 在同一节点
+    """
+
+    def __init__(self, script: str):
+        self.script = script
+        self.sha = hashlib.sha1(script.encode("utf-8")).hexdigest()
+
+    def routed(self, value: str, strategy_id) -> SimilarStr:
+        value = SimilarStr(value)
+        value.strategy_id = strategy_id
+        return value
+
+    def __call__(self, client, keys: list, args: list, strategy_id=0):
+        """
+        执行脚本，client 为 pipeline 时只加入命令，执行 pipeline 前会在节点上加载缺失的脚本
+        """
+        sha = self.routed(self.sha, strategy_id)
+        if isinstance(client, PipelineProxy):
+            client.load_script(sha, self.script)
+            return client.evalsha(sha, len(keys), *keys, *args)
+
+        try:
+            return client.evalsha(sha, len(keys), *keys, *args)
+        except NoScriptError:
+            client.script_load(self.routed(self.script, strategy_id))
+            return client.evalsha(sha, len(keys), *keys, *args)
+
+
 class StringKey(RedisDataKey):
     """
     String 数据结构的Key对象
@@ -206,6 +240,28 @@ NO_DATA_LIST_KEY = register_key_with_config(
     }
 )
 
+NO_DATA_DIMENSION_INDEX_KEY = register_key_with_config(
+    {
+        "label": "[access]无数据告警维度最近上报时间索引",
+        "key_type": "hash",
+        "key_tpl": "access.nodata.index.{strategy_id}.{item_id}",
+        "field_tpl": "{dimensions_md5}",
+        "ttl": 10 * CONST_MINUTES,
+        "backend": "queue",
+    }
+)
+
+QUEUE_SCHEMA_KEY = register_key_with_config(
+    {
+        "label": "[access]待检测数据队列字段schema",
+        "key_type": "hash",
+        "key_tpl": "queue.schema.{strategy_id}.{item_id}",
+        "field_tpl": "{schema_id}",
+        "ttl": CONST_ONE_HOUR,
+        "backend": "queue",
+    }
+)
+
 HISTORY_DATA_KEY = register_key_with_config(
     {
         "label": "[detect]待检测数据对应历史数据",
@@ -290,6 +346,16 @@ ACCESS_DUPLICATE_KEY = register_key_with_config(
     }
 )
 
+ACCESS_BATCH_DUPLICATE_KEY = register_key_with_config(
+    {
+        "label": "[access]数据拉取去重(批量)",
+        "key_type": "set",
+        "key_tpl": "access.data.duplicate.batch.strategy_group_{strategy_group_key}.{dt_event_time}",
+        "ttl": 10 * CONST_MINUTES,
+        "backend": "service",
+    }
+)
+
 ACCESS_PRIORITY_KEY = register_key_with_config(
     {
         "label": "[access]数据拉取优先级",
@@ -547,6 +613,16 @@ ALERT_DEDUPE_CONTENT_KEY = register_key_with_config(
     }
 )
 
+ALERT_DEDUPE_VERSION_KEY = register_key_with_config(
+    {
+        "label": "[alert]当前正在产生的告警内容版本号",
+        "key_type": "string",
+        "key_tpl": "alert.builder.{strategy_id}.{dedupe_md5}.version",
+        "ttl": 2 * CONST_ONE_HOUR,
+        "backend": "service",
+    }
+)
+
 ALERT_SNAPSHOT_KEY = register_key_with_config(
     {
         "label": "[alert]告警内容快照",
@@ -557,6 +633,16 @@ ALERT_SNAPSHOT_KEY = register_key_with_config(
     }
 )
 
+ALERT_ACTIVE_INDEX_KEY = register_key_with_config(
+    {
+        "label": "[alert]异常告警调度索引: (type:SortedSet)(score: 下次调度时间, name: 告警ID|策略ID)",
+        "key_type": "sorted_set",
+        "key_tpl": "alert.manager.active_index",
+        "ttl": CONST_ONE_DAY,
+        "backend": "service",
+    }
+)
+
 EVENT_PULL_LOCKS = register_key_with_config(
     {
         "label": "[alert]事件拉取锁",
@@ -839,6 +925,17 @@ REAL_TIME_HOST_TOPIC_KEY = register_key_with_config(
     }
 )
 
+KAFKA_PARTITION_LOAD_KEY = register_key_with_config(
+    {
+        "label": "[kafka]各分区消费速率及积压",
+        "key_type": "hash",
+        "key_tpl": "kafka.partition_load.{service}",
+        "ttl": 10 * CONST_MINUTES,
+        "backend": "service",
+        "field_tpl": "{partition}",
+    }
+)
+
 NOISE_REDUCE_TOTAL_KEY = register_key_with_config(
     {
         "label": "[access]记录策略对应的降噪基数",
@@ -10,6 +10,7 @@ specific language governing permissions and limitations under the License.
 """
 
 import copy
+import hashlib
 import json
 import logging
 import time
@@ -70,6 +71,8 @@ class StrategyCacheManager(CacheManager):
     FTA_ALERT_CACHE_KEY = CacheManager.CACHE_KEY_PREFIX + ".fta_alert_strategy_ids"
     # 策略分组
     STRATEGY_GROUP_CACHE_KEY = CacheManager.CACHE_KEY_PREFIX + ".strategy_group"
+    # 策略版本，策略内容变化时更新，用于进程内策略对象缓存失效
+    VERSION_CACHE_KEY = CacheManager.CACHE_KEY_PREFIX + ".strategy_version"
     # 最近增量更新时间
     LAST_UPDATED_CACHE_KEY = CacheManager.CACHE_KEY_PREFIX + ".last_updated"
     # 事件型时序检测周期(默认60s)
@@ -564,6 +567,16 @@ class StrategyCacheManager(CacheManager):
         strategy = Strategy.convert_v1_to_v2(strategy)
         return strategy
 
+    @classmethod
+    def get_strategy_versions(cls, strategy_ids: List[int]) -> Dict[int, str]:
+        """
+        获取策略版本
+        """
+        if not strategy_ids:
+            return {}
+        versions = cls.cache.hmget(cls.VERSION_CACHE_KEY, strategy_ids)
+        return {strategy_id: version for strategy_id, version in zip(strategy_ids, versions) if version}
+
     @classmethod
     def get_all_bk_biz_ids(cls) -> List:
         """
@@ -668,6 +681,7 @@ class StrategyCacheManager(CacheManager):
             if strategy_id not in updated_strategy_ids:
                 logger.info(f"[smart_strategy_cache]: refresh_strategy_ids delete strategy: {strategy_id}")
                 cls.cache.delete(cls.CACHE_KEY_TEMPLATE.format(strategy_id=strategy_id))
+                cls.cache.hdel(cls.VERSION_CACHE_KEY, strategy_id)
 
     @classmethod
     def refresh_bk_biz_ids(cls, strategies: List[Dict], partial=None):
@@ -734,9 +748,10 @@ class StrategyCacheManager(CacheManager):
         cls.cache.set(cls.GSE_ALARM_CACHE_KEY, json.dumps(gse_event_strategy_ids), cls.CACHE_TIMEOUT)
 
     @classmethod
-    def refresh_fta_alert_strategy_ids(cls, strategies: List[Dict]):
+    def get_fta_alert_index(cls, strategies: List[Dict]) -> Dict[str, Dict[str, List[int]]]:
         """
-        刷新自愈策略列表缓存
+        生成关联告警策略的倒排索引
+        :return: 告警来源(strategy|监控策略ID 或 alert|告警名称) -> 业务ID -> 引用该告警的关联告警策略ID列表
         """
         fta_alert_strategy_ids = {}
         for strategy in strategies:
@@ -749,16 +764,51 @@ class StrategyCacheManager(CacheManager):
                             continue
 
                         if data_source_label == DataSourceLabel.BK_MONITOR_COLLECTOR:
-                            fta_alert_strategy_ids.setdefault(
-                                f"strategy|{query_config['bkmonitor_strategy_id']}", {}
-                            ).setdefault(strategy["bk_biz_id"], []).append(strategy["id"])
+                            index_key = f"strategy|{query_config['bkmonitor_strategy_id']}"
                         elif data_source_label == DataSourceLabel.BK_FTA:
-                            fta_alert_strategy_ids.setdefault(f"alert|{query_config['alert_name']}", {}).setdefault(
-                                strategy["bk_biz_id"], []
-                            ).append(strategy["id"])
+                            index_key = f"alert|{query_config['alert_name']}"
+                        else:
+                            continue
+
+                        strategy_ids = fta_alert_strategy_ids.setdefault(index_key, {}).setdefault(
+                            str(strategy["bk_biz_id"]), []
+                        )
+                        # 同一策略的多个查询配置引用同一告警时，只记录一次
+                        if strategy["id"] not in strategy_ids:
+                            strategy_ids.append(strategy["id"])
 
             except Exception as e:
                 logger.exception("refresh strategy error when refresh_fta_alert_strategy_ids", e)
+        return fta_alert_strategy_ids
+
+    @classmethod
+    def refresh_fta_alert_strategy_ids(
+        cls, strategies: List[Dict], partial_biz_ids: Iterable = None, deleted_strategy_ids: Iterable = None
+    ):
+        """
+        刷新自愈策略列表缓存
+        :param partial_biz_ids: 增量更新的业务ID列表，为空时全量刷新
+        :param deleted_strategy_ids: 增量更新时删除或停用的策略ID列表
+        """
+        fta_alert_strategy_ids = cls.get_fta_alert_index(strategies)
+
+        if partial_biz_ids is not None:
+            # 增量更新：变更业务的索引以本次结果为准，其他业务保留原索引，并剔除已删除的策略
+            partial_biz_ids = {str(bk_biz_id) for bk_biz_id in partial_biz_ids}
+            deleted_strategy_ids = set(deleted_strategy_ids or [])
+            for index_key, value in cls.cache.hgetall(cls.FTA_ALERT_CACHE_KEY).items():
+                try:
+                    strategy_ids_by_biz = json.loads(value)
+                except (TypeError, ValueError):
+                    continue
+                for bk_biz_id, strategy_ids in strategy_ids_by_biz.items():
+                    if bk_biz_id in partial_biz_ids:
+                        continue
+                    strategy_ids = [
+                        strategy_id for strategy_id in strategy_ids if strategy_id not in deleted_strategy_ids
+                    ]
+                    if strategy_ids:
+                        fta_alert_strategy_ids.setdefault(index_key, {})[bk_biz_id] = strategy_ids
 
         # 批量保存 Key
         if fta_alert_strategy_ids:
@@ -782,9 +832,10 @@ class StrategyCacheManager(CacheManager):
 
         pipeline = cls.cache.pipeline()
         for strategy in strategies:
-            pipeline.set(
-                cls.CACHE_KEY_TEMPLATE.format(strategy_id=strategy["id"]), json.dumps(strategy), cls.CACHE_TIMEOUT
-            )
+            strategy_config = json.dumps(strategy)
+            pipeline.set(cls.CACHE_KEY_TEMPLATE.format(strategy_id=strategy["id"]), strategy_config, cls.CACHE_TIMEOUT)
+            version = hashlib.md5(strategy_config.encode("utf-8")).hexdigest()
+            pipeline.hset(cls.VERSION_CACHE_KEY, strategy["id"], version)
             # 默认周期 50s
             for item in strategy["items"]:
                 if item.get("query_md5"):
@@ -820,6 +871,7 @@ class StrategyCacheManager(CacheManager):
         for query_md5 in strategy_groups:
             pipeline.hset(cls.STRATEGY_GROUP_CACHE_KEY, query_md5, json.dumps(strategy_groups[query_md5]))
         pipeline.expire(cls.STRATEGY_GROUP_CACHE_KEY, cls.CACHE_TIMEOUT)
+        pipeline.expire(cls.VERSION_CACHE_KEY, cls.CACHE_TIMEOUT)
 
         pipeline.execute()
 
@@ -1028,12 +1080,20 @@ class StrategyCacheManager(CacheManager):
                 _strategies, old_groups=[ids[1] for ids in to_be_deleted_strategy_ids if ids[1]]
             )
 
+        def refresh_fta_alert_strategy_ids(_strategies):
+            return cls.refresh_fta_alert_strategy_ids(
+                _strategies,
+                partial_biz_ids=target_biz_set,
+                deleted_strategy_ids=[ids[0] for ids in to_be_deleted_strategy_ids],
+            )
+
         processors: List[Callable[[List[Dict]], None]] = [
             cls.add_target_shield_condition,
             cls.add_enabled_cluster_condition,
             refresh_strategy_ids,
             refresh_bk_biz_ids,
             refresh_strategy,
+            refresh_fta_alert_strategy_ids,
         ]
 
         for processor in processors:
@@ -177,21 +177,22 @@ class Item(DetectMixin, CheckMixin, DoubleCheckMixin):
                     and_cond.append(t)
                 return load_condition_instance([and_cond])
 
+    @cached_property
+    def range_matchers(self):
+        """
+        编译后的范围匹配函数，依次为：
+        1. 匹配监控目标
+        2. 匹配监控条件(即where条件)
+        3. 匹配额外的内置监控条件(针对磁盘、网络做的特殊处理)
+        """
+        matchers = []
+        for condition_obj in [self.target_condition_obj, self.agg_condition_obj, self.extra_agg_condition_obj]:
+            if condition_obj:
+                matchers.append(condition_obj.compile())
+        return matchers
+
     def is_range_match(self, dimensions):
-        # 1. 匹配监控目标
-        is_match = True
-        target_condition_obj = self.target_condition_obj
-        if target_condition_obj:
-            is_match = target_condition_obj.is_match(dimensions)
-
-        # 2. 匹配监控条件(即where条件)
-        agg_condition_target_obj = self.agg_condition_obj
-        if agg_condition_target_obj:
-            is_match = is_match and agg_condition_target_obj.is_match(dimensions)
-
-        # 3. 匹配额外的内置监控条件(针对磁盘、网络做的特殊处理)
-        extra_agg_condition_target_obj = self.extra_agg_condition_obj
-        if extra_agg_condition_target_obj:
-            is_match = is_match and extra_agg_condition_target_obj.is_match(dimensions)
-
-        return is_match
+        for matcher in self.range_matchers:
+            if not matcher(dimensions):
+                return False
+        return True
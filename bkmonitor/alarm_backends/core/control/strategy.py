@@ -11,10 +11,14 @@ specific language governing permissions and limitations under the License.
 
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List
 
 import arrow
+from django.conf import settings
 from django.utils.functional import cached_property
 from django.utils.translation import ugettext as _
 
@@ -26,6 +30,7 @@ from alarm_backends.core.control.item import Item
 from alarm_backends.core.i18n import i18n
 from bkmonitor.utils import time_tools
 from core.errors.alarm_backends import StrategyItemNotFound
+from core.prometheus import metrics
 
 logger = logging.getLogger("core.control")
 
@@ -300,3 +305,86 @@ class Strategy(object):
         if item == "snapshot_key":
             return self.gen_strategy_snapshot()
         return super(Strategy, self).__getattribute__(item)
+
+
+class StrategyObjectCache(object):
+    """
+    进程内策略对象缓存(LRU)
+    策略对象按策略版本缓存，策略缓存刷新后版本变化，对象随之失效。
+    缓存对象会保留 Item、条件匹配器等构建结果，以及策略快照key，因此对象存活时间需要小于快照过期时间。
+    """
+
+    def __init__(self, max_size=None, max_age=None):
+        self._max_size = max_size
+        self._max_age = max_age
+        # strategy_id -> (version, create_time, strategy)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self) -> int:
+        return settings.STRATEGY_OBJECT_CACHE_SIZE if self._max_size is None else self._max_size
+
+    @property
+    def max_age(self) -> int:
+        return settings.STRATEGY_OBJECT_CACHE_AGE if self._max_age is None else self._max_age
+
+    def get(self, strategy_id) -> Strategy:
+        return self.get_strategies([strategy_id])[int(strategy_id)]
+
+    def get_strategies(self, strategy_ids: List[int]) -> Dict[int, Strategy]:
+        """
+        批量获取策略对象，版本一致的策略直接使用缓存对象
+        """
+        strategy_ids = [int(strategy_id) for strategy_id in strategy_ids]
+        if self.max_size <= 0:
+            return {strategy_id: Strategy(strategy_id) for strategy_id in strategy_ids}
+
+        versions = StrategyCacheManager.get_strategy_versions(strategy_ids)
+        now = time.time()
+
+        strategies = {}
+        missing_strategy_ids = []
+        with self._lock:
+            for strategy_id in strategy_ids:
+                cached = self._cache.get(strategy_id)
+                version = versions.get(strategy_id)
+                if cached and version and cached[0] == version and now - cached[1] < self.max_age:
+                    self._cache.move_to_end(strategy_id)
+                    strategies[strategy_id] = cached[2]
+                else:
+                    missing_strategy_ids.append(strategy_id)
+
+        metrics.STRATEGY_OBJECT_CACHE_COUNT.labels(result="hit").inc(len(strategies))
+        if not missing_strategy_ids:
+            return strategies
+        metrics.STRATEGY_OBJECT_CACHE_COUNT.labels(result="miss").inc(len(missing_strategy_ids))
+
+        for strategy_id in missing_strategy_ids:
+            config = StrategyCacheManager.get_strategy_by_id(strategy_id) or {}
+            strategies[strategy_id] = Strategy(strategy_id, config)
+
+        with self._lock:
+            for strategy_id in missing_strategy_ids:
+                strategy = strategies[strategy_id]
+                # 没有版本的策略(已删除或缓存未刷新)不缓存
+                version = versions.get(strategy_id)
+                if not version or not strategy.config:
+                    self._cache.pop(strategy_id, None)
+                    continue
+
+                self._cache[strategy_id] = (version, now, strategy)
+                self._cache.move_to_end(strategy_id)
+
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+        return strategies
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# 每个进程共享的策略对象缓存
+strategy_cache = StrategyObjectCache()
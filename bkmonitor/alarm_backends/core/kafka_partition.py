@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+"""
+kafka 分区负载统计及分配
+1. 消费者按分区统计拉取的消息数，定期将各分区的消息速率及积压上报到 KAFKA_PARTITION_LOAD_KEY
+2. leader 以 消息速率 + 积压/LAG_DRAIN_SECONDS 作为分区负载，按 KAFKA_PARTITION_ASSIGN_BACKEND 配置分配分区
+    hash: 按一致性哈希分配
+    load: 带负载上限的一致性哈希，并尽量保持上一次的分配，减少主机变化时的分区迁移
+两种方式下均上报各主机分配到的负载，用于观察负载是否均衡
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+from django.conf import settings
+from kafka import KafkaConsumer, TopicPartition
+
+from alarm_backends.core.cache.key import KAFKA_PARTITION_LOAD_KEY
+from alarm_backends.management.hashring import HashRing, assign_with_load
+from core.prometheus import metrics
+
+logger = logging.getLogger(__name__)
+
+PARTITION_ASSIGN_BACKEND_HASH = "hash"
+PARTITION_ASSIGN_BACKEND_LOAD = "load"
+
+# 上报间隔
+REPORT_INTERVAL = 60
+# 积压按该时长内消费完折算为速率
+LAG_DRAIN_SECONDS = 300
+# 超过该时长未更新的分区负载不再使用
+LOAD_EXPIRE_SECONDS = 5 * 60
+
+
+def get_partition_key(bootstrap_server: str, topic: str, partition: int) -> str:
+    return f"{bootstrap_server}|{topic}|{partition}"
+
+
+class PartitionLoadReporter(object):
+    """
+    消费者分区负载统计
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self.lock = threading.Lock()
+        self.counts = defaultdict(int)
+        self.last_report_time = time.time()
+
+    def incr(self, bootstrap_server: str, topic: str, partition: int, count: int):
+        with self.lock:
+            self.counts[get_partition_key(bootstrap_server, topic, partition)] += count
+
+    def is_due(self) -> bool:
+        return time.time() - self.last_report_time >= REPORT_INTERVAL
+
+    @staticmethod
+    def get_lags(consumer: KafkaConsumer) -> Dict[TopicPartition, int]:
+        """
+        获取消费者已分配分区的积压，KafkaConsumer 非线程安全，调用方需持有消费者的锁
+        """
+        partitions = list(consumer.assignment())
+        if not partitions:
+            return {}
+
+        try:
+            end_offsets = consumer.end_offsets(partitions)
+        except Exception as e:
+            logger.warning("get end offsets of %s failed: %s", consumer.config["bootstrap_servers"], e)
+            return {}
+
+        lags = {}
+        for tp in partitions:
+            if end_offsets.get(tp) is None:
+                continue
+            try:
+                lags[tp] = max(end_offsets[tp] - consumer.position(tp), 0)
+            except Exception:  # noqa
+                continue
+        return lags
+
+    def report(self, lags: Dict[str, Dict[TopicPartition, int]]):
+        """
+        计算各分区的消息速率并与积压一起上报
+        :param lags: bootstrap_server -> {分区: 积压}
+        """
+        now = time.time()
+        elapsed = max(now - self.last_report_time, 1)
+        with self.lock:
+            counts, self.counts = self.counts, defaultdict(int)
+        self.last_report_time = now
+
+        loads = {}
+        for bootstrap_server, partition_lags in lags.items():
+            for tp, lag in partition_lags.items():
+                partition_key = get_partition_key(bootstrap_server, tp.topic, tp.partition)
+                loads[partition_key] = json.dumps(
+                    {"rate": counts.get(partition_key, 0) / elapsed, "lag": lag, "time": int(now)}
+                )
+
+        if not loads:
+            return
+
+        cache_key = KAFKA_PARTITION_LOAD_KEY.get_key(service=self.service)
+        pipeline = KAFKA_PARTITION_LOAD_KEY.client.pipeline(transaction=False)
+        pipeline.hmset(cache_key, loads)
+        pipeline.expire(cache_key, KAFKA_PARTITION_LOAD_KEY.ttl)
+        pipeline.execute()
+
+
+def get_partition_loads(service: str) -> Dict[str, float]:
+    """
+    获取各分区负载
+    """
+    now = time.time()
+    cache_key = KAFKA_PARTITION_LOAD_KEY.get_key(service=service)
+    loads = {}
+    for partition_key, value in KAFKA_PARTITION_LOAD_KEY.client.hgetall(cache_key).items():
+        try:
+            load = json.loads(value)
+        except (TypeError, ValueError):
+            continue
+        if now - load["time"] > LOAD_EXPIRE_SECONDS:
+            continue
+        loads[partition_key] = load["rate"] + load["lag"] / LAG_DRAIN_SECONDS
+    return loads
+
+
+class PartitionAssigner(object):
+    """
+    leader 分区分配，跨周期保留上一次的分配结果
+    """
+
+    def __init__(self, service: str):
+        self.service = service
+        self.previous: Dict[str, str] = {}
+
+    def assign(self, partitions: List[str], hosts: List[str], load_keys: Dict[str, str] = None) -> Dict[str, List[str]]:
+        """
+        :param partitions: 待分配的分区标识
+        :param hosts: 主机列表
+        :param load_keys: 分区标识 -> 分区负载key(get_partition_key)，默认与分区标识相同
+        :return: host -> [分区标识]
+        """
+        load_keys = load_keys or {}
+        try:
+            partition_loads = get_partition_loads(self.service)
+        except Exception as e:
+            logger.warning("get partition loads of %s failed: %s", self.service, e)
+            partition_loads = {}
+        loads = {}
+        for partition in partitions:
+            load_key = load_keys.get(partition, partition)
+            if load_key in partition_loads:
+                loads[partition] = partition_loads[load_key]
+
+        if settings.KAFKA_PARTITION_ASSIGN_BACKEND == PARTITION_ASSIGN_BACKEND_LOAD:
+            assignment = assign_with_load(partitions, hosts, loads, self.previous)
+        else:
+            assignment = defaultdict(list)
+            if hosts:
+                hash_ring = HashRing({host: 1 for host in hosts})
+                for partition in partitions:
+                    assignment[hash_ring.get_node(partition)].append(partition)
+
+        current = {partition: host for host, host_partitions in assignment.items() for partition in host_partitions}
+        moved_count = len([p for p, host in current.items() if p in self.previous and self.previous[p] != host])
+        self.previous = current
+
+        if moved_count:
+            metrics.KAFKA_PARTITION_MOVED_COUNT.labels(service=self.service).inc(moved_count)
+        for host in hosts:
+            host_partitions = assignment.get(host, [])
+            metrics.KAFKA_PARTITION_ASSIGN_COUNT.labels(service=self.service, host=host).set(len(host_partitions))
+            metrics.KAFKA_PARTITION_ASSIGN_LOAD.labels(service=self.service, host=host).set(
+                sum(loads.get(partition, 0) for partition in host_partitions)
+            )
+        metrics.report_all()
+
+        logger.info(
+            "[%s] assign %s partitions to %s hosts, moved(%s)", self.service, len(partitions), len(hosts), moved_count
+        )
+        return assignment
@@ -8,12 +8,12 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
-import json
 from abc import ABCMeta
 
 import six
 
 from alarm_backends.core.cache import key
+from alarm_backends.core.processor.codec import QueueCodec
 
 
 class BaseAbnormalPushProcessor(six.with_metaclass(ABCMeta, object)):
@@ -31,7 +31,7 @@ class BaseAbnormalPushProcessor(six.with_metaclass(ABCMeta, object)):
 
         for item_id, outputs in six.iteritems(outputs):
             if outputs:
-                outputs_data = [json.dumps(i) for i in outputs]
+                outputs_data = QueueCodec(strategy_id, item_id).encode(outputs, pipeline, key.ANOMALY_LIST_KEY.ttl)
                 anomaly_count += len(outputs_data)
                 anomaly_signal_list.append("{strategy_id}.{item_id}".format(strategy_id=strategy_id, item_id=item_id))
 
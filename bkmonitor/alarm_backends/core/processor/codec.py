@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+"""
+access -> detect -> trigger 队列数据编解码
+
+json: 每条数据为完整的 json 对象(旧格式)
+compact: 字段名抽取为 schema，数据只保存字段值
+    payload = VERSION_COMPACT + json([schema_id, value1, [sub_value1, sub_value2], ...])
+    schema 以内容摘要作为 id，按 item 保存在 QUEUE_SCHEMA_KEY 中，与数据在同一个 pipeline 中写入
+
+解码时根据首字符区分版本，旧格式数据以 "{" 开头。因此升级时先升级全部消费端，
+再通过 ALARM_QUEUE_CODEC 配置切换生产端的编码格式，新旧 worker 可以同时运行。
+"""
+
+import hashlib
+import json
+from typing import Dict, List
+
+from django.conf import settings
+
+from alarm_backends.core.cache import key
+
+CODEC_JSON = "json"
+CODEC_COMPACT = "compact"
+
+# 紧凑格式版本标记
+VERSION_COMPACT = "\x01"
+
+# schema 最大嵌套层数，更深的字典作为普通值编码
+MAX_SCHEMA_DEPTH = 3
+# 单批数据的 schema 数量上限，超出后剩余数据使用 json 编码，避免字段不固定的数据导致 schema 膨胀
+MAX_BATCH_SCHEMAS = 64
+# 进程内 schema 缓存上限
+MAX_CACHED_SCHEMAS = 10000
+
+# schema_id -> schema，schema_id 由内容生成，缓存无需失效
+_schema_cache: Dict[str, list] = {}
+
+
+def _extract_schema(data: dict, depth=1):
+    """
+    拆分字段名及字段值，schema 使用 tuple 以便直接作为字典 key
+    """
+    schema = []
+    row = []
+    for field, value in data.items():
+        if isinstance(value, dict) and depth < MAX_SCHEMA_DEPTH:
+            sub_schema, sub_row = _extract_schema(value, depth + 1)
+            schema.append((field, sub_schema))
+            row.append(sub_row)
+        else:
+            schema.append((field, None))
+            row.append(value)
+    return tuple(schema), row
+
+
+def _restore(schema: list, row: list) -> dict:
+    if len(schema) != len(row):
+        raise ValueError("queue record does not match schema")
+
+    data = {}
+    for (field, sub_schema), value in zip(schema, row):
+        data[field] = value if sub_schema is None else _restore(sub_schema, value)
+    return data
+
+
+def _cache_schema(schema_id: str, schema: list):
+    if len(_schema_cache) >= MAX_CACHED_SCHEMAS:
+        _schema_cache.clear()
+    _schema_cache[schema_id] = schema
+
+
+class QueueCodec(object):
+    """
+    单个 item 的队列数据编解码
+    """
+
+    def __init__(self, strategy_id, item_id, codec=None):
+        self.strategy_id = strategy_id
+        self.item_id = item_id
+        self.codec = codec or settings.ALARM_QUEUE_CODEC
+        self.schema_key = key.QUEUE_SCHEMA_KEY.get_key(strategy_id=strategy_id, item_id=item_id)
+
+    def encode(self, records: List[dict], pipeline=None, ttl=None) -> List[str]:
+        """
+        编码数据，紧凑格式下 schema 写入 pipeline，需由调用方与数据一起提交
+        """
+        if self.codec != CODEC_COMPACT or pipeline is None:
+            return [json.dumps(record) for record in records]
+
+        schemas = {}
+        # 同一批数据的 schema 基本一致，缓存 schema_id，避免逐条序列化及计算摘要
+        schema_ids = {}
+        payloads = []
+        for record in records:
+            schema, row = _extract_schema(record)
+            schema_id = schema_ids.get(schema)
+            if schema_id is None:
+                if len(schemas) >= MAX_BATCH_SCHEMAS:
+                    payloads.append(json.dumps(record))
+                    continue
+                schema_str = json.dumps(schema, separators=(",", ":"))
+                schema_id = hashlib.md5(schema_str.encode("utf-8")).hexdigest()[:16]
+                schema_ids[schema] = schema_id
+                schemas[schema_id] = schema_str
+                _cache_schema(schema_id, schema)
+
+            row.insert(0, schema_id)
+            payloads.append(VERSION_COMPACT + json.dumps(row, separators=(",", ":")))
+
+        if schemas:
+            pipeline.hmset(self.schema_key, schemas)
+            pipeline.expire(self.schema_key, max(ttl or 0, key.QUEUE_SCHEMA_KEY.ttl))
+        return payloads
+
+    def load_schemas(self, payloads: List[str], client=None):
+        """
+        一次性加载解码所需的 schema，进程内已缓存的不再查询
+        """
+        missing_schema_ids = set()
+        for payload in payloads:
+            if not payload.startswith(VERSION_COMPACT):
+                continue
+            # schema_id 固定为16位，位于 '\x01["' 之后
+            schema_id = payload[3:19]
+            if schema_id not in _schema_cache:
+                missing_schema_ids.add(schema_id)
+
+        if not missing_schema_ids:
+            return
+
+        client = client or key.QUEUE_SCHEMA_KEY.client
+        missing_schema_ids = list(missing_schema_ids)
+        for schema_id, schema_str in zip(missing_schema_ids, client.hmget(self.schema_key, missing_schema_ids)):
+            if schema_str:
+                _cache_schema(schema_id, json.loads(schema_str))
+
+    def decode(self, payload: str) -> dict:
+        """
+        解码单条数据，格式错误时抛出 ValueError
+        """
+        if not payload.startswith(VERSION_COMPACT):
+            return json.loads(payload)
+
+        row = json.loads(payload[1:])
+        try:
+            schema = _schema_cache[row[0]]
+        except (KeyError, IndexError, TypeError):
+            raise ValueError("queue record schema not found")
+
+        try:
+            return _restore(schema, row[1:])
+        except TypeError:
+            raise ValueError("queue record does not match schema")
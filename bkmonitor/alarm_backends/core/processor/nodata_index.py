@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+"""
+access -> nodata 无数据检测维度索引
+
+queue: access 将全部数据再推送一份到 NO_DATA_LIST_KEY，nodata 拉取完整数据后降维判断
+index: access 按无数据维度降维后，只记录 "维度md5 -> 最近上报时间|降维后维度" 到 NO_DATA_DIMENSION_INDEX_KEY，
+    nodata 取出索引直接与目标维度比较，不再传输和解析完整数据
+
+索引更新及消费均通过 lua 脚本在 redis 端完成:
+1. 更新时仅当上报时间更新时才覆盖，多个 access 进程乱序写入时保留最新时间
+2. 消费时取出全部维度，并删除不晚于检测时间点的维度，未来时间点的维度保留到后续检测周期
+通过 NO_DATA_BACKEND 配置切换，切换后 nodata 在索引为空时仍会读取旧队列中的剩余数据。
+"""
+
+import json
+from typing import Dict, List, Tuple
+
+from alarm_backends.constants import NO_DATA_TAG_DIMENSION
+from alarm_backends.core.cache import key
+from bkmonitor.utils.common_utils import count_md5
+
+NO_DATA_BACKEND_QUEUE = "queue"
+NO_DATA_BACKEND_INDEX = "index"
+
+# 单次脚本调用更新的维度数量，避免单条命令阻塞 redis 过久
+BATCH_SIZE = 1000
+
+# ARGV: md5_1, timestamp_1, dimensions_1, md5_2, ...
+UPDATE_INDEX_SCRIPT = key.RedisScript(
+    """
+for i = 1, #ARGV, 3 do
+    local current = redis.call('HGET', KEYS[1], ARGV[i])
+    if not current or tonumber(string.match(current, '^[^|]+')) < tonumber(ARGV[i + 1]) then
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1] .. '|' .. ARGV[i + 2])
+    end
+end
+return 1
+"""
+)
+
+# ARGV: check_timestamp，取出并删除不晚于检测时间点的维度；若没有，则取出未来最早时间点的维度(与队列模式一致)
+CONSUME_INDEX_SCRIPT = key.RedisScript(
+    """
+local result = redis.call('HGETALL', KEYS[1])
+local check_timestamp = tonumber(ARGV[1])
+local earliest_future_timestamp = nil
+local consumed = {}
+local records = {}
+for i = 1, #result, 2 do
+    local timestamp = tonumber(string.match(result[i + 1], '^[^|]+'))
+    if timestamp <= check_timestamp then
+        consumed[#consumed + 1] = result[i]
+        records[#records + 1] = result[i]
+        records[#records + 1] = result[i + 1]
+    elseif earliest_future_timestamp == nil or timestamp < earliest_future_timestamp then
+        earliest_future_timestamp = timestamp
+    end
+end
+if #consumed == 0 and earliest_future_timestamp ~= nil then
+    for i = 1, #result, 2 do
+        if tonumber(string.match(result[i + 1], '^[^|]+')) == earliest_future_timestamp then
+            consumed[#consumed + 1] = result[i]
+            records[#records + 1] = result[i]
+            records[#records + 1] = result[i + 1]
+        end
+    end
+end
+for i = 1, #consumed, 1000 do
+    redis.call('HDEL', KEYS[1], unpack(consumed, i, math.min(i + 999, #consumed)))
+end
+return records
+"""
+)
+
+
+class NoDataDimensionIndex(object):
+    """
+    单个 item 的无数据检测维度索引
+    """
+
+    def __init__(self, strategy_id, item_id):
+        self.strategy_id = strategy_id
+        self.item_id = item_id
+        self.index_key = key.NO_DATA_DIMENSION_INDEX_KEY.get_key(strategy_id=strategy_id, item_id=item_id)
+
+    @staticmethod
+    def reduce_dimensions(no_data_dimensions: List[str], records: List[dict]) -> Dict[str, Tuple[int, dict]]:
+        """
+        按无数据维度降维，与 nodata 检测时的降维方式保持一致，缺少无数据维度的数据视为无效数据
+        :return: {dimensions_md5: (最近上报时间, 降维后维度)}
+        """
+        result = {}
+        for record in records:
+            dimensions = record["dimensions"]
+            if any(dimension not in dimensions for dimension in no_data_dimensions):
+                continue
+
+            reduced_dimensions = {dimension: dimensions[dimension] for dimension in no_data_dimensions}
+            reduced_dimensions[NO_DATA_TAG_DIMENSION] = True
+            dimensions_md5 = count_md5(reduced_dimensions)
+            if dimensions_md5 not in result or record["time"] > result[dimensions_md5][0]:
+                result[dimensions_md5] = (record["time"], reduced_dimensions)
+        return result
+
+    def update(self, pipeline, index_data: Dict[str, Tuple[int, dict]], ttl=None):
+        """
+        写入索引，需由调用方提交 pipeline
+        """
+        if not index_data:
+            return
+
+        items = list(index_data.items())
+        for offset in range(0, len(items), BATCH_SIZE):
+            args = []
+            for dimensions_md5, (timestamp, dimensions) in items[offset : offset + BATCH_SIZE]:
+                args.extend([dimensions_md5, int(timestamp), json.dumps(dimensions)])
+            UPDATE_INDEX_SCRIPT(pipeline, [self.index_key], args, self.index_key.strategy_id)
+        pipeline.expire(self.index_key, max(ttl or 0, key.NO_DATA_DIMENSION_INDEX_KEY.ttl))
+
+    def consume(self, check_timestamp, client=None) -> List[dict]:
+        """
+        取出并删除不晚于检测时间点的维度，晚于检测时间点的维度保留到后续检测周期
+        如果检测时间点之前没有维度，则取出未来最早时间点的维度
+        :return: [{"record_id": ..., "dimensions": ..., "time": ...}]
+        """
+        client = client or key.NO_DATA_DIMENSION_INDEX_KEY.client
+        result = CONSUME_INDEX_SCRIPT(client, [self.index_key], [int(check_timestamp)], self.index_key.strategy_id)
+
+        records = []
+        for offset in range(0, len(result or []), 2):
+            dimensions_md5, value = result[offset], result[offset + 1]
+            timestamp, dimensions = value.split("|", 1)
+            timestamp = int(timestamp)
+            records.append(
+                {
+                    "record_id": f"{dimensions_md5}.{timestamp}",
+                    "value": None,
+                    "values": {},
+                    "dimensions": json.loads(dimensions),
+                    "time": timestamp,
+                }
+            )
+        return records
@@ -150,6 +150,8 @@ class PipelineProxy(KeyRouterMixin):
         self._pipeline_pool = {}
         self.init_params = (args, kwargs)
         self.command_stack = []
+        # 节点ID -> (节点, {sha: 脚本})，执行前在节点上加载缺失的脚本
+        self.scripts = {}
 
     def pipeline_instance(self, node):
         if node.id not in self._pipeline_pool:
@@ -159,7 +161,24 @@ class PipelineProxy(KeyRouterMixin):
 
         return self._pipeline_pool[node.id]
 
+    def load_script(self, sha, script):
+        """
+        记录 evalsha 需要的脚本，sha 需与 key 一样带上路由的策略ID
+        """
+        cache_node = get_node_by_strategy_id(self.strategy_id_from_key(sha))
+        self.scripts.setdefault(cache_node.id, (cache_node, {}))[1][sha] = script
+
+    def load_scripts(self):
+        scripts, self.scripts = self.scripts, {}
+        for cache_node, node_scripts in scripts.values():
+            client = self.node_proxy.get_client(cache_node)
+            shas = list(node_scripts)
+            for sha, exists in zip(shas, client.script_exists(*shas)):
+                if not exists:
+                    client.script_load(node_scripts[sha])
+
     def execute(self):
+        self.load_scripts()
         p_result = {}
         result = []
         for node_id, pipeline_instance in self._pipeline_pool.items():
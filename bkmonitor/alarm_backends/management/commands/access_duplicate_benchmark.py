@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import time
+import uuid
+from collections import namedtuple
+
+from django.core.management.base import BaseCommand
+
+from alarm_backends.service.access.data.duplicate import DUPLICATE_BACKENDS
+
+MockRecord = namedtuple("MockRecord", ["time", "record_id"])
+
+
+class Command(BaseCommand):
+    """
+    access 数据去重性能对比
+    模拟一个策略分组连续拉取数据：每轮拉取 windows 个时间点，每个时间点 dimensions 个维度，
+    相邻两轮拉取窗口重叠一半，统计各去重方式的耗时及传输的 record_id 数量
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dimensions", type=int, default=10000, help="number of dimensions per timestamp")
+        parser.add_argument("--windows", type=int, default=4, help="number of timestamps per pull")
+        parser.add_argument("--rounds", type=int, default=3, help="number of pulls")
+
+    def handle(self, *args, **options):
+        dimensions, windows, rounds = options["dimensions"], options["windows"], options["rounds"]
+        for backend, duplicate_cls in DUPLICATE_BACKENDS.items():
+            strategy_group_key = f"benchmark_{uuid.uuid4().hex}"
+            cost = 0
+            transferred = 0
+            for round_index in range(rounds):
+                start_timestamp = 1600000000 + round_index * windows // 2 * 60
+                records = [
+                    MockRecord(start_timestamp + window * 60, f"{dimension}.{start_timestamp + window * 60}")
+                    for window in range(windows)
+                    for dimension in range(dimensions)
+                ]
+
+                start = time.time()
+                dup = duplicate_cls(strategy_group_key)
+                dup.prefetch(records)
+                for record in records:
+                    if not dup.is_duplicate(record):
+                        dup.add_record(record)
+                dup.refresh_cache()
+                cost += time.time() - start
+
+                if backend == "set":
+                    # 拉取的集合大小 = 缓存的 record_id - 本轮新增的 record_id
+                    transferred += sum(len(record_ids) for record_ids in dup.record_ids_cache.values())
+                    transferred -= sum(len(record_ids) for record_ids in dup.pending_to_add.values())
+                else:
+                    transferred += len(records)
+
+            for window in range((rounds + 1) * windows):
+                dup.client.delete(dup.get_dup_key(1600000000 + window * 60))
+
+            self.stdout.write(
+                f"backend({backend}) records({dimensions * windows * rounds}) "
+                f"cost({cost:.3f}s) transferred_record_ids({transferred})"
+            )
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from alarm_backends.core.alert.snapshot import (
+    SNAPSHOT_CODEC_JSON,
+    SNAPSHOT_CODEC_ZLIB,
+    decode_alert,
+    encode_alert,
+    encode_reference,
+)
+from alarm_backends.core.cache.key import ALERT_SNAPSHOT_KEY
+from bkmonitor.documents import AlertDocument
+
+
+class Command(BaseCommand):
+    """
+    告警缓存存储格式对比
+    从ES中取最近的告警，分别按各存储格式编码维度缓存及快照，统计占用字节数及编解码耗时
+    指定 --redis 时写入临时 key，统计 redis 实际占用内存
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--alerts", type=int, default=1000, help="number of recent alerts")
+        parser.add_argument("--redis", action="store_true", help="measure redis memory usage")
+
+    def handle(self, *args, **options):
+        search = AlertDocument.search(all_indices=True).sort("-create_time")[: options["alerts"]]
+        alerts = [hit.to_dict() for hit in search.execute().hits]
+        self.stdout.write(f"alerts({len(alerts)})")
+        if not alerts:
+            return
+
+        for codec in [SNAPSHOT_CODEC_JSON, SNAPSHOT_CODEC_ZLIB]:
+            with override_settings(ALERT_SNAPSHOT_CODEC=codec):
+                start = time.time()
+                snapshots = [encode_alert(alert) for alert in alerts]
+                if codec == SNAPSHOT_CODEC_ZLIB:
+                    contents = [encode_reference(alert) for alert in alerts]
+                else:
+                    contents = [json.dumps(alert) for alert in alerts]
+                encode_cost = time.time() - start
+
+                start = time.time()
+                for snapshot in snapshots:
+                    decode_alert(snapshot)
+                decode_cost = time.time() - start
+
+            values = snapshots + contents
+            output = (
+                f"codec({codec}) bytes({sum(len(value) for value in values)}) "
+                f"encode_cost({encode_cost:.3f}s) decode_cost({decode_cost:.3f}s)"
+            )
+            if options["redis"]:
+                output += f" redis_memory({self.measure_redis_memory(values)})"
+            self.stdout.write(output)
+
+    @staticmethod
+    def measure_redis_memory(values):
+        client = ALERT_SNAPSHOT_KEY.client
+        keys = [ALERT_SNAPSHOT_KEY.get_key(strategy_id=0, alert_id=uuid.uuid4().hex) for _ in values]
+        pipeline = client.pipeline(transaction=False)
+        for key, value in zip(keys, values):
+            pipeline.set(key, value, 60)
+        pipeline.execute()
+        try:
+            pipeline = client.pipeline(transaction=False)
+            for key in keys:
+                pipeline.memory_usage(key)
+            return sum(usage or 0 for usage in pipeline.execute())
+        finally:
+            client.delete(*keys)
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from alarm_backends.core.alert import Alert
+from alarm_backends.core.alert.alert import AlertCache
+from alarm_backends.core.alert.snapshot import decode_alert
+from alarm_backends.core.alert.version import (
+    ALERT_UPDATE_BACKEND_CAS,
+    ALERT_UPDATE_BACKEND_LOCK,
+    CONFLICT_RETRY_TIMES,
+    get_versions,
+)
+from alarm_backends.core.cache.key import (
+    ALERT_DEDUPE_CONTENT_KEY,
+    ALERT_DEDUPE_VERSION_KEY,
+    ALERT_SNAPSHOT_KEY,
+    ALERT_UPDATE_LOCK,
+)
+from alarm_backends.core.lock import MultiRedisLock
+from constants.alert import EventStatus
+
+
+class Command(BaseCommand):
+    """
+    告警并发更新方式对比
+    模拟告警风暴：workers 个线程并发向 dimensions 个热点维度各提交 updates 次更新(告警计数 +1)，
+    lock: 加锁失败后等待 countdown 秒重试(模拟延后投递)；cas: 版本冲突后立即重试，多次冲突后再等待 countdown 秒
+    统计重试次数、更新从首次尝试到写入成功的耗时，并校验是否有更新丢失
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16, help="number of concurrent workers")
+        parser.add_argument("--dimensions", type=int, default=4, help="number of hot dimensions")
+        parser.add_argument("--updates", type=int, default=50, help="number of updates per worker")
+        parser.add_argument("--countdown", type=float, default=0.5, help="delay before retrying later")
+
+    def handle(self, *args, **options):
+        for backend in [ALERT_UPDATE_BACKEND_LOCK, ALERT_UPDATE_BACKEND_CAS]:
+            prefix = uuid.uuid4().hex
+            alerts = [
+                Alert(
+                    {
+                        "id": f"{prefix}{index}",
+                        "strategy_id": 0,
+                        "dedupe_md5": f"{prefix}{index}",
+                        "status": EventStatus.ABNORMAL,
+                        "create_time": int(time.time()),
+                        "first_anomaly_time": int(time.time()),
+                        "latest_time": int(time.time()),
+                        "event": {"count": 0},
+                    }
+                )
+                for index in range(options["dimensions"])
+            ]
+            AlertCache.save_alert_to_cache(alerts)
+            AlertCache.save_alert_snapshot(alerts)
+
+            stats = {"retries": 0, "costs": []}
+            stats_lock = threading.Lock()
+            update = self.update_with_lock if backend == ALERT_UPDATE_BACKEND_LOCK else self.update_with_version
+
+            def worker():
+                for index in range(options["updates"]):
+                    alert = alerts[index % len(alerts)]
+                    start = time.time()
+                    retries = update(alert, options["countdown"])
+                    with stats_lock:
+                        stats["retries"] += retries
+                        stats["costs"].append(time.time() - start)
+
+            start = time.time()
+            threads = [threading.Thread(target=worker) for _ in range(options["workers"])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            total_cost = time.time() - start
+
+            expected = options["workers"] * options["updates"]
+            counted = sum(self.get_alert(alert).data["event"]["count"] for alert in alerts)
+            costs = sorted(stats["costs"])
+            self.stdout.write(
+                f"backend({backend}) updates({expected}) lost({expected - counted}) "
+                f"retries({stats['retries']}) retry_rate({stats['retries'] / expected:.2%}) "
+                f"avg_cost({sum(costs) / len(costs):.3f}s) p99_cost({costs[int(len(costs) * 0.99) - 1]:.3f}s) "
+                f"total_cost({total_cost:.3f}s)"
+            )
+            self.clean(alerts)
+
+    @staticmethod
+    def get_alert(alert: Alert) -> Alert:
+        return Alert(decode_alert(ALERT_SNAPSHOT_KEY.client.get(alert.key.get_snapshot_key())))
+
+    def update_with_lock(self, alert: Alert, countdown) -> int:
+        lock_key = ALERT_UPDATE_LOCK.get_key(dedupe_md5=alert.dedupe_md5)
+        retries = 0
+        while True:
+            lock = MultiRedisLock([lock_key], ALERT_UPDATE_LOCK.ttl)
+            try:
+                lock.acquire()
+                if lock.is_locked(lock_key):
+                    current = self.get_alert(alert)
+                    current.data["event"]["count"] += 1
+                    AlertCache.save_alert_to_cache([current])
+                    AlertCache.save_alert_snapshot([current])
+                    return retries
+            finally:
+                lock.release()
+            retries += 1
+            time.sleep(countdown)
+
+    def update_with_version(self, alert: Alert, countdown) -> int:
+        retries = 0
+        while True:
+            versions = get_versions([(alert.strategy_id, alert.dedupe_md5)])
+            current = self.get_alert(alert)
+            current.data["event"]["count"] += 1
+            if not AlertCache.compare_and_save_alerts([current], versions):
+                return retries
+            retries += 1
+            if retries % (CONFLICT_RETRY_TIMES + 1) == 0:
+                time.sleep(countdown)
+
+    @staticmethod
+    def clean(alerts):
+        for alert in alerts:
+            ALERT_DEDUPE_CONTENT_KEY.client.delete(
+                ALERT_DEDUPE_CONTENT_KEY.get_key(strategy_id=0, dedupe_md5=alert.dedupe_md5),
+                ALERT_DEDUPE_VERSION_KEY.get_key(strategy_id=0, dedupe_md5=alert.dedupe_md5),
+                alert.key.get_snapshot_key(),
+            )
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from alarm_backends.core.cache.key import FTA_CONVERGE_DIMENSION_KEY
+from alarm_backends.service.converge.dimension import DimensionHandler
+from bkmonitor.models.fta.action import ConvergeInstance
+from constants.action import ConvergeType
+
+
+class Command(BaseCommand):
+    """
+    收敛维度匹配方式对比
+    模拟告警风暴：actions 个处理动作分布在 dimensions 个收敛维度上，每个动作按 业务 + 告警名称 两个维度收敛
+    single: 逐个动作查询收敛实例，在 python 中计算维度交集
+    batch: 每 batch_size 个动作批量查询收敛实例，通过 lua 脚本在 redis 中计算维度交集
+    统计每秒完成维度匹配的动作数，并校验两种方式的匹配结果一致
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--actions", type=int, default=2000, help="number of actions in the storm")
+        parser.add_argument("--dimensions", type=int, default=20, help="number of converge dimensions")
+        parser.add_argument("--batch-size", type=int, default=100, help="number of actions per batch")
+
+    def handle(self, *args, **options):
+        prefix = uuid.uuid4().hex
+        now = int(time.time())
+        handlers = []
+        set_keys = set()
+        pipeline = FTA_CONVERGE_DIMENSION_KEY.client.pipeline(transaction=False)
+        for action_id in range(options["actions"]):
+            condition = {"bk_biz_id": [prefix], "alert_name": [f"{prefix}{action_id % options['dimensions']}"]}
+            handler = DimensionHandler(
+                f"{prefix}#{action_id % options['dimensions']}",
+                condition,
+                now - 600,
+                instance_id=action_id,
+                end_timestamp=now + 600,
+                instance_type=ConvergeType.ACTION,
+                converged_condition=condition,
+            )
+            for keys in handler.get_condition_set_keys().values():
+                for set_key in keys:
+                    pipeline.zadd(set_key, {f"{ConvergeType.ACTION}_{action_id}": now})
+                    set_keys.add(set_key)
+            handlers.append(handler)
+        pipeline.execute()
+
+        try:
+            start = time.time()
+            single_results = []
+            for handler in handlers:
+                ConvergeInstance.objects.filter(dimension=handler.dimension).first()
+                single_results.append(set(handler.get_by_condition()))
+            single_cost = time.time() - start
+
+            start = time.time()
+            batch_results = []
+            for index in range(0, len(handlers), options["batch_size"]):
+                batch = handlers[index : index + options["batch_size"]]
+                list(ConvergeInstance.objects.filter(dimension__in={handler.dimension for handler in batch}))
+                batch_results.extend(DimensionHandler.batch_get_by_condition(batch))
+            batch_cost = time.time() - start
+        finally:
+            FTA_CONVERGE_DIMENSION_KEY.client.delete(*set_keys)
+
+        for mode, cost in [("single", single_cost), ("batch", batch_cost)]:
+            self.stdout.write(
+                f"mode({mode}) actions({len(handlers)}) cost({cost:.3f}s) "
+                f"actions_per_second({len(handlers) / max(cost, 1e-6):.1f})"
+            )
+        self.stdout.write(f"results_consistent({single_results == batch_results})")
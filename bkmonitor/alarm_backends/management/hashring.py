@@ -11,36 +11,126 @@ specific language governing permissions and limitations under the License.
 
 
 from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
 from hashlib import md5
+from typing import Dict, Hashable, Iterable, List, Optional
 
 import six
 from six.moves import range
 
 
-class HashRing(object):
-    def __init__(self, nodes, num_vnodes=2 ** 16):
-        self.nodes = nodes
+def _hash(key):
+    return int(md5(str(key).encode("utf-8")).hexdigest(), 16) % (2 ** 32)
 
-        self.ring = []
-        self.hash2node = {}
 
-        self.num_vnodes = num_vnodes
-        sum_weight = sum(nodes.values())
-        multiple = max(int(self.num_vnodes // sum_weight), 1)
-        self.vnodes = multiple * sum_weight
+@lru_cache(maxsize=2)
+def _build_ring(nodes: tuple, num_vnodes: int):
+    """
+    构建虚拟节点，节点不变时复用，避免每次分配都重新计算大量 md5
+    每个环包含大量虚拟节点，只缓存最近的少数几个，节点变化后旧的环随即淘汰
+    """
+    ring = []
+    hash2node = {}
+
+    sum_weight = sum(weight for _, weight in nodes)
+    multiple = max(int(num_vnodes // sum_weight), 1)
+
+    for node, weight in nodes:
+        for i in range(multiple):
+            h = _hash(str(node) + str(i))
+            ring.append(h)
+            hash2node[h] = node
 
-        for node, weight in six.iteritems(nodes):
-            for i in range(multiple):
-                h = self._hash(str(node) + str(i))
-                self.ring.append(h)
-                self.hash2node[h] = node
+    ring.sort()
+    return ring, hash2node, multiple * sum_weight
 
-        self.ring.sort()
+
+class HashRing(object):
+    def __init__(self, nodes, num_vnodes=2 ** 16):
+        self.nodes = nodes
+        self.num_vnodes = num_vnodes
+        self.ring, self.hash2node, self.vnodes = _build_ring(
+            tuple(sorted(six.iteritems(nodes), key=lambda item: str(item[0]))), num_vnodes
+        )
 
     def _hash(self, key):
-        return int(md5(str(key).encode("utf-8")).hexdigest(), 16) % (2 ** 32)
+        return _hash(key)
 
     def get_node(self, key):
         h = self._hash(key)
         n = bisect_left(self.ring, h) % self.vnodes
         return self.hash2node[self.ring[n]]
+
+    def iter_nodes(self, key):
+        """
+        从 key 所在位置开始，沿环依次返回不重复的节点
+        """
+        h = self._hash(key)
+        start = bisect_left(self.ring, h)
+        visited = set()
+        for i in range(len(self.ring)):
+            node = self.hash2node[self.ring[(start + i) % len(self.ring)]]
+            if node in visited:
+                continue
+            visited.add(node)
+            yield node
+            if len(visited) == len(self.nodes):
+                return
+
+
+def assign_with_load(
+    keys: Iterable[Hashable],
+    nodes: List[Hashable],
+    loads: Optional[Dict[Hashable, float]] = None,
+    previous: Optional[Dict[Hashable, Hashable]] = None,
+    balance_factor: float = 1.25,
+) -> Dict[Hashable, List[Hashable]]:
+    """
+    带负载上限的一致性哈希分配
+    1. 每个节点的负载上限为 balance_factor * 平均负载
+    2. 上一次分配的节点仍存在且未超过上限时，保持原分配，减少节点变化时的迁移
+    3. 其他 key 按负载从大到小，沿环分配到第一个未超过上限的节点，均超过时分配到负载最小的节点
+    :param keys: 待分配的 key，如 kafka 分区
+    :param nodes: 节点列表
+    :param loads: key 的负载，没有负载数据的 key 按已知负载的平均值计算
+    :param previous: 上一次的分配结果 key -> node
+    :return: node -> [key]
+    """
+    keys = list(keys)
+    if not nodes:
+        return {}
+
+    loads = loads or {}
+    previous = previous or {}
+    known_loads = [loads[key] for key in keys if key in loads]
+    default_load = sum(known_loads) / len(known_loads) if known_loads else 0
+    # 每个 key 至少计 1，负载数据缺失或为 0 时按 key 数量均衡
+    key_loads = {key: 1 + max(loads.get(key, default_load), 0) for key in keys}
+    capacity = balance_factor * sum(key_loads.values()) / len(nodes)
+
+    ring = HashRing({node: 1 for node in nodes})
+    node_loads = {node: 0 for node in nodes}
+    assignment = defaultdict(list)
+
+    def assign(key, node):
+        node_loads[node] += key_loads[key]
+        assignment[node].append(key)
+
+    pending = []
+    for key in sorted(keys, key=lambda k: key_loads[k], reverse=True):
+        node = previous.get(key)
+        if node in node_loads and node_loads[node] + key_loads[key] <= capacity:
+            assign(key, node)
+        else:
+            pending.append(key)
+
+    for key in pending:
+        for node in ring.iter_nodes(key):
+            if node_loads[node] + key_loads[key] <= capacity:
+                assign(key, node)
+                break
+        else:
+            assign(key, min(node_loads, key=lambda n: node_loads[n]))
+
+    return assignment
@@ -8,25 +8,79 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+import hashlib
+from collections import defaultdict
+
+from django.conf import settings
+
 from alarm_backends.core.cache import key
 
+DUPLICATE_BACKEND_SET = "set"
+DUPLICATE_BACKEND_BATCH = "batch"
+
+# 批量判断集合成员，返回与数据一一对应的 0/1 列表
+# KEYS: 批量去重集合(record_id 摘要), 逐条去重集合(完整 record_id)
+# ARGV: 摘要1, record_id1, 摘要2, record_id2, ...
+BATCH_IS_MEMBER_SCRIPT = key.RedisScript(
+    """
+local result = {}
+for i = 1, #ARGV, 2 do
+    local existed = redis.call('SISMEMBER', KEYS[1], ARGV[i])
+    if existed == 0 then
+        existed = redis.call('SISMEMBER', KEYS[2], ARGV[i + 1])
+    end
+    result[#result + 1] = existed
+end
+return result
+"""
+)
+
 
 class Duplicate:
+    """
+    逐条去重
+    按时间点拉取整个 record_id 集合后在本地判断。
+    切换去重方式后的一个去重周期内，另一种方式写入的数据仍有效，因此判断时同时读取批量去重集合。
+    """
+
+    dup_key_config = key.ACCESS_DUPLICATE_KEY
+    # 另一种去重方式使用的 key，切换去重方式期间需要同时读取
+    other_dup_key_config = key.ACCESS_BATCH_DUPLICATE_KEY
+
     def __init__(self, strategy_group_key, strategy_id=None):
         self.strategy_group_key = strategy_group_key
         self.record_ids_cache = {}
         self.pending_to_add = {}
         self.strategy_id = strategy_id
+        # 批量去重写入的 record_id 摘要
+        self.record_digests_cache = {}
+
+        self.client = self.dup_key_config.client
+
+    def get_dup_key(self, time, key_config=None):
+        key_config = key_config or self.dup_key_config
+        dup_key = key_config.get_key(strategy_group_key=self.strategy_group_key, dt_event_time=time)
+        if self.strategy_id is not None:
+            dup_key.strategy_id = self.strategy_id
+        return dup_key
 
-        self.client = key.ACCESS_DUPLICATE_KEY.client
+    @staticmethod
+    def get_record_digest(record) -> str:
+        return hashlib.md5(str(record.record_id).encode("utf-8")).hexdigest()[:16]
+
+    def prefetch(self, records):
+        """
+        批量预加载去重信息，默认按时间点懒加载
+        """
 
     def get_record_ids(self, time):
         # 保证每个时间点仅调用一次redis， 即使无数据也缓存下来。
-        dup_key = key.ACCESS_DUPLICATE_KEY.get_key(strategy_group_key=self.strategy_group_key, dt_event_time=time)
+        dup_key = self.get_dup_key(time)
         if dup_key not in self.record_ids_cache:
-            if self.strategy_id is not None:
-                dup_key.strategy_id = self.strategy_id
-            self.record_ids_cache[dup_key] = self.client.smembers(dup_key)
+            pipeline = self.client.pipeline(transaction=False)
+            pipeline.smembers(dup_key)
+            pipeline.smembers(self.get_dup_key(time, self.other_dup_key_config))
+            self.record_ids_cache[dup_key], self.record_digests_cache[dup_key] = pipeline.execute()
 
         return self.record_ids_cache[dup_key]
 
@@ -36,23 +90,108 @@ class Duplicate:
         采用redis的集合功能。以分钟+维度作为key，值为record_id的集合
         """
         record_ids = self.get_record_ids(record.time)
-        return str(record.record_id) in record_ids
+        if str(record.record_id) in record_ids:
+            return True
+
+        # 仅在切换去重方式期间存在批量去重写入的数据
+        record_digests = self.record_digests_cache.get(self.get_dup_key(record.time))
+        return bool(record_digests) and self.get_record_digest(record) in record_digests
 
     def add_record(self, record):
         # 原方案，将需要新增的点和已经存在的点放一起。然后再批量刷进redis。
         # 优化：仅把新增的点，单独列出（后续推到redis）。
         # 同步更新新的record到内存record_ids_cache中（但不再将缓存的所有点全推给redis）
-        dup_key = key.ACCESS_DUPLICATE_KEY.get_key(
-            strategy_group_key=self.strategy_group_key, dt_event_time=record.time
-        )
+        dup_key = self.get_dup_key(record.time)
         self.record_ids_cache.setdefault(dup_key, set()).add(record.record_id)
         self.pending_to_add.setdefault(dup_key, set()).add(record.record_id)
 
     def refresh_cache(self):
         pipeline = self.client.pipeline(transaction=False)
         for dup_key, record_ids in self.pending_to_add.items():
-            if self.strategy_id is not None:
-                dup_key.strategy_id = self.strategy_id
             pipeline.sadd(dup_key, *record_ids)
-            pipeline.expire(dup_key, key.ACCESS_DUPLICATE_KEY.ttl)
+            pipeline.expire(dup_key, self.dup_key_config.ttl)
         pipeline.execute()
+
+
+class BatchDuplicate(Duplicate):
+    """
+    批量去重
+    由 redis 端通过 lua 脚本判断本批数据是否已存在，只返回本批数据的判断结果，
+    不再拉取整个时间点的 record_id 集合。适用于维度数量较多的策略分组。
+
+    集合中保存 record_id 的 64 位摘要(16位十六进制)，而非完整 record_id，以减少传输及存储。
+    摘要冲突会导致新数据被误判为重复，单个时间点有 n 个维度时，每条数据的误判概率约为 n / 2^64，
+    10万维度时约为 5.4e-15。
+    脚本同时判断逐条去重集合中的完整 record_id，保证从逐条去重切换过来时不会重复推送。
+    """
+
+    dup_key_config = key.ACCESS_BATCH_DUPLICATE_KEY
+    other_dup_key_config = key.ACCESS_DUPLICATE_KEY
+
+    # 单次脚本调用判断的数据量，避免单条命令阻塞 redis 过久
+    BATCH_SIZE = 1000
+
+    def __init__(self, strategy_group_key, strategy_id=None):
+        super(BatchDuplicate, self).__init__(strategy_group_key, strategy_id)
+        # 已加载判断结果的 record_id
+        self.checked_record_ids = defaultdict(set)
+
+    def prefetch(self, records):
+        # {time: {record_id 摘要: record_id}}
+        time_record_ids = defaultdict(dict)
+        for record in records:
+            dup_key = self.get_dup_key(record.time)
+            record_id = self.get_record_digest(record)
+            if record_id not in self.checked_record_ids[dup_key]:
+                time_record_ids[record.time][record_id] = str(record.record_id)
+
+        if not time_record_ids:
+            return
+
+        commands = []
+        pipeline = self.client.pipeline(transaction=False)
+        for time, record_id_map in time_record_ids.items():
+            dup_key = self.get_dup_key(time)
+            other_dup_key = self.get_dup_key(time, self.other_dup_key_config)
+            record_ids = list(record_id_map)
+            for offset in range(0, len(record_ids), self.BATCH_SIZE):
+                sub_record_ids = record_ids[offset : offset + self.BATCH_SIZE]
+                args = []
+                for record_id in sub_record_ids:
+                    args.extend([record_id, record_id_map[record_id]])
+                BATCH_IS_MEMBER_SCRIPT(pipeline, [dup_key, other_dup_key], args, dup_key.strategy_id)
+                commands.append((dup_key, sub_record_ids))
+
+        for (dup_key, record_ids), results in zip(commands, pipeline.execute()):
+            self.checked_record_ids[dup_key].update(record_ids)
+            existed_record_ids = self.record_ids_cache.setdefault(dup_key, set())
+            existed_record_ids.update(record_id for record_id, result in zip(record_ids, results) if result)
+
+    def is_duplicate(self, record):
+        dup_key = self.get_dup_key(record.time)
+        record_id = self.get_record_digest(record)
+        if record_id not in self.checked_record_ids[dup_key]:
+            self.prefetch([record])
+        return record_id in self.record_ids_cache.get(dup_key, ())
+
+    def add_record(self, record):
+        dup_key = self.get_dup_key(record.time)
+        record_id = self.get_record_digest(record)
+        self.checked_record_ids[dup_key].add(record_id)
+        self.record_ids_cache.setdefault(dup_key, set()).add(record_id)
+        self.pending_to_add.setdefault(dup_key, set()).add(record_id)
+
+
+DUPLICATE_BACKENDS = {
+    DUPLICATE_BACKEND_SET: Duplicate,
+    DUPLICATE_BACKEND_BATCH: BatchDuplicate,
+}
+
+
+def get_duplicate(strategy_group_key, strategy_id=None) -> Duplicate:
+    """
+    按策略分组选择去重方式，未单独配置的分组使用默认方式
+    """
+    backend = settings.ACCESS_DUPLICATE_GROUP_BACKENDS.get(strategy_group_key, settings.ACCESS_DUPLICATE_BACKEND)
+    duplicate_cls = DUPLICATE_BACKENDS.get(backend, Duplicate)
+    return duplicate_cls(strategy_group_key, strategy_id=strategy_id)
@@ -17,6 +17,7 @@ import arrow
 
 from alarm_backends import constants
 from alarm_backends.core.cache.cmdb import HostManager
+from alarm_backends.core.cache.cmdb.host import host_index
 from alarm_backends.core.control.item import Item
 from alarm_backends.service.access import base
 
@@ -96,14 +97,20 @@ class HostStatusFilter(base.Filter):
         if not record.dimensions.get("bk_target_ip") and not record.dimensions.get("bk_host_id"):
             return True
 
+        # 优先从进程内主机索引中获取，索引中不存在时再查询主机缓存
         if record.dimensions.get("bk_host_id"):
-            host = HostManager.get_by_id(bk_host_id=record.dimensions["bk_host_id"], using_mem=True)
+            entry = host_index.get_by_id(record.dimensions["bk_host_id"])
+            host = entry.host if entry else HostManager.get_by_id(record.dimensions["bk_host_id"], using_mem=True)
         elif "bk_target_ip" in record.dimensions and "bk_target_cloud_id" in record.dimensions:
-            host = HostManager.get(
-                ip=record.dimensions["bk_target_ip"],
-                bk_cloud_id=record.dimensions["bk_target_cloud_id"],
-                using_mem=True,
-            )
+            entry = host_index.get(record.dimensions["bk_target_ip"], record.dimensions["bk_target_cloud_id"])
+            if entry:
+                host = entry.host
+            else:
+                host = HostManager.get(
+                    ip=record.dimensions["bk_target_ip"],
+                    bk_cloud_id=record.dimensions["bk_target_cloud_id"],
+                    using_mem=True,
+                )
         else:
             return False
 
@@ -111,7 +118,7 @@ class HostStatusFilter(base.Filter):
             logger.debug(f"Discard the record ({record.raw_data}) because host is unknown")
             return True
 
-        is_filtered = host.ignore_monitoring
+        is_filtered = entry.ignore_monitoring if entry else host.ignore_monitoring
         for item in record.items:
             record.is_retains[item.id] = not is_filtered and record.is_retains[item.id]
         if is_filtered:
@@ -10,9 +10,8 @@ specific language governing permissions and limitations under the License.
 """
 
 
-from itertools import chain
-
 from alarm_backends.core.cache.cmdb import HostManager, ServiceInstanceManager
+from alarm_backends.core.cache.cmdb.host import HostIndex, host_index
 from alarm_backends.service.access.base import Fuller
 from constants.data_source import DataSourceLabel, DataTypeLabel
 
@@ -55,7 +54,8 @@ class TopoNodeFuller(Fuller):
         # 按主机ID补全维度
         bk_host_id = dimensions.get("bk_host_id")
         if bk_host_id:
-            host = HostManager.get_by_id(bk_host_id)
+            entry = host_index.get_by_id(bk_host_id)
+            host = entry.host if entry else HostManager.get_by_id(bk_host_id)
             if host:
                 dimensions["bk_target_ip"] = host.ip
                 dimensions["bk_target_cloud_id"] = str(host.bk_cloud_id)
@@ -65,9 +65,7 @@ class TopoNodeFuller(Fuller):
         if service_instance_id:
             service_instance = ServiceInstanceManager.get(service_instance_id)
             if service_instance:
-                bk_topo_node = []
-                if service_instance.topo_link:
-                    bk_topo_node = list({node.id for node in chain(*list(service_instance.topo_link.values()))})
+                bk_topo_node = HostIndex.get_topo_nodes(service_instance.topo_link)
                 dimensions["bk_target_ip"] = service_instance.ip
                 dimensions["bk_target_cloud_id"] = service_instance.bk_cloud_id
                 dimensions["bk_topo_node"] = bk_topo_node
@@ -79,13 +77,16 @@ class TopoNodeFuller(Fuller):
             return
 
         bk_target_cloud_id = dimensions.get("bk_target_cloud_id", "0") or dimensions.get("bk_cloud_id", "0")
-        host = HostManager.get(bk_target_ip, bk_target_cloud_id, using_mem=True)
-        if not host:
-            return
+        entry = host_index.get(bk_target_ip, bk_target_cloud_id)
+        if entry:
+            # 拓扑节点已预先计算，复制一份避免多条数据共用同一列表
+            host, bk_topo_node = entry.host, list(entry.topo_nodes)
+        else:
+            host = HostManager.get(bk_target_ip, bk_target_cloud_id, using_mem=True)
+            if not host:
+                return
+            bk_topo_node = HostIndex.get_topo_nodes(host.topo_link)
 
-        bk_topo_node = []
-        if host.topo_link:
-            bk_topo_node = list({node.id for node in chain(*list(host.topo_link.values()))})
         dimensions["bk_topo_node"] = bk_topo_node
         if "bk_host_id" not in dimensions:
             dimensions["bk_host_id"] = host.bk_host_id
@@ -9,6 +9,7 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 
+import copy
 import json
 import logging
 import queue
@@ -30,26 +31,29 @@ from kafka.errors import NoBrokersAvailable
 from alarm_backends import constants
 from alarm_backends.cluster import TargetType
 from alarm_backends.core.cache import clear_mem_cache, key
+from alarm_backends.core.cache.cmdb.host import host_index
 from alarm_backends.core.cache.key import ACCESS_END_TIME_KEY, REAL_TIME_HOST_TOPIC_KEY
 from alarm_backends.core.cache.result_table import ResultTableCacheManager
 from alarm_backends.core.cache.strategy import StrategyCacheManager
 from alarm_backends.core.cluster import get_cluster
 from alarm_backends.core.control.checkpoint import Checkpoint
 from alarm_backends.core.control.item import Item
-from alarm_backends.core.control.strategy import Strategy
+from alarm_backends.core.control.strategy import Strategy, strategy_cache
+from alarm_backends.core.kafka_partition import PartitionAssigner, PartitionLoadReporter
+from alarm_backends.core.processor.nodata_index import NO_DATA_BACKEND_INDEX
 from alarm_backends.core.storage.redis import Cache
-from alarm_backends.management.hashring import HashRing
 from alarm_backends.service.access import base
-from alarm_backends.service.access.data.duplicate import Duplicate
+from alarm_backends.service.access.data.duplicate import get_duplicate
 from alarm_backends.service.access.data.filters import (
     ExpireFilter,
     HostStatusFilter,
     RangeFilter,
 )
 from alarm_backends.service.access.data.fullers import TopoNodeFuller
+from alarm_backends.service.access.data.push import PushPlan
 from alarm_backends.service.access.data.records import DataRecord
 from alarm_backends.service.access.priority import PriorityChecker
-from bkmonitor.utils.common_utils import count_md5, get_local_ip
+from bkmonitor.utils.common_utils import get_local_ip
 from bkmonitor.utils.consul import BKConsul
 from bkmonitor.utils.thread_backend import InheritParentThread
 from constants.data_source import DataSourceLabel, DataTypeLabel
@@ -72,6 +76,11 @@ class BaseAccessDataProcess(base.BaseAccessProcess):
 
         self.add_fuller(TopoNodeFuller())
 
+    def handle(self):
+        # 主机索引按间隔检查缓存版本，有变化时增量加载
+        host_index.refresh()
+        super(BaseAccessDataProcess, self).handle()
+
     def post_handle(self):
         # 释放主机信息本地内存
         clear_mem_cache("host_cache")
@@ -79,87 +88,6 @@ class BaseAccessDataProcess(base.BaseAccessProcess):
     def pull(self):
         pass
 
-    def _push_noise_data(self, item, record_list):
-        noise_reduce_config = item.strategy.notice.get("options", {}).get("noise_reduce_config")
-        if not (noise_reduce_config and noise_reduce_config.get("is_enabled")):
-            logger.debug(
-                "skip to add noise data for strategy(%s) due to noise reduce is not enabled", item.strategy.strategy_id
-            )
-            return
-        client = key.NOISE_REDUCE_TOTAL_KEY.client
-        dimension_hash = count_md5(noise_reduce_config["dimensions"])
-        record_key = key.NOISE_REDUCE_TOTAL_KEY.get_key(
-            strategy_id=item.strategy.strategy_id, noise_dimension_hash=dimension_hash
-        )
-        noise_data = defaultdict()
-        for record in record_list:
-            dimensions = record.data["dimensions"]
-            dimension_value = {
-                dimension_key: dimensions.get(dimension_key) for dimension_key in noise_reduce_config["dimensions"]
-            }
-            logger.debug("strategy(%s) noise reduce dimension_value(%s)", item.strategy.strategy_id, dimension_value)
-            dimension_value_hash = count_md5(dimension_value)
-            noise_data[dimension_value_hash] = record.data["time"]
-        client.zadd(record_key, noise_data)
-        client.expire(record_key, key.NOISE_REDUCE_TOTAL_KEY.ttl)
-
-        logger.info(
-            "record_key({record_key}) "
-            "dimension_key({dimension_key})"
-            "strategy({strategy_id}) "
-            "push dimension records({records_length}).".format(
-                record_key=record_key,
-                dimension_key="|".join(noise_reduce_config["dimensions"]),
-                strategy_id=item.strategy.strategy_id,
-                records_length=len(noise_data.keys()),
-            )
-        )
-
-    def _push(self, item, record_list, output_client=None, data_list_key=None):
-        """
-        :summary: 推送单个item的数据到检测队列或无数据待检测队列
-        :param item
-        :param record_list
-        :param output_client
-        :param data_list_key：数据队列，默认为 key.DATA_LIST_KEY
-        """
-        data_list_key = data_list_key or key.DATA_LIST_KEY
-        client = output_client or data_list_key.client
-        output_key = data_list_key.get_key(strategy_id=item.strategy.strategy_id, item_id=item.id)
-        queue_length = client.llen(output_key)
-        # 超过最大检测长度10倍(50w)说明detect模块处理能力不足,数据将被丢弃。
-        if queue_length > settings.SQL_MAX_LIMIT * 10:
-            msg = (
-                f"Critical: strategy({item.strategy.strategy_id}), item({item.id})"
-                f"The number of ({output_key}) records to be detected has "
-                f"exceeded {queue_length}/{settings.SQL_MAX_LIMIT * 10}. "
-                f"Please check if the detect process is running normally."
-            )
-            raise Exception(msg)
-
-        pipeline = client.pipeline(transaction=False)
-        _offset = 0
-        while _offset < len(record_list):
-            chunk_records = record_list[_offset : _offset + 10000]
-            pipeline.lpush(output_key, *[json.dumps(record.data) for record in chunk_records])
-            _offset += 10000
-        # 避免监控周期大于默认key过期时间，引起数据丢失
-        agg_interval = min(query_config["agg_interval"] for query_config in item.query_configs)
-        pipeline.expire(output_key, max([data_list_key.ttl, agg_interval * 5]))
-        pipeline.execute()
-        metrics.ACCESS_PROCESS_PUSH_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG, type="data").inc(len(record_list))
-
-        logger.info(
-            "output_key({output_key}) "
-            "strategy({strategy_id}), item({item_id}), "
-            "push records({records_length}).".format(
-                output_key=output_key,
-                strategy_id=item.strategy.strategy_id,
-                item_id=item.id,
-                records_length=len(record_list),
-            )
-        )
-
     def push(self, records: List = None, output_client=None):
         """
         推送格式化后的数据到 detect 和 nodata 中(按单个策略，单个item项，写入不同的队列)
@@ -185,6 +113,8 @@ class BaseAccessDataProcess(base.BaseAccessProcess):
                 if record.is_retains[item_id] and not record.inhibitions[item_id]:
                     pending_to_push[item_id].append(record)
 
+        # 所有 item 的队列、降噪基数及信号写入合并到一个推送计划中提交
+        plan = PushPlan(getattr(self, "strategy_group_key", None), output_client)
         strategy_ids = set()
         for item_id, record_list in list(pending_to_push.items()):
             item = item_id_to_item[item_id]
@@ -192,24 +122,26 @@ class BaseAccessDataProcess(base.BaseAccessProcess):
                 strategy_ids.add(item.strategy.strategy_id)
 
                 # 推送到检测队列
-                self._push(item, record_list, output_client)
+                plan.add_queue(item, record_list)
 
                 # 推送降噪基数至redis队列
                 try:
-                    self._push_noise_data(item, record_list)
+                    plan.add_noise(item, record_list)
                 except BaseException as e:
                     logger.exception("push noise data of strategy(%s) error, %s", item.strategy.strategy_id, str(e))
 
             # 推送无数据处理
             if item.no_data_config["is_enabled"]:
-                self._push(item, records, output_client, key.NO_DATA_LIST_KEY)
+                if settings.NO_DATA_BACKEND == NO_DATA_BACKEND_INDEX:
+                    plan.add_nodata_index(item, records)
+                else:
+                    plan.add_queue(item, records, key.NO_DATA_LIST_KEY)
 
         # 推送数据处理信号
         if records:
-            client = output_client or key.DATA_SIGNAL_KEY.client
-            if strategy_ids:
-                client.lpush(key.DATA_SIGNAL_KEY.get_key(), *list(strategy_ids))
-            client.expire(key.DATA_SIGNAL_KEY.get_key(), key.DATA_SIGNAL_KEY.ttl)
+            plan.add_signal(strategy_ids)
+
+        plan.execute()
 
 
 class AccessDataProcess(BaseAccessDataProcess):
@@ -224,12 +156,16 @@ class AccessDataProcess(BaseAccessDataProcess):
     def items(self):
         data = []
         records = StrategyCacheManager.get_strategy_group_detail(self.strategy_group_key)
+        strategy_items = {}
         for strategy_id, item_ids in list(records.items()):
             try:
-                strategy_id = int(strategy_id)
+                strategy_items[int(strategy_id)] = item_ids
             except ValueError:
                 continue
-            strategy = Strategy(strategy_id)
+
+        strategies = strategy_cache.get_strategies(list(strategy_items))
+        for strategy_id, item_ids in strategy_items.items():
+            strategy = strategies[strategy_id]
             for item in strategy.items:
                 if item.id in item_ids:
                     data.append(item)
@@ -264,7 +200,8 @@ class AccessDataProcess(BaseAccessDataProcess):
             return
 
         # 拉取一次数据，默认相同查询方法的数据拉取状态保持一致
-        first_item: Item = self.items[0]
+        # items 中的对象在进程内复用，查询前需要调整查询条件，因此单独构建一个查询用的 item
+        first_item: Item = Item(copy.deepcopy(self.items[0].item_config), self.items[0].strategy)
         agg_interval = min(query_config["agg_interval"] for query_config in first_item.query_configs)
 
         min_last_checkpoint = min([i.item_config["update_time"] for i in self.items])
@@ -343,7 +280,7 @@ class AccessDataProcess(BaseAccessDataProcess):
                 return
 
         records = []
-        dup_obj = Duplicate(self.strategy_group_key, strategy_id=first_item.strategy.id)
+        dup_obj = get_duplicate(self.strategy_group_key, strategy_id=first_item.strategy.id)
         duplicate_counts = none_point_counts = 0
 
         # 是否有优先级
@@ -353,8 +290,9 @@ class AccessDataProcess(BaseAccessDataProcess):
                 have_priority = True
                 break
 
-        for record in reversed(item_records):
-            point = DataRecord(self.items, record)
+        points = [DataRecord(self.items, record) for record in reversed(item_records)]
+        dup_obj.prefetch([point for point in points if point.value is not None])
+        for point in points:
             if point.value is not None:
                 # 去除重复数据
                 if dup_obj.is_duplicate(point):
@@ -436,6 +374,8 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
     实时监控数据拉取
     """
 
+    PARTITION_SERVICE = "access.real_time"
+
     def __init__(self, service):
         """
         {
@@ -461,9 +401,19 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
 
         self.consumers: Dict[str, KafkaConsumer] = {}
         self.consumers_lock = threading.Lock()
-        self.queue = queue.Queue(maxsize=100)
+        # KafkaConsumer 非线程安全，拉取与订阅变更需持有对应集群的锁
+        self.consumer_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+        # 按 topic 划分的有界缓冲队列 {bootstrap_servers: {topic: Queue}}
+        self.buffers: Dict[str, Dict[str, queue.Queue]] = defaultdict(dict)
+        # 缓冲队列已满而暂停拉取的分区数据 {bootstrap_servers: [(TopicPartition, records)]}
+        self.pending_records: Dict[str, List] = defaultdict(list)
         self._stop_signal = False
-        self.strategy_cache = {}
+        # 实时数据使用的监控项 {strategy_id: (策略对象, 维度, 监控项)}
+        self.real_time_items: Dict[int, tuple] = {}
+
+        # 分区负载统计及分配
+        self.partition_load_reporter = PartitionLoadReporter(self.PARTITION_SERVICE)
+        self.partition_assigner = PartitionAssigner(self.PARTITION_SERVICE)
 
     def __str__(self):
         return super(AccessRealTimeDataProcess, self).__str__()
@@ -573,13 +523,12 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
                     logger.error(f"get real time result_table({rt_id}) info error")
             map(lambda c: c.close(), consumers)
 
-            # 使用哈希算法分配topic到机器上
+            # 按分区分配topic到机器上
             hosts = self.get_all_hosts()
-            hash_ring = HashRing({host: 1 for host in hosts})
             host_topics = defaultdict(set)
-            for partition in partitions:
-                host = hash_ring.get_node(partition)
-                host_topics[host].add(partition.rsplit("|", maxsplit=1)[0])
+            for host, host_partitions in self.partition_assigner.assign(partitions, hosts).items():
+                for partition in host_partitions:
+                    host_topics[host].add(partition.rsplit("|", maxsplit=1)[0])
 
             # 将topic分配信息写入redis
             pipeline = self.cache.pipeline()
@@ -614,7 +563,44 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
             if end_time - start_time < 60:
                 time.sleep(60 - (end_time - start_time))
 
-    def flat(self, bootstrap_servers: str, record: ConsumerRecord):
+    @staticmethod
+    def trim_value(value) -> memoryview:
+        """
+        去除消息末尾的结束符，使用 memoryview 切片避免复制
+        """
+        value = memoryview(value)
+        if len(value) and value[-1] in (0, 10):
+            return value[:-1]
+        return value
+
+    @classmethod
+    def decode_records(cls, records: List[ConsumerRecord]) -> List:
+        """
+        批量解析消息，拼接为一个 json 数组后一次性解析，存在异常数据时逐条解析
+        """
+        try:
+            result = json.loads(b"[" + b",".join(cls.trim_value(record.value) for record in records) + b"]")
+            if len(result) == len(records):
+                return result
+        except (ValueError, TypeError):
+            pass
+
+        result = []
+        for record in records:
+            try:
+                result.append(json.loads(cls.trim_value(record.value).tobytes()))
+            except (ValueError, TypeError) as e:
+                logger.warning("%s loads alarm(%s) failed: %s", record.topic, record.value, e)
+                result.append(None)
+        return result
+
+    def flat(
+        self,
+        bootstrap_servers: str,
+        record: ConsumerRecord,
+        raw_data: Dict = None,
+        strategies: Dict[int, Strategy] = None,
+    ):
         """
         扁平化
         1. 数据结构转换
@@ -646,14 +632,16 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
             "time":1573701305
         }
         """
-        raw_data = record.value
-        raw_data = json.loads(raw_data[:-1] if raw_data[-1] == "\x00" or raw_data[-1] == "\n" else raw_data)
+        if raw_data is None:
+            raw_data = json.loads(self.trim_value(record.value).tobytes())
 
         data_bk_biz_id = int(raw_data["dimensions"].get("bk_biz_id", 0))
         strategy_ids = self.topics[f"{bootstrap_servers}|{record.topic}"]["strategy_ids"]
         dimensions = self.topics[f"{bootstrap_servers}|{record.topic}"]["dimensions"]
-        strategies = [self.get_strategy(strategy_id) for strategy_id in strategy_ids]
-        strategies = [s for s in strategies if int(s.bk_biz_id) == data_bk_biz_id]
+        if strategies is None:
+            strategies = strategy_cache.get_strategies(strategy_ids)
+        strategies = [strategies[int(strategy_id)] for strategy_id in strategy_ids]
+        strategies = [s for s in strategies if s.config and int(s.bk_biz_id) == data_bk_biz_id]
         if not strategies:
             logger.debug("abandon data(%s), not belong targets", raw_data)
             return []
@@ -664,43 +652,131 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
             standard_raw_data.update(raw_data["metrics"])
             standard_raw_data.update(raw_data["dimensions"])
 
-            item = strategy.items[0]
-            item.data_sources[0].group_by = dimensions
-            item.query_configs[0]["agg_dimension"] = dimensions
+            item = self.get_real_time_item(strategy, dimensions)
             new_record_list.append(DataRecord(item, standard_raw_data))
         return new_record_list
 
-    def get_strategy(self, strategy_id: int) -> Strategy:
+    def get_real_time_item(self, strategy: Strategy, dimensions: List[str]) -> Item:
+        """
+        获取实时数据使用的监控项
+        策略对象在进程内共享，不能直接修改其维度，因此按 topic 维度构建一份监控项，策略对象更新后重新构建
         """
-        获取策略配置
+        cached = self.real_time_items.get(strategy.id)
+        if cached and cached[0] is strategy and cached[1] == dimensions:
+            return cached[2]
+
+        item_config = copy.deepcopy(strategy.items[0].item_config)
+        item_config["query_configs"][0]["agg_dimension"] = dimensions
+        item = Item(item_config, strategy)
+        item.data_sources[0].group_by = dimensions
+        self.real_time_items[strategy.id] = (strategy, dimensions, item)
+        return item
+
+    def get_buffer(self, bootstrap_servers: str, topic: str) -> queue.Queue:
+        buffers = self.buffers[bootstrap_servers]
+        if topic not in buffers:
+            buffers[topic] = queue.Queue(maxsize=settings.REAL_TIME_TOPIC_BUFFER_SIZE)
+        return buffers[topic]
+
+    def put_records(self, bootstrap_servers: str, consumer: KafkaConsumer, partition, records) -> bool:
         """
-        if time.time() - self.strategy_cache.get(strategy_id, {}).get("time", 0) > 60:
-            self.strategy_cache[strategy_id] = {"time": time.time(), "strategy": Strategy(strategy_id)}
+        写入 topic 缓冲队列，队列已满时暂停该分区的拉取，由下一轮拉取重试写入
+        """
+        try:
+            self.get_buffer(bootstrap_servers, partition.topic).put_nowait(records)
+            return True
+        except queue.Full:
+            self.pending_records[bootstrap_servers].append((partition, records))
+            consumer.pause(partition)
+            return False
+
+    def flush_pending_records(self, bootstrap_servers: str, consumer: KafkaConsumer):
+        pending_records = self.pending_records.pop(bootstrap_servers, [])
+        for index, (partition, records) in enumerate(pending_records):
+            if not self.put_records(bootstrap_servers, consumer, partition, records):
+                # 保持分区内的数据顺序，后续数据留待下次写入
+                self.pending_records[bootstrap_servers].extend(pending_records[index + 1 :])
+                return
 
-        return self.strategy_cache[strategy_id]["strategy"]
+            # 分区在订阅变更后可能已不再分配给当前消费者
+            try:
+                consumer.resume(partition)
+            except Exception:  # noqa
+                pass
 
-    def run_poller(self, once=False):
+    def poll_cluster(self, bootstrap_servers: str) -> bool:
+        """
+        拉取单个kafka集群的数据
+        """
+        with self.consumer_locks[bootstrap_servers]:
+            consumer = self.consumers.get(bootstrap_servers)
+            if not consumer:
+                return False
+
+            self.flush_pending_records(bootstrap_servers, consumer)
+            data = consumer.poll(500, max_records=5000)
+            for partition, records in data.items():
+                logger.info(f"real_time poller poll {bootstrap_servers}|{partition.topic}: {len(records)}")
+                self.partition_load_reporter.incr(bootstrap_servers, partition.topic, partition.partition, len(records))
+                self.put_records(bootstrap_servers, consumer, partition, records)
+        return bool(data)
+
+    def run_cluster_poller(self, bootstrap_servers: str):
+        while bootstrap_servers in self.consumers and not self._stop_signal:
+            if not self.poll_cluster(bootstrap_servers):
+                # 如果没有数据就等待一秒
+                time.sleep(1)
+
+    def run_cluster_handler(self, bootstrap_servers: str, once=False):
+        """
+        依次从各个topic缓冲队列取数据处理，集群已下线且缓冲数据处理完成后退出
+        """
         while True:
-            self.consumers_lock.acquire()
             has_record = False
-            for consumer in self.consumers.values():
-                data = consumer.poll(500, max_records=5000)
-                if not data:
+            for buffer in list(self.buffers[bootstrap_servers].values()):
+                try:
+                    data = buffer.get_nowait()
+                except queue.Empty:
                     continue
-
                 has_record = True
-                for records in data.values():
-                    logger.info(f"real_time poller poll {consumer.config['bootstrap_servers']}: {len(records)}")
-                    self.queue.put((consumer.config["bootstrap_servers"], records))
-            self.consumers_lock.release()
+                self.handle(bootstrap_servers, data)
 
-            if once or self._stop_signal:
-                logger.info("real_time poller get stop signal")
+            if once:
                 break
 
-            # 如果没有数据就等待一秒
             if not has_record:
-                time.sleep(1)
+                if self._stop_signal or bootstrap_servers not in self.consumers:
+                    break
+                time.sleep(0.1)
+
+    def run_poller(self, once=False):
+        """
+        每个kafka集群使用独立的拉取线程及处理线程，避免慢集群阻塞其他集群
+        """
+        if once:
+            for bootstrap_servers in list(self.consumers):
+                self.poll_cluster(bootstrap_servers)
+            return
+
+        workers: Dict[tuple, threading.Thread] = {}
+        while True:
+            for bootstrap_servers in list(self.consumers):
+                for target in (self.run_cluster_poller, self.run_cluster_handler):
+                    worker_key = (bootstrap_servers, target.__name__)
+                    if worker_key in workers and workers[worker_key].is_alive():
+                        continue
+
+                    logger.info(f"real_time poller start {target.__name__} for {bootstrap_servers}")
+                    workers[worker_key] = InheritParentThread(target=target, args=(bootstrap_servers,))
+                    workers[worker_key].start()
+
+            if self._stop_signal:
+                logger.info("real_time poller get stop signal")
+                for worker in workers.values():
+                    worker.join()
+                break
+
+            time.sleep(1)
 
     def run_consumer_manager(self, once=False):
         """
@@ -753,75 +829,101 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
 
                 for bootstrap_servers, consumer in self.consumers.items():
                     if bootstrap_servers in delete_bootstrap_servers:
-                        consumer.close()
+                        with self.consumer_locks[bootstrap_servers]:
+                            consumer.close()
+                        self.pending_records.pop(bootstrap_servers, None)
                         continue
 
                     if bootstrap_servers in update_bootstrap_servers:
-                        consumer.subscribe(topics=list(bootstrap_servers_topics[bootstrap_servers]))
+                        with self.consumer_locks[bootstrap_servers]:
+                            consumer.subscribe(topics=list(bootstrap_servers_topics[bootstrap_servers]))
                     new_consumers[bootstrap_servers] = consumer
                 self.consumers = new_consumers
                 self.consumers_lock.release()
 
+            self.report_partition_load()
+
             if once or self._stop_signal:
                 if self._stop_signal:
                     logger.info("real_time consumer_manager get stop signal")
                     self.consumers_lock.acquire()
-                    map(lambda c: c.close(), self.consumers.values())
-                    self.consumers = []
+                    for bootstrap_servers, consumer in self.consumers.items():
+                        with self.consumer_locks[bootstrap_servers]:
+                            consumer.close()
+                    self.consumers = {}
                     self.consumers_lock.release()
                 break
 
             time.sleep(15)
 
+    def report_partition_load(self):
+        """
+        上报当前消费的各分区负载
+        """
+        if not self.partition_load_reporter.is_due():
+            return
+
+        lags = {}
+        for bootstrap_servers, consumer in list(self.consumers.items()):
+            with self.consumer_locks[bootstrap_servers]:
+                lags[bootstrap_servers] = self.partition_load_reporter.get_lags(consumer)
+        try:
+            self.partition_load_reporter.report(lags)
+        except Exception as e:
+            logger.warning(f"real_time report partition load error: {e}")
+
     def run_handler(self, once=False):
-        while True:
-            if self._stop_signal and self.queue.empty():
-                logger.info("real_time handler get stop signal")
-                break
+        """
+        处理各个集群缓冲队列中的数据，常驻模式下由 run_poller 按集群启动处理线程
+        """
+        for bootstrap_servers in list(self.buffers):
+            self.run_cluster_handler(bootstrap_servers, once=once)
 
-            try:
-                bootstrap_servers, data = self.queue.get(block=True, timeout=5)
-            except queue.Empty:
-                data = []
-                bootstrap_servers = ""
+    def handle(self, bootstrap_servers: str, data: List[ConsumerRecord]):
+        try:
+            host_index.refresh()
 
-            try:
-                records = []
-                for record in data:
-                    try:
-                        records.extend(self.flat(bootstrap_servers, record))
-                    except Exception as e:
-                        logger.warning("%s loads alarm(%s) failed", record.topic, record.value, e)
-
-                record_list = []
-                for r in records:
-                    # 补充维度：比如：业务、集群、模块等信息
-                    self.full(r)
-
-                    new_r_list = r.full()
-                    if not new_r_list:
-                        continue
+            # 一批数据只获取一次策略
+            strategy_ids = set()
+            for topic in {record.topic for record in data}:
+                strategy_ids.update(self.topics.get(f"{bootstrap_servers}|{topic}", {}).get("strategy_ids", []))
+            strategies = strategy_cache.get_strategies(list(strategy_ids))
 
-                    record_list.extend(new_r_list)
+            records = []
+            for record, raw_data in zip(data, self.decode_records(data)):
+                if raw_data is None:
+                    continue
+                try:
+                    records.extend(self.flat(bootstrap_servers, record, raw_data, strategies))
+                except Exception as e:
+                    logger.warning("%s loads alarm(%s) failed: %s", record.topic, record.value, e)
 
-                output = []
-                for r in record_list:
-                    # 过滤数据
-                    if self.filter(r) or r.filter(r):
-                        continue
+            record_list = []
+            for r in records:
+                # 补充维度：比如：业务、集群、模块等信息
+                self.full(r)
 
-                    # 格式化数据
-                    r.clean()
+                new_r_list = r.full()
+                if not new_r_list:
+                    continue
 
-                    output.append(r)
+                record_list.extend(new_r_list)
 
-                self.push(output)
-            except Exception as e:
-                logger.exception(e)
-                logger.error(f"real_time handler exception: {e}")
+            output = []
+            for r in record_list:
+                # 过滤数据
+                if self.filter(r) or r.filter(r):
+                    continue
 
-            if once:
-                break
+                # 格式化数据
+                r.clean()
+
+                output.append(r)
+
+            self.push(output)
+        except Exception as e:
+            logger.exception(e)
+            logger.error(f"real_time handler exception: {e}")
 
     def _stop(self, *args, **kwargs):
         self._stop_signal = True
@@ -837,12 +939,11 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
             signal.signal(signal.SIGINT, self._stop)
             leader = InheritParentThread(target=self.run_leader)
             consumer_manager = InheritParentThread(target=self.run_consumer_manager)
+            # 数据处理线程由 poller 按 kafka 集群启动
             poller = InheritParentThread(target=self.run_poller)
-            handler = InheritParentThread(target=self.run_handler)
             leader.start()
             consumer_manager.start()
             poller.start()
-            handler.start()
 
             while True:
                 self.service.register()
@@ -851,7 +952,6 @@ class AccessRealTimeDataProcess(BaseAccessDataProcess):
                     leader.join()
                     consumer_manager.join()
                     poller.join()
-                    handler.join()
                     self.service.unregister()
                     return
 
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+from alarm_backends.core.cache import key
+from alarm_backends.core.processor.codec import QueueCodec
+from alarm_backends.core.processor.nodata_index import NoDataDimensionIndex
+from alarm_backends.core.storage.redis_cluster import (
+    PipelineProxy,
+    RedisProxy,
+    get_node_by_strategy_id,
+)
+from bkmonitor.utils.common_utils import count_md5
+from core.prometheus import metrics
+
+logger = logging.getLogger("access.data")
+
+# 单条 LPUSH 命令的数据条数
+PUSH_CHUNK_SIZE = 10000
+
+
+class PushPlan(object):
+    """
+    策略分组的数据推送计划
+
+    收集本次处理中所有 item 的检测队列、无数据队列/索引、降噪基数及数据信号的写入，合并为少量 pipeline 提交:
+    1. 一次 pipeline 查询全部队列长度
+    2. 队列数据及无数据索引在一个 pipeline 中写入，redis 按策略路由到多个节点时，由 PipelineProxy 按节点拆分
+    3. 数据写入后再推送数据信号，保证 detect 收到信号时数据已就绪。所有队列与信号队列位于同一节点时，
+       信号追加在同一 pipeline 末尾，由 redis 保证执行顺序
+    4. 降噪基数位于 service 缓存，使用单独的 pipeline 写入
+    """
+
+    def __init__(self, strategy_group_key=None, output_client=None):
+        self.strategy_group_key = strategy_group_key or metrics.TOTAL_TAG
+        self.output_client = output_client
+        # [(item, record_list, data_list_key)]
+        self.queue_tasks = []
+        # item_id -> [(record_key, noise_data, dimensions)]
+        self.noise_tasks = defaultdict(list)
+        # [(item, index_data)]
+        self.nodata_index_tasks = []
+        self.strategy_ids = set()
+        self.with_signal = False
+        self.stage_costs = {}
+
+    @staticmethod
+    def new_pipeline(client):
+        # RedisProxy.pipeline 返回的是共享实例，多线程推送时需各自创建
+        if isinstance(client, RedisProxy):
+            return PipelineProxy(client, transaction=False)
+        return client.pipeline(transaction=False)
+
+    @staticmethod
+    def get_node_id(client, redis_key):
+        if not isinstance(client, RedisProxy):
+            return None
+        return get_node_by_strategy_id(client.strategy_id_from_key(redis_key)).id
+
+    def add_queue(self, item, record_list, data_list_key=None):
+        """
+        :param item
+        :param record_list
+        :param data_list_key：数据队列，默认为 key.DATA_LIST_KEY
+        """
+        if record_list:
+            self.queue_tasks.append((item, record_list, data_list_key or key.DATA_LIST_KEY))
+
+    def add_noise(self, item, record_list):
+        """
+        记录降噪基数，维度哈希在此计算，提交时只需写入
+        """
+        noise_reduce_config = item.strategy.notice.get("options", {}).get("noise_reduce_config")
+        if not (noise_reduce_config and noise_reduce_config.get("is_enabled")):
+            logger.debug(
+                "skip to add noise data for strategy(%s) due to noise reduce is not enabled", item.strategy.strategy_id
+            )
+            return
+
+        dimension_hash = count_md5(noise_reduce_config["dimensions"])
+        record_key = key.NOISE_REDUCE_TOTAL_KEY.get_key(
+            strategy_id=item.strategy.strategy_id, noise_dimension_hash=dimension_hash
+        )
+        noise_data = {}
+        for record in record_list:
+            dimensions = record.data["dimensions"]
+            dimension_value = {
+                dimension_key: dimensions.get(dimension_key) for dimension_key in noise_reduce_config["dimensions"]
+            }
+            logger.debug("strategy(%s) noise reduce dimension_value(%s)", item.strategy.strategy_id, dimension_value)
+            noise_data[count_md5(dimension_value)] = record.data["time"]
+        self.noise_tasks[item.id].append((record_key, noise_data, noise_reduce_config["dimensions"]))
+
+    def add_nodata_index(self, item, record_list):
+        """
+        记录无数据检测维度的最近上报时间，降维在此计算，提交时只需写入
+        """
+        no_data_dimensions = item.no_data_config.get("agg_dimension", [])
+        index_data = NoDataDimensionIndex.reduce_dimensions(no_data_dimensions, [record.data for record in record_list])
+        if index_data:
+            self.nodata_index_tasks.append((item, index_data))
+
+    def add_signal(self, strategy_ids):
+        self.with_signal = True
+        self.strategy_ids.update(strategy_ids)
+
+    def timeit(self, stage, start):
+        cost = time.time() - start
+        self.stage_costs[stage] = cost
+        metrics.ACCESS_DATA_PUSH_TIME.labels(strategy_group_key=metrics.TOTAL_TAG, stage=stage).observe(cost)
+
+    def execute(self):
+        """
+        提交推送计划，队列积压的 item 不推送，其余数据推送完成后抛出异常
+        """
+        start = time.time()
+        # 检测队列、无数据队列及信号队列均位于 queue 缓存，共用一个客户端按 key 路由
+        client = self.output_client or key.DATA_LIST_KEY.client
+        signal_key = key.DATA_SIGNAL_KEY.get_key()
+
+        # 1. 批量查询队列长度
+        tasks = []
+        for item, record_list, data_list_key in self.queue_tasks:
+            output_key = data_list_key.get_key(strategy_id=item.strategy.strategy_id, item_id=item.id)
+            tasks.append((item, record_list, data_list_key, output_key))
+
+        queue_lengths = []
+        if tasks:
+            pipeline = self.new_pipeline(client)
+            for task in tasks:
+                pipeline.llen(task[3])
+            queue_lengths = pipeline.execute()
+            self.timeit("check", start)
+
+        # 2. 写入队列数据
+        write_start = time.time()
+        errors = []
+        pushed_tasks = []
+        node_ids = set()
+        pipeline = self.new_pipeline(client)
+        for (item, record_list, data_list_key, output_key), queue_length in zip(tasks, queue_lengths):
+            # 超过最大检测长度10倍(50w)说明detect模块处理能力不足,数据将被丢弃。
+            if (queue_length or 0) > settings.SQL_MAX_LIMIT * 10:
+                errors.append(
+                    f"Critical: strategy({item.strategy.strategy_id}), item({item.id})"
+                    f"The number of ({output_key}) records to be detected has "
+                    f"exceeded {queue_length}/{settings.SQL_MAX_LIMIT * 10}. "
+                    f"Please check if the detect process is running normally."
+                )
+                continue
+
+            # 避免监控周期大于默认key过期时间，引起数据丢失
+            agg_interval = min(query_config["agg_interval"] for query_config in item.query_configs)
+            ttl = max([data_list_key.ttl, agg_interval * 5])
+
+            codec = QueueCodec(item.strategy.strategy_id, item.id)
+            for offset in range(0, len(record_list), PUSH_CHUNK_SIZE):
+                chunk_records = record_list[offset : offset + PUSH_CHUNK_SIZE]
+                pipeline.lpush(output_key, *codec.encode([record.data for record in chunk_records], pipeline, ttl))
+            pipeline.expire(output_key, ttl)
+            pushed_tasks.append((item, record_list, data_list_key, output_key))
+            node_ids.add(self.get_node_id(client, output_key))
+
+        for item, index_data in self.nodata_index_tasks:
+            agg_interval = min(query_config["agg_interval"] for query_config in item.query_configs)
+            index = NoDataDimensionIndex(item.strategy.strategy_id, item.id)
+            index.update(pipeline, index_data, agg_interval * 5)
+            node_ids.add(self.get_node_id(client, index.index_key))
+
+        # 全部队列与信号队列位于同一节点时，信号在同一 pipeline 中提交
+        signal_in_pipeline = self.with_signal and node_ids <= {self.get_node_id(client, signal_key)}
+        if signal_in_pipeline:
+            self.add_signal_commands(pipeline, signal_key)
+        if pushed_tasks or self.nodata_index_tasks or signal_in_pipeline:
+            pipeline.execute()
+        self.timeit("data", write_start)
+
+        for item, record_list, _, output_key in pushed_tasks:
+            metrics.ACCESS_PROCESS_PUSH_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG, type="data").inc(
+                len(record_list)
+            )
+            logger.info(
+                "output_key({output_key}) "
+                "strategy({strategy_id}), item({item_id}), "
+                "push records({records_length}).".format(
+                    output_key=output_key,
+                    strategy_id=item.strategy.strategy_id,
+                    item_id=item.id,
+                    records_length=len(record_list),
+                )
+            )
+        for item, index_data in self.nodata_index_tasks:
+            logger.info(
+                "strategy({}), item({}), update nodata dimension index({}).".format(
+                    item.strategy.strategy_id, item.id, len(index_data)
+                )
+            )
+
+        # 3. 推送数据处理信号
+        if self.with_signal and not signal_in_pipeline:
+            signal_start = time.time()
+            signal_pipeline = self.new_pipeline(client)
+            self.add_signal_commands(signal_pipeline, signal_key)
+            signal_pipeline.execute()
+            self.timeit("signal", signal_start)
+
+        # 4. 推送降噪基数，仅推送已写入检测队列的 item
+        self.push_noise_data(
+            {item.id for item, _, data_list_key, _ in pushed_tasks if data_list_key is key.DATA_LIST_KEY}
+        )
+
+        self.timeit("total", start)
+        logger.info(
+            "strategy_group_key(%s) push plan finished, queues(%s), nodata indexes(%s), costs(%s)",
+            self.strategy_group_key,
+            len(pushed_tasks),
+            len(self.nodata_index_tasks),
+            ", ".join(f"{stage}: {cost:.3f}s" for stage, cost in self.stage_costs.items()),
+        )
+
+        if errors:
+            raise Exception("\n".join(errors))
+
+    def add_signal_commands(self, pipeline, signal_key):
+        if self.strategy_ids:
+            pipeline.lpush(signal_key, *list(self.strategy_ids))
+        pipeline.expire(signal_key, key.DATA_SIGNAL_KEY.ttl)
+
+    def push_noise_data(self, item_ids):
+        noise_tasks = [task for item_id in item_ids for task in self.noise_tasks.get(item_id, [])]
+        if not noise_tasks:
+            return
+
+        noise_start = time.time()
+        try:
+            pipeline = self.new_pipeline(key.NOISE_REDUCE_TOTAL_KEY.client)
+            for record_key, noise_data, _ in noise_tasks:
+                pipeline.zadd(record_key, noise_data)
+                pipeline.expire(record_key, key.NOISE_REDUCE_TOTAL_KEY.ttl)
+            pipeline.execute()
+        except BaseException as e:
+            logger.exception("push noise data of strategy_group(%s) error, %s", self.strategy_group_key, str(e))
+            return
+        self.timeit("noise", noise_start)
+
+        for record_key, noise_data, dimensions in noise_tasks:
+            logger.info(
+                "record_key({record_key}) "
+                "dimension_key({dimension_key})"
+                "strategy({strategy_id}) "
+                "push dimension records({records_length}).".format(
+                    record_key=record_key,
+                    dimension_key="|".join(dimensions),
+                    strategy_id=record_key.strategy_id,
+                    records_length=len(noise_data),
+                )
+            )
@@ -10,17 +10,25 @@ specific language governing permissions and limitations under the License.
 """
 import logging
 import time
-from typing import List
+from typing import Dict, List
 
 from django.utils.translation import ugettext as _
 from elasticsearch.helpers import BulkIndexError
 
 from alarm_backends.constants import CONST_MINUTES
 from alarm_backends.core.alert import Alert, Event
-from alarm_backends.core.alert.alert import AlertUIDManager
+from alarm_backends.core.alert.alert import AlertCache, AlertUIDManager
+from alarm_backends.core.alert.version import (
+    ALERT_UPDATE_BACKEND_CAS,
+    ALERT_UPDATE_BACKEND_LOCK,
+    CONFLICT_RETRY_TIMES,
+    get_versions,
+    use_cas,
+)
 from alarm_backends.core.cache.key import ALERT_UPDATE_LOCK
 from alarm_backends.core.lock.service_lock import multi_service_lock
 from alarm_backends.service.alert.enricher import AlertEnrichFactory, EventEnrichFactory
+from alarm_backends.service.alert.enricher.lookup import CMDBLookup
 from alarm_backends.service.alert.manager.tasks import send_check_task
 from alarm_backends.service.alert.processor import BaseAlertProcessor
 from bkmonitor.documents import AlertLog, EventDocument
@@ -34,6 +42,8 @@ class AlertBuilder(BaseAlertProcessor):
     def __init__(self):
         super(AlertBuilder, self).__init__()
         self.logger = logging.getLogger("alert.builder")
+        # 事件及告警丰富共享的 CMDB 缓存查询，同一批次内相同的主机等信息只查询一次
+        self.cmdb_lookup = CMDBLookup()
 
     def get_unexpired_events(self, events: List[Event]):
         """
@@ -75,11 +85,75 @@ class AlertBuilder(BaseAlertProcessor):
         """
         将事件进行去重，生成告警并保存
         """
-        from alarm_backends.service.alert.builder.tasks import dedupe_events_to_alerts
-
         events = self.get_unexpired_events(events)
         if not events:
             return []
+
+        if use_cas():
+            alerts = self.build_alerts_with_version(events)
+        else:
+            alerts = self.build_alerts_with_lock(events)
+
+        # TODO: 这里需要清理保存失败的告警的 Redis 缓存，否则会导致DB和 Redis 不一致
+        self.save_alert_logs(alerts)
+        self.send_periodic_check_task(alerts)
+        self.update_active_index(alerts)
+
+        alerts_to_send_signal = [alert for alert in alerts if alert.should_send_signal()]
+        self.send_signal(alerts_to_send_signal)
+
+        for alert in alerts:
+            metrics.ALERT_PROCESS_PUSH_DATA_COUNT.labels(
+                bk_data_id=alert.data_id,
+                topic=alert.data_topic,
+                strategy_id=metrics.TOTAL_TAG,
+                is_saved="1" if alert.should_refresh_db() else "0",
+            ).inc()
+
+        return alerts
+
+    def report_process_latency(self, events: List[Event]):
+        for event in events:
+            latency = event.get_process_latency()
+            if not latency:
+                # 没有延迟数据，直接下一个
+                continue
+            if latency.get("trigger_latency"):
+                metrics.ALERT_PROCESS_LATENCY.labels(
+                    bk_data_id=event.data_id,
+                    topic=event.topic,
+                    strategy_id=metrics.TOTAL_TAG,
+                ).observe(latency["trigger_latency"])
+            if latency.get("access_latency"):
+                metrics.ACCESS_TO_ALERT_PROCESS_LATENCY.labels(
+                    bk_data_id=event.data_id,
+                    topic=event.topic,
+                    strategy_id=metrics.TOTAL_TAG,
+                ).observe(latency["access_latency"])
+
+    def retry_later(self, events: List[Event], reason: str):
+        """
+        丢到队列中，延后5s操作
+        """
+        from alarm_backends.service.alert.builder.tasks import dedupe_events_to_alerts
+
+        dedupe_events_to_alerts.apply_async(
+            kwargs={
+                "events": events,
+            },
+            countdown=5,
+        )
+        self.logger.info(
+            "%s alerts is %s, will try later: %s",
+            len(events),
+            reason,
+            ",".join([event.dedupe_md5 for event in events]),
+        )
+
+    def build_alerts_with_lock(self, events: List[Event]) -> List[Alert]:
+        """
+        按维度加锁后生成告警并保存
+        """
         lock_keys = [ALERT_UPDATE_LOCK.get_key(dedupe_md5=event.dedupe_md5) for event in events]
 
         with multi_service_lock(ALERT_UPDATE_LOCK, lock_keys) as lock:
@@ -92,23 +166,9 @@ class AlertBuilder(BaseAlertProcessor):
                 else:
                     fail_locked_events.append(event)
 
-            for event in success_locked_events:
-                latency = event.get_process_latency()
-                if not latency:
-                    # 没有延迟数据，直接下一个
-                    continue
-                if latency.get("trigger_latency"):
-                    metrics.ALERT_PROCESS_LATENCY.labels(
-                        bk_data_id=event.data_id,
-                        topic=event.topic,
-                        strategy_id=metrics.TOTAL_TAG,
-                    ).observe(latency["trigger_latency"])
-                if latency.get("access_latency"):
-                    metrics.ACCESS_TO_ALERT_PROCESS_LATENCY.labels(
-                        bk_data_id=event.data_id,
-                        topic=event.topic,
-                        strategy_id=metrics.TOTAL_TAG,
-                    ).observe(latency["access_latency"])
+            self.report_update_result(success_locked_events, ALERT_UPDATE_BACKEND_LOCK, "success")
+            self.report_update_result(fail_locked_events, ALERT_UPDATE_BACKEND_LOCK, "lock_failed")
+            self.report_process_latency(success_locked_events)
 
             # 对加锁成功的告警才能进行操作
             alerts = self.build_alerts(success_locked_events)
@@ -118,36 +178,63 @@ class AlertBuilder(BaseAlertProcessor):
 
             if fail_locked_events:
                 # 对加锁失败的告警，丢到队列中，延后5s操作
-                dedupe_events_to_alerts.apply_async(
-                    kwargs={
-                        "events": fail_locked_events,
-                    },
-                    countdown=5,
-                )
-                self.logger.info(
-                    "%s alerts is locked, will try later: %s",
-                    len(fail_locked_events),
-                    ",".join([event.dedupe_md5 for event in fail_locked_events]),
-                )
+                self.retry_later(fail_locked_events, "locked")
 
-            alerts = self.save_alerts(alerts, action=BulkActionType.UPSERT, force_save=True)
+            return self.save_alerts(alerts, action=BulkActionType.UPSERT, force_save=True)
 
-        # TODO: 这里需要清理保存失败的告警的 Redis 缓存，否则会导致DB和 Redis 不一致
-        self.save_alert_logs(alerts)
-        self.send_periodic_check_task(alerts)
+    def build_alerts_with_version(self, events: List[Event]) -> List[Alert]:
+        """
+        不加锁生成告警，以维度版本号比较写入缓存，只有版本冲突的维度重新读取缓存并生成告警
+        """
+        self.report_process_latency(events)
+
+        saved_alerts = []
+        # 事件ID -> 由该事件创建的告警，冲突重试时直接复用，新告警只创建、流控计数及丰富一次
+        created_alerts = {}
+        for retry_times in range(CONFLICT_RETRY_TIMES + 1):
+            if retry_times:
+                self.logger.info("%s alerts is conflicted, retry(%s)", len(events), retry_times)
+
+            # 版本号需要在读取告警缓存前获取，期间缓存被其他进程更新时才能识别出冲突
+            versions = get_versions((event.strategy_id, event.dedupe_md5) for event in events)
+            enriched_ids = {alert.id for alert in created_alerts.values()}
+            alerts = self.build_alerts(events, created_alerts)
+
+            # 复用的告警已经丰富过，只丰富其他告警，并以丰富后的告警更新复用记录
+            alerts = [alert for alert in alerts if alert.id in enriched_ids] + self.enrich_alerts(
+                [alert for alert in alerts if alert.id not in enriched_ids]
+            )
+            alerts_mapping = {alert.id: alert for alert in alerts}
+            for event_id, alert in created_alerts.items():
+                created_alerts[event_id] = alerts_mapping.get(alert.id, alert)
+
+            conflicted_dimensions = AlertCache.compare_and_save_alerts(alerts, versions)
+
+            saved_alerts.extend([alert for alert in alerts if alert.dedupe_md5 not in conflicted_dimensions])
+            conflicted_events = [event for event in events if event.dedupe_md5 in conflicted_dimensions]
+            self.report_update_result(
+                [event for event in events if event.dedupe_md5 not in conflicted_dimensions],
+                ALERT_UPDATE_BACKEND_CAS,
+                "success",
+            )
+            self.report_update_result(conflicted_events, ALERT_UPDATE_BACKEND_CAS, "conflict")
 
-        alerts_to_send_signal = [alert for alert in alerts if alert.should_send_signal()]
-        self.send_signal(alerts_to_send_signal)
+            events = conflicted_events
+            if not events:
+                break
 
-        for alert in alerts:
-            metrics.ALERT_PROCESS_PUSH_DATA_COUNT.labels(
-                bk_data_id=alert.data_id,
-                topic=alert.data_topic,
-                strategy_id=metrics.TOTAL_TAG,
-                is_saved="1" if alert.should_refresh_db() else "0",
-            ).inc()
+        if events:
+            # 多次冲突的维度，丢到队列中延后处理
+            self.retry_later(events, "conflicted")
 
-        return alerts
+        return self.save_alerts(saved_alerts, action=BulkActionType.UPSERT, force_save=True)
+
+    @staticmethod
+    def report_update_result(events: List[Event], backend: str, result: str):
+        if events:
+            metrics.ALERT_UPDATE_DIMENSION_COUNT.labels(module="builder", backend=backend, result=result).inc(
+                len({event.dedupe_md5 for event in events})
+            )
 
     def handle(self, events: List[Event]):
         """
@@ -182,7 +269,7 @@ class AlertBuilder(BaseAlertProcessor):
         """
         start_time = time.time()
 
-        factory = AlertEnrichFactory(alerts)
+        factory = AlertEnrichFactory(alerts, self.cmdb_lookup)
         alerts = factory.enrich()
 
         self.logger.info("enrich alerts finished, total(%s), elapsed(%.3f)", len(alerts), time.time() - start_time)
@@ -195,7 +282,7 @@ class AlertBuilder(BaseAlertProcessor):
 
         start_time = time.time()
 
-        factory = EventEnrichFactory(events)
+        factory = EventEnrichFactory(events, self.cmdb_lookup)
         events = factory.enrich()
 
         self.logger.info(
@@ -284,23 +371,47 @@ class AlertBuilder(BaseAlertProcessor):
             )
             return alert
 
-    def build_alerts(self, events: List[Event]) -> List[Alert]:
+    @staticmethod
+    def create_alert(event: Event, created_alerts: Dict[str, Alert] = None) -> Alert:
+        """
+        根据事件创建新告警，已由该事件创建过告警时直接复用
+        """
+        if created_alerts is None:
+            return Alert.from_event(event)
+        if event.id not in created_alerts:
+            created_alerts[event.id] = Alert.from_event(event)
+        return created_alerts[event.id]
+
+    def build_alerts(self, events: List[Event], created_alerts: Dict[str, Alert] = None) -> List[Alert]:
         """
         根据事件生成告警
+        :param created_alerts: 事件ID -> 由该事件创建的告警，本次新创建的告警会写入其中。
+            版本冲突重试时传入，由同一事件创建告警时直接复用上一次的结果，避免重复流控计数、分配ID及丰富。
+            告警由事件创建后的处理只取决于后续事件，因此该维度后续的事件不再重复处理
         """
         if not events:
             return []
 
+        reused_ids = {alert.id for alert in (created_alerts or {}).values()}
+        reused_dimensions = set()
+
         current_alerts = self.get_current_alerts(events)
         new_alerts = {}
         # 对事件进行遍历，逐个更新告警内容
         for event in events:
+            if event.dedupe_md5 in reused_dimensions:
+                # 复用的告警已处理过后续事件，后续事件创建的告警同样直接复用
+                if event.id in created_alerts:
+                    alert = created_alerts[event.id]
+                    new_alerts[alert.id] = alert
+                continue
+
             alert: Alert = current_alerts.get(event.dedupe_md5)
             if alert and not alert.is_end():
                 alert = self.alert_qos_handle(alert)
                 if alert.status == EventStatus.CLOSED:
                     new_alerts[alert.id] = alert
-                    alert = Alert.from_event(event)
+                    alert = self.create_alert(event, created_alerts)
                 else:
                     if alert.severity > event.severity and alert.severity_source != AssignMode.BY_RULE:
                         # 如果告警级别小于当前事件的级别，并且级别不是告警分派改变的，先将当前告警关闭，再创建一个新的告警
@@ -312,7 +423,7 @@ class AlertBuilder(BaseAlertProcessor):
                             event_id=event.id,
                         )
                         new_alerts[alert.id] = alert
-                        alert = Alert.from_event(event)
+                        alert = self.create_alert(event, created_alerts)
                     elif alert.event_severity < event.severity:
                         # 如果当前告警关联的事件级别高于新的事件级别， 接丢弃当前的event, 并记录日志
                         alert.add_log(
@@ -336,7 +447,7 @@ class AlertBuilder(BaseAlertProcessor):
                         event.status,
                     )
                     continue
-                alert = Alert.from_event(event=event)
+                alert = self.create_alert(event, created_alerts)
                 self.logger.info(
                     "event(%s) with event.extra_info(%s)  build alert(%s), alert.labels(%s)",
                     event.id,
@@ -348,6 +459,8 @@ class AlertBuilder(BaseAlertProcessor):
             # 回写到 current_alerts 用于后续遍历继续更新
             current_alerts[event.dedupe_md5] = alert
             new_alerts[alert.id] = alert
+            if alert.id in reused_ids:
+                reused_dimensions.add(event.dedupe_md5)
 
         alerts = list(new_alerts.values())
 
@@ -9,7 +9,8 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import logging
-from typing import List, Type
+import time
+from typing import Callable, List, Type
 
 from alarm_backends.core.alert import Alert, Event
 from alarm_backends.service.alert.enricher.base import (
@@ -23,9 +24,12 @@ from alarm_backends.service.alert.enricher.dimension import (
     StandardTranslateEnricher,
 )
 from alarm_backends.service.alert.enricher.kubernetes_cmdb import KubernetesCMDBEnricher
+from alarm_backends.service.alert.enricher.lookup import CMDBLookup
 from alarm_backends.service.alert.enricher.rule_assign import AssignInfoEnricher
 from alarm_backends.service.alert.enricher.strategy import StrategySnapshotEnricher
 from alarm_backends.service.alert.enricher.whitelist import BizWhiteListFor3rdEvent
+from bkmonitor.utils.thread_backend import InheritParentThread
+from core.prometheus import metrics
 
 logger = logging.getLogger("alert.enricher")
 
@@ -34,41 +38,90 @@ INSTALLED_EVENT_ENRICHER: List[Type[BaseEventEnricher]] = [
     BizWhiteListFor3rdEvent,
 ]
 
+# 标记为 concurrent 的丰富器，在其所在位置开始于后台线程中准备，在其他丰富器执行完成后按顺序写入告警
+# 因此 concurrent 丰富器的准备过程只能依赖其之前的丰富器的结果
 INSTALLED_AlERT_ENRICHER: List[Type[BaseAlertEnricher]] = [
     StrategySnapshotEnricher,
+    KubernetesCMDBEnricher,
     StandardTranslateEnricher,
     MonitorTranslateEnricher,
     DimensionOrderEnricher,
     AssignInfoEnricher,
-    KubernetesCMDBEnricher,
 ]
 
 
+def run_enricher(stage: str, enricher_cls: Type, func: Callable):
+    """
+    执行丰富器并记录耗时，异常时返回 None
+    """
+    start_time = time.time()
+    exc = None
+    try:
+        return func()
+    except Exception as e:
+        exc = e
+        logger.exception("%s enrich error, enricher(%s), reason: %s", stage, enricher_cls, e)
+    finally:
+        metrics.ALERT_ENRICH_TIME.labels(
+            stage=stage, enricher=enricher_cls.__name__, status=metrics.StatusEnum.from_exc(exc)
+        ).observe(time.time() - start_time)
+
+
 class EventEnrichFactory:
-    def __init__(self, events: List[Event]):
+    def __init__(self, events: List[Event], lookup: CMDBLookup = None):
         self.events = events
+        self.lookup = lookup or CMDBLookup()
 
     def enrich(self):
         events = self.events
         for enricher_cls in INSTALLED_EVENT_ENRICHER:
-            try:
-                enricher = enricher_cls(events)
-                events = enricher.enrich()
-            except Exception as e:
-                logger.exception("event enrich error, enricher(%s), reason: %s", enricher_cls, e)
+            events = run_enricher("event", enricher_cls, lambda: enricher_cls(events, self.lookup).enrich()) or events
         return events
 
 
+class ConcurrentEnricherThread(InheritParentThread):
+    """
+    在后台线程中实例化丰富器，完成批量查询
+    """
+
+    def __init__(self, enricher_cls: Type[BaseAlertEnricher], alerts: List[Alert], lookup: CMDBLookup):
+        super(ConcurrentEnricherThread, self).__init__()
+        self.enricher_cls = enricher_cls
+        self.alerts = alerts
+        self.lookup = lookup
+        self.enricher = None
+
+    def run(self):
+        self.sync()
+        try:
+            self.enricher = run_enricher(
+                "alert_prepare", self.enricher_cls, lambda: self.enricher_cls(self.alerts, self.lookup)
+            )
+        finally:
+            self.unsync()
+
+
 class AlertEnrichFactory:
-    def __init__(self, alerts: List[Alert]):
+    def __init__(self, alerts: List[Alert], lookup: CMDBLookup = None):
         self.alerts = alerts
+        self.lookup = lookup or CMDBLookup()
 
     def enrich(self):
         alerts = self.alerts
+        concurrent_threads = []
         for enricher_cls in INSTALLED_AlERT_ENRICHER:
-            try:
-                enricher = enricher_cls(alerts)
-                alerts = enricher.enrich()
-            except Exception as e:
-                logger.exception("alert enrich error, enricher(%s), reason: %s", enricher_cls, e)
+            if enricher_cls.concurrent:
+                thread = ConcurrentEnricherThread(enricher_cls, alerts, self.lookup)
+                thread.start()
+                concurrent_threads.append(thread)
+                continue
+            alerts = run_enricher("alert", enricher_cls, lambda: enricher_cls(alerts, self.lookup).enrich()) or alerts
+
+        for thread in concurrent_threads:
+            thread.join()
+            enricher = thread.enricher
+            if enricher is None:
+                continue
+            enricher.alerts = alerts
+            alerts = run_enricher("alert", thread.enricher_cls, enricher.enrich) or alerts
         return alerts
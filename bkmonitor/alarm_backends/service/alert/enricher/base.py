@@ -13,13 +13,16 @@ import logging
 from typing import List
 
 from alarm_backends.core.alert import Event, Alert
+from alarm_backends.service.alert.enricher.lookup import CMDBLookup
 
 logger = logging.getLogger("alert.enricher")
 
 
 class BaseEventEnricher(metaclass=abc.ABCMeta):
-    def __init__(self, events: List[Event]):
+    def __init__(self, events: List[Event], lookup: CMDBLookup = None):
         self.events = events
+        # 同一批次内共享的 CMDB 缓存查询
+        self.lookup = lookup or CMDBLookup()
 
     def enrich(self) -> List[Event]:
         events = []
@@ -39,8 +42,13 @@ class BaseEventEnricher(metaclass=abc.ABCMeta):
 
 
 class BaseAlertEnricher(metaclass=abc.ABCMeta):
-    def __init__(self, alerts: List[Alert]):
+    # 是否可与后续丰富器并发执行：为 True 时，实例化(批量查询)在后台线程中进行，丰富结果在其他丰富器之后按顺序写入告警
+    concurrent = False
+
+    def __init__(self, alerts: List[Alert], lookup: CMDBLookup = None):
         self.alerts = alerts
+        # 同一批次内共享的 CMDB 缓存查询
+        self.lookup = lookup or CMDBLookup()
 
     def enrich(self) -> List[Alert]:
         alerts = []
@@ -13,59 +13,49 @@ from itertools import chain
 from typing import List
 
 from alarm_backends.core.alert import Event
-from alarm_backends.core.cache.cmdb import (
-    HostIPManager,
-    HostManager,
-    ServiceInstanceManager,
-)
 from alarm_backends.service.alert.enricher.base import BaseEventEnricher
+from alarm_backends.service.alert.enricher.lookup import CMDBLookup
 from constants.alert import EventTargetType
 
 logger = logging.getLogger("alert.enricher")
 
 
 class CMDBEnricher(BaseEventEnricher):
-    def __init__(self, events: List[Event]):
-        super(CMDBEnricher, self).__init__(events)
+    def __init__(self, events: List[Event], lookup: CMDBLookup = None):
+        super(CMDBEnricher, self).__init__(events, lookup)
 
         # 缓存准备，批量查询避免重复请求redis
-        ips = set()
-        hosts = set()
-        service_instance_ids = set()
-
         for event in self.events:
             if not event.target:
                 continue
 
             if event.target_type == EventTargetType.HOST:
+                try:
+                    self.lookup.add_host_id(int(event.target))
+                    continue
+                except ValueError:
+                    pass
+
                 ip_with_cloud_id = event.target.split("|")
                 if not ip_with_cloud_id[0]:
                     continue
                 if len(ip_with_cloud_id) == 1:
-                    ips.add(HostIPManager.key_to_internal_value(ip_with_cloud_id[0]))
+                    self.lookup.add_ip(ip_with_cloud_id[0])
                 else:
-                    hosts.add(HostManager.key_to_internal_value(ip_with_cloud_id[0], ip_with_cloud_id[1]))
+                    self.lookup.add_host(ip_with_cloud_id[0], ip_with_cloud_id[1])
             elif event.target_type == EventTargetType.SERVICE:
-                service_instance_ids.add(ServiceInstanceManager.key_to_internal_value(event.target))
-
-        self.ip_cache = HostIPManager.multi_get_with_dict(ips)
-        self.service_instance_cache = ServiceInstanceManager.multi_get_with_dict(service_instance_ids)
+                self.lookup.add_service_instance(event.target)
 
-        # 加上从 ip_cache 拿到的 IP 列表
-        hosts |= {host for host in chain(*[ips for ips in self.ip_cache.values() if ips])}
-        self.hosts_cache = HostManager.multi_get_with_dict(hosts)
+        self.lookup.resolve()
 
     def get_host_by_ip(self, ip):
-        keys = self.ip_cache.get(HostIPManager.key_to_internal_value(ip)) or []
-        return [self.hosts_cache[key] for key in keys if self.hosts_cache.get(key)]
+        return self.lookup.get_host_by_ip(ip)
 
     def get_host(self, ip, bk_cloud_id):
-        key = HostManager.key_to_internal_value(ip, bk_cloud_id)
-        return self.hosts_cache.get(key)
+        return self.lookup.get_host(ip, bk_cloud_id)
 
     def get_service_instance(self, service_instance_id):
-        key = ServiceInstanceManager.key_to_internal_value(service_instance_id)
-        return self.service_instance_cache.get(key)
+        return self.lookup.get_service_instance(service_instance_id)
 
     def enrich_event(self, event: Event):
         if event.is_dropped():
@@ -103,7 +93,7 @@ class CMDBEnricher(BaseEventEnricher):
             ip_with_cloud_id = event.target.split("|")
 
         if bk_host_id:
-            host = HostManager.get_by_id(bk_host_id)
+            host = self.lookup.get_host_by_id(bk_host_id)
             if not host:
                 ip = ""
                 bk_cloud_id = 0
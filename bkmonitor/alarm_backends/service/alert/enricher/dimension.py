@@ -8,16 +8,13 @@ Unless required by applicable law or agreed to in writing, software distributed
 an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
 specific language governing permissions and limitations under the License.
 """
+from typing import List
 
 from django.utils.translation import ugettext as _
 
 from alarm_backends.core.alert import Alert
-from alarm_backends.core.cache.cmdb import (
-    HostManager,
-    ServiceInstanceManager,
-    TopoManager,
-)
 from alarm_backends.service.alert.enricher import BaseAlertEnricher
+from alarm_backends.service.alert.enricher.lookup import CMDBLookup
 from alarm_backends.service.alert.enricher.translator import TranslatorFactory
 from constants.alert import EventTargetType
 
@@ -90,6 +87,22 @@ class StandardTranslateEnricher(BaseAlertEnricher):
     标准字段翻译
     """
 
+    def __init__(self, alerts: List[Alert], lookup: CMDBLookup = None):
+        super(StandardTranslateEnricher, self).__init__(alerts, lookup)
+
+        # 缓存准备，批量查询避免逐个告警请求redis
+        for alert in self.alerts:
+            if not alert.is_new():
+                continue
+            target_type = alert.top_event.get("target_type")
+            if target_type == EventTargetType.HOST and alert.top_event.get("bk_host_id"):
+                self.lookup.add_host_id(alert.top_event["bk_host_id"])
+            elif target_type == EventTargetType.SERVICE and alert.top_event.get("target"):
+                self.lookup.add_service_instance(alert.top_event["target"])
+            elif target_type == EventTargetType.TOPO and len((alert.top_event.get("target") or "").split("|")) == 2:
+                self.lookup.add_topo_node(*alert.top_event["target"].split("|"))
+        self.lookup.resolve()
+
     def enrich_alert(self, alert: Alert) -> Alert:
         target_type = alert.top_event.get("target_type")
 
@@ -128,7 +141,7 @@ class StandardTranslateEnricher(BaseAlertEnricher):
 
         if alert.top_event.get("bk_host_id") and "bk_host_id" in dimension_fields:
             bk_host_id = alert.top_event["bk_host_id"]
-            host = HostManager.get_by_id(bk_host_id)
+            host = self.lookup.get_host_by_id(bk_host_id)
             if host:
                 display_name = _("主机")
                 display_value = host.display_name
@@ -151,7 +164,7 @@ class StandardTranslateEnricher(BaseAlertEnricher):
 
     def enrich_service(self, alert: Alert):
         bk_service_instance_id = alert.top_event["target"]
-        instance = ServiceInstanceManager.get(bk_service_instance_id)
+        instance = self.lookup.get_service_instance(bk_service_instance_id)
         if not instance:
             alert.add_dimension(key="bk_service_instance_id", value=bk_service_instance_id, display_key=_("服务实例ID"))
         else:
@@ -165,7 +178,7 @@ class StandardTranslateEnricher(BaseAlertEnricher):
 
     def enrich_topo(self, alert: Alert):
         bk_obj_id, bk_inst_id = alert.top_event["target"].split("|")
-        node_info = TopoManager.get(bk_obj_id, bk_inst_id)
+        node_info = self.lookup.get_topo_node(bk_obj_id, bk_inst_id)
         if not node_info:
             alert.add_dimension(key="bk_topo_node", value=alert.top_event["target"], display_key=_("拓扑节点"))
         else:
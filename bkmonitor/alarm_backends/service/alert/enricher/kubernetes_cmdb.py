@@ -20,6 +20,7 @@ import settings
 from alarm_backends.core.alert import Alert
 from alarm_backends.core.cache.cmdb import HostIPManager, HostManager
 from alarm_backends.service.alert.enricher.base import BaseAlertEnricher
+from alarm_backends.service.alert.enricher.lookup import CMDBLookup
 from api.cmdb.define import Host
 from bkmonitor.utils.thread_backend import ThreadPool
 from core.drf_resource import api
@@ -32,9 +33,12 @@ class KubernetesCMDBEnricher(BaseAlertEnricher):
     kubernetes相关的告警补全IP信息
     """
 
-    def __init__(self, alerts: List[Alert]):
+    # 关联关系查询耗时较长，与其他丰富器并发执行
+    concurrent = True
+
+    def __init__(self, alerts: List[Alert], lookup: CMDBLookup = None):
         # 缓存准备，批量查询避免重复请求redis
-        super(KubernetesCMDBEnricher, self).__init__(alerts)
+        super(KubernetesCMDBEnricher, self).__init__(alerts, lookup)
         self.kubernetes_alerts = defaultdict(list)
         biz_source_info_list = defaultdict(list)
         self.biz_resource_info = {}
@@ -46,12 +50,13 @@ class KubernetesCMDBEnricher(BaseAlertEnricher):
         # 解析出告警ip对应的ip信息
         self.alert_relations = {}
         ips = self.get_node_ips()
-        # 根据ip获取对应的 ip + 云区域 的组合
-        self.ip_cache = HostIPManager.multi_get_with_dict(ips)
-
-        # 根据ip和云区域ID获取对应的主机列表（带业务特性）
+        # 根据ip获取对应的 ip + 云区域 的组合，以及对应的主机列表（带业务特性），与同批次的其他丰富器共享查询结果
+        for ip in ips:
+            self.lookup.add_ip(ip)
+        self.lookup.resolve()
+        self.ip_cache = {ip: self.lookup.ip_cache.get(ip) for ip in ips}
         hosts = {host for host in chain(*[ips for ips in self.ip_cache.values() if ips])}
-        self.hosts_cache = HostManager.multi_get_with_dict(hosts)
+        self.hosts_cache = {host: self.lookup.hosts_cache.get(host) for host in hosts}
 
         # 容器场景告警和主机创建时间相近，差量同步不存在主机避免缓存刷新不及时导致维度无法正常补充的问题
         try:
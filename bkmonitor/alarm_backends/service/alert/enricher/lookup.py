@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+from itertools import chain
+from typing import Dict, List, Optional
+
+from alarm_backends.core.cache.cmdb import (
+    HostIDManager,
+    HostIPManager,
+    HostManager,
+    ServiceInstanceManager,
+    TopoManager,
+)
+from api.cmdb.define import Host, ServiceInstance, TopoNode
+
+
+class CMDBLookup(object):
+    """
+    同一批事件/告警丰富过程中共享的 CMDB 缓存查询
+    各丰富器先登记需要的 key，再调用 resolve 对每类缓存进行一次批量查询，查询结果在本批次内复用
+    """
+
+    def __init__(self):
+        # resolve 串行执行，待查询的 key 由单独的锁保护，避免登记 key 时等待查询完成
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+
+        # 待查询的 key
+        self._pending_ips = set()
+        self._pending_host_keys = set()
+        self._pending_host_ids = set()
+        self._pending_service_instance_ids = set()
+        self._pending_topo_keys = set()
+
+        # ip -> [ip|bk_cloud_id]
+        self.ip_cache: Dict[str, Optional[List[str]]] = {}
+        # ip|bk_cloud_id -> Host
+        self.hosts_cache: Dict[str, Optional[Host]] = {}
+        # bk_host_id -> Host
+        self.host_id_cache: Dict[str, Optional[Host]] = {}
+        self.service_instance_cache: Dict[str, Optional[ServiceInstance]] = {}
+        self.topo_cache: Dict[str, Optional[TopoNode]] = {}
+
+    def add_ip(self, ip):
+        with self._pending_lock:
+            self._pending_ips.add(HostIPManager.key_to_internal_value(ip))
+
+    def add_host(self, ip, bk_cloud_id=0):
+        with self._pending_lock:
+            self._pending_host_keys.add(HostManager.key_to_internal_value(ip, bk_cloud_id))
+
+    def add_host_id(self, bk_host_id):
+        with self._pending_lock:
+            self._pending_host_ids.add(str(bk_host_id))
+
+    def add_service_instance(self, service_instance_id):
+        with self._pending_lock:
+            self._pending_service_instance_ids.add(ServiceInstanceManager.key_to_internal_value(service_instance_id))
+
+    def add_topo_node(self, bk_obj_id, bk_inst_id):
+        with self._pending_lock:
+            self._pending_topo_keys.add(TopoManager.key_to_internal_value(bk_obj_id, bk_inst_id))
+
+    def _add_host_keys(self, host_keys):
+        with self._pending_lock:
+            self._pending_host_keys.update(host_keys)
+
+    def _pop_pending(self, name: str, cache: dict) -> list:
+        """
+        取出待查询的 key，持锁时整体替换为新的集合，期间登记的 key 留到下次查询
+        """
+        with self._pending_lock:
+            pending = getattr(self, name)
+            setattr(self, name, set())
+        return [key for key in pending if key not in cache]
+
+    def resolve(self):
+        """
+        批量查询已登记的 key，已查询过的 key 不再重复查询
+        """
+        with self._lock:
+            ips = self._pop_pending("_pending_ips", self.ip_cache)
+            if ips:
+                self.ip_cache.update(HostIPManager.multi_get_with_dict(ips))
+                # 加上从 ip_cache 拿到的主机
+                self._add_host_keys(chain(*[self.ip_cache.get(ip) or [] for ip in ips]))
+
+            host_ids = self._pop_pending("_pending_host_ids", self.host_id_cache)
+            host_id_keys = {}
+            if host_ids:
+                # 主机缓存中同时以 bk_host_id 为 key 保存了主机信息，获取不到时再通过 ip|bk_cloud_id 获取
+                hosts = HostManager.multi_get_with_dict(host_ids)
+                for bk_host_id in host_ids:
+                    self.host_id_cache[bk_host_id] = hosts.get(bk_host_id)
+                missing_host_ids = [bk_host_id for bk_host_id in host_ids if not self.host_id_cache[bk_host_id]]
+                if missing_host_ids:
+                    host_id_keys = {
+                        bk_host_id: host_key
+                        for bk_host_id, host_key in HostIDManager.multi_get_with_dict(missing_host_ids).items()
+                        if host_key
+                    }
+                    self._add_host_keys(host_id_keys.values())
+
+            host_keys = self._pop_pending("_pending_host_keys", self.hosts_cache)
+            if host_keys:
+                self.hosts_cache.update(HostManager.multi_get_with_dict(host_keys))
+            for bk_host_id, host_key in host_id_keys.items():
+                self.host_id_cache[bk_host_id] = self.hosts_cache.get(host_key)
+
+            service_instance_ids = self._pop_pending("_pending_service_instance_ids", self.service_instance_cache)
+            if service_instance_ids:
+                self.service_instance_cache.update(ServiceInstanceManager.multi_get_with_dict(service_instance_ids))
+
+            topo_keys = self._pop_pending("_pending_topo_keys", self.topo_cache)
+            if topo_keys:
+                self.topo_cache.update(TopoManager.multi_get_with_dict(topo_keys))
+
+    def get_host_by_ip(self, ip) -> List[Host]:
+        keys = self.ip_cache.get(HostIPManager.key_to_internal_value(ip)) or []
+        return [self.hosts_cache[key] for key in keys if self.hosts_cache.get(key)]
+
+    def get_host(self, ip, bk_cloud_id=0) -> Optional[Host]:
+        return self.hosts_cache.get(HostManager.key_to_internal_value(ip, bk_cloud_id))
+
+    def get_host_by_id(self, bk_host_id) -> Optional[Host]:
+        return self.host_id_cache.get(str(bk_host_id))
+
+    def get_service_instance(self, service_instance_id) -> Optional[ServiceInstance]:
+        return self.service_instance_cache.get(ServiceInstanceManager.key_to_internal_value(service_instance_id))
+
+    def get_topo_node(self, bk_obj_id, bk_inst_id) -> Optional[TopoNode]:
+        return self.topo_cache.get(TopoManager.key_to_internal_value(bk_obj_id, bk_inst_id))
@@ -25,7 +25,11 @@ from alarm_backends.core.cache.key import (
 )
 from alarm_backends.core.cluster import get_cluster
 from alarm_backends.core.handlers import base
-from alarm_backends.management.hashring import HashRing
+from alarm_backends.core.kafka_partition import (
+    PartitionAssigner,
+    PartitionLoadReporter,
+    get_partition_key,
+)
 from alarm_backends.management.utils import get_host_addr
 from alarm_backends.service.alert.builder.tasks import run_alert_builder
 from bkmonitor.models import EventPluginInstance
@@ -57,6 +61,7 @@ class AlertHandler(base.BaseHandler):
     MAX_RETRIEVE_NUMBER = 5000
     MAX_EVENT_NUMBER = 500
     MAX_POLLER_THREAD = 20
+    PARTITION_SERVICE = "alert.poller"
     _kafka_queues = {}
 
     def __init__(self, service, *args, **kwargs):
@@ -72,6 +77,9 @@ class AlertHandler(base.BaseHandler):
         self.data_id_cache_key = ALERT_HOST_DATA_ID_KEY.get_key()
         self.leader_key = ALERT_DATA_POLLER_LEADER_KEY.get_key()
         self.consumers_lock = threading.Lock()
+        # 分区负载统计及分配
+        self.partition_load_reporter = PartitionLoadReporter(self.PARTITION_SERVICE)
+        self.partition_assigner = PartitionAssigner(self.PARTITION_SERVICE)
 
     def _stop(self, *args, **kwargs):
         self._stop_signal = True
@@ -221,12 +229,20 @@ class AlertHandler(base.BaseHandler):
                     # 一般没有获取到hosts， 可能是consul服务有问题, 暂时等待一下
                     time.sleep(15)
                 else:
-                    hash_ring = HashRing({host: 1 for host in hosts})
-                    host_kfk_info = defaultdict(list)
+                    partition_infos = {}
+                    load_keys = {}
                     for data_id, kfk_info in plugin_kafka_configs.items():
                         for partition_info in kfk_info:
-                            host = hash_ring.get_node(f"{data_id}|{partition_info['partition']}")
-                            host_kfk_info[host].append(partition_info)
+                            partition = f"{data_id}|{partition_info['partition']}"
+                            partition_infos[partition] = partition_info
+                            load_keys[partition] = get_partition_key(
+                                partition_info["bootstrap_server"], partition_info["topic"], partition_info["partition"]
+                            )
+                    host_kfk_info = defaultdict(list)
+                    for host, partitions in self.partition_assigner.assign(
+                        list(partition_infos), hosts, load_keys
+                    ).items():
+                        host_kfk_info[host].extend(partition_infos[partition] for partition in partitions)
 
                     # 将data_id分配信息写入redis
                     pipeline = self.redis_client.pipeline()
@@ -335,6 +351,8 @@ class AlertHandler(base.BaseHandler):
                 self.consumers_lock.release()
             else:
                 logger.info("[run_consumer_manager] comsumers have not changed, %s", len(list(self.consumers.values())))
+
+            self.report_partition_load()
             if self._stop_signal:
                 self.consumers_lock.acquire()
                 logger.info("[run_consumer_manager] got stop signal")
@@ -346,6 +364,23 @@ class AlertHandler(base.BaseHandler):
                 break
             time.sleep(15)
 
+    def report_partition_load(self):
+        """
+        上报当前消费的各分区负载
+        """
+        if not self.partition_load_reporter.is_due():
+            return
+
+        with self.consumers_lock:
+            lags = {
+                bootstrap_server: self.partition_load_reporter.get_lags(consumer)
+                for bootstrap_server, consumer in self.consumers.items()
+            }
+        try:
+            self.partition_load_reporter.report(lags)
+        except Exception as e:
+            logger.warning("[run_consumer_manager] report partition load error: %s", e)
+
     @staticmethod
     def close_consumer(consumer):
         consumer.commit()
@@ -369,8 +404,9 @@ class AlertHandler(base.BaseHandler):
                 has_record = True
                 events = []
 
-                for records in list(data.values()):
+                for tp, records in data.items():
                     events.extend(records)
+                    self.partition_load_reporter.incr(bootstrap_server, tp.topic, tp.partition, len(records))
                 self.push_handle_task(consumer.config['bootstrap_servers'], events)
                 logger.info(
                     "[run_poller]  alert event poller poll %s: count(%s)",
@@ -18,6 +18,7 @@ from django.utils.translation import ugettext as _
 
 from alarm_backends.constants import CONST_MINUTES
 from alarm_backends.core.alert import Alert
+from alarm_backends.core.alert.snapshot import decode_alert, decode_reference
 from alarm_backends.core.cache.cmdb import HostManager, ServiceInstanceManager
 from alarm_backends.core.cache.key import (
     ALERT_DEDUPE_CONTENT_KEY,
@@ -199,7 +200,8 @@ class CloseStatusChecker(BaseChecker):
             ALERT_DEDUPE_CONTENT_KEY.get_key(strategy_id=alert.strategy_id or 0, dedupe_md5=alert.dedupe_md5)
         )
         try:
-            current_alert = json.loads(current_alert_data)
+            # 只需要比较告警ID，引用格式无需再获取快照内容
+            current_alert = decode_reference(current_alert_data) or decode_alert(current_alert_data)
             current_alert = Alert(current_alert)
         except Exception:
             # 如果从缓存中获取不到告警，表示当前告警应该为最新的告警信息，默认不做关闭
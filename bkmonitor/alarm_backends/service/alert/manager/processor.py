@@ -9,11 +9,18 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import logging
-from typing import List
+from typing import Dict, List
 
 from alarm_backends.core.alert import Alert, Event
-from alarm_backends.core.alert.alert import AlertKey
-from alarm_backends.core.cache.key import ALERT_UPDATE_LOCK
+from alarm_backends.core.alert.alert import AlertCache, AlertKey
+from alarm_backends.core.alert.snapshot import decode_alert
+from alarm_backends.core.alert.version import (
+    ALERT_UPDATE_BACKEND_CAS,
+    ALERT_UPDATE_BACKEND_LOCK,
+    get_versions,
+    use_cas,
+)
+from alarm_backends.core.cache.key import ALERT_SNAPSHOT_KEY, ALERT_UPDATE_LOCK
 from alarm_backends.core.lock.service_lock import multi_service_lock
 from alarm_backends.service.alert.manager.checker.ack import AckChecker
 from alarm_backends.service.alert.manager.checker.action import ActionHandleChecker
@@ -44,42 +51,68 @@ class AlertManager(BaseAlertProcessor):
         super(AlertManager, self).__init__()
         self.logger = logging.getLogger("alert.manager")
         self.alert_keys = alert_keys
+        self.alert_docs = {}
+
+    # 用户修改字段，这些字段只有在ES是最准的，需要刷进去
+    USER_FIELDS = [
+        "id",
+        "assignee",
+        "is_handled",
+        "handle_stage",
+        "is_ack",
+        "is_ack_noticed",
+        "ack_operator",
+        "appointee",
+        "supervisor",
+        "extra_info",
+    ]
 
     def fetch_alerts(self) -> List[Alert]:
         # 1. 根据告警ID，从ES拉出数据
         alerts = Alert.mget(self.alert_keys)
 
-        # 2. 补充用户修改字段，这些字段只有在ES是最准的，需要刷进去
-        fields = [
-            "id",
-            "assignee",
-            "is_handled",
-            "handle_stage",
-            "is_ack",
-            "is_ack_noticed",
-            "ack_operator",
-            "appointee",
-            "supervisor",
-            "extra_info",
-        ]
-        alert_docs = {
+        # 2. 补充用户修改字段
+        self.alert_docs = {
             alert_doc.id: alert_doc
             for alert_doc in AlertDocument.mget(
                 ids=[alert.id for alert in alerts],
-                fields=fields,
+                fields=self.USER_FIELDS,
             )
         }
+        self.fill_user_fields(alerts)
+        return alerts
+
+    def fill_user_fields(self, alerts: List[Alert]):
         for alert in alerts:
-            if alert.id in alert_docs:
-                for field in fields:
+            if alert.id in self.alert_docs:
+                for field in self.USER_FIELDS:
                     if field == "extra_info":
                         # 以DB为主，同时合并check阶段新增内容
-                        extra_info = getattr(alert_docs[alert.id], field, None)
+                        extra_info = getattr(self.alert_docs[alert.id], field, None)
                         alert.data[field] = alert.data.get(field) or {}
                         alert.data[field].update(extra_info.to_dict() if extra_info else {})
                     else:
-                        alert.data[field] = getattr(alert_docs[alert.id], field, None)
-        return alerts
+                        alert.data[field] = getattr(self.alert_docs[alert.id], field, None)
+
+    def refresh_alerts(self, alerts: List[Alert]) -> List[Alert]:
+        """
+        重新读取告警快照，用户修改字段沿用已拉取的结果，不再查询ES
+        快照不存在的告警沿用已拉取的告警
+        """
+        pipeline = ALERT_SNAPSHOT_KEY.client.pipeline(transaction=False)
+        for alert in alerts:
+            pipeline.get(alert.key.get_snapshot_key())
+
+        refreshed_alerts = []
+        for alert, alert_json in zip(alerts, pipeline.execute()):
+            if alert_json:
+                try:
+                    alert = Alert(decode_alert(alert_json))
+                except Exception as e:
+                    self.logger.warning("load alert failed: %s, origin data: %s", e, alert_json)
+            refreshed_alerts.append(alert)
+        self.fill_user_fields(refreshed_alerts)
+        return refreshed_alerts
 
     def process(self):
         """
@@ -88,9 +121,65 @@ class AlertManager(BaseAlertProcessor):
         alerts = self.fetch_alerts()
         dedupe_md5_list = [alert.dedupe_md5 for alert in alerts]
 
+        # 缓存及ES中均已不存在的告警，需要从调度索引中移除
+        fetched_alert_ids = {alert.id for alert in alerts}
+        missing_keys = [alert_key for alert_key in self.alert_keys if alert_key.alert_id not in fetched_alert_ids]
+
         if not dedupe_md5_list:
+            self.update_active_index([], missing_keys)
             return
 
+        if use_cas():
+            saved_alerts, alerts_to_update_directly = self.process_with_version(alerts)
+        else:
+            saved_alerts, alerts_to_update_directly = self.process_with_lock(alerts)
+
+        # 5. 保存流水日志
+        self.save_alert_logs(saved_alerts)
+
+        # 6. 发送信号
+        self.send_signal(saved_alerts)
+
+        # 7. 指标上报
+        for alert in saved_alerts:
+            metrics.ALERT_MANAGE_PUSH_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG, signal=alert.status).inc()
+
+        # #### 需要检测的告警，处理结束
+
+        if alerts_to_update_directly:
+            # 某些情况下，会存在snapshot的告警处于终结状态，而 DB 的并没有，此时需要刷一波进DB
+            self.logger.info("%s alerts with wrong status, will update db directly", len(alerts_to_update_directly))
+            self.save_alerts(alerts_to_update_directly, action=BulkActionType.UPSERT, force_save=True)
+
+        # 8. 更新异常告警调度索引，已结束的告警不再调度
+        self.update_active_index(saved_alerts + alerts_to_update_directly, missing_keys)
+
+    @staticmethod
+    def split_alerts(alerts: List[Alert]):
+        """
+        区分需要检测的异常告警，以及快照已结束需要直接刷新DB的告警
+        """
+        alerts_to_check = []
+        alerts_to_update_directly = []
+        for alert in alerts:
+            if alert.is_abnormal():
+                alerts_to_check.append(alert)
+            else:
+                alerts_to_update_directly.append(alert)
+        return alerts_to_check, alerts_to_update_directly
+
+    @staticmethod
+    def report_update_result(dedupe_md5_list: List[str], backend: str, result: str):
+        if dedupe_md5_list:
+            metrics.ALERT_UPDATE_DIMENSION_COUNT.labels(module="manager", backend=backend, result=result).inc(
+                len(set(dedupe_md5_list))
+            )
+
+    def process_with_lock(self, alerts: List[Alert]):
+        """
+        按维度加锁后处理告警
+        """
+        dedupe_md5_list = [alert.dedupe_md5 for alert in alerts]
         lock_keys = [ALERT_UPDATE_LOCK.get_key(dedupe_md5=dedupe_md5) for dedupe_md5 in dedupe_md5_list]
 
         with multi_service_lock(ALERT_UPDATE_LOCK, lock_keys) as lock:
@@ -101,15 +190,12 @@ class AlertManager(BaseAlertProcessor):
                     success_locked_dimensions.append(dedupe_md5)
                 else:
                     fail_locked_dimensions.append(dedupe_md5)
+            self.report_update_result(success_locked_dimensions, ALERT_UPDATE_BACKEND_LOCK, "success")
+            self.report_update_result(fail_locked_dimensions, ALERT_UPDATE_BACKEND_LOCK, "lock_failed")
+
             # 加锁成功的告警，才会开始处理
             locked_alerts = [alert for alert in alerts if alert.dedupe_md5 in success_locked_dimensions]
-            alerts_to_check = []
-            alerts_to_update_directly = []
-            for alert in locked_alerts:
-                if alert.is_abnormal():
-                    alerts_to_check.append(alert)
-                else:
-                    alerts_to_update_directly.append(alert)
+            alerts_to_check, alerts_to_update_directly = self.split_alerts(locked_alerts)
 
             alerts_to_check = self.handle(alerts_to_check)
 
@@ -124,24 +210,24 @@ class AlertManager(BaseAlertProcessor):
             # 4. 保存告警到ES
             saved_alerts = self.save_alerts(alerts_to_check, action=BulkActionType.UPSERT, force_save=True)
 
-        # 5. 保存流水日志
-        self.save_alert_logs(saved_alerts)
-
-        # 6. 发送信号
-        self.send_signal(saved_alerts)
+        return saved_alerts, alerts_to_update_directly
 
-        # 7. 指标上报
-        for alert in saved_alerts:
-            metrics.ALERT_MANAGE_PUSH_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG, signal=alert.status).inc()
+    def process_with_version(self, alerts: List[Alert]):
+        """
+        不加锁处理告警，以维度版本号比较写入缓存，版本冲突的告警不保存，等下一轮的周期检测即可
+        """
+        # 版本号需要在读取告警前获取，因此获取版本号后重新读取一次快照，期间告警被其他进程更新时才能识别出冲突
+        versions = get_versions((alert.strategy_id, alert.dedupe_md5) for alert in alerts)
+        alerts = self.refresh_alerts(alerts)
+        alerts_to_check, alerts_to_update_directly = self.split_alerts(alerts)
 
-        # #### 需要检测的告警，处理结束
+        alerts_to_check = self.handle(alerts_to_check, versions)
 
-        if alerts_to_update_directly:
-            # 某些情况下，会存在snapshot的告警处于终结状态，而 DB 的并没有，此时需要刷一波进DB
-            self.logger.info("%s alerts with wrong status, will update db directly", len(alerts_to_update_directly))
-            self.save_alerts(alerts_to_update_directly, action=BulkActionType.UPSERT, force_save=True)
+        # 4. 保存告警到ES
+        saved_alerts = self.save_alerts(alerts_to_check, action=BulkActionType.UPSERT, force_save=True)
+        return saved_alerts, alerts_to_update_directly
 
-    def handle(self, alerts: List[Alert]):
+    def handle(self, alerts: List[Alert], versions: Dict[str, int] = None):
         # #### 需要检测的告警，处理开始
         # 2. 再处理 DB 和 Redis 缓存中存在的告警
         for checker_cls in INSTALLED_CHECKERS:
@@ -153,6 +239,9 @@ class AlertManager(BaseAlertProcessor):
             [Event(data=alert.top_event, do_clean=False) for alert in alerts]
         )
         active_alerts_mapping = {alert.dedupe_md5: alert.id for alert in active_alerts}
+        if versions is not None:
+            return self.compare_and_save_alerts(alerts, versions, active_alerts_mapping)
+
         self.update_alert_cache(
             [
                 alert
@@ -164,3 +253,33 @@ class AlertManager(BaseAlertProcessor):
         self.update_alert_snapshot(alerts)
 
         return alerts
+
+    def compare_and_save_alerts(self, alerts: List[Alert], versions: Dict[str, int], active_alerts_mapping: dict):
+        """
+        以维度版本号比较写入缓存及快照，返回未冲突的告警
+        """
+        snapshot_only_ids = {
+            alert.id
+            for alert in alerts
+            if alert.dedupe_md5 in active_alerts_mapping and active_alerts_mapping[alert.dedupe_md5] != alert.id
+        }
+        conflicted_dimensions = AlertCache.compare_and_save_alerts(alerts, versions, snapshot_only_ids)
+        dedupe_md5_list = [alert.dedupe_md5 for alert in alerts]
+        self.report_update_result(
+            [dedupe_md5 for dedupe_md5 in dedupe_md5_list if dedupe_md5 not in conflicted_dimensions],
+            ALERT_UPDATE_BACKEND_CAS,
+            "success",
+        )
+        self.report_update_result(
+            [dedupe_md5 for dedupe_md5 in dedupe_md5_list if dedupe_md5 in conflicted_dimensions],
+            ALERT_UPDATE_BACKEND_CAS,
+            "conflict",
+        )
+        if conflicted_dimensions:
+            # 对版本冲突的告警，不进行保存，等下一轮的周期检测即可
+            self.logger.info(
+                "%s alerts is conflicted, will try later: %s",
+                len(conflicted_dimensions),
+                ",".join(conflicted_dimensions),
+            )
+        return [alert for alert in alerts if alert.dedupe_md5 not in conflicted_dimensions]
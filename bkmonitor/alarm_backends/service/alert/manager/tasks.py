@@ -13,10 +13,15 @@ import time
 from typing import Dict, List
 
 from celery.task import task
+from django.conf import settings
 from elasticsearch.helpers import BulkIndexError
 from elasticsearch_dsl import Q
 
 from alarm_backends.constants import CONST_ONE_DAY, CONST_ONE_HOUR
+from alarm_backends.core.alert.active_index import (
+    ALERT_CHECK_BACKEND_INDEX,
+    ActiveAlertIndex,
+)
 from alarm_backends.core.alert.alert import Alert, AlertCache, AlertKey
 from alarm_backends.core.cache.strategy import StrategyCacheManager
 from alarm_backends.core.cluster import get_cluster_bk_biz_ids
@@ -38,6 +43,47 @@ def check_abnormal_alert():
     """
     拉取异常告警，对这些告警进行状态管理
     """
+    if settings.ALERT_CHECK_BACKEND == ALERT_CHECK_BACKEND_INDEX:
+        index = ActiveAlertIndex()
+        if index.size():
+            # 从调度索引中取出到期的告警，不再全量 scan ES
+            alert_keys = index.pop_due()
+            send_check_task(
+                [{"id": alert_key.alert_id, "strategy_id": alert_key.strategy_id} for alert_key in alert_keys]
+            )
+            return
+
+        # 索引为空时(如刚切换)，从 ES 全量拉取并初始化索引
+        scan_start_time = int(time.time())
+        alerts = scan_abnormal_alerts()
+        index.reconcile(
+            [AlertKey(alert_id=alert["id"], strategy_id=alert["strategy_id"]) for alert in alerts], scan_start_time
+        )
+    else:
+        alerts = scan_abnormal_alerts()
+
+    send_check_task(alerts)
+
+
+def reconcile_active_alert_index():
+    """
+    根据 ES 中的异常告警校正调度索引
+    """
+    if settings.ALERT_CHECK_BACKEND != ALERT_CHECK_BACKEND_INDEX:
+        return
+
+    scan_start_time = int(time.time())
+    alerts = scan_abnormal_alerts()
+    stale_count = ActiveAlertIndex().reconcile(
+        [AlertKey(alert_id=alert["id"], strategy_id=alert["strategy_id"]) for alert in alerts], scan_start_time
+    )
+    logger.info("[reconcile_active_alert_index] abnormal alerts(%s), stale(%s)", len(alerts), stale_count)
+
+
+def scan_abnormal_alerts() -> List[Dict]:
+    """
+    从 ES 全量拉取集群内未被流控的异常告警
+    """
     search = (
         AlertDocument.search(all_indices=True)
         .filter(Q("term", status=EventStatus.ABNORMAL) & ~Q('term', is_blocked=True))
@@ -56,8 +102,7 @@ def check_abnormal_alert():
         if hit.event.bk_biz_id not in cluster_bk_biz_ids:
             continue
         alerts.append({"id": hit.id, "strategy_id": getattr(hit, "strategy_id", None)})
-
-    send_check_task(alerts)
+    return alerts
 
 
 def check_blocked_alert():
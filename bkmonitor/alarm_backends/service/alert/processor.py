@@ -14,10 +14,16 @@ import time
 from collections import defaultdict
 from typing import List
 
+from django.conf import settings
 from elasticsearch.helpers import BulkIndexError
 
 from alarm_backends.core.alert import Alert, Event
-from alarm_backends.core.alert.alert import AlertCache
+from alarm_backends.core.alert.active_index import (
+    ALERT_CHECK_BACKEND_INDEX,
+    ActiveAlertIndex,
+)
+from alarm_backends.core.alert.alert import AlertCache, AlertKey
+from alarm_backends.core.alert.snapshot import decode_alert, decode_reference
 from alarm_backends.core.cache.key import ALERT_CONTENT_KEY, ALERT_DEDUPE_CONTENT_KEY
 from alarm_backends.service.composite.tasks import check_action_and_composite
 from bkmonitor.documents import AlertDocument, AlertLog
@@ -87,6 +93,7 @@ class BaseAlertProcessor:
 
         # 对告警内容进行解析，记录在 mapping 中
         not_existed_dedupe_md5_list = []
+        references = []
         for index, alert in enumerate(alert_data):
             if not alert:
                 # 不存在的先记录下
@@ -95,10 +102,16 @@ class BaseAlertProcessor:
 
             dedupe_md5 = dedupe_md5_list[index]
             try:
-                alert = json.loads(alert)
+                reference = decode_reference(alert)
+                if reference:
+                    # 引用格式的告警内容需要再从快照中获取
+                    references.append(reference)
+                    continue
+                alert = decode_alert(alert)
                 alerts.append(Alert(alert))
             except Exception as e:
                 self.logger.warning("dedupe_md5(%s) loads alert failed: %s, origin data: %s", dedupe_md5, e, alert)
+        alerts.extend(Alert.mget_by_references(references))
         if not_existed_dedupe_md5_list:
             # 对于无法找到的告警列表，则通过原来的key进行检索
             # 这种情况主要是针对切换过程中，旧的数据保存在原来的redis key里
@@ -121,6 +134,18 @@ class BaseAlertProcessor:
         snapshot_count = AlertCache.save_alert_snapshot(alerts)
         self.logger.info("update alert snapshot: %s", snapshot_count)
 
+    def update_active_index(self, alerts: List[Alert], removed_keys: List[AlertKey] = None):
+        """
+        更新异常告警调度索引
+        :param alerts: 需要根据状态更新索引的告警
+        :param removed_keys: 需要直接从索引中移除的告警
+        """
+        if settings.ALERT_CHECK_BACKEND != ALERT_CHECK_BACKEND_INDEX:
+            return
+        index = ActiveAlertIndex()
+        index.update(alerts)
+        index.remove(removed_keys or [])
+
     def save_alerts(self, alerts: List[Alert], action=BulkActionType.INDEX, force_save=False) -> List[Alert]:
         """
         将告警信息保存到 ES
@@ -57,6 +57,7 @@ class CompositeProcessor:
         self.actions = []
         self.events = []
         self._strategy_cache = {}
+        self._event_flatten_dict = None
 
     def pull(self):
         if not self.strategy_ids:
@@ -294,8 +295,12 @@ class CompositeProcessor:
 
         agg_condition = query_config.get("agg_condition", [])
 
+        if self._event_flatten_dict is None:
+            # 同一告警匹配多个查询配置时，只展开一次事件
+            self._event_flatten_dict = self.event.to_flatten_dict()
+
         condition = gen_condition_matcher(agg_condition)
-        return condition.is_match(self.event.to_flatten_dict())
+        return condition.is_match(self._event_flatten_dict)
 
     @classmethod
     def cal_public_dimensions(cls, strategy):
@@ -334,49 +339,47 @@ class CompositeProcessor:
         # 每个别名所关联的告警对象
         alert_by_alias = {}
 
+        # 各查询配置的检测结果缓存在同一个 pipeline 中读写，读取异常告警数的命令放在最后
+        pipeline = COMPOSITE_CHECK_RESULT.client.pipeline(transaction=False)
+        count_keys = []
+
         # 1. 对于匹配的item，直接注入到表达式上下文
         for query_config_id, config in matched_configs.items():
             cache_key = COMPOSITE_CHECK_RESULT.get_key(
                 strategy_id=strategy["id"], dimension_hash=dimension_hash, query_config_id=query_config_id
             )
             # 清理过期的 item
-            COMPOSITE_CHECK_RESULT.client.zremrangebyscore(cache_key, 0, check_start_time - COMPOSITE_CHECK_RESULT.ttl)
+            pipeline.zremrangebyscore(cache_key, 0, check_start_time - COMPOSITE_CHECK_RESULT.ttl)
             if self.alert_status == EventStatus.ABNORMAL:
                 # 如果是异常告警，则一定是触发的
-                COMPOSITE_CHECK_RESULT.client.zadd(cache_key, {self.alert.id: self.alert.update_time})
-                check_result = AlertExpressionValue.ABNORMAL
+                pipeline.zadd(cache_key, {self.alert.id: self.alert.update_time})
+                alert_by_alias[config["alias"]] = AlertExpressionValue.ABNORMAL
             else:
                 # 如果不是异常告警，则还要看检测结果缓存中是否还有其他异常告警
                 # 当没有其他告警时，当前配置才会被认为是不满足，否则就仍为异常
-                COMPOSITE_CHECK_RESULT.client.zrem(cache_key, self.alert.id)
-                abnormal_count = COMPOSITE_CHECK_RESULT.client.zcount(cache_key, check_start_time, "+inf")
-                if abnormal_count:
-                    check_result = AlertExpressionValue.ABNORMAL
-                else:
-                    check_result = AlertExpressionValue.NORMAL
-
-            alert_by_alias[config["alias"]] = check_result
+                pipeline.zrem(cache_key, self.alert.id)
+                count_keys.append((config["alias"], cache_key))
 
             # 更新过期时间
-            COMPOSITE_CHECK_RESULT.expire(
-                strategy_id=strategy["id"], dimension_hash=dimension_hash, query_config_id=query_config_id
-            )
+            pipeline.expire(cache_key, COMPOSITE_CHECK_RESULT.ttl)
 
         # 2. 没匹配到的item，需要到缓存中查询，获取计算结果后再注入到表达式上下文
-        query_config_id_list = []
         for query_config_id, config in unmatched_configs.items():
             cache_key = COMPOSITE_CHECK_RESULT.get_key(
                 strategy_id=strategy["id"], dimension_hash=dimension_hash, query_config_id=query_config_id
             )
-            abnormal_count = COMPOSITE_CHECK_RESULT.client.zcount(cache_key, check_start_time, "+inf")
-            if abnormal_count:
-                check_result = AlertExpressionValue.ABNORMAL
-            else:
-                check_result = AlertExpressionValue.NORMAL
+            count_keys.append((config["alias"], cache_key))
 
-            alert_by_alias[config["alias"]] = check_result
+        for alias, cache_key in count_keys:
+            pipeline.zcount(cache_key, check_start_time, "+inf")
 
-            query_config_id_list.append(query_config_id)
+        results = pipeline.execute()
+        abnormal_counts = results[len(results) - len(count_keys) :]
+        for (alias, cache_key), abnormal_count in zip(count_keys, abnormal_counts):
+            if abnormal_count:
+                alert_by_alias[alias] = AlertExpressionValue.ABNORMAL
+            else:
+                alert_by_alias[alias] = AlertExpressionValue.NORMAL
 
         return alert_by_alias
 
@@ -454,16 +457,19 @@ class CompositeProcessor:
 
         return abnormal_level, is_closed, detect_result_by_level
 
-    def process_composite_strategy(self, strategy):
+    def process_composite_strategy(self, strategy, matched_configs=None, unmatched_configs=None):
         """
         关联告警：对单个策略进行检测
+        :param matched_configs: 已计算的匹配的查询配置，为空时重新计算
+        :param unmatched_configs: 已计算的不匹配的查询配置
         :return: 二元组，触发配置(detect), 关联的告警ID列表
         """
         if not strategy["detects"]:
             # 没有检测算法，直接退出
             return
 
-        matched_configs, unmatched_configs = self.cal_match_query_configs(strategy)
+        if matched_configs is None:
+            matched_configs, unmatched_configs = self.cal_match_query_configs(strategy)
 
         # 如果任何 id 都不匹配，那么直接退出
         if not matched_configs:
@@ -740,8 +746,16 @@ class CompositeProcessor:
         if not self.is_composite_strategy() and not self.alert.is_no_data():
             self.pull()
             for strategy in self.strategies:
+                if not strategy["detects"]:
+                    continue
+
+                # 先匹配查询配置，只有可能命中的策略才需要判断告警时间及读取检测结果缓存
+                matched_configs, unmatched_configs = self.cal_match_query_configs(strategy)
+                if not matched_configs:
+                    continue
+
                 in_alarm_time, message = Strategy(strategy["id"], strategy).in_alarm_time()
                 if not in_alarm_time:
                     logger.info("[composite] strategy(%s) not in alarm time: %s, skipped", strategy["id"], message)
                     continue
-                self.process_composite_strategy(strategy)
+                self.process_composite_strategy(strategy, matched_configs, unmatched_configs)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+"""
+批量收敛
+同一批推送的处理动作按收敛配置分组(每组至多 CONVERGE_BATCH_SIZE 个)，由一个任务依次收敛：
+1. 批量查询收敛对象及各收敛维度已存在的收敛实例
+2. 各收敛对象的维度交集通过 lua 脚本在 redis 中计算，整批共用一个 pipeline
+3. 收敛过程中新建或结束的收敛实例更新到批次缓存中，同一维度的后续收敛对象直接使用
+异常的收敛对象与单个收敛一样，单独重新推送至收敛队列
+"""
+
+import logging
+import time
+from copy import deepcopy
+
+from alarm_backends.service.converge.dimension import DimensionHandler
+from alarm_backends.service.converge.processor import (
+    ConvergeLockError,
+    ConvergeProcessor,
+)
+from alarm_backends.service.converge.tasks import report_converge_result, retry_converge
+from bkmonitor.models.fta.action import ConvergeInstance
+from constants.action import ConvergeType
+from core.prometheus import metrics
+
+logger = logging.getLogger("fta_action.converge")
+
+
+class ConvergeBatchContext(object):
+    """
+    批量收敛共享的收敛实例及维度匹配结果
+    """
+
+    def __init__(self):
+        # 收敛维度 -> 收敛实例，不存在时为 None
+        self.converge_instances = {}
+        # (收敛对象类型, 收敛对象ID) -> 维度匹配结果
+        self.related_ids = {}
+
+    def prefetch(self, processors):
+        """
+        预先查询收敛实例并计算维度匹配结果
+        """
+        processors = [processor for processor in processors if not processor.is_illegal]
+        if not processors:
+            return
+
+        dimensions = {processor.dimension for processor in processors}
+        for converge_instance in ConvergeInstance.objects.filter(dimension__in=dimensions).order_by("id"):
+            self.converge_instances.setdefault(converge_instance.dimension, converge_instance)
+        for dimension in dimensions:
+            self.converge_instances.setdefault(dimension, None)
+
+        handlers = [processor.get_dimension_handler() for processor in processors]
+        for processor, related_ids in zip(processors, DimensionHandler.batch_get_by_condition(handlers)):
+            self.related_ids[(processor.instance_type, processor.instance_id)] = related_ids
+
+    def get_converge_instance(self, dimension):
+        if dimension not in self.converge_instances:
+            self.converge_instances[dimension] = ConvergeInstance.objects.filter(dimension=dimension).first()
+        return self.converge_instances[dimension]
+
+    def get_related_ids(self, instance_type, instance_id):
+        """
+        获取预先计算的维度匹配结果，只使用一次，不存在时返回 None
+        """
+        return self.related_ids.pop((instance_type, instance_id), None)
+
+
+class BatchConvergeProcessor(object):
+    def __init__(self, converge_config, instances, instance_type=ConvergeType.ACTION):
+        """
+        :param converge_config: 收敛配置
+        :param instances: 收敛对象列表 [{"id": 收敛对象id, "converge_context": 收敛上下文, "alerts": 告警快照}]
+        :param instance_type: 收敛对象类型
+        """
+        self.converge_config = converge_config
+        self.instances = sorted(instances, key=lambda item: item["id"])
+        self.instance_type = instance_type
+        self.context = ConvergeBatchContext()
+
+    def get_instance_models(self):
+        instance_model = ConvergeProcessor.InstanceModel[self.instance_type]
+        instance_ids = [item["id"] for item in self.instances]
+        return {instance.id: instance for instance in instance_model.objects.filter(id__in=instance_ids)}
+
+    def converge(self):
+        """
+        :return: 完成收敛的对象数量
+        """
+        try:
+            instance_models = self.get_instance_models()
+        except Exception as error:
+            logger.exception("[batch converge] get %s instances failed: %s", self.instance_type, error)
+            instance_models = {}
+
+        processors = []
+        for item in self.instances:
+            start_time = time.time()
+            try:
+                # 收敛过程中会修改收敛配置，每个收敛对象使用单独的副本
+                processor = ConvergeProcessor(
+                    deepcopy(self.converge_config),
+                    item["id"],
+                    self.instance_type,
+                    item.get("converge_context"),
+                    item.get("alerts"),
+                    instance=instance_models.get(item["id"]),
+                    batch_context=self.context,
+                )
+            except Exception as error:
+                logger.exception("execute converge %s, %s error: %s", self.instance_type, item["id"], error)
+                self.retry(item)
+                report_converge_result(0, self.instance_type, start_time, error)
+                continue
+            processors.append((item, processor))
+
+        try:
+            self.context.prefetch([processor for _, processor in processors])
+        except Exception as error:
+            # 预先计算失败时，收敛过程中逐个查询
+            logger.exception("[batch converge] prefetch converge dimensions failed: %s", error)
+
+        converged_count = 0
+        for item, processor in processors:
+            start_time = time.time()
+            exc = None
+            try:
+                processor.converge_alarm()
+            except ConvergeLockError as error:
+                logger.info(
+                    "end to converge %s, %s, due to can not get converge lock  %s",
+                    self.instance_type,
+                    item["id"],
+                    str(error),
+                )
+            except Exception as error:
+                exc = error
+                logger.exception("execute converge %s, %s error: %s", self.instance_type, item["id"], error)
+            else:
+                converged_count += 1
+                logger.info(
+                    "--end converge action(%s_%s)--  result %s", item["id"], self.instance_type, processor.status
+                )
+
+            if exc:
+                self.retry(item)
+            report_converge_result(getattr(processor.instance, "bk_biz_id", 0), self.instance_type, start_time, exc)
+
+        metrics.report_all()
+        return converged_count
+
+    def retry(self, item):
+        retry_converge(
+            self.converge_config,
+            item["id"],
+            self.instance_type,
+            item.get("converge_context"),
+            item.get("alerts"),
+        )
@@ -48,8 +48,13 @@ class ConvergeManager(object):
         instance_type=ConvergeType.ACTION,
         end_timestamp=None,
         alerts=None,
+        batch_context=None,
     ):
+        """
+        :param batch_context: 批量收敛时共享的收敛实例及维度匹配结果(ConvergeBatchContext)，为空时逐个查询
+        """
         self.alerts = alerts
+        self.batch_context = batch_context
         self.converge_config = converge_config
         self.instance_type = instance_type
         self.instance = instance
@@ -66,20 +71,31 @@ class ConvergeManager(object):
             create_timestamp = int(self.converge_instance.create_time.timestamp())
             if self.start_timestamp < create_timestamp:
                 self.start_timestamp = self.start_timestamp
+        self.dimension_handler = self.get_dimension_handler(
+            self.converge_config,
+            self.dimension,
+            self.start_timestamp,
+            self.instance,
+            self.instance_type,
+            self.end_timestamp,
+        )
+
+    @staticmethod
+    def get_dimension_handler(converge_config, dimension, start_timestamp, instance, instance_type, end_timestamp=None):
         converged_condition = {
-            condition_item["dimension"]: self.converge_config["converged_condition"].get(condition_item["dimension"])
-            for condition_item in self.converge_config["condition"]
+            condition_item["dimension"]: converge_config["converged_condition"].get(condition_item["dimension"])
+            for condition_item in converge_config["condition"]
         }
 
-        self.dimension_handler = DimensionHandler(
-            self.dimension,
+        return DimensionHandler(
+            dimension,
             converged_condition,
-            self.start_timestamp,
-            instance_id=self.instance.id,
-            end_timestamp=self.end_timestamp,
-            instance_type=self.instance_type,
-            strategy_id=getattr(self.instance, "strategy_id", 0),
-            converged_condition=self.converge_config["converged_condition"],
+            start_timestamp,
+            instance_id=instance.id,
+            end_timestamp=end_timestamp,
+            instance_type=instance_type,
+            strategy_id=getattr(instance, "strategy_id", 0),
+            converged_condition=converge_config["converged_condition"],
         )
 
     def do_converge(self):
@@ -173,7 +189,12 @@ class ConvergeManager(object):
         获取到当前收敛对象相关的处理动作
         """
 
-        matched_related_ids = self.dimension_handler.get_by_condition()
+        matched_related_ids = None
+        if self.batch_context is not None:
+            # 批量收敛时使用预先计算的维度匹配结果
+            matched_related_ids = self.batch_context.get_related_ids(self.instance_type, self.instance.id)
+        if matched_related_ids is None:
+            matched_related_ids = self.dimension_handler.get_by_condition()
 
         # 仅获取同一种收敛事件的id
         matched_related_ids = [
@@ -267,14 +288,22 @@ class ConvergeManager(object):
         except BaseException as error:
             logger.error("insert_converge_instance error %s", str(error))
             self.is_created = False
+            if self.batch_context is not None:
+                # 可能已被其他进程创建，需要重新查询
+                self.batch_context.converge_instances.pop(self.dimension, None)
             self.converge_instance = self.get_converge_instance()
 
         else:
             self.is_created = True
+            if self.batch_context is not None:
+                self.batch_context.converge_instances[self.dimension] = self.converge_instance
 
     def get_converge_instance(self, start_time=None):
         try:
-            converge_instance = ConvergeInstance.objects.filter(dimension=self.dimension).first()
+            if self.batch_context is not None:
+                converge_instance = self.batch_context.get_converge_instance(self.dimension)
+            else:
+                converge_instance = ConvergeInstance.objects.filter(dimension=self.dimension).first()
         except Exception:
             converge_instance = None
         if converge_instance and start_time and converge_instance.create_time < start_time:
@@ -287,6 +316,8 @@ class ConvergeManager(object):
             )
             self.end_converge_by_id(converge_instance.id)
             converge_instance = None
+            if self.batch_context is not None:
+                self.batch_context.converge_instances[self.dimension] = None
         self.converge_instance = converge_instance
         return self.converge_instance
 
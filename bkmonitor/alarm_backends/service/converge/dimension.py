@@ -19,6 +19,7 @@ from alarm_backends.core.cache.key import (
     FTA_CONVERGE_DIMENSION_KEY,
     FTA_SUB_CONVERGE_DIMENSION_KEY,
     KEY_PREFIX,
+    RedisScript,
 )
 from alarm_backends.core.context import ActionContext
 from constants.action import (
@@ -30,6 +31,39 @@ from constants.action import (
 
 logger = logging.getLogger("fta_action.converge")
 
+# KEYS: 各收敛维度的集合key，按维度依次排列
+# ARGV: 开始时间, 结束时间, 各维度的集合key数量...
+# 同一维度的集合取并集，不同维度之间取交集，返回时间范围内匹配的收敛对象
+CONVERGE_MATCH_SCRIPT = RedisScript(
+    """
+local result = nil
+local offset = 0
+for i = 3, #ARGV do
+    local count = tonumber(ARGV[i])
+    local union = {}
+    for j = offset + 1, offset + count do
+        for _, member in ipairs(redis.call('ZRANGEBYSCORE', KEYS[j], ARGV[1], ARGV[2])) do
+            if result == nil or result[member] then
+                union[member] = true
+            end
+        end
+    end
+    if next(union) == nil then
+        return {}
+    end
+    offset = offset + count
+    result = union
+end
+local members = {}
+if result then
+    for member in pairs(result) do
+        table.insert(members, member)
+    end
+end
+return members
+"""
+)
+
 
 class DimensionHandler(object):
     def __init__(
@@ -69,8 +103,7 @@ class DimensionHandler(object):
             keys_length, pipeline_results = self.get_sub_converge_instances()
         else:
             pipeline = FTA_CONVERGE_DIMENSION_KEY.client.pipeline()
-            for key, values in self.condition.items():
-                set_keys = self.get_set_keys(key, values)
+            for key, set_keys in self.get_condition_set_keys().items():
                 keys_length[key] = len(set_keys)
                 for set_key in set_keys:
                     # 获取并集
@@ -78,12 +111,67 @@ class DimensionHandler(object):
             pipeline_results = pipeline.execute()
         return self.calc_converge_results(keys_length, pipeline_results)
 
+    @classmethod
+    def batch_get_by_condition(cls, handlers):
+        """
+        批量获取收敛对象，每个收敛对象的维度交集通过 lua 脚本在 redis 中计算，所有收敛对象共用一个 pipeline
+        :param handlers: DimensionHandler 列表
+        :return: 与 handlers 一一对应的匹配结果
+        """
+        if not handlers:
+            return []
+
+        pipeline = FTA_CONVERGE_DIMENSION_KEY.client.pipeline(transaction=False)
+        for handler in handlers:
+            handler.match_by_script(pipeline)
+        results = []
+        for handler, result in zip(handlers, pipeline.execute()):
+            result = set(result or [])
+            logger.info(
+                "$%s dimension_key %s len:%s filter:%s-%s",
+                handler.instance_id,
+                handler.dimension,
+                len(result),
+                handler.start_timestamp,
+                handler.end_timestamp,
+            )
+            results.append(result)
+        return results
+
+    def match_by_script(self, pipeline):
+        """
+        在 pipeline 中加入计算维度交集的脚本
+        """
+        if self.instance_type == ConvergeType.CONVERGE:
+            condition_set_keys = {
+                "sub_converge": [FTA_SUB_CONVERGE_DIMENSION_KEY.get_key(**self.get_sub_converge_label_info())]
+            }
+            strategy_id = 0
+        else:
+            condition_set_keys = self.get_condition_set_keys()
+            strategy_id = self.strategy_id
+
+        keys = []
+        args = [self.start_timestamp, self.end_timestamp]
+        for set_keys in condition_set_keys.values():
+            keys.extend(set_keys)
+            args.append(len(set_keys))
+
+        # 同一策略的收敛维度在同一节点
+        CONVERGE_MATCH_SCRIPT(pipeline, keys, args, strategy_id)
+
+    def get_condition_set_keys(self):
+        """
+        获取各收敛维度对应的集合key
+        """
+        return {key: sorted(self.get_set_keys(key, values)) for key, values in self.condition.items()}
+
     def calc_converge_results(self, keys_length, converge_results):
         index = 0
         all_key_results = []
         for length in keys_length.values():
             all_key_results.append(converge_results[index : index + length])
-            index += 1
+            index += length
 
         if not all_key_results:
             return []
@@ -169,12 +257,15 @@ class DimensionCalculator:
         if instance_type == ConvergeType.CONVERGE:
             self.converge_ctx.update(related_instance.converge_config["converged_condition"])
 
-    def calc_dimension(self):
+    def calc_dimension(self, pipeline=None):
         """
         收敛维度计算
+        :param pipeline: 批量计算时共用的 pipeline，由调用方执行
         """
         score = arrow.get(self.related_instance.create_time).replace(tzinfo="utc").timestamp
-        pipeline = FTA_CONVERGE_DIMENSION_KEY.client.pipeline()
+        need_execute = pipeline is None
+        if need_execute:
+            pipeline = FTA_CONVERGE_DIMENSION_KEY.client.pipeline()
         for dimension in COMPARED_CONVERGE_DIMENSION.keys():
             values = self.converge_ctx.get(dimension)
             if values is None or not str(values):
@@ -196,7 +287,8 @@ class DimensionCalculator:
                 kwargs = {"{}_{}".format(self.instance_type, str(self.related_instance.id)): score}
                 pipeline.zadd(key, kwargs)
                 pipeline.expire(key, FTA_CONVERGE_DIMENSION_KEY.ttl)
-        pipeline.execute()
+        if need_execute:
+            pipeline.execute()
         return self.compile_converge_info()
 
     def calc_sub_converge_dimension(self):
@@ -55,8 +55,20 @@ class ConvergeLockError(BaseException):
 class ConvergeProcessor(object):
     InstanceModel = {ConvergeType.CONVERGE: ConvergeInstance, ConvergeType.ACTION: ActionInstance}
 
-    def __init__(self, converge_config, instance_id, instance_type, converge_context=None, alerts=None):
-        """ """
+    def __init__(
+        self,
+        converge_config,
+        instance_id,
+        instance_type,
+        converge_context=None,
+        alerts=None,
+        instance=None,
+        batch_context=None,
+    ):
+        """
+        :param instance: 已查询的收敛对象，为空时按 instance_id 查询
+        :param batch_context: 批量收敛时共享的上下文(ConvergeBatchContext)
+        """
 
         self.status = converge_context.get("status", "") if converge_context else ""
         self.comment = ""
@@ -70,8 +82,9 @@ class ConvergeProcessor(object):
         self.lock_key = ""
         self.need_unlock = False
         self.instance_model = self.InstanceModel[instance_type]
+        self.batch_context = batch_context
         try:
-            self.instance = self.instance_model.objects.get(id=instance_id)
+            self.instance = instance or self.instance_model.objects.get(id=instance_id)
         except Exception as error:
             print("pytest|get {} converge instance({})  failed {}".format(instance_type, instance_id, str(error)))
             raise
@@ -293,6 +306,7 @@ class ConvergeProcessor(object):
             self.instance_type,
             end_timestamp=self.end_timestamp,
             alerts=self.alerts,
+            batch_context=self.batch_context,
         )
 
         converged_instance = converge_manager.converge_instance
@@ -327,6 +341,19 @@ class ConvergeProcessor(object):
             )
         return self.status
 
+    def get_dimension_handler(self):
+        """
+        获取收敛维度处理对象，用于批量收敛时预先计算维度匹配结果
+        """
+        return ConvergeManager.get_dimension_handler(
+            self.converge_config,
+            self.dimension,
+            self.start_timestamp,
+            self.instance,
+            self.instance_type,
+            self.end_timestamp,
+        )
+
     def get_dimension_lock(self):
         """
         获取收敛维度锁
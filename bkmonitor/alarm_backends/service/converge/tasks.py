@@ -16,6 +16,7 @@ from celery.task import task
 from django.db import OperationalError
 
 from alarm_backends.constants import CONST_HALF_MINUTE
+from constants.action import ConvergeType
 from core.prometheus import metrics
 
 logger = logging.getLogger("fta_action.converge")
@@ -60,21 +61,55 @@ def run_converge(converge_config, instance_id, instance_type, converge_context=N
         logger.info("--end converge action(%s_%s)--  result %s", instance_id, instance_type, converge_handler.status)
 
     if exc:
-        # 如果产生了异常，可以重试，至多3次
-        if retry_times < 3:
-            # 如果当前重试次数没有达到3次，可以重发任务
-            task_id = run_converge.apply_async(
-                (converge_config, instance_id, instance_type, converge_context, alerts, retry_times + 1),
-                countdown=CONST_HALF_MINUTE,
-            )
-            logger.info(
-                "[run_converge] retry to push %s(%s) to converge queue again, delay %s, task_id(%s)",
-                instance_type,
-                instance_id,
-                CONST_HALF_MINUTE,
-                task_id,
-            )
+        retry_converge(converge_config, instance_id, instance_type, converge_context, alerts, retry_times)
 
+    report_converge_result(bk_biz_id, instance_type, start_time, exc)
+    metrics.report_all()
+
+
+@task(ignore_result=True, queue="celery_converge")
+def run_converge_batch(converge_config, instances, instance_type=ConvergeType.ACTION):
+    """
+    批量执行同一收敛配置下的收敛动作
+    :param converge_config: 收敛配置
+    :param instances: 收敛对象列表 [{"id": 收敛对象id, "converge_context": 收敛上下文, "alerts": 告警快照}]
+    :param instance_type: 收敛对象类型
+    """
+    from alarm_backends.service.converge.batch import BatchConvergeProcessor
+
+    logger.info("--begin batch converge %s(%s)--", instance_type, len(instances))
+    start_time = time.time()
+    converged_count = BatchConvergeProcessor(converge_config, instances, instance_type).converge()
+    logger.info(
+        "--end batch converge %s(%s)--  converged(%s) cost(%.3fs)",
+        instance_type,
+        len(instances),
+        converged_count,
+        time.time() - start_time,
+    )
+
+
+def retry_converge(converge_config, instance_id, instance_type, converge_context=None, alerts=None, retry_times=0):
+    """
+    收敛产生异常时重新推送至收敛队列
+    """
+    # 如果产生了异常，可以重试，至多3次
+    if retry_times < 3:
+        # 如果当前重试次数没有达到3次，可以重发任务
+        task_id = run_converge.apply_async(
+            (converge_config, instance_id, instance_type, converge_context, alerts, retry_times + 1),
+            countdown=CONST_HALF_MINUTE,
+        )
+        logger.info(
+            "[run_converge] retry to push %s(%s) to converge queue again, delay %s, task_id(%s)",
+            instance_type,
+            instance_id,
+            CONST_HALF_MINUTE,
+            task_id,
+        )
+
+
+def report_converge_result(bk_biz_id, instance_type, start_time, exc=None):
     cost = time.time() - start_time
     metrics.CONVERGE_PROCESS_TIME.labels(
         bk_biz_id=bk_biz_id, strategy_id=metrics.TOTAL_TAG, instance_type=instance_type
@@ -86,4 +121,3 @@ def run_converge(converge_config, instance_id, instance_type, converge_context=N
         status=metrics.StatusEnum.from_exc(exc),
         exception=exc,
     ).inc()
-    metrics.report_all()
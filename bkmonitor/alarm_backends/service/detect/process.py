@@ -9,17 +9,17 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 
-import json
 import logging
 import time
 
 from django.conf import settings
 
 from alarm_backends.core.cache import key
-from alarm_backends.core.control.strategy import Strategy
+from alarm_backends.core.control.strategy import strategy_cache
 from alarm_backends.core.i18n import i18n
 from alarm_backends.core.lock.service_lock import service_lock
 from alarm_backends.core.processor.base import BaseAbnormalPushProcessor
+from alarm_backends.core.processor.codec import QueueCodec
 from alarm_backends.service.detect import DataPoint
 from core.prometheus import metrics
 
@@ -32,7 +32,7 @@ class DetectProcess(BaseAbnormalPushProcessor):
         self.strategy_id = strategy_id
         self.inputs = {}
         self.outputs = {}
-        self.strategy = Strategy(strategy_id)
+        self.strategy = strategy_cache.get(strategy_id)
         i18n.set_biz(self.strategy.bk_biz_id)
         self.is_busy = False
 
@@ -82,10 +82,12 @@ class DetectProcess(BaseAbnormalPushProcessor):
         last_unexpected_record = None
         if records:
             client.ltrim(data_channel, 0, -offset - 1)
+            codec = QueueCodec(self.strategy_id, item.id)
+            codec.load_schemas(records, client)
             # 队列左进右出，lrange 取出时需要做一次倒序才能保证先进先出
             for record in reversed(records):
                 try:
-                    data_point = DataPoint(json.loads(record), item)
+                    data_point = DataPoint(codec.decode(record), item)
                     # fill data point into inputs list
                     self.inputs[item.id].append(data_point)
                 except ValueError:
@@ -14,6 +14,9 @@ import functools
 import inspect
 import json
 import logging
+import operator
+import threading
+from collections import OrderedDict
 
 from django.conf import settings
 from django.template import Context, Template
@@ -33,18 +36,48 @@ from core.unit import load_unit
 
 logger = logging.getLogger("detect")
 
+# 表达式比较符对应的运算函数，供批量检测使用
+COMPARE_OPERATORS = {
+    ">": operator.gt,
+    ">=": operator.ge,
+    "<": operator.lt,
+    "<=": operator.le,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
 
 class DetectContext(dict):
     def __getattr__(self, item):
         return self.__getitem__(item)
 
 
+class BatchUnitConverter(dict):
+    """
+    批量检测使用的单位换算，结果与 unit_convert_min 一致
+    按 (unit, suffix) 缓存换算函数，避免逐点 load_unit
+    """
+
+    def __missing__(self, key):
+        unit, suffix = key
+        converter = functools.partial(load_unit(unit).convert_to_max, suffix=suffix, decimal=settings.POINT_PRECISION)
+        self[key] = converter
+        return converter
+
+    def __call__(self, value, unit, suffix=None):
+        return self[(unit, suffix)](value)[0]
+
+
 class Algorithms(object):
     """
     检测算法基类，定义一个算法对象。
     """
 
     desc_tpl = ""
+    # 是否支持批量检测，开启后子类需实现 batch_check，且判定结果必须与表达式检测一致
+    batch_supported = False
+    # 批量检测过程中已获取的历史数据，按数据点复用给逐点检测
+    _batch_history = None
 
     def __init__(self):
         self.expr = self.gen_expr()
@@ -124,26 +157,69 @@ class Algorithms(object):
         context = Context(self.get_context(data_point))
         return Template(self.desc_tpl).render(context)
 
+    def batch_check(self, data_point, convert):
+        """
+        To be implemented
+        作用：批量检测时对单个数据点做判定，不构造检测上下文，也不渲染异常描述
+        :param data_point: 待检测点
+        :param convert: BatchUnitConverter，替代表达式中的 unit_convert_min
+        :return: bool
+        """
+        raise NotImplementedError
+
+    def batch_detect(self, data_points):
+        """
+        批量检测，一次性得到所有数据点的异常标记
+        :return: 与 data_points 一一对应的异常标记列表，不支持批量检测时返回 None
+        """
+        if not self.batch_supported:
+            return None
+
+        convert = BatchUnitConverter()
+        anomaly_mask = []
+        for data_point in data_points:
+            # debug 数据点需要打印检测上下文，交由逐点检测处理
+            if hasattr(data_point, "__debug__"):
+                anomaly_mask.append(True)
+                continue
+            try:
+                anomaly_mask.append(bool(self.batch_check(data_point, convert)))
+            except Exception:
+                anomaly_mask.append(False)
+        return anomaly_mask
+
     def detect_records(self, data_points, level):
         """
         detect service entry
         """
         if isinstance(data_points, DataPoint):
             data_points = [data_points]
+
+        # 批量检测先筛出异常点，只有异常点才走逐点检测生成异常描述
+        anomaly_mask = None
+        if settings.DETECT_BATCH_ENABLED:
+            self._batch_history = {}
+            anomaly_mask = self.batch_detect(data_points)
+
         anomaly_points = []
-        for data_point in data_points:
-            try:
-                check_result = self.detect(data_point)
-            except Exception:
-                continue
-            if check_result:
-                ap = self.gen_anomaly_point(data_point, check_result, level)
-                logger.info(
-                    "[detect] strategy({}) item({}) level[{}] 发现异常点: {}".format(
-                        ap.data_point.item.strategy.id, ap.data_point.item.id, level, ap.__dict__
+        try:
+            for index, data_point in enumerate(data_points):
+                if anomaly_mask is not None and not anomaly_mask[index]:
+                    continue
+                try:
+                    check_result = self.detect(data_point)
+                except Exception:
+                    continue
+                if check_result:
+                    ap = self.gen_anomaly_point(data_point, check_result, level)
+                    logger.info(
+                        "[detect] strategy({}) item({}) level[{}] 发现异常点: {}".format(
+                            ap.data_point.item.strategy.id, ap.data_point.item.id, level, ap.__dict__
+                        )
                     )
-                )
-                anomaly_points.append(ap)
+                    anomaly_points.append(ap)
+        finally:
+            self._batch_history = None
 
         return anomaly_points
 
@@ -290,14 +366,83 @@ class BasicAlgorithmsCollection(Algorithms):
         return context
 
 
+class HistoryPointBuffer(object):
+    """
+    进程内按 item 缓存最近若干周期的数据点
+    当前周期的数据及从存储中查询到的历史数据都会记录下来，环比类算法需要的近期数据如果本进程已经处理过，
+    不再查询 redis 或时序存储。内存中没有的维度仍然回退到 redis 查询，因此只需保证缓存的数据点正确，无需完整。
+    """
+
+    def __init__(self):
+        # (strategy_id, item_id) -> {timestamp: {dimensions_md5: point}}
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def max_cycles(self):
+        return settings.DETECT_HISTORY_BUFFER_CYCLES
+
+    @property
+    def max_items(self):
+        return settings.DETECT_HISTORY_BUFFER_ITEMS
+
+    def add(self, item, data_points):
+        if self.max_cycles <= 0 or not data_points:
+            return
+
+        item_key = (item.strategy.id, item.id)
+        with self.lock:
+            cycles = self.items.pop(item_key, None) or {}
+            self.items[item_key] = cycles
+            for point in data_points:
+                # 与历史数据查询保持一致，忽略空值
+                if not point.value:
+                    continue
+                cycles.setdefault(point.timestamp, {})[point.record_id.split(".")[0]] = point.as_dict()
+
+            # 只保留最近的周期
+            if len(cycles) > self.max_cycles:
+                for timestamp in sorted(cycles)[: -self.max_cycles]:
+                    del cycles[timestamp]
+
+            while len(self.items) > self.max_items:
+                self.items.popitem(last=False)
+
+    def get(self, item, timestamp, dimensions_md5):
+        with self.lock:
+            points = self.items.get((item.strategy.id, item.id), {}).get(timestamp)
+            return points.get(dimensions_md5) if points else None
+
+    def contains(self, item, timestamp, dimensions_md5_set):
+        with self.lock:
+            points = self.items.get((item.strategy.id, item.id), {}).get(timestamp)
+            if not points:
+                return False
+            return all(dimensions_md5 in points for dimensions_md5 in dimensions_md5_set)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+
+history_point_buffer = HistoryPointBuffer()
+
+
 class HistoryPointFetcher(object):
     def set_default(self, value: int):
         self._default = value
 
     def query_history_points(self, data_points):
         item = data_points[0].item
+        agg_interval = item.query_configs[0]["agg_interval"]
         # 按时间从小到大排序
         sorted_data_points = sorted(data_points, key=lambda x: x.timestamp)
+        dimensions_md5_set = {point.record_id.split(".")[0] for point in data_points}
+
+        # 当前周期的数据已由本进程处理，记录下来供后续周期使用
+        history_point_buffer.add(item, data_points)
+
+        query_ranges = []
         offsets = self.get_history_offsets(item)
         for offset in offsets:
             # offsets 支持区间（相邻offset之间差值等于interval的整数倍）批量查询
@@ -310,40 +455,81 @@ class HistoryPointFetcher(object):
                 self._publish_history_points(item, data_points)
                 continue
 
-            records = []
             from_timestamp, until_timestamp = (
                 sorted_data_points[0].timestamp - end,
-                sorted_data_points[-1].timestamp - start + item.query_configs[0]["agg_interval"],
+                sorted_data_points[-1].timestamp - start + agg_interval,
             )
-
-            accessed = None
-            for history_timestamp in range(from_timestamp, until_timestamp, item.query_configs[0]["agg_interval"]):
-                if accessed is None:
-                    accessed = True
-                accessed = accessed and self._check_history_points(item, history_timestamp)
-
-            if accessed:
+            history_timestamps = list(range(from_timestamp, until_timestamp, agg_interval))
+            query_ranges.append((from_timestamp, until_timestamp, history_timestamps))
+
+        # 内存中已有全部所需维度的时刻，无需再检查 redis
+        missing_timestamps = {
+            history_timestamp
+            for _, _, history_timestamps in query_ranges
+            for history_timestamp in history_timestamps
+            if not history_point_buffer.contains(item, history_timestamp, dimensions_md5_set)
+        }
+        accessed_timestamps = self._check_history_points(item, missing_timestamps)
+
+        for from_timestamp, until_timestamp, history_timestamps in query_ranges:
+            if history_timestamps and all(
+                history_timestamp not in missing_timestamps or history_timestamp in accessed_timestamps
+                for history_timestamp in history_timestamps
+            ):
                 # 历史时刻的数据都已经查过
                 continue
 
+            records = []
             item_records = item.query_record(from_timestamp, until_timestamp)
             for record in item_records:
                 point = DataRecord(item, record)
                 if point.value:
                     records.append(adapter_data_access_2_detect(point, item))
 
-            self._local_history_storage = {}
             self._publish_history_points(item, records)
+            history_point_buffer.add(item, records)
 
-    def _check_history_points(self, item, history_timestamp):
+        self._local_history_storage = {}
+        self._prefetched_history_keys = set()
+        self._prefetch_history_points(item, missing_timestamps, dimensions_md5_set)
+
+    def _check_history_points(self, item, history_timestamps):
         """
-        检查历史时刻的数据是否已经拉取过，如果存在，则更新过期时间。
+        批量检查历史时刻的数据是否已经拉取过，返回已拉取过的时刻
         """
-        client = key.HISTORY_DATA_KEY.client
-        history_key = key.HISTORY_DATA_KEY.get_key(
-            strategy_id=item.strategy.id, item_id=item.id, timestamp=history_timestamp
-        )
-        return client.exists(history_key)
+        if not history_timestamps:
+            return set()
+
+        history_timestamps = list(history_timestamps)
+        pipeline = key.HISTORY_DATA_KEY.client.pipeline(transaction=False)
+        for history_timestamp in history_timestamps:
+            pipeline.exists(
+                key.HISTORY_DATA_KEY.get_key(strategy_id=item.strategy.id, item_id=item.id, timestamp=history_timestamp)
+            )
+        return {
+            history_timestamp for history_timestamp, exists in zip(history_timestamps, pipeline.execute()) if exists
+        }
+
+    def _prefetch_history_points(self, item, history_timestamps, dimensions_md5_set):
+        """
+        批量获取历史时刻中所需维度的数据，只查询需要的字段
+        """
+        if not history_timestamps or not dimensions_md5_set:
+            return
+
+        dimensions = list(dimensions_md5_set)
+        history_keys = []
+        pipeline = key.HISTORY_DATA_KEY.client.pipeline(transaction=False)
+        for history_timestamp in history_timestamps:
+            history_key = key.HISTORY_DATA_KEY.get_key(
+                strategy_id=item.strategy.id, item_id=item.id, timestamp=history_timestamp
+            )
+            pipeline.hmget(history_key, dimensions)
+            history_keys.append(history_key)
+
+        for history_key, values in zip(history_keys, pipeline.execute()):
+            self._local_history_storage[history_key] = dict(zip(dimensions, values))
+            self._prefetched_history_keys.add(history_key)
 
     def _publish_history_points(self, item, history_points):
         """
@@ -370,18 +556,28 @@ class HistoryPointFetcher(object):
     def fetch_history_point(self, item, point, history_timestamp):
         """
         获取当前数据点对应的历史数据点
+        优先从进程内缓存获取，其次是预加载的数据，最后再查询 redis
         """
+        dimensions_md5 = point.record_id.split(".")[0]
+        history_point = history_point_buffer.get(item, history_timestamp, dimensions_md5)
+        if history_point is not None:
+            return DataPoint(history_point, item)
+
         client = key.HISTORY_DATA_KEY.client
         history_key = key.HISTORY_DATA_KEY.get_key(
             strategy_id=item.strategy.id, item_id=item.id, timestamp=history_timestamp
         )
         if not getattr(self, "_local_history_storage", None):
             self._local_history_storage = {}
+        prefetched_history_keys = getattr(self, "_prefetched_history_keys", set())
 
-        if history_key not in self._local_history_storage:
-            self._local_history_storage[history_key] = client.hgetall(history_key)
+        history_points = self._local_history_storage.get(history_key)
+        if history_points is None or (dimensions_md5 not in history_points and history_key in prefetched_history_keys):
+            # 未预加载或预加载时未包含该维度，获取整个时刻的数据
+            history_points = self._local_history_storage[history_key] = client.hgetall(history_key)
+            prefetched_history_keys.discard(history_key)
 
-        raw_data = self._local_history_storage[history_key].get(point.record_id.split(".")[0])
+        raw_data = history_points.get(dimensions_md5)
         if not raw_data:
             if getattr(self, "_default", None) is not None:
                 return DataPoint({"value": self._default, "time": history_timestamp}, item)
@@ -389,6 +585,18 @@ class HistoryPointFetcher(object):
 
         return DataPoint(json.loads(raw_data), item)
 
+    def get_history_point(self, data_point):
+        """
+        获取数据点对应的历史数据，批量检测时已获取的结果直接复用，避免逐点检测重复获取
+        """
+        if self._batch_history is None:
+            return self.history_point_fetcher(data_point)
+
+        key = id(data_point)
+        if key not in self._batch_history:
+            self._batch_history[key] = self.history_point_fetcher(data_point)
+        return self._batch_history[key]
+
     def get_history_offsets(self, item):
         """
         获取历史数据的偏移时间，所有同比环比类算法必须实现该方法。
@@ -436,7 +644,7 @@ class RangeRatioAlgorithmsCollection(BasicAlgorithmsCollection, HistoryPointFetc
 
     def extra_context(self, context):
         env = dict()
-        history_data_point = self.history_point_fetcher(context.data_point)
+        history_data_point = self.get_history_point(context.data_point)
         if history_data_point is None:
             raise HistoryDataNotExists(item_id=context.data_point.item.id, timestamp=context.data_point.timestamp)
 
@@ -446,6 +654,29 @@ class RangeRatioAlgorithmsCollection(BasicAlgorithmsCollection, HistoryPointFetc
         env.update(self.validated_config)
         return env
 
+    def batch_check(self, data_point, convert):
+        history_data_point = self.get_history_point(data_point)
+        if history_data_point is None:
+            return False
+
+        unit = data_point.unit
+        value = convert(data_point.value, unit)
+        history_value = convert(history_data_point.value, unit)
+
+        floor = self.validated_config["floor"]
+        if floor:
+            floor_value = history_value * (100 - floor) * 0.01
+            if (value or floor_value) and (value <= floor_value):
+                return True
+
+        ceil = self.validated_config["ceil"]
+        if ceil:
+            ceil_value = history_value * (100 + ceil) * 0.01
+            if (value or ceil_value) and (value >= ceil_value):
+                return True
+
+        return False
+
     def history_point_fetcher(self, data_point, **kwargs):
         """
         同比环比类算法特有方法，获取历史数据。
@@ -24,6 +24,7 @@ from bkmonitor.strategy.serializers import RingRatioAmplitudeSerializer
 class RingRatioAmplitude(SimpleRingRatio):
     config_serializer = RingRatioAmplitudeSerializer
     expr_op = "and"
+    batch_supported = True
     desc_tpl = _(
         "{% load unit %} - 前一时刻值{{history_data_point.value|auto_unit:unit}}的绝对值 >= "
         "前一时刻值{{history_data_point.value|auto_unit:unit}} * {{ratio}} + {{shock}}{{unit|unit_suffix:algorithm_unit}}"
@@ -41,6 +42,21 @@ class RingRatioAmplitude(SimpleRingRatio):
             "",
         )
 
+    def batch_check(self, data_point, convert):
+        history_data_point = self.get_history_point(data_point)
+        if history_data_point is None:
+            return False
+
+        unit = data_point.unit
+        threshold, ratio, shock = (self.validated_config[k] for k in ("threshold", "ratio", "shock"))
+        value = convert(data_point.value, unit)
+        history_value = convert(history_data_point.value, unit)
+        if not (value >= convert(threshold, self.unit) and history_value >= convert(threshold, unit, self.unit)):
+            return False
+
+        amplitude = convert(abs(history_data_point.value - data_point.value), unit)
+        return amplitude >= history_value * ratio + convert(shock, unit, self.unit)
+
     def gen_anomaly_point(self, data_point, detect_result, level, auto_format=True):
         ap = super(RingRatioAmplitude, self).gen_anomaly_point(data_point, detect_result, level)
         if auto_format:
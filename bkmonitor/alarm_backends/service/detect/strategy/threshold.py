@@ -19,7 +19,11 @@ import logging
 from django.utils.safestring import mark_safe
 from six.moves import zip
 
-from alarm_backends.service.detect.strategy import BasicAlgorithmsCollection, ExprDetectAlgorithms
+from alarm_backends.service.detect.strategy import (
+    COMPARE_OPERATORS,
+    BasicAlgorithmsCollection,
+    ExprDetectAlgorithms,
+)
 from bkmonitor.strategy.serializers import ThresholdSerializer, allowed_threshold_method
 from core.errors.alarm_backends.detect import InvalidThresholdConfig
 
@@ -37,6 +41,7 @@ class AlgorithmsAST(ast.NodeTransformer):
 class AndThreshold(BasicAlgorithmsCollection):
     config_serializer = ThresholdSerializer.AndSerializer
     expr_op = "and"
+    batch_supported = True
 
     desc_tpl = "{{% load unit %}} {method_desc} {threshold}{{{{unit|unit_suffix:algorithm_unit}}}}"
 
@@ -61,6 +66,15 @@ class AndThreshold(BasicAlgorithmsCollection):
         for args in zip(expr_list, tpl_list):
             yield ExprDetectAlgorithms(*args)
 
+    def batch_check(self, data_point, convert):
+        unit = data_point.unit
+        value = convert(data_point.value, unit)
+        for t_config in self.validated_config:
+            compare = COMPARE_OPERATORS[allowed_threshold_method[t_config["method"]]]
+            if not compare(value, convert(t_config["threshold"], unit, self.unit)):
+                return False
+        return True
+
 
 class Threshold(AndThreshold):
     config_serializer = ThresholdSerializer
@@ -69,3 +83,6 @@ class Threshold(AndThreshold):
     def gen_expr(self):
         for t_config in self.validated_config:
             yield AndThreshold(t_config, self.unit)
+
+    def batch_check(self, data_point, convert):
+        return any(detector.batch_check(data_point, convert) for detector in self.detectors)
@@ -19,13 +19,18 @@ from django.utils.translation import ugettext as _
 from six.moves import range
 
 from alarm_backends.constants import CONST_ONE_DAY
-from alarm_backends.service.detect.strategy import ExprDetectAlgorithms, RangeRatioAlgorithmsCollection
+from alarm_backends.service.detect.strategy import (
+    COMPARE_OPERATORS,
+    ExprDetectAlgorithms,
+    RangeRatioAlgorithmsCollection,
+)
 from bkmonitor.strategy.serializers import YearRoundAmplitudeSerializer, allowed_method
 
 
 class YearRoundAmplitude(RangeRatioAlgorithmsCollection):
     config_serializer = YearRoundAmplitudeSerializer
     expr_op = "or"
+    batch_supported = True
 
     def gen_expr(self):
         comp = allowed_method[self.validated_config["method"]]
@@ -47,11 +52,26 @@ class YearRoundAmplitude(RangeRatioAlgorithmsCollection):
         env = dict()
         comp = allowed_method[self.validated_config["method"]]
         method_desc = comp.replace("==", "=")
-        diffs = self.history_point_fetcher(context.data_point)
+        diffs = self.get_history_point(context.data_point)
         env.update(dict(pre_val=diffs[0][1].value, diffs=diffs, comp=comp, method_desc=mark_safe(method_desc)))
         env.update(self.validated_config)
         return env
 
+    def batch_check(self, data_point, convert):
+        compare = COMPARE_OPERATORS[allowed_method[self.validated_config["method"]]]
+        ratio, shock = self.validated_config["ratio"], self.validated_config["shock"]
+        unit = data_point.unit
+        diffs = self.get_history_point(data_point)
+
+        current_diff = convert(abs(diffs[0][0].value - diffs[0][1].value), unit)
+        shock_value = convert(shock, unit, self.unit)
+        # 任意一天满足即可
+        for day in range(1, self.validated_config["days"] + 1):
+            history_diff = convert(abs(diffs[day][0].value - diffs[day][1].value), unit)
+            if compare(current_diff, history_diff * ratio + shock_value):
+                return True
+        return False
+
     def get_history_offsets(self, item):
         agg_interval = item.query_configs[0]["agg_interval"]
         return [(i * CONST_ONE_DAY, i * CONST_ONE_DAY + agg_interval) for i in range(self.validated_config["days"] + 1)]
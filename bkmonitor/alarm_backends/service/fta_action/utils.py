@@ -9,6 +9,7 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import calendar
+import json
 import logging
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
@@ -16,11 +17,15 @@ from typing import List
 
 import pytz
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.utils.translation import ugettext as _
 
 from alarm_backends.core.cache.cmdb.host import HostManager
 from alarm_backends.core.cache.cmdb.module import ModuleManager
-from alarm_backends.core.cache.key import ALERT_DETECT_RESULT
+from alarm_backends.core.cache.key import (
+    ALERT_DETECT_RESULT,
+    FTA_CONVERGE_DIMENSION_KEY,
+)
 from alarm_backends.core.context import ActionContext
 from alarm_backends.core.context.utils import (
     get_business_roles,
@@ -28,7 +33,7 @@ from alarm_backends.core.context.utils import (
 )
 from alarm_backends.core.i18n import i18n
 from alarm_backends.service.converge.dimension import DimensionCalculator
-from alarm_backends.service.converge.tasks import run_converge
+from alarm_backends.service.converge.tasks import run_converge, run_converge_batch
 from bkmonitor.documents import ActionInstanceDocument, AlertDocument
 from bkmonitor.models import ActionInstance, DutyArrange, DutyPlan, UserGroup
 from bkmonitor.utils import time_tools
@@ -93,6 +98,11 @@ class PushActionProcessor:
         """
         推送告警至收敛汇总队列
         """
+        batch_size = settings.CONVERGE_BATCH_SIZE
+        # 批量收敛时，收敛维度共用一个 pipeline 写入，并按收敛配置分组推送
+        dimension_pipeline = FTA_CONVERGE_DIMENSION_KEY.client.pipeline() if batch_size > 0 else None
+        batch_converge_configs = {}
+        batch_instances = defaultdict(list)
         for action_instance in action_instances:
             converge_config = None
             alerts = action_alert_relations[action_instance.generate_uuid]
@@ -120,7 +130,19 @@ class PushActionProcessor:
 
             converge_info = DimensionCalculator(
                 action_instance, converge_config=converge_config, alerts=alerts
-            ).calc_dimension()
+            ).calc_dimension(dimension_pipeline)
+            if dimension_pipeline is not None:
+                config_key = json.dumps(converge_config, sort_keys=True)
+                batch_converge_configs[config_key] = converge_config
+                batch_instances[config_key].append(
+                    {
+                        "id": action_instance.id,
+                        "converge_context": converge_info["converge_context"],
+                        "alerts": [alert.to_dict() for alert in alerts],
+                    }
+                )
+                continue
+
             task_id = run_converge.delay(
                 converge_config,
                 action_instance.id,
@@ -135,6 +157,23 @@ class PushActionProcessor:
                 task_id,
             )
 
+        if not batch_instances:
+            return
+
+        # 收敛维度写入后再推送收敛任务
+        dimension_pipeline.execute()
+        for config_key, instances in batch_instances.items():
+            for index in range(0, len(instances), batch_size):
+                batch = instances[index : index + batch_size]
+                task_id = run_converge_batch.delay(batch_converge_configs[config_key], batch, ConvergeType.ACTION)
+                logger.info(
+                    "[push_actions_to_converge_queue] push actions(%s) to batch converge queue, "
+                    "converge_config %s, task id %s",
+                    ",".join(str(item["id"]) for item in batch),
+                    batch_converge_configs[config_key],
+                    task_id,
+                )
+
     @classmethod
     def push_action_to_execute_queue(
         cls, action_instance, alerts=None, countdown=0, callback_func="execute", kwargs=None
@@ -10,17 +10,22 @@ specific language governing permissions and limitations under the License.
 """
 
 
-import json
 import logging
 
 import arrow
+from django.conf import settings
 
 from alarm_backends.constants import LATEST_NO_DATA_CHECK_POINT
 from alarm_backends.core.cache import key
-from alarm_backends.core.control.strategy import Strategy
+from alarm_backends.core.control.strategy import strategy_cache
 from alarm_backends.core.i18n import i18n
 from alarm_backends.core.lock.service_lock import service_lock
 from alarm_backends.core.processor.base import BaseAbnormalPushProcessor
+from alarm_backends.core.processor.codec import QueueCodec
+from alarm_backends.core.processor.nodata_index import (
+    NO_DATA_BACKEND_INDEX,
+    NoDataDimensionIndex,
+)
 from alarm_backends.service.access.data.token import TokenBucket
 from alarm_backends.service.detect import DataPoint
 from core.prometheus import metrics
@@ -33,7 +38,7 @@ class CheckProcessor(BaseAbnormalPushProcessor):
         self.strategy_id = strategy_id
         self.inputs = {}
         self.outputs = {}
-        self.strategy = Strategy(strategy_id)
+        self.strategy = strategy_cache.get(strategy_id)
         i18n.set_biz(self.strategy.bk_biz_id)
 
     def pull_data(self, item, check_timestamp, inputs=None):
@@ -58,6 +63,13 @@ class CheckProcessor(BaseAbnormalPushProcessor):
             # for debug
             self.inputs[item.id].extend(inputs)
             return
+
+        if settings.NO_DATA_BACKEND == NO_DATA_BACKEND_INDEX:
+            self.pull_index_data(item, check_timestamp)
+            # 索引为空时，继续读取切换前队列中的剩余数据
+            if self.inputs[item.id]:
+                return
+
         # pull data
         data_channel = key.NO_DATA_LIST_KEY.get_key(strategy_id=self.strategy_id, item_id=item.id)
         client = key.NO_DATA_LIST_KEY.client
@@ -78,6 +90,8 @@ class CheckProcessor(BaseAbnormalPushProcessor):
         last_unexpected_record = None
         if records:
             client.ltrim(data_channel, 0, -total_points - 1)
+            codec = QueueCodec(self.strategy_id, item.id)
+            codec.load_schemas(records, client)
             logger.info(
                 "[nodata] strategy({}) item({}) check_timestamp({}) pull records({})".format(
                     self.strategy_id, item.id, check_timestamp, total_points
@@ -86,7 +100,7 @@ class CheckProcessor(BaseAbnormalPushProcessor):
             future_records = []
             for record in records:
                 try:
-                    data_point = DataPoint(json.loads(record), item)
+                    data_point = DataPoint(codec.decode(record), item)
                     if data_point.timestamp <= check_timestamp:
                         self.inputs[item.id].append(data_point)
                     else:
@@ -98,21 +112,21 @@ class CheckProcessor(BaseAbnormalPushProcessor):
             # 如果当前监测点之前无数据，但是未来有数据，那么取未来一个周期的数据
             if not self.inputs[item.id] and future_records:
                 record = future_records[0]
-                data_point = DataPoint(json.loads(record), item)
+                data_point = DataPoint(codec.decode(record), item)
                 earliest_future_timestamp = data_point.timestamp
                 earliest_future_points = [data_point]
-                earliest_future_records_idx = [0]
+                earliest_future_records_idx = {0}
                 for index, record in enumerate(future_records[1:]):
-                    data_point = DataPoint(json.loads(record), item)
+                    data_point = DataPoint(codec.decode(record), item)
                     # 遇到更早时间数据，重置 earliest_future_points 和 earliest_future_records_idx
                     if data_point.timestamp < earliest_future_timestamp:
                         earliest_future_timestamp = data_point.timestamp
                         earliest_future_points = [data_point]
-                        earliest_future_records_idx = [index + 1]
+                        earliest_future_records_idx = {index + 1}
                     # 遇到和当前最早时间一致的数据，加入 earliest_future_points 和 earliest_future_records_idx
                     elif data_point.timestamp == earliest_future_timestamp:
                         earliest_future_points.append(data_point)
-                        earliest_future_records_idx.append(index + 1)
+                        earliest_future_records_idx.add(index + 1)
 
                 self.inputs[item.id] = earliest_future_points
                 future_records = [
@@ -147,6 +161,19 @@ class CheckProcessor(BaseAbnormalPushProcessor):
                 )
             )
 
+    def pull_index_data(self, item, check_timestamp):
+        """
+        从无数据维度索引中获取各维度最近上报时间，索引中的维度已按无数据维度降维
+        """
+        records = NoDataDimensionIndex(self.strategy_id, item.id).consume(check_timestamp)
+        metrics.NODATA_PROCESS_PULL_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG).inc(len(records))
+        self.inputs[item.id] = [DataPoint(record, item) for record in records]
+        logger.info(
+            "[nodata] strategy({}) item({}) check_timestamp({}) 从维度索引拉取维度({})个".format(
+                self.strategy_id, item.id, check_timestamp, len(records)
+            )
+        )
+
     def handle_data(self, item, check_timestamp):
         # check no data
         data_points = self.inputs[item.id]
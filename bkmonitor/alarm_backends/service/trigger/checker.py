@@ -20,10 +20,76 @@ from alarm_backends.core.control.record_parser import RecordParser
 from alarm_backends.core.control.strategy import Strategy
 from alarm_backends.core.detect_result import ANOMALY_LABEL
 from bkmonitor.models import AnomalyRecord
+from bkmonitor.utils.common_utils import chunks
 
 logger = logging.getLogger("trigger")
 
 
+class CheckResultCache(object):
+    """
+    检测结果窗口缓存
+    同一批异常点按 (dimensions_md5, level) 合并检测窗口，通过 pipeline 一次拉取所有窗口的检测结果，
+    各异常点再在内存中按自身的窗口范围过滤
+    """
+
+    # 单个 pipeline 中的最大命令数
+    PIPELINE_CHUNK_SIZE = 1000
+
+    def __init__(self):
+        # (strategy_id, item_id, dimensions_md5, level) -> ((min_score, max_score), check_results)
+        self.results = {}
+
+    def prefetch(self, checkers):
+        """
+        预取一批异常点所需的检测结果
+        :param list[AnomalyChecker] checkers: 异常点检测对象
+        """
+        windows = {}
+        for checker in checkers:
+            for level in checker.anomaly_ids:
+                level = str(int(level))
+                trigger_config = checker.get_trigger_config(level)
+                if trigger_config is None:
+                    continue
+
+                min_score, max_score = checker.get_check_window(trigger_config)
+                window_key = (checker.strategy_id, checker.item_id, checker.dimensions_md5, level)
+                if window_key in windows:
+                    fetched_min_score, fetched_max_score = windows[window_key]
+                    min_score, max_score = min(min_score, fetched_min_score), max(max_score, fetched_max_score)
+                windows[window_key] = (min_score, max_score)
+
+        client = CHECK_RESULT_CACHE_KEY.client
+        for window_keys in chunks(list(windows.keys()), self.PIPELINE_CHUNK_SIZE):
+            pipeline = client.pipeline(transaction=False)
+            for strategy_id, item_id, dimensions_md5, level in window_keys:
+                min_score, max_score = windows[(strategy_id, item_id, dimensions_md5, level)]
+                check_cache_key = CHECK_RESULT_CACHE_KEY.get_key(
+                    strategy_id=strategy_id, item_id=item_id, dimensions_md5=dimensions_md5, level=level
+                )
+                pipeline.zrangebyscore(name=check_cache_key, min=min_score, max=max_score, withscores=True)
+
+            for window_key, check_results in zip(window_keys, pipeline.execute()):
+                self.results[window_key] = (windows[window_key], check_results)
+
+    def get(self, strategy_id, item_id, dimensions_md5, level, min_score, max_score):
+        """
+        获取窗口内的检测结果，窗口未被预取时返回 None
+        """
+        try:
+            (fetched_min_score, fetched_max_score), check_results = self.results[
+                (strategy_id, item_id, dimensions_md5, level)
+            ]
+        except KeyError:
+            return None
+
+        if min_score < fetched_min_score or max_score > fetched_max_score:
+            return None
+
+        # 预取结果已按分数排序，过滤后顺序与 zrangebyscore 一致
+        return [(label, score) for label, score in check_results if min_score <= score <= max_score]
+
+
 class AnomalyChecker(object):
     """
     异常检测逻辑
@@ -32,7 +98,7 @@ class AnomalyChecker(object):
     # 检测窗口单位(默认1min)
     DEFAULT_CHECK_WINDOW_UNIT = 60
 
-    def __init__(self, point, strategy, item_id):
+    def __init__(self, point, strategy, item_id, check_result_cache=None):
         self.item = Strategy.get_item_in_strategy(strategy, item_id)
         self.strategy = strategy
         self.strategy_id = strategy["id"]
@@ -54,6 +120,8 @@ class AnomalyChecker(object):
         # shortcut
         self.dimensions_md5 = self.record_parser.dimensions_md5
         self.source_time = self.record_parser.source_time
+        # 批量处理时预取的检测结果
+        self.check_result_cache = check_result_cache
 
     @staticmethod
     def is_no_data_point(point):
@@ -163,27 +231,39 @@ class AnomalyChecker(object):
                 anomaly_level = level
         return anomaly_level, anomaly_timestamps
 
-    def _check_anomaly_by_level(self, level):
+    def get_trigger_config(self, level):
         """
-        检测某个级别的异常点是否满足触发条件
+        获取告警级别对应的触发配置，没有任何触发配置时返回 None
         :param str level: 告警级别
-        :return: 二元组：是否被触发，异常次数
         """
         try:
-            trigger_config = self.trigger_configs[level]
+            return self.trigger_configs[level]
         except KeyError:
             trigger_configs = self.trigger_configs.values()
             if not trigger_configs:
-                # 如果该等级没有在策略中配置，则不检测
-                logger.error(
-                    "strategy({}), item({}) level({}) trigger config not exists".format(
-                        self.strategy_id, self.item_id, level
-                    )
-                )
-                return False, []
+                return None
 
             # 默认兜底，trigger 配置当前所有告警级别默认一致
-            trigger_config = list(trigger_configs)[0]
+            return list(trigger_configs)[0]
+
+    def get_check_window(self, trigger_config):
+        """
+        检测窗口范围
+        :return: 二元组：窗口起始时间，窗口结束时间
+        """
+        check_window_offset = trigger_config["check_window_size"] * self.check_window_unit - 1
+        return self.source_time - check_window_offset, self.source_time
+
+    def get_check_results(self, level, min_score, max_score):
+        """
+        获取检测窗口内的检测结果，优先使用批量预取的结果
+        """
+        if self.check_result_cache is not None:
+            check_results = self.check_result_cache.get(
+                self.strategy_id, self.item_id, self.dimensions_md5, level, min_score, max_score
+            )
+            if check_results is not None:
+                return check_results
 
         check_cache_key = CHECK_RESULT_CACHE_KEY.get_key(
             strategy_id=self.strategy_id,
@@ -191,11 +271,29 @@ class AnomalyChecker(object):
             dimensions_md5=self.dimensions_md5,
             level=level,
         )
-        # 在对应的打点队列中取出打点信息。时间范围为source_time前后的一个窗口偏移量
-        check_window_offset = trigger_config["check_window_size"] * self.check_window_unit - 1
-        check_results = CHECK_RESULT_CACHE_KEY.client.zrangebyscore(
-            name=check_cache_key, min=self.source_time - check_window_offset, max=self.source_time, withscores=True
+        return CHECK_RESULT_CACHE_KEY.client.zrangebyscore(
+            name=check_cache_key, min=min_score, max=max_score, withscores=True
         )
+
+    def _check_anomaly_by_level(self, level):
+        """
+        检测某个级别的异常点是否满足触发条件
+        :param str level: 告警级别
+        :return: 二元组：是否被触发，异常次数
+        """
+        trigger_config = self.get_trigger_config(level)
+        if trigger_config is None:
+            # 如果该等级没有在策略中配置，则不检测
+            logger.error(
+                "strategy({}), item({}) level({}) trigger config not exists".format(
+                    self.strategy_id, self.item_id, level
+                )
+            )
+            return False, []
+
+        # 在对应的打点队列中取出打点信息。时间范围为source_time前后的一个窗口偏移量
+        min_score, max_score = self.get_check_window(trigger_config)
+        check_results = self.get_check_results(level, min_score, max_score)
         # 统计包含异常标记的key的数量，并与trigger_count进行比较
         anomaly_timestamps = []
         for label, score in check_results:
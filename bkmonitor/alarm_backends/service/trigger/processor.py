@@ -9,7 +9,6 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 
-import json
 import logging
 import time
 
@@ -21,8 +20,9 @@ from alarm_backends.core.cache.key import (
     ANOMALY_SIGNAL_KEY,
     TRIGGER_EVENT_LIST_KEY,
 )
-from alarm_backends.core.control.strategy import Strategy
-from alarm_backends.service.trigger.checker import AnomalyChecker
+from alarm_backends.core.control.strategy import Strategy, strategy_cache
+from alarm_backends.core.processor.codec import QueueCodec
+from alarm_backends.service.trigger.checker import AnomalyChecker, CheckResultCache
 from core.errors.alarm_backends import StrategyNotFound
 from core.prometheus import metrics
 
@@ -42,7 +42,8 @@ class TriggerProcessor(object):
         self.event_records = []
         # 策略快照数据
         self._strategy_snapshots = {}
-        self.strategy = Strategy(self.strategy_id)
+        self.strategy = strategy_cache.get(self.strategy_id)
+        self.codec = QueueCodec(self.strategy_id, self.item_id)
 
     def get_strategy_snapshot(self, key):
         """
@@ -64,6 +65,7 @@ class TriggerProcessor(object):
         # 对列表做翻转，按数据从旧到新的顺序处理
         self.anomaly_points.reverse()
         if self.anomaly_points:
+            self.codec.load_schemas(self.anomaly_points, ANOMALY_LIST_KEY.client)
             metrics.TRIGGER_PROCESS_PULL_DATA_COUNT.labels(strategy_id=metrics.TOTAL_TAG).inc(len(self.anomaly_points))
             ANOMALY_LIST_KEY.client.ltrim(self.anomaly_list_key, 0, -len(self.anomaly_points) - 1)
             if len(self.anomaly_points) == self.MAX_PROCESS_COUNT:
@@ -144,21 +146,48 @@ class TriggerProcessor(object):
         if not in_alarm_time:
             logger.info("[trigger] strategy(%s) not in alarm time: %s, skipped", self.strategy_id, message)
         else:
+            checkers = []
             for point in self.anomaly_points:
                 try:
-                    self.process_point(point)
+                    checkers.append(self.get_checker(point))
                 except Exception as e:
                     error_message = "[process error] strategy({}), item({}) reason: {} \norigin data: {}".format(
                         self.strategy_id, self.item_id, e, point
                     )
                     logger.exception(error_message)
 
+            # 一次性预取所有异常点检测窗口内的检测结果，预取失败时退化为逐点查询
+            check_result_cache = CheckResultCache()
+            try:
+                check_result_cache.prefetch(checkers)
+            except Exception as e:
+                logger.exception(
+                    "[trigger] strategy({}), item({}) prefetch check results error: {}".format(
+                        self.strategy_id, self.item_id, e
+                    )
+                )
+
+            for checker in checkers:
+                checker.check_result_cache = check_result_cache
+                try:
+                    self.process_checker(checker)
+                except Exception as e:
+                    error_message = "[process error] strategy({}), item({}) reason: {} \norigin data: {}".format(
+                        self.strategy_id, self.item_id, e, checker.point
+                    )
+                    logger.exception(error_message)
+
         self.push()
 
-    def process_point(self, point):
-        point = json.loads(point)
+    def get_checker(self, point):
+        point = self.codec.decode(point)
         strategy = self.get_strategy_snapshot(point["strategy_snapshot_key"])
-        checker = AnomalyChecker(point, strategy, self.item_id)
+        return AnomalyChecker(point, strategy, self.item_id)
+
+    def process_point(self, point):
+        self.process_checker(self.get_checker(point))
+
+    def process_checker(self, checker):
         anomaly_records, event_record = checker.check()
 
         # 暂存结果，最后批量保存
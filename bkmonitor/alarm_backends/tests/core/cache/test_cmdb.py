@@ -24,6 +24,7 @@ from alarm_backends.core.cache.cmdb import (
     ServiceInstanceManager,
     TopoManager,
 )
+from alarm_backends.core.cache.cmdb.host import HostIndex
 from alarm_backends.tests.utils.cmdb_data import (
     ALL_HOSTS,
     ALL_MODULES,
@@ -300,6 +301,73 @@ class TestHostManager(TestCase):
         self.assertTrue(HostManager.key_to_internal_value(ip, bk_cloud_id) in local.host_cache)
 
 
+class TestHostIndex(TestCase):
+    def setUp(self):
+        HostManager.clear()
+        self.index = HostIndex()
+
+    def tearDown(self):
+        HostManager.clear()
+
+    def test_refresh(self):
+        HostManager.refresh()
+        self.index.refresh()
+        self.assertEqual(len(self.index.entries), len(ALL_HOSTS) * 2)
+        for host in ALL_HOSTS:
+            entry = self.index.get(host.ip, host.bk_cloud_id)
+            self.assertEqual(entry.host, host)
+            self.assertIs(self.index.get_by_id(host.bk_host_id), entry)
+            self.assertIs(self.index.get_by_id(str(host.bk_host_id)), entry)
+
+        entry = self.index.get("10.0.0.1", "1")
+        expected_nodes = {node.id for nodes in entry.host.topo_link.values() for node in nodes}
+        self.assertSetEqual(set(entry.topo_nodes), expected_nodes)
+        self.assertEqual(self.index.get("10.0.0.2", 2).topo_nodes, [])
+        self.assertIsNone(self.index.get("10.0.0.1", 0))
+
+    @mock.patch("alarm_backends.core.cache.cmdb.host.api.cmdb.get_host_by_topo_node")
+    def test_incremental_refresh(self, get_host_by_topo_node):
+        get_host_by_topo_node.side_effect = lambda bk_biz_id, **kwargs: [
+            host for host in ALL_HOSTS if host.bk_biz_id == bk_biz_id
+        ]
+        HostManager.refresh()
+        self.index.refresh()
+        biz3_entry = self.index.get_by_id(3)
+
+        # 刷新间隔内不检查版本
+        get_host_by_topo_node.side_effect = lambda bk_biz_id, **kwargs: [
+            host for host in ALL_HOSTS if host.bk_biz_id == bk_biz_id and host.bk_host_id != 2
+        ]
+        HostManager.refresh()
+        self.index.refresh()
+        self.assertIsNotNone(self.index.get_by_id(2))
+
+        # 只重新加载变化的业务
+        self.index.refresh(force=True)
+        self.assertIsNone(self.index.get_by_id(2))
+        self.assertIsNone(self.index.get("10.0.0.2", 2))
+        self.assertIsNotNone(self.index.get_by_id(1))
+        self.assertIs(self.index.get_by_id(3), biz3_entry)
+
+    def test_ignore_monitoring(self):
+        HostManager.refresh()
+        with self.settings(HOST_DISABLE_MONITOR_STATES=["运营中[无告警]"]):
+            self.index.refresh()
+            self.assertTrue(self.index.get_by_id(1).ignore_monitoring)
+            self.assertFalse(self.index.get_by_id(2).ignore_monitoring)
+
+        # 配置变化时重新计算
+        with self.settings(HOST_DISABLE_MONITOR_STATES=[]):
+            self.index.refresh(force=True)
+            self.assertFalse(self.index.get_by_id(1).ignore_monitoring)
+
+    def test_disabled(self):
+        HostManager.refresh()
+        with self.settings(HOST_INDEX_REFRESH_INTERVAL=0):
+            self.index.refresh(force=True)
+        self.assertEqual(self.index.entries, {})
+
+
 class TestHostIDManager(TestCase):
     def setUp(self):
         HostIDManager.clear()
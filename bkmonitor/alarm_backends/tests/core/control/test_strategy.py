@@ -5,7 +5,7 @@ from datetime import datetime
 import mock
 from django.test import TestCase
 
-from alarm_backends.core.control.strategy import Strategy
+from alarm_backends.core.control.strategy import Strategy, StrategyObjectCache
 
 STRATEGY = {
     "bk_biz_id": 2,
@@ -99,3 +99,51 @@ class TestStrategy(TestCase):
             [],
         ]
         self.assertFalse(strategy.in_alarm_time(datetime.strptime("2022-01-01 01:00:00", "%Y-%m-%d %H:%M:%S"))[0])
+
+
+class TestStrategyObjectCache(TestCase):
+    def setUp(self):
+        self.versions = {1: "v1", 2: "v1"}
+        self.patchers = [
+            mock.patch(
+                "alarm_backends.core.control.strategy.StrategyCacheManager.get_strategy_versions",
+                side_effect=lambda strategy_ids: {i: self.versions[i] for i in strategy_ids if i in self.versions},
+            ),
+            mock.patch(
+                "alarm_backends.core.control.strategy.StrategyCacheManager.get_strategy_by_id",
+                side_effect=lambda strategy_id: dict(STRATEGY, id=strategy_id),
+            ),
+        ]
+        self.get_strategy_by_id = self.patchers[1].start()
+        self.patchers[0].start()
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+
+    def test_get(self):
+        cache = StrategyObjectCache(max_size=10, max_age=60)
+        strategy = cache.get(1)
+        self.assertIs(cache.get("1"), strategy)
+        self.assertEqual(self.get_strategy_by_id.call_count, 1)
+
+        # 版本变化后重新构建
+        self.versions[1] = "v2"
+        self.assertIsNot(cache.get(1), strategy)
+        self.assertEqual(self.get_strategy_by_id.call_count, 2)
+
+        # 没有版本的策略不缓存
+        cache.get(3)
+        cache.get(3)
+        self.assertEqual(self.get_strategy_by_id.call_count, 4)
+
+    def test_lru(self):
+        cache = StrategyObjectCache(max_size=1, max_age=60)
+        strategies = cache.get_strategies([1, 2])
+        self.assertEqual(set(strategies), {1, 2})
+        self.assertIs(cache.get(2), strategies[2])
+        self.assertIsNot(cache.get(1), strategies[1])
+
+    def test_max_age(self):
+        cache = StrategyObjectCache(max_size=10, max_age=0)
+        self.assertIsNot(cache.get(1), cache.get(1))
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import json
+
+import mock
+import pytest
+
+from alarm_backends.core.processor import codec
+from alarm_backends.core.processor.codec import (
+    CODEC_COMPACT,
+    CODEC_JSON,
+    VERSION_COMPACT,
+    QueueCodec,
+)
+
+RECORD = {
+    "record_id": "6e1e2ab4c3ae6e0f8a5c1f3d1f4c1f1e.1569246480",
+    "value": 1.38,
+    "values": {"timestamp": 1569246480, "load5": 1.38},
+    "dimensions": {"ip": "127.0.0.1", "bk_target_cloud_id": "0"},
+    "time": 1569246480,
+    "access_time": 1569246490.0,
+    "dimension_fields": ["ip", "bk_target_cloud_id"],
+    "__debug__": None,
+}
+
+
+class FakeSchemaStorage(object):
+    def __init__(self):
+        self.data = {}
+
+    def hmset(self, name, mapping):
+        self.data.setdefault(name, {}).update(mapping)
+
+    def expire(self, name, ttl):
+        pass
+
+    def hmget(self, name, keys):
+        return [self.data.get(name, {}).get(k) for k in keys]
+
+
+@pytest.fixture()
+def queue_codec():
+    with mock.patch("alarm_backends.core.processor.codec.settings") as settings:
+        settings.ALARM_QUEUE_CODEC = CODEC_COMPACT
+        yield QueueCodec(1, 2)
+    codec._schema_cache.clear()
+
+
+class TestQueueCodec(object):
+    def test_json(self, queue_codec):
+        queue_codec.codec = CODEC_JSON
+        payloads = queue_codec.encode([RECORD], FakeSchemaStorage())
+        assert json.loads(payloads[0]) == RECORD
+        assert queue_codec.decode(payloads[0]) == RECORD
+
+    def test_compact(self, queue_codec):
+        storage = FakeSchemaStorage()
+        records = [RECORD, dict(RECORD, value=2), {"a": {"b": {"c": {"d": 1}}}}]
+        payloads = queue_codec.encode(records, storage)
+
+        assert all(payload.startswith(VERSION_COMPACT) for payload in payloads)
+        assert len(storage.data[queue_codec.schema_key]) == 2
+        assert sum(map(len, payloads[:1])) < len(json.dumps(RECORD))
+
+        # 其他进程解码时需要从 redis 加载 schema
+        codec._schema_cache.clear()
+        queue_codec.load_schemas(payloads, storage)
+        assert [queue_codec.decode(payload) for payload in payloads] == records
+
+    def test_legacy_payload(self, queue_codec):
+        assert queue_codec.decode(json.dumps(RECORD)) == RECORD
+
+    def test_invalid_payload(self, queue_codec):
+        payload = queue_codec.encode([RECORD], FakeSchemaStorage())[0]
+        codec._schema_cache.clear()
+        with pytest.raises(ValueError):
+            queue_codec.decode(payload)
+
+        with pytest.raises(ValueError):
+            queue_codec.decode("invalid")
+
+    def test_max_batch_schemas(self, queue_codec):
+        storage = FakeSchemaStorage()
+        records = [{"field_{}".format(i): i} for i in range(codec.MAX_BATCH_SCHEMAS + 1)]
+        payloads = queue_codec.encode(records, storage)
+        assert len(storage.data[queue_codec.schema_key]) == codec.MAX_BATCH_SCHEMAS
+        assert payloads[-1] == json.dumps(records[-1])
+        assert [queue_codec.decode(payload) for payload in payloads] == records
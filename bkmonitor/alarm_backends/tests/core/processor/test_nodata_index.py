@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import copy
+
+from alarm_backends.core.control.mixins.nodata import CheckMixin
+from alarm_backends.core.processor.nodata_index import (
+    CONSUME_INDEX_SCRIPT,
+    UPDATE_INDEX_SCRIPT,
+    NoDataDimensionIndex,
+)
+
+RECORDS = [
+    {"dimensions": {"ip": "127.0.0.1", "bk_target_cloud_id": "0", "device": "eth0"}, "time": 1569246480},
+    {"dimensions": {"ip": "127.0.0.1", "bk_target_cloud_id": "0", "device": "eth1"}, "time": 1569246540},
+    {"dimensions": {"ip": "127.0.0.2", "bk_target_cloud_id": "0", "device": "eth0"}, "time": 1569246480},
+    {"dimensions": {"device": "eth0"}, "time": 1569246480},
+]
+
+
+class MockPoint(object):
+    def __init__(self, record):
+        self.dimensions = copy.deepcopy(record["dimensions"])
+        self.timestamp = record["time"]
+
+
+class FakeScriptClient(object):
+    """
+    模拟 redis 执行索引更新及消费脚本
+    """
+
+    def __init__(self):
+        self.data = {}
+
+    def pipeline(self):
+        return self
+
+    def expire(self, *args):
+        pass
+
+    def evalsha(self, sha, numkeys, index_key, *args):
+        index = self.data.setdefault(index_key, {})
+        if sha == UPDATE_INDEX_SCRIPT.sha:
+            for offset in range(0, len(args), 3):
+                dimensions_md5, timestamp, dimensions = args[offset : offset + 3]
+                current = index.get(dimensions_md5)
+                if current is None or int(current.split("|")[0]) < timestamp:
+                    index[dimensions_md5] = f"{timestamp}|{dimensions}"
+            return 1
+
+        assert sha == CONSUME_INDEX_SCRIPT.sha
+        check_timestamp = args[0]
+        timestamps = {dimensions_md5: int(value.split("|")[0]) for dimensions_md5, value in index.items()}
+        consumed = [dimensions_md5 for dimensions_md5, timestamp in timestamps.items() if timestamp <= check_timestamp]
+        if not consumed and timestamps:
+            earliest_future_timestamp = min(timestamps.values())
+            consumed = [
+                dimensions_md5
+                for dimensions_md5, timestamp in timestamps.items()
+                if timestamp == earliest_future_timestamp
+            ]
+
+        result = []
+        for dimensions_md5 in consumed:
+            result.extend([dimensions_md5, index.pop(dimensions_md5)])
+        return result
+
+
+def test_reduce_dimensions():
+    index_data = NoDataDimensionIndex.reduce_dimensions(["ip", "bk_target_cloud_id"], RECORDS)
+
+    # 与 nodata 检测时的降维结果一致，同一维度保留最近上报时间
+    result = CheckMixin._process_dimensions(["ip", "bk_target_cloud_id"], [MockPoint(record) for record in RECORDS])
+    assert {md5: timestamp for md5, (timestamp, _) in index_data.items()} == result["dimensions_md5_timestamp"]
+    assert sorted(dimensions["ip"] for _, dimensions in index_data.values()) == ["127.0.0.1", "127.0.0.2"]
+
+
+def test_update_and_consume():
+    client = FakeScriptClient()
+    index = NoDataDimensionIndex(1, 1)
+    index_data = NoDataDimensionIndex.reduce_dimensions(["ip", "bk_target_cloud_id"], RECORDS)
+    index.update(client, index_data)
+
+    # 乱序写入更早的数据不覆盖最近上报时间
+    index.update(client, NoDataDimensionIndex.reduce_dimensions(["ip", "bk_target_cloud_id"], RECORDS[:1]))
+
+    records = index.consume(1569246480, client)
+    assert [record["time"] for record in records] == [1569246480]
+    assert all(record["dimensions"]["__NO_DATA_DIMENSION__"] for record in records)
+
+    # 检测时间点之前已无维度时，取未来最早时间点的维度
+    assert [record["time"] for record in index.consume(1569246480, client)] == [1569246540]
+    assert index.consume(1569246540, client) == []
+
+
+def test_consume_skip_check_timestamp():
+    client = FakeScriptClient()
+    index = NoDataDimensionIndex(1, 1)
+    records = [
+        {"dimensions": {"ip": "127.0.0.1", "bk_target_cloud_id": "0"}, "time": 1569246420},
+        {"dimensions": {"ip": "127.0.0.2", "bk_target_cloud_id": "0"}, "time": 1569246420},
+    ]
+    index.update(client, NoDataDimensionIndex.reduce_dimensions(["ip", "bk_target_cloud_id"], records))
+
+    # 127.0.0.2 跳过检测周期 1569246480，之后才上报
+    late_record = {"dimensions": {"ip": "127.0.0.2", "bk_target_cloud_id": "0"}, "time": 1569246540}
+    index.update(client, NoDataDimensionIndex.reduce_dimensions(["ip", "bk_target_cloud_id"], [late_record]))
+
+    # 未来上报的维度不参与当前检测，以免掩盖无数据告警
+    records = index.consume(1569246480, client)
+    assert [(record["dimensions"]["ip"], record["time"]) for record in records] == [("127.0.0.1", 1569246420)]
+
+    records = index.consume(1569246540, client)
+    assert [(record["dimensions"]["ip"], record["time"]) for record in records] == [("127.0.0.2", 1569246540)]
@@ -10,6 +10,7 @@ specific language governing permissions and limitations under the License.
 """
 
 
+from bkmonitor.utils.range import load_condition_instance
 from bkmonitor.utils.range.conditions import (
     AndCondition,
     EqualCondition,
@@ -25,6 +26,7 @@ from bkmonitor.utils.range.conditions import (
     RegularCondition,
 )
 from bkmonitor.utils.range.fields import DimensionField
+from bkmonitor.utils.range.target import TargetCondition
 
 
 class TestCondition(object):
@@ -211,3 +213,59 @@ class TestCondition(object):
         and_condition.add(condition3)
         assert not and_condition.is_match({"key": "123"})
         assert and_condition.is_match({"key": "1234235678"})
+
+    def test_compile(self):
+        conditions_config = [
+            [
+                {"field": "ip", "method": "eq", "value": ["127.0.0.1", "127.0.0.2"]},
+                {"field": "device", "method": "nreg", "value": ["^lo$", "["]},
+                {"field": "usage", "method": "gte", "value": 10},
+            ],
+            [
+                {"field": "device", "method": "include", "value": ["eth", "bond"]},
+                {"field": "usage", "method": "lt", "value": [5, 6]},
+                {"field": "mount", "method": "neq", "value": "/"},
+            ],
+            [{"field": "bk_topo_node", "method": "exclude", "value": "set|1"}],
+        ]
+        data_list = [
+            {"ip": "127.0.0.1", "device": "eth0", "usage": 10},
+            {"ip": "127.0.0.1", "device": "lo", "usage": "42"},
+            {"ip": "127.0.0.3", "device": "bond1", "usage": 4, "mount": "/data"},
+            {"ip": "127.0.0.3", "device": "bond1", "usage": 4, "mount": "/"},
+            {"ip": ["127.0.0.3", "127.0.0.2"], "usage": [11, 12]},
+            {"bk_topo_node": ["set|1", "module|2"]},
+            {"bk_topo_node": ["module|2"], "usage": "nan"},
+            {},
+        ]
+        for default_value_if_not_exists in [True, False]:
+            condition = load_condition_instance(conditions_config, default_value_if_not_exists)
+            matcher = condition.compile()
+            for data in data_list:
+                assert bool(matcher(data)) == bool(condition.is_match(data))
+
+        assert load_condition_instance([]).compile()({"key": "value"})
+        assert load_condition_instance([[]]).compile()({"key": "value"})
+
+    def test_target_condition(self):
+        target = [
+            [
+                {"field": "ip", "method": "eq", "value": [{"ip": "127.0.0.1", "bk_cloud_id": 0}, {"bk_host_id": 2}]},
+                {"field": "host_topo_node", "method": "neq", "value": [{"bk_obj_id": "set", "bk_inst_id": 1}]},
+            ],
+        ]
+        condition = TargetCondition(target)
+        assert condition.is_match({"ip": "127.0.0.1", "bk_cloud_id": 0, "bk_topo_node": ["module|1"]})
+        assert condition.is_match({"bk_host_id": 2, "bk_topo_node": ["module|1"]})
+        assert not condition.is_match({"bk_host_id": 3, "bk_topo_node": ["module|1"]})
+        assert not condition.is_match({"bk_host_id": 2, "bk_topo_node": ["set|1", "module|1"]})
+        # 缺少拓扑信息时，数据无效
+        assert not condition.is_match({"bk_host_id": 2})
+        assert not condition.is_match({"bk_host_id": 2, "bk_topo_node": []})
+        # 缺少主机信息时，忽略主机条件
+        assert condition.is_match({"bk_topo_node": ["module|1"]})
+
+        target.append([{"field": "service_instance_id", "method": "eq", "value": [{"service_instance_id": 3}]}])
+        condition = TargetCondition(target)
+        assert condition.is_match({"service_instance_id": 3, "bk_host_id": 3})
+        assert not condition.is_match({"service_instance_id": 4, "bk_host_id": 3, "bk_topo_node": ["module|1"]})
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import mock
+from django.test import override_settings
+
+from alarm_backends.core.kafka_partition import (
+    PARTITION_ASSIGN_BACKEND_LOAD,
+    PartitionAssigner,
+)
+from alarm_backends.management.hashring import HashRing, assign_with_load
+
+PARTITIONS = [f"topic|{index}" for index in range(30)]
+
+
+class TestHashRing:
+    def test_ring_cache(self):
+        ring = HashRing({"a": 1, "b": 1})
+        # 节点相同时复用虚拟节点
+        assert HashRing({"b": 1, "a": 1}).ring is ring.ring
+        assert list(ring.iter_nodes("key")) in (["a", "b"], ["b", "a"])
+
+    def test_assign_with_load(self):
+        loads = {partition: 1000 if index < 3 else 1 for index, partition in enumerate(PARTITIONS)}
+        assignment = assign_with_load(PARTITIONS, ["a", "b", "c"], loads)
+
+        # 热点分区分散到不同节点
+        for host_partitions in assignment.values():
+            assert len([partition for partition in host_partitions if loads[partition] == 1000]) == 1
+        assert sorted(sum(assignment.values(), [])) == sorted(PARTITIONS)
+
+        # 节点不变时保持原分配
+        previous = {partition: host for host, host_partitions in assignment.items() for partition in host_partitions}
+        new_assignment = assign_with_load(PARTITIONS, ["a", "b", "c"], loads, previous)
+        assert {host: sorted(partitions) for host, partitions in new_assignment.items()} == {
+            host: sorted(partitions) for host, partitions in assignment.items()
+        }
+
+        # 节点减少时，只迁移下线节点上的分区
+        new_assignment = assign_with_load(PARTITIONS, ["a", "b"], loads, previous)
+        for host in ["a", "b"]:
+            assert set(assignment[host]) <= set(new_assignment[host])
+
+
+class TestPartitionAssigner:
+    @override_settings(KAFKA_PARTITION_ASSIGN_BACKEND=PARTITION_ASSIGN_BACKEND_LOAD)
+    @mock.patch("alarm_backends.core.kafka_partition.metrics.report_all")
+    @mock.patch("alarm_backends.core.kafka_partition.get_partition_loads")
+    def test_assign(self, get_partition_loads, report_all):
+        get_partition_loads.return_value = {"server|topic|0": 1000, "server|topic|1": 1000}
+        assigner = PartitionAssigner("test")
+        load_keys = {partition: f"server|{partition}" for partition in PARTITIONS}
+        assignment = assigner.assign(PARTITIONS, ["a", "b"], load_keys)
+
+        hosts = {partition: host for host, partitions in assignment.items() for partition in partitions}
+        assert hosts["topic|0"] != hosts["topic|1"]
+        assert assigner.previous == hosts
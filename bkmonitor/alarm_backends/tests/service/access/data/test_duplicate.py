@@ -15,7 +15,11 @@ import copy
 import fakeredis
 import pytest
 
-from alarm_backends.service.access.data.duplicate import Duplicate
+from alarm_backends.service.access.data.duplicate import (
+    BatchDuplicate,
+    Duplicate,
+    get_duplicate,
+)
 
 from .config import STANDARD_DATA
 
@@ -65,3 +69,95 @@ class TestDuplicate(object):
         assert dup.is_duplicate(record_1) is True
         assert dup.is_duplicate(record_2) is True
         assert dup.is_duplicate(record) is False
+
+
+class FakeScriptClient(object):
+    """
+    模拟 redis 执行批量判断脚本
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.commands = []
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def evalsha(self, sha, numkeys, dup_key, other_dup_key, *args):
+        def is_member(digest, record_id):
+            return int(digest in self.data.get(dup_key, set()) or record_id in self.data.get(other_dup_key, set()))
+
+        self.commands.append(lambda: [is_member(*args[i : i + 2]) for i in range(0, len(args), 2)])
+
+    def smembers(self, dup_key):
+        self.commands.append(lambda: set(self.data.get(dup_key, set())))
+
+    def sadd(self, dup_key, *record_ids):
+        self.commands.append(lambda: self.data.setdefault(dup_key, set()).update(record_ids))
+
+    def expire(self, dup_key, ttl):
+        self.commands.append(lambda: True)
+
+    def execute(self):
+        results = [command() for command in self.commands]
+        self.commands = []
+        return results
+
+
+class TestBatchDuplicate(object):
+    def test_duplicate(self):
+        client = FakeScriptClient()
+        dup = BatchDuplicate("123456789")
+        dup.client = client
+
+        record_1 = MockRecord(copy.deepcopy(STANDARD_DATA))
+        record_2 = MockRecord(copy.deepcopy(STANDARD_DATA))
+        record_2.time += 60
+        dup.prefetch([record_1, record_2])
+        assert dup.is_duplicate(record_1) is False
+        dup.add_record(record_1)
+        assert dup.is_duplicate(record_1) is True
+        dup.refresh_cache()
+
+        dup = BatchDuplicate("123456789")
+        dup.client = client
+        dup.prefetch([record_1, record_2])
+        assert dup.is_duplicate(record_1) is True
+        assert dup.is_duplicate(record_2) is False
+
+        # 未预加载的数据单独判断
+        record_3 = MockRecord(copy.deepcopy(STANDARD_DATA))
+        record_3.record_id = "other"
+        assert dup.is_duplicate(record_3) is False
+
+    def test_switch_backend(self):
+        client = FakeScriptClient()
+        record_1 = MockRecord(copy.deepcopy(STANDARD_DATA))
+        record_2 = MockRecord(copy.deepcopy(STANDARD_DATA))
+        record_2.record_id = "other"
+
+        # 逐条去重写入的数据，切换为批量去重后仍判断为重复
+        dup = Duplicate("123456789")
+        dup.client = client
+        dup.add_record(record_1)
+        dup.refresh_cache()
+
+        dup = BatchDuplicate("123456789")
+        dup.client = client
+        dup.prefetch([record_1, record_2])
+        assert dup.is_duplicate(record_1) is True
+        assert dup.is_duplicate(record_2) is False
+        dup.add_record(record_2)
+        dup.refresh_cache()
+
+        # 批量去重写入的数据，切换回逐条去重后仍判断为重复
+        dup = Duplicate("123456789")
+        dup.client = client
+        assert dup.is_duplicate(record_1) is True
+        assert dup.is_duplicate(record_2) is True
+
+    def test_get_duplicate(self, settings):
+        settings.ACCESS_DUPLICATE_BACKEND = "set"
+        settings.ACCESS_DUPLICATE_GROUP_BACKENDS = {"123456789": "batch"}
+        assert type(get_duplicate("123456789")) is BatchDuplicate
+        assert type(get_duplicate("987654321")) is Duplicate
@@ -18,7 +18,12 @@ import mock
 import pytest
 
 from alarm_backends.core.cache import key
-from alarm_backends.service.access.data import AccessDataProcess
+from alarm_backends.core.control.strategy import Strategy
+from alarm_backends.service.access.data import (
+    AccessDataProcess,
+    AccessRealTimeDataProcess,
+)
+from alarm_backends.service.access.data.push import PushPlan
 from bkmonitor.models import CacheNode
 from bkmonitor.utils.common_utils import count_md5
 
@@ -152,3 +157,83 @@ class TestAccessDataProcess(object):
             strategy_id=strategy_id, noise_dimension_hash=noise_dimension_hash
         )
         assert client.zrangebyscore(record_key, start_timestamp, int(time.time() + 1)) == []
+
+
+class TestPushPlan(object):
+    def setup_method(self):
+        CacheNode.refresh_from_settings()
+        self.client = fakeredis.FakeRedis(decode_responses=True)
+        self.client.flushall()
+
+    @staticmethod
+    def make_item(item_id):
+        item = mock.MagicMock(id=item_id, query_configs=[{"agg_interval": 60}])
+        item.strategy.strategy_id = 1
+        item.strategy.notice = {}
+        return item
+
+    def test_queue_overload(self, settings):
+        settings.SQL_MAX_LIMIT = 1
+        overload_key = key.DATA_LIST_KEY.get_key(strategy_id=1, item_id=1)
+        self.client.lpush(overload_key, *range(11))
+
+        plan = PushPlan("123456789", self.client)
+        record = MockRecord(STANDARD_DATA)
+        plan.add_queue(self.make_item(1), [record])
+        plan.add_queue(self.make_item(2), [record, record])
+        plan.add_queue(self.make_item(2), [record], key.NO_DATA_LIST_KEY)
+        plan.add_signal({1})
+
+        # 积压的队列不再写入，其余队列及信号正常推送后抛出异常
+        with pytest.raises(Exception):
+            plan.execute()
+        assert self.client.llen(overload_key) == 11
+        assert self.client.llen(key.DATA_LIST_KEY.get_key(strategy_id=1, item_id=2)) == 2
+        assert self.client.llen(key.NO_DATA_LIST_KEY.get_key(strategy_id=1, item_id=2)) == 1
+        assert self.client.lrange(key.DATA_SIGNAL_KEY.get_key(), 0, -1) == ["1"]
+
+
+class TestAccessRealTimeDataProcess(object):
+    def test_decode_records(self):
+        value = json.dumps({"metrics": {"load5": 1}, "dimensions": {"ip": "127.0.0.1"}, "time": 1573701305})
+        records = [
+            mock.MagicMock(topic="topic", value=value.encode() + b"\n"),
+            mock.MagicMock(topic="topic", value=value.encode() + b"\x00"),
+            mock.MagicMock(topic="topic", value=value.encode()),
+        ]
+        assert AccessRealTimeDataProcess.decode_records(records) == [json.loads(value)] * 3
+
+        # 存在异常数据时逐条解析
+        records.append(mock.MagicMock(topic="topic", value=b"{"))
+        assert AccessRealTimeDataProcess.decode_records(records) == [json.loads(value)] * 3 + [None]
+
+    def test_buffer_backpressure(self, settings):
+        settings.REAL_TIME_TOPIC_BUFFER_SIZE = 1
+        process = AccessRealTimeDataProcess(mock.MagicMock())
+        consumer = mock.MagicMock()
+        partition = mock.MagicMock(topic="topic")
+
+        assert process.put_records("kafka:9092", consumer, partition, [1])
+        assert not process.put_records("kafka:9092", consumer, partition, [2])
+        consumer.pause.assert_called_once_with(partition)
+
+        # 缓冲区消费后，下一轮拉取时写入暂存数据并恢复分区拉取
+        assert process.get_buffer("kafka:9092", "topic").get_nowait() == [1]
+        process.flush_pending_records("kafka:9092", consumer)
+        consumer.resume.assert_called_once_with(partition)
+        assert process.get_buffer("kafka:9092", "topic").get_nowait() == [2]
+        assert not process.pending_records["kafka:9092"]
+
+    def test_real_time_item(self):
+        process = AccessRealTimeDataProcess(mock.MagicMock())
+        strategy = Strategy(1, copy.deepcopy(STRATEGY_CONFIG_V3))
+        dimensions = ["ip", "bk_cloud_id"]
+
+        item = process.get_real_time_item(strategy, dimensions)
+        assert item.query_configs[0]["agg_dimension"] == dimensions
+        assert item.data_sources[0].group_by == dimensions
+        # 共享的策略对象不被修改
+        assert strategy.items[0].query_configs[0]["agg_dimension"] == ["bk_target_ip", "bk_target_cloud_id"]
+
+        assert process.get_real_time_item(strategy, dimensions) is item
+        assert process.get_real_time_item(Strategy(1, copy.deepcopy(STRATEGY_CONFIG_V3)), dimensions) is not item
@@ -14,6 +14,7 @@ from collections import namedtuple
 
 import mock
 import pytest
+from kafka import TopicPartition
 
 from alarm_backends.service.access import AccessRealTimeDataProcess
 
@@ -133,7 +134,7 @@ class TestAccessDataProcess(object):
         p.run_consumer_manager(once=True)
         for consumer in p.consumers.values():
             consumer.poll = lambda *args, **kwargs: {
-                "record1": [
+                TopicPartition("topic", 0): [
                     b'{"time":1646654276,"dimensions":{"bk_biz_id":3,"bk_cloud_id":0,"bk_cmdb_level":"null",'
                     b'"bk_supplier_id":0,"bk_target_cloud_id":"0","bk_target_ip":"127.0.0.2",'
                     b'"device_name":"cpu-total","hostname":"VM-233-232-centos","ip":"127.0.0.2"},'
@@ -141,7 +142,7 @@ class TestAccessDataProcess(object):
                     b'"nice":0.0000032647704520309565,"softirq":0.001961290886801718,"stolen":null,'
                     b'"system":0.0088828947147627,"usage":5.549278091672173,"user":0.025378829756153826}}'
                 ],
-                "record2": [
+                TopicPartition("topic", 1): [
                     b'{"time":1646654289,"dimensions":{"bk_biz_id":2,"bk_cloud_id":0,"bk_cmdb_level":"null",'
                     b'"bk_supplier_id":0,"bk_target_cloud_id":"0","bk_target_ip":"127.0.0.1",'
                     b'"device_name":"cpu-total","hostname":"VM-68-183-centos","ip":"127.0.0.1"},"metrics":'
@@ -151,7 +152,8 @@ class TestAccessDataProcess(object):
                 ],
             }
         p.run_poller(once=True)
-        assert p.queue.qsize() == 4
+        assert sum(buffer.qsize() for buffers in p.buffers.values() for buffer in buffers.values()) == 4
+        assert p.buffers["kafka1.service.consul:9092"]["topic"].qsize() == 2
 
     def test_handler(self):
         ConsumerRecord = namedtuple("ConsumerRecord", ["topic", "value"])
@@ -163,35 +165,29 @@ class TestAccessDataProcess(object):
             "kafka2.service.consul:9092|topic2": {"strategy_ids": [3, 4], "dimensions": ["ip", "bk_cloud_id"]},
         }
         message = f'{{"time":{int(time.time())},"dimensions":{{"bk_biz_id":3,"bk_cloud_id":0,"bk_cmdb_level":"null",'
-        p.queue.put(
-            (
-                "kafka1.service.consul:9092",
-                [
-                    ConsumerRecord(
-                        "topic1",
-                        message.encode() + b'"bk_supplier_id":0,"bk_target_cloud_id":"0","bk_target_ip":"127.0.0.2",'
-                        b'"device_name":"cpu-total","hostname":"VM-233-232-centos","ip":"127.0.0.2"},'
-                        b'"metrics":{"guest":0,"idle":0.9633778145526556,"interrupt":0,"iowait":0.00039590531917403843,'
-                        b'"nice":0.0000032647704520309565,"softirq":0.001961290886801718,"stolen":null,'
-                        b'"system":0.0088828947147627,"usage":5.549278091672173,"user":0.025378829756153826}}',
-                    )
-                ],
-            )
+        p.get_buffer("kafka1.service.consul:9092", "topic1").put(
+            [
+                ConsumerRecord(
+                    "topic1",
+                    message.encode() + b'"bk_supplier_id":0,"bk_target_cloud_id":"0","bk_target_ip":"127.0.0.2",'
+                    b'"device_name":"cpu-total","hostname":"VM-233-232-centos","ip":"127.0.0.2"},'
+                    b'"metrics":{"guest":0,"idle":0.9633778145526556,"interrupt":0,"iowait":0.00039590531917403843,'
+                    b'"nice":0.0000032647704520309565,"softirq":0.001961290886801718,"stolen":null,'
+                    b'"system":0.0088828947147627,"usage":5.549278091672173,"user":0.025378829756153826}}',
+                )
+            ]
         )
         message = f'{{"time":{int(time.time())},"dimensions":{{"bk_biz_id":2,"bk_cloud_id":0,"bk_cmdb_level":"null",'
-        p.queue.put(
-            (
-                "kafka2.service.consul:9092",
-                [
-                    ConsumerRecord(
-                        "topic2",
-                        message.encode() + b'"bk_supplier_id":0,"bk_target_cloud_id":"0","bk_target_ip":"127.0.0.1",'
-                        b'"device_name":"cpu-total","hostname":"VM-68-183-centos","ip":"127.0.0.1"},"metrics":'
-                        b'{"guest":0,"idle":0.8892071480874113,"interrupt":0,"iowait":0.01150230305921522,'
-                        b'"nice":0.000008206645092959288,"softirq":0.005655448600487947,"stolen":0,'
-                        b'"system":0.024662938476193073,"usage":17.05800814878766,"user":0.06896395513159939}}',
-                    )
-                ],
-            )
+        p.get_buffer("kafka2.service.consul:9092", "topic2").put(
+            [
+                ConsumerRecord(
+                    "topic2",
+                    message.encode() + b'"bk_supplier_id":0,"bk_target_cloud_id":"0","bk_target_ip":"127.0.0.1",'
+                    b'"device_name":"cpu-total","hostname":"VM-68-183-centos","ip":"127.0.0.1"},"metrics":'
+                    b'{"guest":0,"idle":0.8892071480874113,"interrupt":0,"iowait":0.01150230305921522,'
+                    b'"nice":0.000008206645092959288,"softirq":0.005655448600487947,"stolen":0,'
+                    b'"system":0.024662938476193073,"usage":17.05800814878766,"user":0.06896395513159939}}',
+                )
+            ]
         )
         p.run_handler(once=True)
@@ -17,7 +17,7 @@ from django.test import TestCase
 from elasticsearch.helpers import BulkIndexError
 
 from alarm_backends.core.alert import Alert, Event
-from alarm_backends.core.alert.alert import AlertUIDManager
+from alarm_backends.core.alert.alert import AlertCache, AlertUIDManager
 from alarm_backends.core.cache.key import ALERT_DEDUPE_CONTENT_KEY, ALERT_SNAPSHOT_KEY
 from alarm_backends.service.alert.builder.processor import AlertBuilder
 from api.cmdb.define import Host
@@ -198,6 +198,41 @@ class TestProcessor(TestCase):
         self.assertEqual(1, len(result[1].logs))
         self.assertEqual("CREATE", result[1].logs[0]["op_type"])
 
+    def test_build_alerts_with_version__conflict(self):
+        processor = AlertBuilder()
+
+        time1 = int(time.time())
+        events = [
+            Event(
+                {
+                    "event_id": str(i),
+                    "plugin_id": "fta-test",
+                    "alert_name": "CPU usage high",
+                    "time": time1 + i,
+                    "severity": 1,
+                    "target": "10.0.0.1",
+                    "dedupe_keys": ["alert_name", "target"],
+                }
+            )
+            for i in range(2)
+        ]
+
+        # 第一次写入冲突，重试时复用已创建的告警，不再重复创建及丰富
+        with mock.patch.object(
+            AlertCache, "compare_and_save_alerts", side_effect=[{events[0].dedupe_md5}, set()]
+        ), mock.patch.object(Alert, "from_event", wraps=Alert.from_event) as from_event, mock.patch.object(
+            processor, "enrich_alerts", side_effect=lambda alerts: alerts
+        ) as enrich_alerts, mock.patch.object(
+            processor, "save_alerts", side_effect=lambda alerts, **kwargs: alerts
+        ):
+            result = processor.build_alerts_with_version(events)
+
+        self.assertEqual(from_event.call_count, 1)
+        self.assertEqual([len(call[0][0]) for call in enrich_alerts.call_args_list], [1, 0])
+        self.assertEqual(len(result), 1)
+        self.assertEqual(time1 + 1, result[0].latest_time)
+        self.assertEqual(2, len(result[0].logs))
+
     def test_build_alerts__expired(self):
         event_time = int(time.time())
         alert_time = event_time - 500
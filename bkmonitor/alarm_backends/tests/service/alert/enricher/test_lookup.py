@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import mock
+from django.test import TestCase
+
+from alarm_backends.service.alert.enricher.lookup import CMDBLookup
+from api.cmdb.define import Host
+
+HOSTS = {
+    "127.0.0.1|0": Host(attrs={"bk_host_innerip": "127.0.0.1", "bk_cloud_id": 0, "bk_host_id": 1, "bk_biz_id": 2}),
+    "127.0.0.2|0": Host(attrs={"bk_host_innerip": "127.0.0.2", "bk_cloud_id": 0, "bk_host_id": 2, "bk_biz_id": 2}),
+}
+
+
+def multi_get_hosts(keys):
+    return {key: HOSTS.get(key) for key in keys}
+
+
+class TestCMDBLookup(TestCase):
+    @mock.patch("alarm_backends.core.cache.cmdb.HostIDManager.multi_get_with_dict", return_value={"2": "127.0.0.2|0"})
+    @mock.patch("alarm_backends.core.cache.cmdb.HostManager.multi_get_with_dict", side_effect=multi_get_hosts)
+    @mock.patch(
+        "alarm_backends.core.cache.cmdb.HostIPManager.multi_get_with_dict",
+        side_effect=lambda keys: {key: ["127.0.0.1|0"] if key == "127.0.0.1" else None for key in keys},
+    )
+    def test_resolve(self, host_ip_mock, host_mock, host_id_mock):
+        lookup = CMDBLookup()
+        lookup.add_ip("127.0.0.1")
+        lookup.add_host_id(2)
+        lookup.resolve()
+
+        self.assertEqual(lookup.get_host_by_ip("127.0.0.1")[0].bk_host_id, 1)
+        # 主机缓存中不存在 bk_host_id 的 key 时，通过 ip|bk_cloud_id 获取
+        self.assertEqual(lookup.get_host_by_id(2).bk_host_id, 2)
+
+        # 已查询过的 key 不再重复查询
+        host_mock.reset_mock()
+        lookup.add_ip("127.0.0.1")
+        lookup.add_host("127.0.0.2", 0)
+        lookup.resolve()
+        host_mock.assert_not_called()
+        self.assertEqual(host_ip_mock.call_count, 1)
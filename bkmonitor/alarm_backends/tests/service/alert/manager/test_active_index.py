@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+from django.test import TestCase
+
+from alarm_backends.core.alert import Alert
+from alarm_backends.core.alert.active_index import SCHEDULE_INTERVAL, ActiveAlertIndex
+from alarm_backends.core.alert.alert import AlertKey
+from alarm_backends.core.cache.key import ALERT_ACTIVE_INDEX_KEY
+from bkmonitor.models import CacheNode
+from constants.alert import EventStatus
+
+
+class TestActiveAlertIndex(TestCase):
+    def setUp(self):
+        CacheNode.refresh_from_settings()
+        ALERT_ACTIVE_INDEX_KEY.client.flushall()
+
+    def tearDown(self):
+        ALERT_ACTIVE_INDEX_KEY.client.flushall()
+
+    def test_schedule(self):
+        index = ActiveAlertIndex()
+        now = 1617504000
+        index.add([AlertKey("1", 1), AlertKey("2", 2)], schedule_time=now)
+        # 已在索引中的告警保持原有的调度时间
+        index.add([AlertKey("1", 1)], schedule_time=now + 30)
+        index.add([AlertKey("3", 0)], schedule_time=now + 30)
+
+        self.assertEqual({str(alert_key) for alert_key in index.pop_due(now)}, {"1|1", "2|2"})
+        # 取出的告警顺延一个周期，不会被重复调度
+        self.assertEqual([str(alert_key) for alert_key in index.pop_due(now + 30)], ["3|0"])
+        self.assertEqual({str(alert_key) for alert_key in index.pop_due(now + SCHEDULE_INTERVAL)}, {"1|1", "2|2"})
+
+    def test_update(self):
+        index = ActiveAlertIndex()
+        alerts = [
+            Alert({"id": "1", "strategy_id": 1, "status": EventStatus.ABNORMAL}),
+            Alert({"id": "2", "strategy_id": 1, "status": EventStatus.ABNORMAL, "is_blocked": True}),
+        ]
+        index.update(alerts)
+        self.assertEqual(index.size(), 1)
+
+        alerts[0].data["status"] = EventStatus.RECOVERED
+        index.update(alerts)
+        self.assertEqual(index.size(), 0)
+
+    def test_reconcile(self):
+        index = ActiveAlertIndex()
+        now = 1617504000
+        index.add([AlertKey("1", 1), AlertKey("2", 1)], schedule_time=now)
+        # 校正开始后新加入的告警不做清理
+        index.add([AlertKey("3", 1)], schedule_time=now + SCHEDULE_INTERVAL + 10)
+
+        stale_count = index.reconcile([AlertKey("1", 1), AlertKey("4", 1)], now)
+        self.assertEqual(stale_count, 1)
+        self.assertEqual(
+            {str(alert_key) for alert_key in index.pop_due(now + SCHEDULE_INTERVAL + 10)}, {"1|1", "3|1", "4|1"}
+        )
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import json
+
+from django.test import TestCase, override_settings
+
+from alarm_backends.core.alert import Alert, AlertCache
+from alarm_backends.core.alert.snapshot import (
+    COMPRESSED_PREFIX,
+    SNAPSHOT_CODEC_ZLIB,
+    decode_alert,
+    decode_reference,
+    encode_alert,
+)
+from alarm_backends.core.cache.key import ALERT_DEDUPE_CONTENT_KEY, ALERT_SNAPSHOT_KEY
+from constants.alert import EventStatus
+
+
+def make_alert_data(alert_id, status=EventStatus.ABNORMAL):
+    return {
+        "id": alert_id,
+        "strategy_id": 1,
+        "dedupe_md5": "dedupe_md5",
+        "status": status,
+        "begin_time": 1617504000,
+        "create_time": 1617504000,
+        "latest_time": 1617504060,
+        "end_time": None if status == EventStatus.ABNORMAL else 1617504120,
+        "first_anomaly_time": 1617504000,
+        "duration": 60,
+        "extra_info": {"origin_alarm": {"dimensions": {"tag{}".format(i): "value{}".format(i) for i in range(50)}}},
+    }
+
+
+class TestAlertSnapshot(TestCase):
+    def setUp(self) -> None:
+        ALERT_SNAPSHOT_KEY.client.flushall()
+
+    def tearDown(self) -> None:
+        ALERT_SNAPSHOT_KEY.client.flushall()
+
+    def test_codec(self):
+        alert_data = make_alert_data("1")
+        # 兼容未压缩的 json 格式
+        self.assertEqual(decode_alert(json.dumps(alert_data)), alert_data)
+
+        with override_settings(ALERT_SNAPSHOT_CODEC=SNAPSHOT_CODEC_ZLIB):
+            value = encode_alert(alert_data)
+            self.assertTrue(value.startswith(COMPRESSED_PREFIX))
+            self.assertLess(len(value), len(json.dumps(alert_data)))
+            self.assertEqual(decode_alert(value), alert_data)
+
+            # 内容较少时不压缩
+            self.assertEqual(encode_alert({"id": "1"}), json.dumps({"id": "1"}))
+
+    @override_settings(ALERT_SNAPSHOT_CODEC=SNAPSHOT_CODEC_ZLIB)
+    def test_reference(self):
+        alerts = [Alert(make_alert_data("1")), Alert(make_alert_data("2", EventStatus.RECOVERED))]
+        alerts[1].data["dedupe_md5"] = "dedupe_md5_2"
+        AlertCache.save_alert_to_cache(alerts)
+        AlertCache.save_alert_snapshot(alerts)
+
+        content = ALERT_DEDUPE_CONTENT_KEY.client.get(
+            ALERT_DEDUPE_CONTENT_KEY.get_key(strategy_id=1, dedupe_md5="dedupe_md5")
+        )
+        reference = decode_reference(content)
+        self.assertEqual(reference["id"], "1")
+        self.assertNotIn("extra_info", reference)
+
+        results = Alert.mget_by_references([reference])
+        self.assertEqual(results[0].to_dict()["extra_info"], alerts[0].data["extra_info"])
+
+        # 引用格式下快照与维度缓存的过期时间一致
+        snapshot_ttl = ALERT_SNAPSHOT_KEY.client.ttl(ALERT_SNAPSHOT_KEY.get_key(strategy_id=1, alert_id="1"))
+        self.assertGreater(snapshot_ttl, ALERT_DEDUPE_CONTENT_KEY.ttl - 60)
+
+        # 快照过期后，已结束的告警直接使用引用中的字段
+        content = ALERT_DEDUPE_CONTENT_KEY.client.get(
+            ALERT_DEDUPE_CONTENT_KEY.get_key(strategy_id=1, dedupe_md5="dedupe_md5_2")
+        )
+        ALERT_SNAPSHOT_KEY.client.delete(ALERT_SNAPSHOT_KEY.get_key(strategy_id=1, alert_id="2"))
+        results = Alert.mget_by_references([decode_reference(content)])
+        self.assertEqual(results[0].id, "2")
+        self.assertTrue(results[0].is_end())
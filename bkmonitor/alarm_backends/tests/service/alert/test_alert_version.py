@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+from django.test import TestCase, override_settings
+
+from alarm_backends.core.alert import Alert, AlertCache
+from alarm_backends.core.alert.snapshot import decode_alert
+from alarm_backends.core.alert.version import ALERT_UPDATE_BACKEND_CAS, get_versions
+from alarm_backends.core.cache.key import ALERT_DEDUPE_CONTENT_KEY, ALERT_SNAPSHOT_KEY
+from constants.alert import EventStatus
+
+
+def make_alert(alert_id, dedupe_md5="dedupe_md5", create_time=1617504000):
+    return Alert(
+        {
+            "id": alert_id,
+            "strategy_id": 1,
+            "dedupe_md5": dedupe_md5,
+            "status": EventStatus.ABNORMAL,
+            "create_time": create_time,
+            "first_anomaly_time": create_time,
+            "latest_time": create_time + 60,
+        }
+    )
+
+
+@override_settings(ALERT_UPDATE_BACKEND=ALERT_UPDATE_BACKEND_CAS)
+class TestAlertVersion(TestCase):
+    def setUp(self) -> None:
+        ALERT_DEDUPE_CONTENT_KEY.client.flushall()
+
+    def tearDown(self) -> None:
+        ALERT_DEDUPE_CONTENT_KEY.client.flushall()
+
+    def get_content(self, dedupe_md5="dedupe_md5"):
+        content = ALERT_DEDUPE_CONTENT_KEY.client.get(
+            ALERT_DEDUPE_CONTENT_KEY.get_key(strategy_id=1, dedupe_md5=dedupe_md5)
+        )
+        return decode_alert(content) if content else None
+
+    def test_compare_and_save(self):
+        versions = get_versions([(1, "dedupe_md5"), (1, "dedupe_md5_2")])
+        self.assertEqual(versions, {"dedupe_md5": 0, "dedupe_md5_2": 0})
+
+        # 同一维度的告警一起写入，维度缓存保存创建时间最新的告警
+        alerts = [make_alert("1"), make_alert("2", create_time=1617504060), make_alert("3", "dedupe_md5_2")]
+        self.assertEqual(AlertCache.compare_and_save_alerts(alerts, versions), set())
+        self.assertEqual(self.get_content()["id"], "2")
+        self.assertTrue(ALERT_SNAPSHOT_KEY.client.get(alerts[0].key.get_snapshot_key()))
+
+        # 使用过期的版本号写入时冲突，缓存及快照均不变
+        alerts = [make_alert("4", create_time=1617504120), make_alert("5", "dedupe_md5_2")]
+        self.assertEqual(AlertCache.compare_and_save_alerts(alerts, versions), {"dedupe_md5", "dedupe_md5_2"})
+        self.assertEqual(self.get_content()["id"], "2")
+        self.assertIsNone(ALERT_SNAPSHOT_KEY.client.get(alerts[0].key.get_snapshot_key()))
+
+        # 只写入快照的告警不刷新维度缓存
+        versions = get_versions([(1, "dedupe_md5")])
+        self.assertEqual(AlertCache.compare_and_save_alerts(alerts[:1], versions, {"4"}), set())
+        self.assertEqual(self.get_content()["id"], "2")
+        self.assertTrue(ALERT_SNAPSHOT_KEY.client.get(alerts[0].key.get_snapshot_key()))
+
+    def test_direct_save(self):
+        versions = get_versions([(1, "dedupe_md5")])
+        # 直接写入缓存时递增版本号，并发中的更新产生冲突
+        AlertCache.save_alert_to_cache([make_alert("1")])
+        self.assertEqual(AlertCache.compare_and_save_alerts([make_alert("2")], versions), {"dedupe_md5"})
+        self.assertEqual(self.get_content()["id"], "1")
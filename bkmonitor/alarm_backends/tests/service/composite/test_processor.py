@@ -208,6 +208,23 @@ class TestProcessor(TestCase):
         processor.pull()
         self.assertEqual(0, len(processor.strategies))
 
+    def test_refresh_fta_alert_index(self):
+        other_strategy = copy.deepcopy(STRATEGY)
+        other_strategy.update({"id": 2, "bk_biz_id": 3})
+        StrategyCacheManager.refresh_fta_alert_strategy_ids([STRATEGY, other_strategy])
+        self.assertEqual(StrategyCacheManager.get_fta_alert_strategy_ids(strategy_id=7), {"2": [1], "3": [2]})
+        self.assertEqual(StrategyCacheManager.get_fta_alert_strategy_ids(alert_name="测试关联告警"), {"2": [1], "3": [2]})
+
+        # 增量更新：变更业务的索引以本次结果为准，其他业务剔除已删除的策略
+        new_strategy = copy.deepcopy(STRATEGY)
+        new_strategy["id"] = 3
+        new_strategy["items"][0]["query_configs"] = new_strategy["items"][0]["query_configs"][:1]
+        StrategyCacheManager.refresh_fta_alert_strategy_ids(
+            [new_strategy], partial_biz_ids=[2], deleted_strategy_ids=[2]
+        )
+        self.assertEqual(StrategyCacheManager.get_fta_alert_strategy_ids(strategy_id=7), {"2": [3]})
+        self.assertEqual(StrategyCacheManager.get_fta_alert_strategy_ids(alert_name="测试关联告警"), {})
+
     def test_cal_public_dimensions(self):
         dimensions = CompositeProcessor.cal_public_dimensions(STRATEGY)
         self.assertEqual(["ip"], dimensions)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import mock
+from django.test import TestCase
+
+from alarm_backends.core.cache.key import FTA_CONVERGE_DIMENSION_KEY
+from alarm_backends.service.converge.batch import ConvergeBatchContext
+from alarm_backends.service.converge.dimension import DimensionHandler
+from constants.action import ConvergeType
+
+NOW = 1617504000
+
+
+def make_handler(condition, instance_id=1, start_timestamp=NOW - 60, end_timestamp=NOW + 60):
+    return DimensionHandler(
+        "dimension",
+        condition,
+        start_timestamp,
+        instance_id=instance_id,
+        end_timestamp=end_timestamp,
+        instance_type=ConvergeType.ACTION,
+        strategy_id=1,
+        converged_condition=condition,
+    )
+
+
+class TestDimensionHandler(TestCase):
+    def setUp(self) -> None:
+        FTA_CONVERGE_DIMENSION_KEY.client.flushall()
+        members = {
+            ("bk_biz_id", "2"): {"action_1": NOW, "action_2": NOW, "action_3": NOW, "action_4": NOW - 3600},
+            ("alert_name", "cpu"): {"action_1": NOW, "action_4": NOW - 3600},
+            ("alert_name", "mem"): {"action_2": NOW},
+        }
+        for (dimension, value), mapping in members.items():
+            FTA_CONVERGE_DIMENSION_KEY.client.zadd(
+                FTA_CONVERGE_DIMENSION_KEY.get_key(strategy_id=1, dimension=dimension, value=value), mapping
+            )
+
+    def tearDown(self) -> None:
+        FTA_CONVERGE_DIMENSION_KEY.client.flushall()
+
+    def test_batch_get_by_condition(self):
+        handlers = [
+            # 同一维度多个取值时取并集，不同维度之间取交集
+            make_handler({"alert_name": ["cpu", "mem"], "bk_biz_id": ["2"]}),
+            make_handler({"bk_biz_id": ["2"], "alert_name": ["cpu"]}),
+            # 超出时间范围的不匹配
+            make_handler({"alert_name": ["cpu"]}, start_timestamp=NOW - 7200, end_timestamp=NOW - 1800),
+            make_handler({"bk_biz_id": ["2"], "alert_name": ["disk"]}),
+            make_handler({}),
+        ]
+        expected = [{"action_1", "action_2"}, {"action_1"}, {"action_4"}, set(), set()]
+
+        self.assertEqual(DimensionHandler.batch_get_by_condition(handlers), expected)
+        self.assertEqual([set(handler.get_by_condition()) for handler in handlers], expected)
+
+
+class TestConvergeBatchContext(TestCase):
+    @mock.patch("alarm_backends.service.converge.batch.ConvergeInstance")
+    def test_cache(self, converge_instance_model):
+        context = ConvergeBatchContext()
+        context.related_ids[(ConvergeType.ACTION, 1)] = {"action_1"}
+
+        # 预先计算的匹配结果只使用一次
+        self.assertEqual(context.get_related_ids(ConvergeType.ACTION, 1), {"action_1"})
+        self.assertIsNone(context.get_related_ids(ConvergeType.ACTION, 1))
+
+        # 同一维度的收敛实例只查询一次
+        converge_instance_model.objects.filter.return_value.first.return_value = None
+        self.assertIsNone(context.get_converge_instance("dimension"))
+        self.assertIsNone(context.get_converge_instance("dimension"))
+        converge_instance_model.objects.filter.assert_called_once_with(dimension="dimension")
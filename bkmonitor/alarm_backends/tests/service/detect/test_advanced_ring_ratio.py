@@ -13,6 +13,8 @@ specific language governing permissions and limitations under the License.
 import mock
 import pytest
 
+from alarm_backends.service.detect import DataPoint as DetectDataPoint
+from alarm_backends.service.detect.strategy import history_point_buffer
 from alarm_backends.service.detect.strategy.advanced_ring_ratio import AdvancedRingRatio
 from alarm_backends.tests.service.detect import DataPoint
 from alarm_backends.tests.service.detect.test_threshold import mock_datapoint_with_value
@@ -114,6 +116,25 @@ class TestAdvancedRingRatio(object):
         assert len(anomaly_result) == 1
         assert anomaly_result[0].anomaly_message == "avg(测试指标)较前3个时间点的瞬间值(101%)下降超过100.0%, 当前值-1%"
 
+    def test_history_point_buffer(self):
+        CacheNode.refresh_from_settings()
+        history_point_buffer.clear()
+
+        algorithms_config = {"floor": 100, "ceil": 100, "ceil_interval": 3, "floor_interval": 3, "fetch_type": "last"}
+        detect_engine = AdvancedRingRatio(config=algorithms_config, unit="percent")
+        _datapoint500 = mock_datapoint_with_value(500)
+        item = _datapoint500.item
+        detect_engine.query_history_points([_datapoint500])
+        query_count = item.query_record.call_count
+
+        # 上个周期的数据及查询过的历史数据已在内存中，下个周期无需再查询
+        next_datapoint = DetectDataPoint(dict(_datapoint500.as_dict(), value=300, time=1569246540), item)
+        detect_engine.query_history_points([next_datapoint])
+        assert item.query_record.call_count == query_count
+        history_points = detect_engine.history_point_fetcher(next_datapoint, cycles=3)
+        assert [point.value for point in history_points] == [500, 99, 1]
+        history_point_buffer.clear()
+
     def test_detect_with_invalid_datapoint(self):
         algorithms_config = {"floor": 101, "ceil": 100, "ceil_interval": 3, "floor_interval": 3}
         with pytest.raises(InvalidDataPoint):
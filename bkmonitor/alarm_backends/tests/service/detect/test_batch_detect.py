@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import random
+
+import mock
+from django.test import override_settings
+
+from alarm_backends.service.detect.strategy.ring_ratio_amplitude import (
+    RingRatioAmplitude,
+)
+from alarm_backends.service.detect.strategy.simple_ring_ratio import SimpleRingRatio
+from alarm_backends.service.detect.strategy.simple_year_round import SimpleYearRound
+from alarm_backends.service.detect.strategy.threshold import Threshold
+from alarm_backends.service.detect.strategy.year_round_amplitude import (
+    YearRoundAmplitude,
+)
+from alarm_backends.tests.service.detect import DataPoint
+
+from .test_threshold import mock_datapoint_with_value
+
+VALUES = [None, -100, -1.5, -1, 0, 0.5, 1, 6, 49.999, 50, 50.001, 99, 100, 101, 200, 1e6]
+
+
+def gen_data_points(unit="percent"):
+    random.seed(1)
+    points = [DataPoint(value, 100000000, unit, "item") for value in VALUES]
+    points.extend(DataPoint(random.uniform(-1000, 1000), 100000000, unit, "item") for _ in range(200))
+    return points
+
+
+def history_of(data_point):
+    # 每个数据点对应一个确定的历史点，覆盖历史点缺失、历史值为 0 及为空的情况
+    if data_point.value is None:
+        return None
+    return DataPoint(VALUES[int(abs(data_point.value)) % len(VALUES)], 100000000, data_point.unit, "item")
+
+
+def per_point_mask(detect_engine, data_points):
+    mask = []
+    for data_point in data_points:
+        try:
+            mask.append(bool(detect_engine.detect(data_point)))
+        except Exception:
+            mask.append(False)
+    return mask
+
+
+def assert_same_result(detect_engine, data_points):
+    assert detect_engine.batch_detect(data_points) == per_point_mask(detect_engine, data_points)
+
+
+class TestBatchDetect(object):
+    def test_threshold(self):
+        configs = [
+            [[{"threshold": 50.0, "method": "gte"}]],
+            [[{"threshold": 50.0, "method": "eq"}]],
+            [[{"threshold": 50.0, "method": "neq"}]],
+            [
+                [
+                    {"threshold": 6, "method": "gt"},
+                    {"threshold": 99, "method": "lte"},
+                    {"threshold": 50, "method": "neq"},
+                ],
+                [{"threshold": 6, "method": "eq"}],
+                [{"threshold": -1, "method": "lt"}],
+            ],
+        ]
+        data_points = gen_data_points()
+        for config in configs:
+            assert_same_result(Threshold(config=config), data_points)
+            assert_same_result(Threshold(config=config, unit="K"), gen_data_points(unit="bytes"))
+
+    def test_simple_ring_ratio(self):
+        with mock.patch(
+            "alarm_backends.service.detect.strategy.simple_ring_ratio.SimpleRingRatio.history_point_fetcher",
+            side_effect=history_of,
+        ):
+            for config in [{"floor": 50, "ceil": None}, {"floor": None, "ceil": 100}, {"floor": 10, "ceil": 10}]:
+                assert_same_result(SimpleRingRatio(config=config), gen_data_points())
+
+    def test_simple_year_round(self):
+        with mock.patch(
+            "alarm_backends.service.detect.strategy.simple_year_round.SimpleYearRound.history_point_fetcher",
+            side_effect=history_of,
+        ):
+            for config in [{"floor": 50, "ceil": None}, {"floor": 30, "ceil": 200}]:
+                assert_same_result(SimpleYearRound(config=config), gen_data_points())
+
+    def test_ring_ratio_amplitude(self):
+        with mock.patch(
+            "alarm_backends.service.detect.strategy.ring_ratio_amplitude.RingRatioAmplitude.history_point_fetcher",
+            side_effect=history_of,
+        ):
+            for config in [{"threshold": 0, "ratio": 1, "shock": 50}, {"threshold": 99, "ratio": 0.1, "shock": 1}]:
+                assert_same_result(RingRatioAmplitude(config=config), gen_data_points())
+
+    def test_year_round_amplitude(self):
+        def diffs_of(data_point):
+            history = history_of(data_point)
+            return [(history, data_point), (data_point, history_of(history)), (history, history)]
+
+        with mock.patch(
+            "alarm_backends.service.detect.strategy.year_round_amplitude.YearRoundAmplitude.history_point_fetcher",
+            side_effect=diffs_of,
+        ):
+            for config in [
+                {"method": "gte", "days": 2, "ratio": 1, "shock": 1},
+                {"method": "lt", "days": 1, "ratio": 0.5, "shock": 10},
+                {"method": "eq", "days": 2, "ratio": 0, "shock": 0},
+            ]:
+                detect_engine = YearRoundAmplitude(config=config, unit="percent")
+                assert_same_result(detect_engine, gen_data_points())
+
+    def test_detect_records(self):
+        data_points = [mock_datapoint_with_value(value) for value in VALUES]
+        config = [
+            [{"threshold": 6, "method": "gt"}, {"threshold": 99, "method": "lte"}],
+            [{"threshold": 0, "method": "eq"}],
+        ]
+
+        with override_settings(DETECT_BATCH_ENABLED=False):
+            expected = Threshold(config=config).detect_records(data_points, 1)
+        with override_settings(DETECT_BATCH_ENABLED=True):
+            actual = Threshold(config=config).detect_records(data_points, 1)
+
+        assert [ap.anomaly_message for ap in actual] == [ap.anomaly_message for ap in expected]
+        assert [ap.anomaly_id for ap in actual] == [ap.anomaly_id for ap in expected]
+        assert len(actual) == 5
+
+    def test_detect_records_reuse_history(self):
+        data_points = gen_data_points()
+        detect_engine = SimpleRingRatio(config={"floor": 10, "ceil": 10})
+
+        with mock.patch(
+            "alarm_backends.service.detect.strategy.simple_ring_ratio.SimpleRingRatio.history_point_fetcher",
+            side_effect=history_of,
+        ) as fetcher, override_settings(DETECT_BATCH_ENABLED=True):
+            anomaly_points = detect_engine.detect_records(data_points, 1)
+
+        # 批量检测已获取的历史数据直接用于异常点的逐点检测，每个数据点只获取一次
+        assert anomaly_points
+        assert fetcher.call_count == len(data_points)
+        assert detect_engine._batch_history is None
+
+    def test_unsupported_algorithm(self):
+        from alarm_backends.service.detect.strategy.os_restart import OsRestart
+
+        assert OsRestart(config={}).batch_detect(gen_data_points()) is None
@@ -14,7 +14,7 @@ import arrow
 from django.test import TestCase
 
 from alarm_backends.core.cache.key import CHECK_RESULT_CACHE_KEY
-from alarm_backends.service.trigger.checker import AnomalyChecker
+from alarm_backends.service.trigger.checker import AnomalyChecker, CheckResultCache
 from bkmonitor.utils import time_tools
 from core.errors.alarm_backends import StrategyItemNotFound
 
@@ -433,3 +433,22 @@ class TestChecker(TestCase):
         anomaly_records, event_record = checker.check()
         self.assertEqual(len(anomaly_records), 3)
         self.assertEqual(event_record["trigger"]["level"], "2")
+
+    def test_check_anomaly_with_check_result_cache(self):
+        self.insert_check_result(3)
+        early_point = copy.deepcopy(POINT)
+        early_point["data"]["record_id"] = "55a76cf628e46c04a052f4e19bdb9dbf.1569246360"
+        early_point["data"]["time"] = 1569246360
+
+        points = [POINT, early_point, POINT]
+        expected_results = [AnomalyChecker(point, STRATEGY, 1).check_anomaly() for point in points]
+
+        check_result_cache = CheckResultCache()
+        checkers = [AnomalyChecker(point, STRATEGY, 1, check_result_cache) for point in points]
+        check_result_cache.prefetch(checkers)
+        # 同一维度同一级别的窗口合并后只拉取一次
+        self.assertEqual(len(check_result_cache.results), 3)
+
+        for checker, expected_result in zip(checkers, expected_results):
+            self.assertEqual(checker.check_anomaly(), expected_result)
+        self.assertEqual(expected_results[1], (2, [1569246240, 1569246360]))
@@ -270,6 +270,8 @@ ADVANCED_OPTIONS = OrderedDict(
         ("OUTER_COLLOCTOR_HOST", slz.CharField(label="collector外网域名", default="")),
         ("ENABLE_INFLUXDB_STORAGE", slz.BooleanField(label="启用 influxdb 存储", default=True)),
         ("ES_SERIAL_CLUSTER_LIST", slz.ListField(label="ES 串行集群列表", default=[])),
+        ("ES_LIFECYCLE_PLANNER_CLUSTER_LIST", slz.ListField(label="ES 按集群规划索引生命周期的集群列表", default=[])),
+        ("ES_LIFECYCLE_PLANNER_CONCURRENCY", slz.IntegerField(label="ES 按集群规划索引生命周期的并发数", default=5)),
         ("BKDATA_USE_UNIFY_QUERY_GRAY_BIZ_LIST", slz.ListField(label="UNIFY-QUERY支持bkdata查询灰度业务列表", default=[])),
     ]
 )
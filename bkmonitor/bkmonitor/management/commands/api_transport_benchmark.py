@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from django.core.management.base import BaseCommand
+
+from bkmonitor.utils.thread_backend import ThreadPool
+from core.drf_resource.contrib.api import APIResource
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    delay = 0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super(StubHandler, self).setup()
+        with StubHandler.lock:
+            StubHandler.connections += 1
+
+    def do_GET(self):
+        time.sleep(self.delay)
+        body = json.dumps({"result": True, "code": 0, "data": {"path": self.path}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Command(BaseCommand):
+    """
+    APIResource 传输层性能对比
+    启动本地 http 桩服务，分别使用每次新建连接及共享连接池的方式批量请求，统计耗时及服务端建立的连接数
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=1000, help="number of requests")
+        parser.add_argument("--delay", type=float, default=0.01, help="stub server response delay(seconds)")
+
+    def handle(self, *args, **options):
+        StubHandler.delay = options["delay"]
+        server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = "http://127.0.0.1:{}".format(server.server_address[1])
+
+        class StubResource(APIResource):
+            module_name = "api_transport_benchmark"
+            action = "/stub/"
+            method = "GET"
+
+            @property
+            def base_url(self):
+                return base_url
+
+        request_data_list = [{"index": index} for index in range(options["requests"])]
+        try:
+            # 1. 每个请求新建连接，每次批量调用新建线程池
+            StubHandler.connections = 0
+            start = time.time()
+            pool = ThreadPool()
+            for request_data in request_data_list:
+                pool.apply_async(requests.get, args=(base_url + "/stub/",), kwds={"params": request_data})
+            pool.close()
+            pool.join()
+            self.stdout.write(
+                f"transport(new_connection) requests({len(request_data_list)}) "
+                f"cost({time.time() - start:.3f}s) connections({StubHandler.connections})"
+            )
+
+            # 2. 共享连接池及线程池
+            StubHandler.connections = 0
+            start = time.time()
+            StubResource().bulk_request(request_data_list)
+            self.stdout.write(
+                f"transport(pooled) requests({len(request_data_list)}) "
+                f"cost({time.time() - start:.3f}s) connections({StubHandler.connections})"
+            )
+        finally:
+            server.shutdown()
@@ -13,31 +13,126 @@ specific language governing permissions and limitations under the License.
 import functools
 import json
 import logging
+import threading
 import time
+import uuid
 import zlib
+from collections import OrderedDict
 
 from django.conf import settings
-from django.core.cache import cache, caches
+from django.core.cache import cache
 from django.utils import translation
 from django.utils.encoding import force_bytes
 
 from bkmonitor.utils.common_utils import count_md5
 from bkmonitor.utils.local import local
 from bkmonitor.utils.request import get_request
+from bkmonitor.utils.thread_backend import InheritParentThread
+from core.prometheus import metrics
 
 logger = logging.getLogger(__name__)
 
 
-try:
-    mem_cache = caches["locmem"]
-except Exception:
-    mem_cache = cache
+class LRUCacheTier(object):
+    """
+    进程内 LRU 缓存
+    保存序列化后的数据，每次读取时重新解析，避免调用方修改返回值影响缓存。
+    按数据长度统计容量，超出 RESOURCE_CACHE_LRU_MAX_BYTES 时淘汰最久未使用的数据。
+    """
+
+    def __init__(self):
+        # key -> (payload, expire_time)
+        self.data = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                self._pop(key)
+                return None
+            self.data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, payload, timeout):
+        max_bytes = settings.RESOURCE_CACHE_LRU_MAX_BYTES
+        if not max_bytes or timeout <= 0 or len(payload) > settings.RESOURCE_CACHE_LRU_MAX_ITEM_BYTES:
+            self.delete(key)
+            return
+
+        with self.lock:
+            self._pop(key)
+            self.data[key] = (payload, time.time() + timeout)
+            self.size += len(payload)
+            while self.size > max_bytes and self.data:
+                self._pop(next(iter(self.data)))
+
+    def delete(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self.data.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[0])
+
+
+lru_cache_tier = LRUCacheTier()
+
+
+class SingleFlight(object):
+    """
+    进程内请求合并，同一个 key 同时只有一个线程加载，其余线程等待加载完成后读取缓存
+    """
+
+    def __init__(self):
+        self.events = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, key):
+        """
+        :return: (是否为加载者, 等待事件)
+        """
+        with self.lock:
+            event = self.events.get(key)
+            if event is not None:
+                return False, event
+            event = self.events[key] = threading.Event()
+            return True, event
+
+    def release(self, key):
+        with self.lock:
+            event = self.events.pop(key, None)
+        if event is not None:
+            event.set()
+
+
+single_flight = SingleFlight()
 
 
 class UsingCache(object):
+    """
+    resource 缓存
+    缓存层级: 线程缓存(web 单次请求) -> 进程内 LRU 缓存 -> django cache
+    1. 缓存数据记录软过期时间，软过期后仍保留 timeout * RESOURCE_CACHE_STALE_RATIO 秒，
+       期间直接返回旧数据，由获取到刷新锁的一个请求(或后台线程)刷新缓存
+    2. 缓存不存在时，同进程内的线程只有一个加载，跨进程通过 cache.add 实现的加载锁保证只有一个进程加载，
+       其余进程等待加载结果，等待超时后自行加载
+    """
+
     min_length = 15
     preset = 6
     key_prefix = "web_cache"
+    # 缓存数据格式版本，格式变化时使用新的 key，避免滚动升级时新旧进程读取到不兼容的数据
+    version = "v2"
 
     def __init__(
         self,
@@ -94,8 +189,9 @@ class UsingCache(object):
     def _cache_key(self, task_definition, args, kwargs):
         # 新增根据用户openid设置缓存key
         if self.using_cache_type:
-            return "{}:{}:{}:{},{}[{}]{}".format(
+            return "{}:{}:{}:{}:{},{}[{}]{}".format(
                 self.key_prefix,
+                self.version,
                 self.using_cache_type.key,
                 self.func_key_generator(task_definition),
                 count_md5(args),
@@ -105,51 +201,97 @@ class UsingCache(object):
             )
         return None
 
-    def get_value(self, cache_key, default=None):
+    def _count(self, status):
+        cache_type = self.using_cache_type.key if self.using_cache_type else ""
+        metrics.RESOURCE_CACHE_REQUEST_COUNT.labels(cache_type=cache_type, status=status).inc()
+
+    @staticmethod
+    def _loads_entry(payload):
+        """
+        解析缓存数据，返回 (数据, 软过期时间)
+        """
+        entry = json.loads(payload)
+        if isinstance(entry, list) and len(entry) == 2:
+            return entry[1], entry[0]
+        return entry, None
+
+    def get_value(self, cache_key, default=None, with_expires=False):
         """
-        新增一级内存缓存（local）。在同一个请求(线程)中，优先使用内存缓存。
         一级缓存： local（web服务单次请求中生效）
-        二级缓存： cache（60s生效）
+        二级缓存： 进程内 LRU 缓存（RESOURCE_CACHE_LRU_TIMEOUT 内生效）
+        三级缓存： cache
         机制：
-        local (miss), cache(miss): cache <- result
-        local (miss), cache(hit): local <- result
+        local (miss), lru(miss), cache(miss): cache/lru <- result
+        local (miss), lru(miss), cache(hit): local/lru <- result
+        :param with_expires: 是否同时返回软过期时间，为 True 时返回 (数据, 软过期时间)，无缓存时返回 default
         """
         if self.local_cache_enable:
-            value = getattr(local, cache_key, None)
-            if value:
-                return json.loads(value)
+            payload = getattr(local, cache_key, None)
+            if payload:
+                value, expires = self._loads_entry(payload)
+                return (value, expires) if with_expires else value
+
+        # 进程内缓存的有效期不超过软过期时间，读取到的数据均未过期
+        if self.compress:
+            payload = lru_cache_tier.get(cache_key)
+            if payload is not None:
+                value, expires = self._loads_entry(payload)
+                return (value, expires) if with_expires else value
 
-        value = mem_cache.get(cache_key, default=None) or cache.get(cache_key, default=None)
+        value = cache.get(cache_key, default=None)
         if value is None:
             return default
+
         if self.compress:
             try:
                 value = zlib.decompress(value)
             except Exception:
                 pass
             try:
-                value = json.loads(force_bytes(value))
+                payload = force_bytes(value).decode("utf-8")
+                value, expires = self._loads_entry(payload)
             except Exception:
-                value = default
-        if value and self.local_cache_enable:
-            setattr(local, cache_key, json.dumps(value))
-        return value
+                return default
+
+            if expires is None or expires > time.time():
+                lru_timeout = settings.RESOURCE_CACHE_LRU_TIMEOUT
+                if expires is not None:
+                    lru_timeout = min(lru_timeout, expires - time.time())
+                lru_cache_tier.set(cache_key, payload, lru_timeout)
+            if value and self.local_cache_enable:
+                setattr(local, cache_key, payload)
+        elif isinstance(value, tuple) and len(value) == 2:
+            expires, value = value
+        else:
+            expires = None
+
+        return (value, expires) if with_expires else value
 
     def set_value(self, key, value, timeout=60):
+        # 软过期后保留一段时间，期间返回旧数据并刷新缓存
+        expires = time.time() + timeout
+        hard_timeout = timeout + int(timeout * settings.RESOURCE_CACHE_STALE_RATIO)
         if self.compress:
             try:
-                value = json.dumps(value)
+                payload = json.dumps([expires, value])
             except Exception:
                 logger.exception("[Cache]不支持序列化的类型: %s" % type(value))
                 return False
 
+            value = payload
             if len(value) > self.min_length:
                 value = zlib.compress(value.encode("utf-8"))
+        else:
+            payload = None
+            value = (expires, value)
 
         try:
-            if mem_cache is not cache:
-                mem_cache.set(key, value, 60)
-            cache.set(key, value, timeout)
+            cache.set(key, value, hard_timeout)
+            if payload is not None:
+                lru_cache_tier.set(key, payload, min(settings.RESOURCE_CACHE_LRU_TIMEOUT, timeout))
+                # 同一请求中已读取过旧数据时，同步更新线程缓存
+                if self.local_cache_enable and getattr(local, key, None):
+                    setattr(local, key, payload)
         except Exception as e:
             try:
                 request_path = get_request().path
@@ -158,25 +300,126 @@ class UsingCache(object):
             # 缓存出错不影响主流程
             logger.exception("存缓存[key:{}]时报错：{}\n value: {!r}\nurl: {}".format(key, e, value, request_path))
 
+    @staticmethod
+    def _lock_key(cache_key):
+        return "{}:lock".format(cache_key)
+
+    def _acquire_lock(self, cache_key):
+        """
+        获取缓存加载锁，获取失败说明其他进程正在加载，缓存异常时视为获取成功
+        :return: 锁标识，未获取到锁时返回 None
+        """
+        token = uuid.uuid4().hex
+        try:
+            if cache.add(self._lock_key(cache_key), token, settings.RESOURCE_CACHE_LOCK_TIMEOUT):
+                return token
+            return None
+        except Exception as e:
+            logger.warning("[Cache] acquire lock of key(%s) error: %s", cache_key, e)
+            return token
+
+    def _release_lock(self, cache_key, token):
+        lock_key = self._lock_key(cache_key)
+        try:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+        except Exception as e:
+            logger.warning("[Cache] release lock of key(%s) error: %s", cache_key, e)
+
     def _cached(self, task_definition, args, kwargs):
         """
         【默认缓存模式】
         先检查是否缓存是否存在
-        若存在，则直接返回缓存内容
-        若不存在，则执行函数，并将结果回写到缓存中
+        若存在且未过期，则直接返回缓存内容
+        若已软过期，则返回旧数据，并刷新缓存
+        若不存在，则执行函数，并将结果回写到缓存中，同一时间只有一个进程执行
         """
         if settings.ENVIRONMENT == "development":
             cache_key = None
         else:
             cache_key = self._cache_key(task_definition, args, kwargs)
-        if cache_key:
+        if not cache_key:
+            return self._cacheless(task_definition, args, kwargs)
+
+        entry = self.get_value(cache_key, default=None, with_expires=True)
+        if entry is None:
+            return self._load(cache_key, task_definition, args, kwargs)
+
+        return_value, expires = entry
+        if expires is None or expires > time.time():
+            self._count("hit")
+            return return_value
+
+        self._count("stale")
+        return self._revalidate(cache_key, return_value, task_definition, args, kwargs)
+
+    def _revalidate(self, cache_key, stale_value, task_definition, args, kwargs):
+        """
+        刷新已软过期的缓存，未获取到刷新锁时直接返回旧数据
+        """
+        token = self._acquire_lock(cache_key)
+        if token is None:
+            return stale_value
+
+        if settings.RESOURCE_CACHE_BACKGROUND_REFRESH:
+
+            def refresh():
+                try:
+                    self._refresh(task_definition, args, kwargs)
+                except Exception as e:
+                    logger.exception("[Cache] background refresh of key(%s) error: %s", cache_key, e)
+                finally:
+                    self._release_lock(cache_key, token)
+
+            InheritParentThread(target=refresh, daemon=True).start()
+            return stale_value
+
+        try:
+            return self._refresh(task_definition, args, kwargs)
+        except Exception as e:
+            logger.exception("[Cache] refresh of key(%s) error, use stale value: %s", cache_key, e)
+            return stale_value
+        finally:
+            self._release_lock(cache_key, token)
+
+    def _load(self, cache_key, task_definition, args, kwargs):
+        """
+        加载不存在的缓存，进程内及进程间均只有一个加载者，其余请求等待加载结果
+        """
+        is_leader, event = single_flight.acquire(cache_key)
+        if not is_leader:
+            event.wait(settings.RESOURCE_CACHE_LOCK_TIMEOUT)
             return_value = self.get_value(cache_key, default=None)
+            if return_value is not None:
+                self._count("coalesced")
+                return return_value
+            self._count("miss")
+            return self._refresh(task_definition, args, kwargs)
 
-            if return_value is None:
-                return_value = self._refresh(task_definition, args, kwargs)
-        else:
-            return_value = self._cacheless(task_definition, args, kwargs)
-        return return_value
+        try:
+            token = self._acquire_lock(cache_key)
+            if token is not None:
+                self._count("miss")
+                try:
+                    return self._refresh(task_definition, args, kwargs)
+                finally:
+                    self._release_lock(cache_key, token)
+
+            # 其他进程正在加载，等待加载结果
+            deadline = time.time() + settings.RESOURCE_CACHE_LOCK_WAIT
+            interval = 0.05
+            while time.time() < deadline:
+                time.sleep(interval)
+                interval = min(interval * 2, 0.5)
+                return_value = self.get_value(cache_key, default=None)
+                if return_value is not None:
+                    self._count("coalesced")
+                    return return_value
+
+            self._count("lock_timeout")
+            return self._refresh(task_definition, args, kwargs)
+        finally:
+            single_flight.release(cache_key)
 
     def _refresh(self, task_definition, args, kwargs):
         """
@@ -15,9 +15,23 @@ import sre_constants
 
 
 class Condition(object):
+    # 编译后同一组 AND 条件按开销从小到大排序匹配
+    cost = 0
+
     def is_match(self, data):
         raise NotImplementedError("You should implement this.")
 
+    def compile(self):
+        """
+        编译成匹配函数 matcher(data) -> bool，匹配结果与 is_match 一致
+        条件值的预处理(集合、数值阈值、正则)只在编译时进行一次
+        """
+        return self.is_match
+
+
+def match_all(data):
+    return True
+
 
 class SimpleCondition(Condition):
     """eq / gt / lt / reg ..."""
@@ -42,10 +56,37 @@ class SimpleCondition(Condition):
             return True, self.cond_field.__class__(self.cond_field.name, data_value)
         return False, None
 
+    def compile(self):
+        try:
+            value_matcher = self._compile()
+        except Exception:
+            # 条件值无法预处理(如数值条件中存在非法值)，保持原有的匹配行为
+            return self.is_match
+
+        get_value_from_data = self.cond_field.get_value_from_data
+        default_value_if_not_exists = self.default_value_if_not_exists
+
+        def matcher(data):
+            existed, data_value = get_value_from_data(data)
+            if not existed:
+                return default_value_if_not_exists
+            return value_matcher(data_value)
+
+        return matcher
+
+    def _compile(self):
+        """
+        返回基于原始数据值的匹配函数 value_matcher(data_value) -> bool
+        """
+        field_class, field_name = self.cond_field.__class__, self.cond_field.name
+        return lambda data_value: self._is_match(field_class(field_name, data_value))
+
 
 class CompositeCondition(Condition):
     """AND / OR"""
 
+    cost = 5
+
     def __init__(self):
         self.conditions = []
 
@@ -69,6 +110,21 @@ class OrCondition(CompositeCondition):
                 return True
         return False
 
+    def compile(self):
+        matchers = [cond.compile() for cond in self.conditions]
+        if not matchers:
+            return match_all
+        if len(matchers) == 1:
+            return matchers[0]
+
+        def matcher(data):
+            for _matcher in matchers:
+                if _matcher(data):
+                    return True
+            return False
+
+        return matcher
+
 
 class AndCondition(CompositeCondition):
     def is_match(self, data):
@@ -80,20 +136,49 @@ class AndCondition(CompositeCondition):
                 return False
         return True
 
+    def compile(self):
+        # 开销小的条件(集合判断)优先匹配，尽早短路
+        matchers = [cond.compile() for cond in sorted(self.conditions, key=lambda cond: cond.cost)]
+        if not matchers:
+            return match_all
+        if len(matchers) == 1:
+            return matchers[0]
+
+        def matcher(data):
+            for _matcher in matchers:
+                if not _matcher(data):
+                    return False
+            return True
+
+        return matcher
+
 
 class EqualCondition(SimpleCondition):
+    cost = 1
+
     def _is_match(self, data_field):
         data_value = data_field.to_str_list()
         cond_value = self.cond_field.to_str_list()
         return bool(set(data_value) & set(cond_value))
 
+    def _compile(self):
+        cond_value = frozenset(self.cond_field.to_str_list())
+        value_to_str_list = self.cond_field.value_to_str_list
+        return lambda data_value: not cond_value.isdisjoint(value_to_str_list(data_value))
+
 
 class NotEqualCondition(EqualCondition):
     def _is_match(self, data_field):
         return not super(NotEqualCondition, self)._is_match(data_field)
 
+    def _compile(self):
+        value_matcher = super(NotEqualCondition, self)._compile()
+        return lambda data_value: not value_matcher(data_value)
+
 
 class IncludeCondition(SimpleCondition):
+    cost = 3
+
     def _is_match(self, data_field):
         data_value = data_field.to_str_list()[0]
         cond_value = self.cond_field.to_str_list()
@@ -102,37 +187,78 @@ class IncludeCondition(SimpleCondition):
                 return True
         return False
 
+    def _compile(self):
+        cond_value = tuple(self.cond_field.to_str_list())
+        value_to_str_list = self.cond_field.value_to_str_list
+
+        def value_matcher(data_value):
+            data_value = value_to_str_list(data_value)[0]
+            for v in cond_value:
+                if v in data_value:
+                    return True
+            return False
+
+        return value_matcher
+
 
 class ExcludeCondition(IncludeCondition):
     def _is_match(self, data_field):
         return not super(ExcludeCondition, self)._is_match(data_field)
 
+    def _compile(self):
+        value_matcher = super(ExcludeCondition, self)._compile()
+        return lambda data_value: not value_matcher(data_value)
+
 
 class GreaterCondition(SimpleCondition):
+    cost = 2
+
     def _is_match(self, data_field):
         data_value = min(data_field.to_float_list())
         cond_value = max(self.cond_field.to_float_list())
         return data_value > cond_value
 
+    def _compile(self):
+        cond_value = max(self.cond_field.to_float_list())
+        value_to_float_list = self.cond_field.value_to_float_list
+        return lambda data_value: min(value_to_float_list(data_value)) > cond_value
+
 
 class LesserOrEqualCondition(GreaterCondition):
     def _is_match(self, data_field):
         return not super(LesserOrEqualCondition, self)._is_match(data_field)
 
+    def _compile(self):
+        value_matcher = super(LesserOrEqualCondition, self)._compile()
+        return lambda data_value: not value_matcher(data_value)
+
 
 class LesserCondition(SimpleCondition):
+    cost = 2
+
     def _is_match(self, data_field):
         data_value = max(data_field.to_float_list())
         cond_value = min(self.cond_field.to_float_list())
         return data_value < cond_value
 
+    def _compile(self):
+        cond_value = min(self.cond_field.to_float_list())
+        value_to_float_list = self.cond_field.value_to_float_list
+        return lambda data_value: max(value_to_float_list(data_value)) < cond_value
+
 
 class GreaterOrEqualCondition(LesserCondition):
     def _is_match(self, data_field):
         return not super(GreaterOrEqualCondition, self)._is_match(data_field)
 
+    def _compile(self):
+        value_matcher = super(GreaterOrEqualCondition, self)._compile()
+        return lambda data_value: not value_matcher(data_value)
+
 
 class RegularCondition(SimpleCondition):
+    cost = 4
+
     def _is_match(self, data_field):
         data_value = data_field.to_str_list()[0]
         cond_value = self.cond_field.to_str_list()
@@ -146,7 +272,33 @@ class RegularCondition(SimpleCondition):
                 return True
         return False
 
+    def _compile(self):
+        regs = []
+        for v in self.cond_field.to_str_list():
+            try:
+                regs.append(re.compile(r"%s" % v))
+            except sre_constants.error:
+                # 非法正则之后的条件值不再参与匹配，与 _is_match 保持一致
+                regs.append(None)
+                break
+        value_to_str_list = self.cond_field.value_to_str_list
+
+        def value_matcher(data_value):
+            data_value = value_to_str_list(data_value)[0]
+            for reg in regs:
+                if reg is None:
+                    return False
+                if reg.search(data_value):
+                    return True
+            return False
+
+        return value_matcher
+
 
 class NotRegularCondition(RegularCondition):
     def _is_match(self, data_field):
         return not super(NotRegularCondition, self)._is_match(data_field)
+
+    def _compile(self):
+        value_matcher = super(NotRegularCondition, self)._compile()
+        return lambda data_value: not value_matcher(data_value)
@@ -9,10 +9,17 @@ an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express o
 specific language governing permissions and limitations under the License.
 """
 import logging
-from typing import Dict, List, Set
+from typing import Callable, Dict, List
+
+from django.utils.functional import cached_property
 
 logger = logging.getLogger("service")
 
+# 数据中缺少该条件对应的字段，忽略该条件
+SKIP_CONDITION = object()
+# 数据中缺少拓扑信息，数据无效
+INVALID_DATA = object()
+
 
 class TargetCondition:
     """
@@ -81,57 +88,81 @@ class TargetCondition:
         """
         判断数据是否匹配监控目标
         """
+        return self.matcher(data)
+
+    @cached_property
+    def matcher(self) -> Callable[[Dict], bool]:
+        return self.compile()
+
+    @staticmethod
+    def get_host_keys(data: Dict):
+        target_keys = []
+        bk_host_id = data.get("bk_host_id")
+        if bk_host_id:
+            target_keys.append(str(bk_host_id))
+
+        ip = data.get("bk_target_ip", data.get("ip"))
+        if ip:
+            bk_cloud_id = data.get("bk_target_cloud_id", data.get("bk_cloud_id", 0))
+            target_keys.append(f"{ip}|{bk_cloud_id}")
+        return target_keys or SKIP_CONDITION
+
+    @staticmethod
+    def get_service_instance_keys(data: Dict):
+        service_instance_id = data.get("bk_target_service_instance_id", data.get("service_instance_id"))
+        if not service_instance_id:
+            return SKIP_CONDITION
+        return [str(service_instance_id)]
+
+    @staticmethod
+    def get_topo_node_keys(data: Dict):
+        if "bk_topo_node" in data:
+            topo_nodes = data["bk_topo_node"]
+        elif "bk_obj_id" in data and "bk_inst_id" in data:
+            topo_nodes = [f'{data["bk_obj_id"]}|{data["bk_inst_id"]}']
+        else:
+            # 这里topo_node是基于主机信息full出来的，如果数据中不存在topo信息，则表示主机信息无效
+            # 可能原因：
+            #   1. 机器在cmdb已移除，但依然上报数据，此时该机器数据无效
+            #   2. 策略配置的数据字段不足以获取topo信息，但监控目标又是基于topo信息的匹配
+            # 此时数据均以无效处理
+            return INVALID_DATA
+
+        if not topo_nodes:
+            logger.info(f"data target topo_node is empty, {data}")
+            return INVALID_DATA
+        return topo_nodes
+
+    def compile(self) -> Callable[[Dict], bool]:
+        """
+        编译成匹配函数，每个条件的取值方法及目标集合只计算一次
+        """
+        compiled_conditions_list = []
         for conditions in self.conditions_list:
+            compiled_conditions = []
             for condition in conditions:
                 field = condition["field"]
-                method = condition["method"]
-                values: Set = condition["target_keys"]
-
-                target_keys = set()
                 if field in ["ip", "bk_target_ip"]:
-                    bk_host_id = data.get("bk_host_id")
-                    if bk_host_id:
-                        target_keys.add(str(bk_host_id))
-
-                    ip = data.get("bk_target_ip", data.get("ip"))
-                    if ip:
-                        bk_cloud_id = data.get("bk_target_cloud_id", data.get("bk_cloud_id", 0))
-                        target_keys.add(f"{ip}|{bk_cloud_id}")
-                    if not target_keys:
-                        continue
+                    get_keys = self.get_host_keys
                 elif field in ["service_instance_id", "bk_target_service_instance_id"]:
-                    service_instance_id = data.get("bk_target_service_instance_id", data.get("service_instance_id"))
-                    if not service_instance_id:
+                    get_keys = self.get_service_instance_keys
+                else:
+                    get_keys = self.get_topo_node_keys
+                compiled_conditions.append((get_keys, condition["method"] == "eq", frozenset(condition["target_keys"])))
+            compiled_conditions_list.append(compiled_conditions)
+
+        def matcher(data: Dict) -> bool:
+            for compiled_conditions in compiled_conditions_list:
+                for get_keys, is_eq, values in compiled_conditions:
+                    target_keys = get_keys(data)
+                    if target_keys is SKIP_CONDITION:
                         continue
-                    target_keys.add(str(service_instance_id))
-                elif field.split("_", 1)[1] == "topo_node":
-                    target_keys = set()
-                    if "bk_topo_node" in data:
-                        topo_nodes = data["bk_topo_node"]
-                    elif "bk_obj_id" in data and "bk_inst_id" in data:
-                        topo_nodes = [f'{data["bk_obj_id"]}|{data["bk_inst_id"]}']
-                    else:
-                        # 这里topo_node是基于主机信息full出来的，如果数据中不存在topo信息，则表示主机信息无效
-                        # 可能原因：
-                        #   1. 机器在cmdb已移除，但依然上报数据，此时该机器数据无效
-                        #   2. 策略配置的数据字段不足以获取topo信息，但监控目标又是基于topo信息的匹配
-                        # 此时数据均以无效处理
-                        break
-
-                    if not topo_nodes:
-                        logger.info(f"data target topo_node is empty, {data}")
+                    # 有一个条件不满足，则跳过
+                    if target_keys is INVALID_DATA or values.isdisjoint(target_keys) == is_eq:
                         break
-
-                    target_keys.update(topo_nodes)
-                if method == "eq":
-                    is_match = values & target_keys
                 else:
-                    is_match = not (values & target_keys)
-
-                # 有一个条件不满足，则跳过
-                if not is_match:
-                    break
-            else:
-                # 所有条件都满足，则返回True
-                return True
-        return False
+                    # 所有条件都满足，则返回True
+                    return True
+            return False
+
+        return matcher
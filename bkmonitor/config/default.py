@@ -751,6 +751,24 @@ WECOM_ROBOT_CONTENT_LENGTH = 0
 # 二次确认
 DOUBLE_CHECK_SUM_STRATEGY_IDS = os.environ.get("DOUBLE_CHECK_SUM_STRATEGY_IDS", [])
 
+# 是否开启检测算法批量检测(仅支持批量检测的算法生效)
+DETECT_BATCH_ENABLED = False
+
+# detect进程内按item缓存最近的数据点周期数，供环比类算法使用，为0时不缓存
+DETECT_HISTORY_BUFFER_CYCLES = 10
+# detect进程内缓存数据点的item数量上限
+DETECT_HISTORY_BUFFER_ITEMS = 500
+
+# 进程内策略对象缓存数量，为0时不缓存
+STRATEGY_OBJECT_CACHE_SIZE = 2000
+# 进程内策略对象最长缓存时间(秒)，需小于策略快照过期时间
+STRATEGY_OBJECT_CACHE_AGE = 10 * 60
+
+# access -> detect -> trigger 队列数据编码格式
+# json: 每条数据为完整的 json 对象；compact: 字段名抽取为 schema 按 item 单独保存，队列中只保存字段值
+# 旧版 detect、nodata、trigger 无法解码 compact 数据，需这三类消费进程全部升级后，才能切换生产端 access、detect 的格式
+ALARM_QUEUE_CODEC = "json"
+
 # BCS 集群配置来源标签
 BCS_CLUSTER_BK_ENV_LABEL = os.environ.get("BCS_CLUSTER_BK_ENV_LABEL", "")
 
@@ -759,6 +777,40 @@ ALARM_DISABLE_STRATEGY_RULES = []
 # access模块数据拉取延迟时间
 ACCESS_DATA_TIME_DELAY = 10
 
+# access数据去重方式，set: 拉取整个时间点的record_id集合在本地判断；batch: 在redis端批量判断本批数据
+ACCESS_DUPLICATE_BACKEND = "set"
+# 按策略分组单独配置去重方式 {strategy_group_key: backend}
+ACCESS_DUPLICATE_GROUP_BACKENDS = {}
+
+# access推送无数据检测数据的方式，queue: 推送完整数据到无数据检测队列；index: 只记录各维度最近上报时间
+# 旧版 nodata 只读取队列，access 先切换为 index 会导致维度被误判为无数据，需先升级 nodata 再切换 access
+NO_DATA_BACKEND = "queue"
+
+# 告警缓存的存储格式，json: 告警内容分别保存到维度缓存及快照；zlib: 快照压缩保存，维度缓存只保存对快照的引用
+# 旧版进程无法解析压缩快照及维度缓存中的引用，需先升级 alert(builder/manager)及 fta_action 等通过快照读取告警的进程
+ALERT_SNAPSHOT_CODEC = "json"
+
+# 异常告警调度方式，scan: 每分钟从ES全量拉取异常告警；index: 从redis调度索引中取出到期的告警，定期以ES数据校正索引
+# 索引由 alert.builder 在产生告警时写入，旧版 builder 产生的告警要等下次ES校正才会被调度，需先升级全部 builder
+ALERT_CHECK_BACKEND = "scan"
+
+# 告警缓存的并发更新方式，lock: 按维度加锁，加锁失败的事件延后重新投递；cas: 不加锁，以维度版本号比较写入，只有冲突的维度重新处理
+# 旧版进程写入告警缓存时不递增版本号，cas 无法发现与其并发的更新，需先升级 alert 及 fta_action 等直接写告警缓存的进程
+ALERT_UPDATE_BACKEND = "lock"
+
+# 同一批推送的处理动作按收敛配置分组批量收敛，每批最多处理的动作数，为0时逐个推送收敛任务
+# 开启前需确保 converge 进程已升级(支持 run_converge_batch 任务)
+CONVERGE_BATCH_SIZE = 0
+
+# access进程内主机索引的版本检查间隔(秒)，为0时不使用索引，逐条查询主机缓存
+HOST_INDEX_REFRESH_INTERVAL = 60
+
+# kafka 分区分配方式(实时监控及告警事件拉取)，hash: 按一致性哈希分配；load: 按各分区消息速率及积压均衡分配，并尽量保持原分配
+KAFKA_PARTITION_ASSIGN_BACKEND = "hash"
+
+# 实时监控每个topic的缓冲批次数量(每批最多5000条)，缓冲满时暂停对应分区的拉取
+REAL_TIME_TOPIC_BUFFER_SIZE = 10
+
 # kafka是否自动提交配置
 KAFKA_AUTO_COMMIT = True
 
@@ -963,6 +1015,33 @@ CACHE_OVERVIEW_TIMEOUT = 60 * 2
 CACHE_HOME_TIMEOUT = 60 * 10
 CACHE_USER_TIMEOUT = 60 * 10
 
+# resource 缓存软过期后继续保留的时间占缓存时间的比例，期间返回旧数据并刷新缓存，为0时不保留
+RESOURCE_CACHE_STALE_RATIO = 0.5
+# 是否在后台线程中刷新已软过期的 resource 缓存，否则由获取到刷新锁的请求同步刷新
+RESOURCE_CACHE_BACKGROUND_REFRESH = False
+# resource 缓存加载锁的超时时间(秒)
+RESOURCE_CACHE_LOCK_TIMEOUT = 30
+# 未获取到加载锁时，等待其他进程加载结果的最长时间(秒)
+RESOURCE_CACHE_LOCK_WAIT = 5
+# 进程内 resource 缓存的容量(字节)及单条数据上限，为0时不使用进程内缓存
+RESOURCE_CACHE_LRU_MAX_BYTES = 32 * 1024 * 1024
+RESOURCE_CACHE_LRU_MAX_ITEM_BYTES = 1024 * 1024
+# 进程内 resource 缓存的有效期(秒)
+RESOURCE_CACHE_LRU_TIMEOUT = 60
+
+# APIResource 每个后端模块的连接池数量(按host)及单个连接池的最大连接数
+API_POOL_CONNECTIONS = 10
+API_POOL_MAXSIZE = 50
+# APIResource 每个后端模块的进程内最大并发请求数，为0时不限制(默认)；可按模块单独配置 {module_name: limit}
+API_CONCURRENCY_LIMIT = 0
+API_CONCURRENCY_LIMITS = {}
+# 等待并发限制的最长时间(秒)
+API_CONCURRENCY_WAIT_TIMEOUT = 30
+# Resource.bulk_request 进程内共享线程池大小
+BULK_REQUEST_POOL_SIZE = 20
+# gevent 模式下 Resource.bulk_request 是否使用协程池
+BULK_REQUEST_USE_GEVENT = False
+
 # SaaS访问读写权限
 ROLE_WRITE_PERMISSION = "w"
 ROLE_READ_PERMISSION = "r"
@@ -1369,3 +1448,8 @@ OUTER_COLLOCTOR_HOST = ""
 
 # ES 需要串行的集群的白名单
 ES_SERIAL_CLUSTER_LIST = []
+
+# ES 按集群规划索引生命周期的集群列表
+ES_LIFECYCLE_PLANNER_CLUSTER_LIST = []
+# ES 按集群规划索引生命周期时，结果表索引创建及分裂的并发数
+ES_LIFECYCLE_PLANNER_CONCURRENCY = 5
@@ -194,6 +194,8 @@ ACTION_TASK_CRONTAB = [
     # 分集群任务
     # 定期检测异常告警
     ("alarm_backends.service.alert.manager.tasks.check_abnormal_alert", "* * * * *", "cluster"),
+    # 定期校正异常告警调度索引
+    ("alarm_backends.service.alert.manager.tasks.reconcile_active_alert_index", "*/10 * * * *", "cluster"),
     # 定期关闭流控告警，避免与整点之类的任务并发，设置每12分钟执行一次
     ("alarm_backends.service.alert.manager.tasks.check_blocked_alert", "*/12 * * * *", "cluster"),
     # 定期检测屏蔽策略，进行告警的屏蔽
@@ -12,8 +12,11 @@ specific language governing permissions and limitations under the License.
 
 import abc
 import logging
+import os
+import threading
 
 import six
+from django.conf import settings
 from django.db import models
 from django.utils.translation import ugettext as _
 from opentelemetry import trace
@@ -31,6 +34,42 @@ from core.drf_resource.tools import (
 tracer = trace.get_tracer(__name__)
 logger = logging.getLogger(__name__)
 
+# pid -> 批量请求共享线程池，按进程区分，避免 fork 后子进程使用父进程的线程池
+_bulk_request_pools = {}
+_bulk_request_pool_lock = threading.Lock()
+# 标记当前线程是否为共享线程池的工作线程
+_bulk_request_worker = threading.local()
+
+
+def _mark_bulk_request_worker():
+    _bulk_request_worker.active = True
+
+
+def get_bulk_request_pool():
+    """
+    获取批量请求共享线程池，嵌套调用(在共享线程池中再次批量请求)时返回 None，避免工作线程互相等待
+    """
+    if getattr(_bulk_request_worker, "active", False):
+        return None
+
+    pid = os.getpid()
+    pool = _bulk_request_pools.get(pid)
+    if pool is None:
+        with _bulk_request_pool_lock:
+            pool = _bulk_request_pools.get(pid)
+            if pool is None:
+                pool = ThreadPool(settings.BULK_REQUEST_POOL_SIZE, initializer=_mark_bulk_request_worker)
+                _bulk_request_pools[pid] = pool
+    return pool
+
+
+def is_gevent_patched():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
 
 __doc__ = """
 Non-ORM for DRF 的架构：
@@ -226,17 +265,36 @@ class Resource(six.with_metaclass(abc.ABCMeta, object)):
     def bulk_request(self, request_data_iterable=None, ignore_exceptions=False):
         """
         基于多线程的批量并发请求
+        1. 默认使用进程内共享的线程池，限制进程的总并发数
+        2. 在共享线程池中嵌套调用时，使用临时线程池
+        3. gevent 模式下(socket 已被 patch)且开启 BULK_REQUEST_USE_GEVENT 时，使用协程池
         """
         if not isinstance(request_data_iterable, (list, tuple)):
             raise TypeError("'request_data_iterable' object is not iterable")
 
-        pool = ThreadPool()
-        futures = []
-        for request_data in request_data_iterable:
-            futures.append(pool.apply_async(self.request, args=(request_data,)))
+        if settings.BULK_REQUEST_USE_GEVENT and is_gevent_patched():
+            from gevent.pool import Pool
 
-        pool.close()
-        pool.join()
+            pool = Pool(settings.BULK_REQUEST_POOL_SIZE)
+            func = ThreadPool.get_func_with_local(self.request)
+            futures = [pool.spawn(func, request_data) for request_data in request_data_iterable]
+            pool.join()
+        else:
+            pool = get_bulk_request_pool()
+            temp_pool = pool is None
+            if temp_pool:
+                pool = ThreadPool(min(len(request_data_iterable), settings.BULK_REQUEST_POOL_SIZE) or 1)
+
+            futures = []
+            for request_data in request_data_iterable:
+                futures.append(pool.apply_async(self.request, args=(request_data,)))
+
+            if temp_pool:
+                pool.close()
+                pool.join()
+            else:
+                for future in futures:
+                    future.wait()
 
         results = []
         exceptions = []
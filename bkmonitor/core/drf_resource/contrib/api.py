@@ -13,7 +13,6 @@ specific language governing permissions and limitations under the License.
 import abc
 import logging
 
-import requests
 import six
 from blueapps.account.conf import ConfFixture
 from blueapps.account.utils import load_backend
@@ -25,6 +24,7 @@ from requests.exceptions import HTTPError, ReadTimeout
 from bkmonitor.utils.request import get_common_headers, get_request
 from bkmonitor.utils.user import make_userinfo
 from core.drf_resource.contrib.cache import CacheResource
+from core.drf_resource.contrib.transport import APISession
 from core.errors.api import BKAPIError
 from core.errors.iam import APIPermissionDeniedError
 
@@ -128,7 +128,8 @@ class APIResource(six.with_metaclass(abc.ABCMeta, CacheResource)):
         super(APIResource, self).__init__(**kwargs)
         assert self.method.upper() in ["GET", "POST", "PUT", "DELETE", "PATCH"], _("method仅支持GET或POST或PUT或DELETE或PATCH")
         self.method = self.method.upper()
-        self.session = requests.session()
+        # 按后端模块共享连接池，并限制并发请求数
+        self.session = APISession(self)
 
     def request(self, request_data=None, **kwargs):
         request_data = request_data or kwargs
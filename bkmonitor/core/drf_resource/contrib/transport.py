@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import os
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.utils.translation import ugettext as _
+from requests.adapters import HTTPAdapter
+
+from core.errors.api import BKAPIError
+from core.prometheus import metrics
+
+__doc__ = """
+    APIResource 的 http 请求传输层
+    1. 同一进程内按后端模块(module_name)共享 requests.Session 及连接池，保持长连接
+    2. 按后端模块限制并发请求数，等待超时时抛出异常，避免批量调用时耗尽连接
+    3. 记录每个接口的请求耗时
+"""
+
+# (pid, module_name) -> requests.Session，按进程区分，避免 fork 后子进程复用父进程的连接
+_sessions = {}
+# (pid, module_name) -> threading.BoundedSemaphore
+_semaphores = {}
+_lock = threading.Lock()
+
+
+def get_session(module_name: str) -> requests.Session:
+    """
+    获取后端模块共享的 Session
+    """
+    session_key = (os.getpid(), module_name)
+    session = _sessions.get(session_key)
+    if session is not None:
+        return session
+
+    with _lock:
+        session = _sessions.get(session_key)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.API_POOL_CONNECTIONS,
+                pool_maxsize=settings.API_POOL_MAXSIZE,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[session_key] = session
+    return session
+
+
+def get_semaphore(module_name: str):
+    """
+    获取后端模块的并发限制，未限制时返回 None
+    """
+    semaphore_key = (os.getpid(), module_name)
+    if semaphore_key in _semaphores:
+        return _semaphores[semaphore_key]
+
+    with _lock:
+        if semaphore_key not in _semaphores:
+            limit = settings.API_CONCURRENCY_LIMITS.get(module_name, settings.API_CONCURRENCY_LIMIT)
+            _semaphores[semaphore_key] = threading.BoundedSemaphore(limit) if limit else None
+    return _semaphores[semaphore_key]
+
+
+class APISession(object):
+    """
+    APIResource 的请求会话，调用方式与 requests.Session 一致
+    """
+
+    def __init__(self, resource):
+        self.resource = resource
+
+    def request(self, method, url, **kwargs):
+        module_name = self.resource.module_name
+        action = str(self.resource.action)
+
+        start = time.time()
+        semaphore = get_semaphore(module_name)
+        if semaphore is not None and not semaphore.acquire(timeout=settings.API_CONCURRENCY_WAIT_TIMEOUT):
+            metrics.API_REQUEST_TIME.labels(module_name=module_name, action=action, status="throttled").observe(
+                time.time() - start
+            )
+            raise BKAPIError(system_name=module_name, url=action, result=_("并发请求数超过限制，请稍后重试"))
+
+        status = "exception"
+        try:
+            response = get_session(module_name).request(method, url, **kwargs)
+            status = str(response.status_code)
+            return response
+        finally:
+            if semaphore is not None:
+                semaphore.release()
+            metrics.API_REQUEST_TIME.labels(module_name=module_name, action=action, status=status).observe(
+                time.time() - start
+            )
+
+    def get(self, url, params=None, **kwargs):
+        return self.request("GET", url, params=params, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request("PUT", url, data=data, **kwargs)
+
+    def patch(self, url, data=None, **kwargs):
+        return self.request("PATCH", url, data=data, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
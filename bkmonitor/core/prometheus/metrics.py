@@ -16,7 +16,13 @@ from django.conf import settings
 from prometheus_client.exposition import push_to_gateway
 from prometheus_client.utils import INF
 
-from core.prometheus.base import REGISTRY, BkCollectorRegistry, Counter, Histogram
+from core.prometheus.base import (
+    REGISTRY,
+    BkCollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+)
 from core.prometheus.tools import get_metric_agg_gateway_url, udp_handler
 
 logger = logging.getLogger(__name__)
@@ -145,6 +151,12 @@ ACCESS_PROCESS_PUSH_DATA_COUNT = Counter(
     labelnames=("strategy_id", "type"),
 )
 
+ACCESS_DATA_PUSH_TIME = Histogram(
+    name="bkmonitor_access_data_push_time",
+    documentation="access(data) 模块各阶段推送耗时",
+    labelnames=("strategy_group_key", "stage"),
+)
+
 ACCESS_TOKEN_FORBIDDEN_COUNT = Counter(
     name="bkmonitor_access_token_forbidden_count",
     documentation="access 流控限制次数",
@@ -274,6 +286,36 @@ ALERT_PROCESS_PUSH_DATA_COUNT = Counter(
     labelnames=("bk_data_id", "topic", "strategy_id", "is_saved"),
 )
 
+ALERT_ENRICH_TIME = Histogram(
+    name="bkmonitor_alert_enrich_time",
+    documentation="alert(builder) 模块各丰富器处理耗时",
+    labelnames=("stage", "enricher", "status"),
+)
+
+ALERT_UPDATE_DIMENSION_COUNT = Counter(
+    name="bkmonitor_alert_update_dimension_count",
+    documentation="alert 模块告警维度更新次数，result 为 conflict(版本冲突) 或 lock_failed(加锁失败) 的需要重新处理",
+    labelnames=("module", "backend", "result"),
+)
+
+KAFKA_PARTITION_ASSIGN_LOAD = Gauge(
+    name="bkmonitor_kafka_partition_assign_load",
+    documentation="kafka 分区分配后各主机的负载(消息速率及积压折算的速率)",
+    labelnames=("service", "host"),
+)
+
+KAFKA_PARTITION_ASSIGN_COUNT = Gauge(
+    name="bkmonitor_kafka_partition_assign_count",
+    documentation="kafka 分区分配后各主机的分区数",
+    labelnames=("service", "host"),
+)
+
+KAFKA_PARTITION_MOVED_COUNT = Counter(
+    name="bkmonitor_kafka_partition_moved_count",
+    documentation="kafka 分区重新分配时迁移到其他主机的分区数",
+    labelnames=("service",),
+)
+
 DETECT_PROCESS_LATENCY = Histogram(
     name="bkmonitor_detect_process_latency",
     documentation="告警从 access 到 detect 模块的整体处理延迟",
@@ -431,6 +473,14 @@ ACTION_NOTICE_API_CALL_COUNT = Counter(
     labelnames=("notice_way", "status"),
 )
 
+# api
+API_REQUEST_TIME = Histogram(
+    name="bkmonitor_api_request_time",
+    documentation="APIResource 请求耗时",
+    labelnames=("module_name", "action", "status"),
+    buckets=(0.05, 0.1, 0.3, 0.5, 1, 3, 5, 10, 30, 60, INF),
+)
+
 # cache
 ALARM_CACHE_TASK_TIME = Histogram(
     name="bkmonitor_alarm_cache_task_time",
@@ -439,6 +489,18 @@ ALARM_CACHE_TASK_TIME = Histogram(
     buckets=(1, 3, 5, 10, 30, 60, 300, INF),
 )
 
+STRATEGY_OBJECT_CACHE_COUNT = Counter(
+    name="bkmonitor_strategy_object_cache_count",
+    documentation="进程内策略对象缓存命中次数",
+    labelnames=("result",),
+)
+
+RESOURCE_CACHE_REQUEST_COUNT = Counter(
+    name="bkmonitor_resource_cache_request_count",
+    documentation="resource 缓存请求次数",
+    labelnames=("cache_type", "status"),
+)
+
 # mail report
 MAIL_REPORT_SEND_LATENCY = Histogram(
     name="bkmonitor_mail_report_send_latency",
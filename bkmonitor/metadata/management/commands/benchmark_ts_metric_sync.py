@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.transaction import atomic
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from metadata import config, models
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    自定义时序指标同步方式对比
+    在回滚的事务中构造包含 metrics 个指标的分组，分别使用逐个同步和批量比对同步
+    统计首次同步(全部新建)及再次同步(全部已存在，其中 10% 的指标维度变化)的 DB 查询数及耗时
+    """
+
+    help = "benchmark time series metric sync"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--metrics", type=int, default=5000, help="number of metrics in the group")
+        parser.add_argument("--tags", type=int, default=5, help="number of tags per metric")
+
+    def handle(self, *args, **options):
+        now = time.time()
+        tags = {f"benchmark_tag_{index}": {"values": None} for index in range(options["tags"])}
+        first_metric_info = [
+            {"field_name": f"benchmark_metric_{index}", "tag_value_list": tags, "last_modify_time": now}
+            for index in range(options["metrics"])
+        ]
+        second_metric_info = [
+            {
+                "field_name": item["field_name"],
+                "tag_value_list": dict(tags, benchmark_extra_tag={"values": None}) if index % 10 == 0 else tags,
+                "last_modify_time": now,
+            }
+            for index, item in enumerate(first_metric_info)
+        ]
+
+        for mode in ["single", "bulk"]:
+            try:
+                with atomic(config.DATABASE_CONNECTION_NAME):
+                    group = models.TimeSeriesGroup.objects.create(
+                        bk_data_id=0,
+                        bk_biz_id=0,
+                        table_id="benchmark_ts_metric_sync.__default__",
+                        time_series_group_name="benchmark_ts_metric_sync",
+                        creator="system",
+                        last_modify_user="system",
+                    )
+                    for round_name, metric_info in [("create", first_metric_info), ("update", second_metric_info)]:
+                        with CaptureQueriesContext(connections[config.DATABASE_CONNECTION_NAME]) as context:
+                            start = time.time()
+                            with override_settings(IS_ENABLE_METADATA_FUNCTION_CONTROLLER=mode == "bulk"):
+                                group.update_metrics(metric_info)
+                            cost = time.time() - start
+                        self.stdout.write(
+                            f"mode({mode}) round({round_name}) metrics({len(metric_info)}) "
+                            f"queries({len(context.captured_queries)}) cost({cost:.3f}s)"
+                        )
+                    raise Rollback
+            except Rollback:
+                pass
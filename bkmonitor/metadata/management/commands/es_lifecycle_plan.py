@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import json
+from collections import Counter
+
+from django.core.management import BaseCommand, CommandError
+
+from metadata import models
+from metadata.task.es_lifecycle import ESLifecyclePlanner
+
+
+class Command(BaseCommand):
+    help = "plan es index lifecycle of storage cluster, only output the plan unless --apply is set"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cluster_id", type=int, required=True, help="存储集群ID")
+        parser.add_argument("--table_ids", type=str, required=False, help="结果表 ID, 格式: test,test1,test2")
+        parser.add_argument("--apply", action="store_true", default=False, help="执行规划的动作，默认只输出规划")
+
+    def handle(self, *args, **options):
+        cluster_id = options["cluster_id"]
+        es_storages = models.ESStorage.objects.filter(storage_cluster_id=cluster_id)
+        if options.get("table_ids"):
+            es_storages = es_storages.filter(table_id__in=options["table_ids"].split(","))
+        if not es_storages.exists():
+            raise CommandError(f"cluster_id: {cluster_id} has no es storage")
+
+        planner = ESLifecyclePlanner(cluster_id, es_storages, dry_run=not options["apply"])
+        table_actions = planner.run()
+
+        for table_id, actions in table_actions.items():
+            for action in actions:
+                self.stdout.write(json.dumps(dict(table_id=table_id, **action)))
+
+        action_count = Counter(action["action"] for actions in table_actions.values() for action in actions)
+        self.stdout.write(
+            json.dumps(
+                {
+                    "cluster_id": cluster_id,
+                    "dry_run": planner.dry_run,
+                    "table_count": len(planner.es_storages),
+                    "failed_table_ids": sorted(planner.failed_table_ids),
+                    "action_count": action_count,
+                }
+            )
+        )
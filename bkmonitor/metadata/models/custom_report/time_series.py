@@ -37,7 +37,6 @@ from metadata.models.result_table import (
     ResultTableOption,
 )
 from metadata.models.storage import ClusterInfo
-from metadata.utils.db import filter_model_by_in_page
 from utils.redis_client import RedisClient
 
 from .base import CustomGroupBase
@@ -233,7 +232,7 @@ class TimeSeriesGroup(CustomGroupBase):
         table_id: str,
         metric_dict: Dict,
         need_create_metrics: Set,
-        need_update_metrics: Set,
+        need_update_metric_objs: List[ResultTableField],
     ):
         """批量创建或更新字段"""
         logger.info("bulk create or update rt metrics")
@@ -258,13 +257,7 @@ class TimeSeriesGroup(CustomGroupBase):
 
         # 开始批量更新
         update_records = []
-        qs_objs = filter_model_by_in_page(
-            ResultTableField,
-            "field_name__in",
-            need_update_metrics,
-            other_filter={"table_id": table_id, "tag": ResultTableField.FIELD_TAG_METRIC},
-        )
-        for obj in qs_objs:
+        for obj in need_update_metric_objs:
             expect_metric_status = metric_dict.get(obj.field_name, False)
             if obj.is_disabled != expect_metric_status:
                 obj.is_disabled = expect_metric_status
@@ -277,7 +270,7 @@ class TimeSeriesGroup(CustomGroupBase):
         table_id: str,
         tag_dict: Dict,
         need_create_tags: Set,
-        need_update_tags: Set,
+        need_update_tag_objs: List[ResultTableField],
         update_description: bool,
     ):
         """批量创建或更新 tag"""
@@ -304,20 +297,7 @@ class TimeSeriesGroup(CustomGroupBase):
 
         # 开始批量更新
         update_records = []
-        qs_objs = filter_model_by_in_page(
-            ResultTableField,
-            "field_name__in",
-            need_update_tags,
-            other_filter={
-                "table_id": table_id,
-                "tag__in": [
-                    ResultTableField.FIELD_TAG_DIMENSION,
-                    ResultTableField.FIELD_TAG_TIMESTAMP,
-                    ResultTableField.FIELD_TAG_GROUP,
-                ],
-            },
-        )
-        for obj in qs_objs:
+        for obj in need_update_tag_objs:
             expect_tag_description = tag_dict.get(obj.field_name, "")
             if obj.description != expect_tag_description and update_description:
                 obj.description = expect_tag_description
@@ -329,27 +309,40 @@ class TimeSeriesGroup(CustomGroupBase):
         """批量刷新结果表打平的指标和维度"""
         # 创建或更新
         metric_tag_info = self._refine_metric_tags(metric_info)
-        # 通过结果表过滤到到指标和维度
+        # 通过结果表过滤到到指标和维度，一次性加载已有字段后在内存中比对
         # NOTE: 因为 `ResultTableField` 字段是打平的，因此，需要排除已经存在的，以已经存在的为准
-        exist_fields = set(ResultTableField.objects.filter(table_id=table_id).values_list("field_name", flat=True))
+        exist_field_objs = {obj.field_name: obj for obj in ResultTableField.objects.filter(table_id=table_id)}
         # 过滤需要创建或更新的指标
         metric_dict = metric_tag_info["metric_dict"]
         metric_set = set(metric_dict.keys())
-        need_create_metrics = metric_set - exist_fields
+        need_create_metrics = metric_set - set(exist_field_objs)
         # 获取已经存在的指标，然后进行批量更新
-        need_update_metrics = metric_set - need_create_metrics
-        self._bulk_create_or_update_metrics(table_id, metric_dict, need_create_metrics, need_update_metrics)
+        need_update_metric_objs = [
+            exist_field_objs[metric]
+            for metric in metric_set - need_create_metrics
+            if exist_field_objs[metric].tag == ResultTableField.FIELD_TAG_METRIC
+        ]
+        self._bulk_create_or_update_metrics(table_id, metric_dict, need_create_metrics, need_update_metric_objs)
         # 过滤需要创建或更新的维度
         tag_dict = metric_tag_info["tag_dict"]
         tag_set = set(tag_dict.keys())
         # 需要创建的 tag 需要再剔除和指标重复的字段名称
-        need_create_tags = tag_set - exist_fields - need_create_metrics
-        need_update_tags = tag_set - need_create_tags
+        need_create_tags = tag_set - set(exist_field_objs) - need_create_metrics
+        tag_types = {
+            ResultTableField.FIELD_TAG_DIMENSION,
+            ResultTableField.FIELD_TAG_TIMESTAMP,
+            ResultTableField.FIELD_TAG_GROUP,
+        }
+        need_update_tag_objs = [
+            exist_field_objs[tag]
+            for tag in tag_set - need_create_tags
+            if tag in exist_field_objs and exist_field_objs[tag].tag in tag_types
+        ]
         self._bulk_create_or_update_tags(
             table_id,
             tag_dict,
             need_create_tags,
-            need_update_tags,
+            need_update_tag_objs,
             metric_tag_info["is_update_description"],
         )
         logger.info("bulk refresh rt fields successfully")
@@ -368,7 +361,7 @@ class TimeSeriesGroup(CustomGroupBase):
                 raise ValueError(f"ts group id: {group_id} not found")
             # 刷新 ts 中指标和维度
             is_updated = TimeSeriesMetric.bulk_refresh_ts_metrics(
-                group_id, group.table_id, metric_info, group.is_auto_discovery
+                group_id, group.table_id, metric_info, group.is_auto_discovery()
             )
             # 刷新 rt 表中的指标和维度
             self.bulk_refresh_rt_fields(group.table_id, metric_info)
@@ -995,15 +988,16 @@ class TimeSeriesMetric(models.Model):
 
     @classmethod
     def _bulk_update_metrics(
-        cls, metrics_dict: Dict, need_update_metrics: Union[List, Set], group_id: int, is_auto_discovery: bool
+        cls,
+        metrics_dict: Dict,
+        need_update_metric_objs: List["TimeSeriesMetric"],
+        group_id: int,
+        is_auto_discovery: bool,
     ):
         """批量更新指标，针对记录仅更新最后更新时间和 tag 字段"""
-        qs_objs = filter_model_by_in_page(
-            TimeSeriesMetric, "field_name__in", need_update_metrics, other_filter={"group_id": group_id}
-        )
         records, white_list_disabled_metric = [], set()
         # 组装更新的数据
-        for obj in qs_objs:
+        for obj in need_update_metric_objs:
             metric = obj.field_name
             metric_info = metrics_dict.get(metric)
             # 如果找不到指标数据，则忽略
@@ -1031,7 +1025,7 @@ class TimeSeriesMetric(models.Model):
                 is_need_update = True
                 obj.tag_list = tag_list
 
-            if is_need_update:
+            if is_need_update and metric not in white_list_disabled_metric:
                 records.append(obj)
         # 白名单模式，如果存在需要禁用的指标，则需要删除；应该不会太多，直接删除
         if white_list_disabled_metric:
@@ -1064,23 +1058,23 @@ class TimeSeriesMetric(models.Model):
             :return: True or raise
         """
         _metrics_dict = {m["field_name"]: m for m in metric_info_list if m.get("field_name")}
-        # 获取不存在的指标，然后批量创建
-        metrics_by_group_id = cls.objects.filter(group_id=group_id).values_list("field_name", flat=True)
+        # 一次性加载分组下已有的指标，在内存中比对需要创建及更新的指标
+        exist_metric_objs = {obj.field_name: obj for obj in cls.objects.filter(group_id=group_id)}
         # 获取需要批量创建的指标
         _metrics = set(_metrics_dict.keys())
         # NOTE: 这里仅针对创建时，推送路由数据
         is_create = False
-        need_create_metrics = _metrics - set(metrics_by_group_id)
+        need_create_metrics = _metrics - set(exist_metric_objs)
         # 获取已经存在的指标，然后进行批量更新
-        need_update_metrics = _metrics - need_create_metrics
+        need_update_metric_objs = [exist_metric_objs[metric] for metric in _metrics - need_create_metrics]
         # 如果存在，则批量创建
         if need_create_metrics:
             is_create = cls._bulk_create_metrics(
                 _metrics_dict, need_create_metrics, group_id, table_id, is_auto_discovery
             )
         # 批量更新
-        if need_update_metrics:
-            cls._bulk_update_metrics(_metrics_dict, need_update_metrics, group_id, is_auto_discovery)
+        if need_update_metric_objs:
+            cls._bulk_update_metrics(_metrics_dict, need_update_metric_objs, group_id, is_auto_discovery)
 
         return is_create
 
@@ -17,7 +17,8 @@ import logging
 import re
 import time
 import traceback
-from typing import Dict, List, Optional
+from fnmatch import fnmatchcase
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import arrow
 import curator
@@ -2101,16 +2102,16 @@ class ESStorage(models.Model, StorageResultTable):
         logger.info("table_id->[%s] no index", self.table_id)
         return False
 
-    def current_index_info(self):
+    def current_index_info(self, indices_stats: Optional[Dict] = None):
         """
         返回当前使用的最新index相关的信息
+        :param indices_stats: 预先获取的该结果表的索引统计信息 {index_name: stats}，为空时实时查询
         :return: {
             "datetime_object": max_datetime_object,
             "index": 0,
             "size": 123123,  # index大小，单位byte
         }
         """
-        es_client = self.get_client()
         # stats格式为：{
         #   "indices": {
         #       "${index_name}": {
@@ -2125,12 +2126,12 @@ class ESStorage(models.Model, StorageResultTable):
         index_re = None
         index_version = ""
         # 查找index,找不到v2的就找v1的
-        stat_info_list = es_client.indices.stats(self.search_format_v2())
+        stat_info_list = self.filter_indices_stats(self.search_format_v2(), indices_stats)
         if len(stat_info_list["indices"]) != 0:
             index_version = "v2"
             index_re = self.index_re_v2
         else:
-            stat_info_list = es_client.indices.stats(self.search_format_v1())
+            stat_info_list = self.filter_indices_stats(self.search_format_v1(), indices_stats)
             if len(stat_info_list["indices"]) != 0:
                 index_version = "v1"
                 index_re = self.index_re_v1
@@ -2203,6 +2204,12 @@ class ESStorage(models.Model, StorageResultTable):
             ]["store"]["size_in_bytes"],
         }
 
+    def filter_indices_stats(self, index_pattern: str, indices_stats: Optional[Dict] = None) -> Dict:
+        """按索引通配获取索引统计信息，存在预先获取的统计信息时直接过滤"""
+        if indices_stats is None:
+            return self.get_client().indices.stats(index_pattern)
+        return {"indices": {name: info for name, info in indices_stats.items() if fnmatchcase(name, index_pattern)}}
+
     def make_index_name(self, datetime_object, index, version):
         """根据传入的时间和index，创建返回一个index名"""
         if version == "v2":
@@ -2398,19 +2405,8 @@ class ESStorage(models.Model, StorageResultTable):
             current_index_info["datetime_object"], current_index_info["index"], current_index_info["index_version"]
         )
 
-        now_datetime_object = self.now
-
-        now_gap = 0
-        index_name = self.index_name
-
-        while now_gap <= ahead_time:
-            round_time = now_datetime_object + datetime.timedelta(minutes=now_gap)
-            round_time_str = round_time.strftime(self.date_format)
-
+        for round_alias_name, round_read_alias_name in self.iter_round_aliases(ahead_time):
             try:
-                round_alias_name = f"write_{round_time_str}_{index_name}"
-                round_read_alias_name = f"{index_name}_{round_time_str}_read"
-
                 # 3.1 判断这个别名是否有指向旧的index，如果存在则需要解除
                 try:
                     # 此处是非通配的别名，所以会有NotFound的异常
@@ -2467,11 +2463,22 @@ class ESStorage(models.Model, StorageResultTable):
                     )
 
             finally:
-                logger.info("all operations for index->[{}] gap->[{}] now is done.".format(self.table_id, now_gap))
-                # slice_gap maybe zero, will cause dead loop
-                if self.slice_gap <= 0:
-                    return
-                now_gap += self.slice_gap
+                logger.info("all operations for index->[%s] alias->[%s] now is done.", self.table_id, round_alias_name)
+
+    def iter_round_aliases(self, ahead_time=1440) -> Iterator[Tuple[str, str]]:
+        """
+        按 slice_gap 遍历当前及 ahead_time 分钟内各个时间段的别名
+        :return: (写入别名, 读取别名)
+        """
+        now_datetime_object = self.now
+        now_gap = 0
+        while now_gap <= ahead_time:
+            round_time_str = (now_datetime_object + datetime.timedelta(minutes=now_gap)).strftime(self.date_format)
+            yield f"write_{round_time_str}_{self.index_name}", f"{self.index_name}_{round_time_str}_read"
+            # slice_gap maybe zero, will cause dead loop
+            if self.slice_gap <= 0:
+                return
+            now_gap += self.slice_gap
 
     def create_index_and_aliases(self, ahead_time=1440):
         self.create_index_v2()
@@ -2516,7 +2523,6 @@ class ESStorage(models.Model, StorageResultTable):
             last_index_name = self.make_index_name(
                 current_index_info["datetime_object"], current_index_info["index"], current_index_info["index_version"]
             )
-            index_size_in_byte = current_index_info["size"]
 
         except (elasticsearch5.NotFoundError, elasticsearch.NotFoundError, elasticsearch6.NotFoundError):
             logger.warn(
@@ -2537,14 +2543,42 @@ class ESStorage(models.Model, StorageResultTable):
             )
 
         # 2. 判断index是否需要分割
+        if not self.should_create_new_index(current_index_info, last_index_name):
+            return True
+
+        new_index, is_delete_last_index = self.get_next_index(now_datetime_object, current_index_info, last_index_name)
+        if is_delete_last_index:
+            es_client.indices.delete(index=last_index_name)
+            logger.info(
+                "table_id->[%s] has index->[%s] which has not data, will be deleted for new index create.",
+                self.table_id,
+                last_index_name,
+            )
+
+        # 但凡涉及到index新增，都使用v2版本的格式
+        new_index_name = self.make_index_name(now_datetime_object, new_index, "v2")
+        logger.info("table_id->[%s] will create new index->[%s]", self.table_id, new_index_name)
+
+        # 2.1 创建新的index
+        es_client.indices.create(index=new_index_name, body=self.index_body, params={"request_timeout": 30})
+        logger.info("table_id->[%s] new index_name->[%s] is created now", self.table_id, new_index_name)
+
+        return True
+
+    def should_create_new_index(self, current_index_info: Dict, last_index_name: str) -> bool:
+        """
+        判断当前最新的index是否需要分裂：大小超限、mapping 不一致、达到保存期限或暖数据期限
+        :param current_index_info: current_index_info 的返回
+        :param last_index_name: 当前最新的index名
+        """
         # 如果是小于分割大小的，不必进行处理
         should_create = False
-        if index_size_in_byte / 1024.0 / 1024.0 / 1024.0 > self.slice_size:
+        if current_index_info["size"] / 1024.0 / 1024.0 / 1024.0 > self.slice_size:
             logger.info(
                 "table_id->[%s] index->[%s] current_size->[%s] is larger than slice size->[%s], create new index slice",
                 self.table_id,
                 last_index_name,
-                index_size_in_byte,
+                current_index_info["size"],
                 self.slice_size,
             )
             should_create = True
@@ -2580,43 +2614,34 @@ class ESStorage(models.Model, StorageResultTable):
                 )
                 should_create = True
 
-        # 2.0 判断新的index信息：日期以及对应的index
         if not should_create:
             logger.info(
                 "table_id->[%s] index->[%s] everything is ok,nothing to do",
                 self.table_id,
                 last_index_name,
             )
-            return True
+        return should_create
 
+    def get_next_index(self, now_datetime_object, current_index_info: Dict, last_index_name: str) -> Tuple[int, bool]:
+        """
+        获取新index的序号
+        :return: (新index序号, 是否需要先删除当前没有数据的最新index)
+        """
         new_index = 0
+        is_delete_last_index = False
         # 判断日期是否当前的时期或时间
         if now_datetime_object.strftime(self.date_format) == current_index_info["datetime_object"].strftime(
             self.date_format
         ):
             # 如果当前index并没有写入过数据(count==0),则对其进行删除重建操作即可
-            if es_client.count(index=last_index_name).get("count", 0) == 0:
+            if self.get_client().count(index=last_index_name).get("count", 0) == 0:
                 new_index = current_index_info["index"]
-                es_client.indices.delete(index=last_index_name)
-                logger.info(
-                    "table_id->[%s] has index->[%s] which has not data, will be deleted for new index create.",
-                    self.table_id,
-                    last_index_name,
-                )
+                is_delete_last_index = True
             # 否则原来的index不动，新增一个index，并把alias指向过去
             else:
                 new_index = current_index_info["index"] + 1
                 logger.info("table_id->[%s] index->[%s] has data, so new index will create", self.table_id, new_index)
-
-        # 但凡涉及到index新增，都使用v2版本的格式
-        new_index_name = self.make_index_name(now_datetime_object, new_index, "v2")
-        logger.info("table_id->[%s] will create new index->[%s]", self.table_id, new_index_name)
-
-        # 2.1 创建新的index
-        es_client.indices.create(index=new_index_name, body=self.index_body, params={"request_timeout": 30})
-        logger.info("table_id->[%s] new index_name->[%s] is created now", self.table_id, new_index_name)
-
-        return True
+        return new_index, is_delete_last_index
 
     def clean_index(self):
         """
@@ -3138,12 +3163,14 @@ class ESStorage(models.Model, StorageResultTable):
     def restore_index_prefix(self):
         return "restore_"
 
-    def can_delete(self) -> bool:
+    def can_delete(self, alias_list: Optional[Dict] = None, snapshots: Optional[List] = None) -> bool:
         """
         判断是否可以删除 当存在快照配置当时候需要判断是否可以删除
         - 不快照的结果表 直接删除
         - 当天有索引需要删除的时候 需要判断当天快照是否创建
         - 当天快照完成 删除索引
+        :param alias_list: 预先获取的索引别名，为空时实时查询
+        :param snapshots: 预先获取的快照列表，为空时实时查询
         """
         if not self.have_snapshot_conf:
             return True
@@ -3151,8 +3178,8 @@ class ESStorage(models.Model, StorageResultTable):
         if not self.can_snapshot:
             return True
 
-        current_snapshot_info = self.current_snapshot_info()
-        if self.expired_index():
+        current_snapshot_info = self.current_snapshot_info(snapshots)
+        if self.expired_index(alias_list):
             if not current_snapshot_info["datetime"]:
                 return False
             if current_snapshot_info["datetime"].day != datetime.datetime.utcnow().day:
@@ -3164,9 +3191,10 @@ class ESStorage(models.Model, StorageResultTable):
     def make_snapshot_name(self, datetime, index):
         return f"{index}_snapshot_{datetime.strftime(self.snapshot_date_format)}"
 
-    def expired_index(self):
+    def expired_index(self, alias_list: Optional[Dict] = None):
         es_client = self.es_client
-        alias_list = es_client.indices.get_alias(index=f"*{self.index_name}_*_*")
+        if alias_list is None:
+            alias_list = es_client.indices.get_alias(index=f"*{self.index_name}_*_*")
         expired_index_info = self.group_expired_alias(alias_list, self.retention)
         ret = []
 
@@ -3177,14 +3205,21 @@ class ESStorage(models.Model, StorageResultTable):
                 ret.append(expired_index)
         return ret
 
-    def current_snapshot_info(self):
-        es_client = self.es_client
+    def get_snapshots(self) -> List:
+        """获取该结果表在快照仓库中的快照"""
         try:
-            snapshots = es_client.snapshot.get(
+            return self.es_client.snapshot.get(
                 self.snapshot_obj.target_snapshot_repository_name, self.search_snapshot
             ).get("snapshots", [])
         except (elasticsearch5.NotFoundError, elasticsearch.NotFoundError, elasticsearch6.NotFoundError):
-            snapshots = []
+            return []
+
+    def current_snapshot_info(self, snapshots: Optional[List] = None):
+        """
+        :param snapshots: 预先获取的快照列表，为空时实时查询；只处理符合该结果表快照命名的快照
+        """
+        if snapshots is None:
+            snapshots = self.get_snapshots()
         snapshot_re = self.snapshot_re
         max_datetime = None
         max_snapshot = {}
@@ -3213,7 +3248,13 @@ class ESStorage(models.Model, StorageResultTable):
             "is_success": max_snapshot.get("state") == self.snapshot_complete_state,
         }
 
-    def create_snapshot(self):
+    def get_new_snapshot_info(self, alias_list: Optional[Dict] = None, snapshots: Optional[List] = None):
+        """
+        获取需要新建的快照，不需要新建时返回 None
+        :param alias_list: 预先获取的索引别名，为空时实时查询
+        :param snapshots: 预先获取的快照列表，为空时实时查询
+        :return: {"snapshot_name": 快照名, "indices": 需要快照的过期索引列表}
+        """
         if not self.can_snapshot:
             return
 
@@ -3221,8 +3262,7 @@ class ESStorage(models.Model, StorageResultTable):
         if self.is_snapshot_stopped:
             return
 
-        es_client = self.es_client
-        current_snapshot_info = self.current_snapshot_info()
+        current_snapshot_info = self.current_snapshot_info(snapshots)
         now = self.now
 
         # 如果最新快照不存在 直接创建
@@ -3235,11 +3275,25 @@ class ESStorage(models.Model, StorageResultTable):
                 return
 
         new_snapshot_name = self.make_snapshot_name(now, self.index_name)
-        expired_index = self.expired_index()
+        expired_index = self.expired_index(alias_list)
 
         # 如果当天没有需要删除的索引 不进行快照
         if not expired_index:
             return
+        return {"snapshot_name": new_snapshot_name, "indices": expired_index}
+
+    def create_snapshot(self, snapshot_info: Optional[Dict] = None):
+        """
+        :param snapshot_info: get_new_snapshot_info 的返回，为空时实时获取
+        """
+        if snapshot_info is None:
+            snapshot_info = self.get_new_snapshot_info()
+        if not snapshot_info:
+            return
+
+        es_client = self.es_client
+        new_snapshot_name = snapshot_info["snapshot_name"]
+        expired_index = snapshot_info["indices"]
         try:
             with atomic(config.DATABASE_CONNECTION_NAME):
                 EsSnapshotIndice.objects.bulk_create(
@@ -3302,17 +3356,15 @@ class ESStorage(models.Model, StorageResultTable):
         expired_datetime_point = snapshot_datetime + datetime.timedelta(days=self.snapshot_obj.snapshot_days)
         return expired_datetime_point.timestamp()
 
-    def get_expired_snapshot(self, expired_days: int):
+    def get_expired_snapshot(self, expired_days: int, snapshots: Optional[List] = None):
+        """
+        :param snapshots: 预先获取的快照列表，为空时实时查询；只处理符合该结果表快照命名的快照
+        """
         logger.info("table_id -> [%s] filter expired snapshot before %s days", self.table_id, expired_days)
         expired_datetime_point = self.now - datetime.timedelta(days=expired_days)
 
-        es_client = self.es_client
-        try:
-            snapshots = es_client.snapshot.get(
-                self.snapshot_obj.target_snapshot_repository_name, self.search_snapshot
-            ).get("snapshots", [])
-        except (elasticsearch5.NotFoundError, elasticsearch.NotFoundError, elasticsearch6.NotFoundError):
-            snapshots = []
+        if snapshots is None:
+            snapshots = self.get_snapshots()
         snapshot_re = self.snapshot_re
         expired_snapshots = []
 
@@ -22,7 +22,7 @@ from metadata import models
 from metadata.config import PERIODIC_TASK_DEFAULT_TTL
 from metadata.utils import consul_tools
 
-from .tasks import manage_es_storage
+from .tasks import manage_cluster_es_storage, manage_es_storage
 
 logger = logging.getLogger("metadata")
 
@@ -226,15 +226,24 @@ def refresh_kafka_topic_info():
 
 @share_lock(identify="metadata_refreshESStorage", ttl=7200)
 def refresh_es_storage():
+    # 按集群规划生命周期的集群，每个集群一个任务
+    es_planner_cluster_list = list(getattr(settings, "ES_LIFECYCLE_PLANNER_CLUSTER_LIST", []))
+    for cluster_id in es_planner_cluster_list:
+        manage_cluster_es_storage.delay(cluster_id)
+
     # NOTE: 这是临时处理；如果在白名单中，则按照串行处理
-    es_cluster_wl = getattr(settings, "ES_SERIAL_CLUSTER_LIST", [])
+    es_cluster_wl = [
+        cluster_id
+        for cluster_id in getattr(settings, "ES_SERIAL_CLUSTER_LIST", [])
+        if cluster_id not in es_planner_cluster_list
+    ]
     if es_cluster_wl:
         # 这里集群不会太多
         es_storage_data = models.ESStorage.objects.filter(storage_cluster_id__in=es_cluster_wl)
         manage_es_storage.delay(es_storage_data)
     # 设置每100条记录，拆分为一个任务
     start, step = 0, 100
-    es_storages = models.ESStorage.objects.exclude(storage_cluster_id__in=es_cluster_wl)
+    es_storages = models.ESStorage.objects.exclude(storage_cluster_id__in=es_cluster_wl + es_planner_cluster_list)
     # 添加一步过滤，用以减少任务的数量
     table_id_list = models.ResultTable.objects.filter(
         table_id__in=es_storages.values_list("table_id", flat=True), is_enable=True, is_deleted=False
@@ -0,0 +1,546 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+"""
+按集群规划 ES 索引生命周期
+同一集群的结果表共用一次集群状态查询(别名、索引统计、快照、分配配置)，在内存中计算各个结果表的索引新建及分裂、
+别名更新、过期清理、快照及暖数据分配动作，别名、索引删除及分配配置按批次更新
+dry_run 模式只返回规划的动作，不执行任何写操作
+"""
+
+import logging
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+import elasticsearch
+import elasticsearch5
+import elasticsearch6
+from curator import utils as curator_utils
+from django.conf import settings
+
+from bkmonitor.utils.thread_backend import ThreadPool
+from metadata import models
+from metadata.utils import es_tools
+
+logger = logging.getLogger("metadata")
+
+# 每次批量更新别名的最大动作数
+ALIAS_ACTION_BATCH_SIZE = 500
+# 结果表索引名，v2 格式为 v2_{index_name}_{datetime}_{index}，v1 格式为 {index_name}_{datetime}_{index}
+INDEX_NAME_RE = re.compile(r"^(?P<base>.+)_(?P<datetime>\d+)_(?P<index>\d+)$")
+
+
+class ESLifecyclePlanner(object):
+    """
+    ES 集群索引生命周期规划
+    执行顺序与逐个结果表处理时一致：索引新建及分裂 -> 别名更新 -> 新建快照 -> 清理过期别名及索引 -> 清理过期快照 -> 暖数据分配
+    某个结果表的动作执行失败时，该结果表后续的动作不再执行
+    """
+
+    def __init__(
+        self,
+        cluster_id: int,
+        es_storages: Iterable[models.ESStorage],
+        dry_run: bool = False,
+        concurrency: Optional[int] = None,
+    ):
+        """
+        :param cluster_id: 存储集群ID
+        :param es_storages: 该集群下需要处理的 ES 存储
+        :param dry_run: 是否只规划不执行
+        :param concurrency: 索引新建及分裂的并发数
+        """
+        self.cluster_id = cluster_id
+        self.es_storages = {es_storage.table_id: es_storage for es_storage in es_storages}
+        self.dry_run = dry_run
+        self.concurrency = concurrency or settings.ES_LIFECYCLE_PLANNER_CONCURRENCY
+        self.es_client = es_tools.get_client(cluster_id)
+
+        # 索引名前缀 -> 结果表
+        self.index_table_ids = {es_storage.index_name: table_id for table_id, es_storage in self.es_storages.items()}
+        # 结果表 -> {索引名: 别名集合}
+        self.table_aliases = defaultdict(dict)
+        # 结果表 -> {索引名: 索引统计}
+        self.table_stats = defaultdict(dict)
+        # 结果表 -> 快照配置
+        self.es_snapshots = {}
+        # 快照仓库 -> 快照列表
+        self.snapshots = {}
+
+        # 结果表 -> 规划的动作列表
+        self.actions = defaultdict(list)
+        # 执行失败或无需继续处理的结果表
+        self.failed_table_ids = set()
+
+    def run(self) -> Dict[str, List[Dict]]:
+        """
+        :return: 结果表 -> 规划的动作列表
+        """
+        if not self.es_storages:
+            return {}
+
+        if next(iter(self.es_storages.values())).is_red():
+            logger.error("es cluster health is red, skip index lifecycle; cluster id: %s", self.cluster_id)
+            return {}
+
+        self.fetch_cluster_state()
+
+        last_index_names = self.plan_indices()
+        self.update_aliases(
+            {
+                table_id: self.plan_aliases(self.es_storages[table_id], last_index_name)
+                for table_id, last_index_name in last_index_names.items()
+                if table_id not in self.failed_table_ids
+            }
+        )
+        self.plan_snapshots()
+        self.plan_clean()
+        self.plan_clean_snapshots()
+        self.plan_reallocate()
+
+        logger.info(
+            "[es lifecycle] cluster(%s) dry_run(%s) tables(%s) actions(%s) failed tables(%s)",
+            self.cluster_id,
+            self.dry_run,
+            len(self.es_storages),
+            sum(len(actions) for actions in self.actions.values()),
+            len(self.failed_table_ids),
+        )
+        return dict(self.actions)
+
+    def add_action(self, table_id: str, action: str, **params):
+        self.actions[table_id].append(dict(action=action, **params))
+        logger.info("[es lifecycle] table_id->[%s] %s: %s", table_id, action, params)
+
+    def mark_failed(self, table_id: str, step: str, error: Exception):
+        self.failed_table_ids.add(table_id)
+        logger.error("[es lifecycle] table_id->[%s] failed to %s: %s", table_id, step, error)
+
+    def get_table_id(self, index_name: str) -> Optional[str]:
+        """根据索引名获取所属的结果表"""
+        result = INDEX_NAME_RE.match(index_name)
+        if result is None:
+            return None
+
+        base = result.group("base")
+        if base.startswith("v2_") and base[3:] in self.index_table_ids:
+            return self.index_table_ids[base[3:]]
+        return self.index_table_ids.get(base)
+
+    def fetch_cluster_state(self):
+        """一次性获取集群所有索引的别名及统计信息，并按结果表归类"""
+        for index_name, alias_info in self.es_client.indices.get_alias(index="*").items():
+            table_id = self.get_table_id(index_name)
+            if table_id:
+                self.table_aliases[table_id][index_name] = set(alias_info.get("aliases", {}))
+
+        for index_name, index_stats in self.es_client.indices.stats(metric="store")["indices"].items():
+            table_id = self.get_table_id(index_name)
+            if table_id:
+                self.table_stats[table_id][index_name] = index_stats
+
+        self.es_snapshots = {
+            es_snapshot.table_id: es_snapshot
+            for es_snapshot in models.EsSnapshot.objects.all()
+            if es_snapshot.table_id in self.es_storages
+        }
+
+    def get_alias_list(self, table_id: str) -> Dict:
+        """获取结果表的索引别名，格式与 get_alias 的返回一致"""
+        return {
+            index_name: {"aliases": {alias_name: {} for alias_name in aliases}}
+            for index_name, aliases in self.table_aliases[table_id].items()
+        }
+
+    def get_snapshots(self, repository_name: str) -> List:
+        """获取快照仓库中的所有快照，每个仓库只查询一次"""
+        if repository_name not in self.snapshots:
+            try:
+                self.snapshots[repository_name] = self.es_client.snapshot.get(repository_name, "_all").get(
+                    "snapshots", []
+                )
+            except (elasticsearch5.NotFoundError, elasticsearch.NotFoundError, elasticsearch6.NotFoundError):
+                self.snapshots[repository_name] = []
+        return self.snapshots[repository_name]
+
+    def create_index(self, es_storage: models.ESStorage, index_name: str):
+        self.add_action(es_storage.table_id, "create_index", index=index_name)
+        if not self.dry_run:
+            self.es_client.indices.create(index=index_name, body=es_storage.index_body, params={"request_timeout": 30})
+
+    def delete_index(self, es_storage: models.ESStorage, index_name: str):
+        self.add_action(es_storage.table_id, "delete_index", index=index_name)
+        if not self.dry_run:
+            self.es_client.indices.delete(index=index_name)
+        self.table_stats[es_storage.table_id].pop(index_name, None)
+        self.table_aliases[es_storage.table_id].pop(index_name, None)
+
+    def plan_index(self, es_storage: models.ESStorage) -> Optional[str]:
+        """
+        规划结果表索引的新建及分裂，与 create_index_v2 及 update_index_v2 一致
+        :return: 当前最新的索引名，没有可用的索引时返回 None
+        """
+        indices_stats = self.table_stats[es_storage.table_id]
+        is_index_enable = es_storage.is_index_enable()
+        now_datetime_object = es_storage.now
+
+        if not indices_stats:
+            if not is_index_enable:
+                return None
+            new_index_name = es_storage.make_index_name(now_datetime_object, 0, "v2")
+            self.create_index(es_storage, new_index_name)
+            return new_index_name
+
+        current_index_info = es_storage.current_index_info(indices_stats)
+        last_index_name = es_storage.make_index_name(
+            current_index_info["datetime_object"], current_index_info["index"], current_index_info["index_version"]
+        )
+        if not is_index_enable:
+            return last_index_name
+
+        # 清理超前的索引
+        while now_datetime_object < current_index_info["datetime_object"]:
+            self.delete_index(es_storage, last_index_name)
+            current_index_info = es_storage.current_index_info(indices_stats)
+            last_index_name = es_storage.make_index_name(
+                current_index_info["datetime_object"], current_index_info["index"], current_index_info["index_version"]
+            )
+
+        if not es_storage.should_create_new_index(current_index_info, last_index_name):
+            return last_index_name
+
+        new_index, is_delete_last_index = es_storage.get_next_index(
+            now_datetime_object, current_index_info, last_index_name
+        )
+        if is_delete_last_index:
+            self.delete_index(es_storage, last_index_name)
+        new_index_name = es_storage.make_index_name(now_datetime_object, new_index, "v2")
+        self.create_index(es_storage, new_index_name)
+        return new_index_name
+
+    def plan_indices(self) -> Dict[str, str]:
+        """
+        并发规划各个结果表索引的新建及分裂
+        :return: 结果表 -> 当前最新的索引名
+        """
+        es_storages = list(self.es_storages.values())
+        pool = ThreadPool(min(self.concurrency, len(es_storages)))
+        try:
+            results = pool.map_ignore_exception(self.plan_index, es_storages, return_exception=True)
+        finally:
+            pool.close()
+            pool.join()
+
+        last_index_names = {}
+        for es_storage, result in zip(es_storages, results):
+            if isinstance(result, Exception):
+                self.mark_failed(es_storage.table_id, "create or update index", result)
+            elif result is None:
+                logger.info("table_id->[%s] has no index and is disabled, skip index lifecycle", es_storage.table_id)
+                self.failed_table_ids.add(es_storage.table_id)
+            else:
+                last_index_names[es_storage.table_id] = result
+        return last_index_names
+
+    def plan_aliases(self, es_storage: models.ESStorage, last_index_name: str) -> List[Dict]:
+        """规划结果表的别名更新，与 create_or_update_aliases 一致，将各个时间段的别名指向最新的索引"""
+        index_aliases = self.table_aliases[es_storage.table_id]
+        last_index_aliases = index_aliases.get(last_index_name, set())
+
+        add_aliases, remove_aliases = {}, {}
+        for round_alias_name, round_read_alias_name in es_storage.iter_round_aliases(es_storage.slice_gap):
+            # 解除指向旧索引的写入别名
+            for index_name, aliases in index_aliases.items():
+                if index_name != last_index_name and round_alias_name in aliases:
+                    remove_aliases[(index_name, round_alias_name)] = None
+            for alias_name in [round_alias_name, round_read_alias_name]:
+                if alias_name not in last_index_aliases:
+                    add_aliases[alias_name] = None
+
+        return [{"add": {"index": last_index_name, "alias": alias_name}} for alias_name in add_aliases] + [
+            {"remove": {"index": index_name, "alias": alias_name}} for index_name, alias_name in remove_aliases
+        ]
+
+    def apply_alias_state(self, table_id: str, alias_actions: List[Dict]):
+        """将别名变更同步到内存中的集群状态"""
+        for alias_action in alias_actions:
+            for operation, params in alias_action.items():
+                aliases = self.table_aliases[table_id].setdefault(params["index"], set())
+                if operation == "add":
+                    aliases.add(params["alias"])
+                else:
+                    aliases.discard(params["alias"])
+
+    def update_aliases(self, table_alias_actions: Dict[str, List[Dict]]):
+        """按批次更新别名"""
+        batch, batch_size = {}, 0
+        for table_id, alias_actions in table_alias_actions.items():
+            if not alias_actions:
+                continue
+
+            for alias_action in alias_actions:
+                for operation, params in alias_action.items():
+                    self.add_action(table_id, f"{operation}_alias", index=params["index"], alias=params["alias"])
+
+            if self.dry_run:
+                self.apply_alias_state(table_id, alias_actions)
+                continue
+
+            if batch and batch_size + len(alias_actions) > ALIAS_ACTION_BATCH_SIZE:
+                self._update_aliases(batch)
+                batch, batch_size = {}, 0
+            batch[table_id] = alias_actions
+            batch_size += len(alias_actions)
+
+        if batch:
+            self._update_aliases(batch)
+
+    def _update_aliases(self, batch: Dict[str, List[Dict]]):
+        try:
+            self.es_client.indices.update_aliases(
+                body={"actions": [alias_action for alias_actions in batch.values() for alias_action in alias_actions]}
+            )
+            updated_table_ids = list(batch)
+        except Exception as error:
+            if len(batch) == 1:
+                self.mark_failed(next(iter(batch)), "update aliases", error)
+                return
+
+            # 整批失败时按结果表逐个更新，避免单个结果表的异常影响其他结果表
+            logger.warning("[es lifecycle] cluster(%s) bulk update aliases failed: %s", self.cluster_id, error)
+            updated_table_ids = []
+            for table_id, alias_actions in batch.items():
+                try:
+                    self.es_client.indices.update_aliases(body={"actions": alias_actions})
+                except Exception as table_error:
+                    self.mark_failed(table_id, "update aliases", table_error)
+                    continue
+                updated_table_ids.append(table_id)
+
+        for table_id in updated_table_ids:
+            self.apply_alias_state(table_id, batch[table_id])
+
+    def plan_snapshots(self):
+        """新建快照，与 create_snapshot 一致"""
+        for table_id, es_snapshot in self.es_snapshots.items():
+            if table_id in self.failed_table_ids:
+                continue
+
+            es_storage = self.es_storages[table_id]
+            try:
+                snapshots = self.get_snapshots(es_snapshot.target_snapshot_repository_name)
+                snapshot_info = es_storage.get_new_snapshot_info(self.get_alias_list(table_id), snapshots)
+                if not snapshot_info:
+                    continue
+
+                self.add_action(
+                    table_id,
+                    "create_snapshot",
+                    snapshot=snapshot_info["snapshot_name"],
+                    indices=snapshot_info["indices"],
+                )
+                if not self.dry_run:
+                    es_storage.create_snapshot(snapshot_info)
+            except Exception as error:
+                self.mark_failed(table_id, "create snapshot", error)
+                continue
+
+            # 新建的快照完成前，不清理过期的索引
+            snapshots.append({"snapshot": snapshot_info["snapshot_name"], "state": "IN_PROGRESS"})
+
+    def plan_clean(self):
+        """清理过期的别名及索引，与 clean_index_v2 一致"""
+        table_alias_actions, delete_index_table_ids = {}, {}
+        for table_id, es_storage in self.es_storages.items():
+            if table_id in self.failed_table_ids:
+                continue
+
+            alias_list = self.get_alias_list(table_id)
+            try:
+                # 有快照任务需要判断是否可以删除
+                es_snapshot = self.es_snapshots.get(table_id)
+                if es_snapshot and not es_storage.can_delete(
+                    alias_list, self.get_snapshots(es_snapshot.target_snapshot_repository_name)
+                ):
+                    continue
+                filter_result = es_storage.group_expired_alias(alias_list, es_storage.retention)
+            except Exception as error:
+                self.mark_failed(table_id, "clean index", error)
+                continue
+
+            alias_actions = []
+            for index_name, alias_info in filter_result.items():
+                if alias_info["not_expired_alias"]:
+                    alias_actions.extend(
+                        {"remove": {"index": index_name, "alias": alias_name}}
+                        for alias_name in alias_info["expired_alias"]
+                    )
+                    continue
+                # 已经不存在未过期的别名，则将索引删除
+                delete_index_table_ids[index_name] = table_id
+            table_alias_actions[table_id] = alias_actions
+
+        self.update_aliases(table_alias_actions)
+        self.delete_indices(
+            {
+                index_name: table_id
+                for index_name, table_id in delete_index_table_ids.items()
+                if table_id not in self.failed_table_ids
+            }
+        )
+
+    def delete_indices(self, index_table_ids: Dict[str, str]):
+        """按批次删除索引，批次删除失败时逐个删除"""
+        if not index_table_ids:
+            return
+
+        for index_name, table_id in index_table_ids.items():
+            self.add_action(table_id, "delete_index", index=index_name)
+
+        for index_names in curator_utils.chunk_index_list(list(index_table_ids)):
+            if self.dry_run:
+                deleted_index_names = index_names
+            else:
+                try:
+                    self.es_client.indices.delete(index=curator_utils.to_csv(index_names))
+                    deleted_index_names = index_names
+                except Exception:
+                    deleted_index_names = []
+                    for index_name in index_names:
+                        try:
+                            self.es_client.indices.delete(index=index_name)
+                        except (
+                            elasticsearch5.ElasticsearchException,
+                            elasticsearch.ElasticsearchException,
+                            elasticsearch6.ElasticsearchException,
+                        ):
+                            logger.warning(
+                                "table_id->[%s] index->[%s] delete failed, index maybe doing snapshot",
+                                index_table_ids[index_name],
+                                index_name,
+                            )
+                            continue
+                        deleted_index_names.append(index_name)
+
+            for index_name in deleted_index_names:
+                self.table_stats[index_table_ids[index_name]].pop(index_name, None)
+                self.table_aliases[index_table_ids[index_name]].pop(index_name, None)
+
+    def plan_clean_snapshots(self):
+        """清理过期快照，与 clean_snapshot 一致"""
+        for table_id, es_snapshot in self.es_snapshots.items():
+            if table_id in self.failed_table_ids:
+                continue
+
+            es_storage = self.es_storages[table_id]
+            try:
+                if not es_storage.can_delete_snapshot:
+                    continue
+                expired_snapshots = es_storage.get_expired_snapshot(
+                    es_snapshot.snapshot_days, self.get_snapshots(es_snapshot.target_snapshot_repository_name)
+                )
+            except Exception as error:
+                self.mark_failed(table_id, "clean snapshot", error)
+                continue
+
+            for expired_snapshot in expired_snapshots:
+                snapshot_name = expired_snapshot.get("snapshot")
+                self.add_action(table_id, "delete_snapshot", snapshot=snapshot_name)
+                if self.dry_run:
+                    continue
+                try:
+                    es_storage.delete_snapshot(snapshot_name, es_snapshot.target_snapshot_repository_name)
+                except Exception as e:
+                    logger.exception("clean snapshot => [%s] failed => %s", snapshot_name, e)
+
+    def get_allocation_settings(self, index_names: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取索引的分配配置
+        :return: {索引名: {"index.routing.allocation.include.box_type": "warm"}}
+        """
+        allocation_settings = {}
+        for chunk_index_names in curator_utils.chunk_index_list(index_names):
+            try:
+                result = self.es_client.indices.get_settings(
+                    index=curator_utils.to_csv(chunk_index_names),
+                    name="index.routing.allocation.*",
+                    params={"expand_wildcards": "open,closed", "flat_settings": "true"},
+                )
+            except Exception as error:
+                logger.exception("[es lifecycle] cluster(%s) get index settings failed: %s", self.cluster_id, error)
+                continue
+            for index_name, index_settings in result.items():
+                allocation_settings[index_name] = index_settings.get("settings", {})
+        return allocation_settings
+
+    def plan_reallocate(self):
+        """将超过暖数据天数的索引分配到指定节点，与 reallocate_index 一致，相同分配配置的索引批量更新"""
+        # 分配配置名, 分配配置值 -> {索引名: 结果表}
+        allocations = defaultdict(dict)
+        for table_id, es_storage in self.es_storages.items():
+            if table_id in self.failed_table_ids or es_storage.warm_phase_days <= 0:
+                continue
+
+            try:
+                warm_phase_settings = es_storage.warm_phase_settings
+                setting_name = "index.routing.allocation.{}.{}".format(
+                    warm_phase_settings["allocation_type"], warm_phase_settings["allocation_attr_name"]
+                )
+                setting_value = warm_phase_settings["allocation_attr_value"]
+                filter_result = es_storage.group_expired_alias(
+                    self.get_alias_list(table_id), es_storage.warm_phase_days
+                )
+            except Exception as error:
+                self.mark_failed(table_id, "reallocate index", error)
+                continue
+
+            # 如果存在未过期的别名，那说明这个索引仍在被写入，不能把它切换到冷节点
+            for index_name, alias_info in filter_result.items():
+                if not alias_info["not_expired_alias"]:
+                    allocations[(setting_name, setting_value)][index_name] = table_id
+
+        if not allocations:
+            return
+
+        allocation_settings = self.get_allocation_settings(
+            [index_name for index_table_ids in allocations.values() for index_name in index_table_ids]
+        )
+        for (setting_name, setting_value), index_table_ids in allocations.items():
+            # 过滤掉已经分配过的索引
+            index_names = [
+                index_name
+                for index_name in index_table_ids
+                if index_name in allocation_settings
+                and allocation_settings[index_name].get(setting_name) != setting_value
+            ]
+            for index_name in index_names:
+                self.add_action(
+                    index_table_ids[index_name],
+                    "reallocate_index",
+                    index=index_name,
+                    settings={setting_name: setting_value},
+                )
+            if self.dry_run or not index_names:
+                continue
+
+            for chunk_index_names in curator_utils.chunk_index_list(index_names):
+                try:
+                    self.es_client.indices.put_settings(
+                        index=curator_utils.to_csv(chunk_index_names), body={setting_name: setting_value}
+                    )
+                except Exception as error:
+                    logger.exception(
+                        "[es lifecycle] cluster(%s) reallocate index(%s) failed: %s",
+                        self.cluster_id,
+                        chunk_index_names,
+                        error,
+                    )
@@ -197,6 +197,25 @@ def manage_es_storage(es_storages):
             )
 
 
+@app.task(ignore_result=True, queue="celery_report_cron")
+def manage_cluster_es_storage(cluster_id: int):
+    """
+    按集群规划并执行 ES 索引生命周期，集群状态只查询一次
+    """
+    from metadata.task.es_lifecycle import ESLifecyclePlanner
+
+    table_id_list = models.ResultTable.objects.filter(
+        table_id__in=models.ESStorage.objects.filter(storage_cluster_id=cluster_id).values_list("table_id", flat=True),
+        is_enable=True,
+        is_deleted=False,
+    ).values_list("table_id", flat=True)
+    es_storages = models.ESStorage.objects.filter(storage_cluster_id=cluster_id, table_id__in=list(table_id_list))
+    try:
+        ESLifecyclePlanner(cluster_id, es_storages).run()
+    except Exception:
+        logger.exception("es cluster->[%s] failed to manage index lifecycle", cluster_id)
+
+
 @app.task(ignore_result=True, queue="celery_metadata_task_worker")
 def publish_redis(space_type_id: Optional[str] = None, space_id: Optional[str] = None, table_id: Optional[str] = None):
     """通知redis数据更新
@@ -178,3 +178,27 @@ def test_delete_ts_metrics(create_and_delete_records):
 
     objs = models.TimeSeriesMetric.objects.filter(group_id=DEFAULT_GROUP_ID, field_name="disk_usage1")
     assert not objs.exists()
+
+
+@pytest.mark.django_db(databases=["default", "monitor_api"])
+def test_bulk_refresh_rt_fields(create_and_delete_records):
+    group = models.TimeSeriesGroup.objects.get(table_id=DEFAULT_TABLE_ID)
+    metric_info = [
+        {
+            "field_name": "disk_usage",
+            "tag_value_list": {"disk_name": {"values": None}, "bk_target_ip": {"values": None}},
+            "last_modify_time": 1701506528,
+        }
+    ]
+    group.bulk_refresh_rt_fields(DEFAULT_TABLE_ID, metric_info)
+    fields = {obj.field_name: obj for obj in models.ResultTableField.objects.filter(table_id=DEFAULT_TABLE_ID)}
+    assert fields["disk_usage"].tag == models.ResultTableField.FIELD_TAG_METRIC
+    assert not fields["disk_usage"].is_disabled
+    assert {"disk_name", "bk_target_ip"} <= set(fields)
+
+    # 已存在的指标按上报状态更新，维度不重复创建
+    metric_info[0]["is_active"] = False
+    group.bulk_refresh_rt_fields(DEFAULT_TABLE_ID, metric_info)
+    assert models.ResultTableField.objects.get(table_id=DEFAULT_TABLE_ID, field_name="disk_usage").is_disabled
+    assert models.ResultTableField.objects.filter(table_id=DEFAULT_TABLE_ID).count() == len(fields)
+    models.ResultTableField.objects.filter(table_id=DEFAULT_TABLE_ID).delete()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+
+import datetime
+
+import mock
+import pytest
+
+from metadata import models
+from metadata.task.es_lifecycle import ESLifecyclePlanner
+
+pytestmark = pytest.mark.django_db(databases=["default", "monitor_api"])
+
+DATE_FORMAT = "%Y%m%d"
+
+
+def make_es_storage(table_id):
+    return models.ESStorage(
+        table_id=table_id,
+        date_format=DATE_FORMAT,
+        slice_gap=1440,
+        retention=3,
+        storage_cluster_id=1,
+        index_settings="{}",
+        mapping_settings="{}",
+    )
+
+
+@pytest.fixture
+def es_client(mocker):
+    now = datetime.datetime.utcnow()
+    today = now.strftime(DATE_FORMAT)
+    expired_day = (now - datetime.timedelta(days=10)).strftime(DATE_FORMAT)
+
+    client = mock.MagicMock()
+    client.indices.get_alias.return_value = {
+        f"v2_1_bklog_a_{today}_0": {"aliases": {f"write_{today}_1_bklog_a": {}, f"1_bklog_a_{today}_read": {}}},
+        f"v2_1_bklog_a_{expired_day}_0": {"aliases": {f"write_{expired_day}_1_bklog_a": {}}},
+        "other_index": {"aliases": {}},
+    }
+    client.indices.stats.return_value = {
+        "indices": {
+            f"v2_1_bklog_a_{today}_0": {"primaries": {"store": {"size_in_bytes": 1024}}},
+            f"v2_1_bklog_a_{expired_day}_0": {"primaries": {"store": {"size_in_bytes": 1024}}},
+            "other_index": {"primaries": {"store": {"size_in_bytes": 1024}}},
+        }
+    }
+    mocker.patch("metadata.utils.es_tools.get_client", return_value=client)
+    mocker.patch.object(models.ESStorage, "is_red", return_value=False)
+    mocker.patch.object(models.ESStorage, "is_index_enable", return_value=True)
+    mocker.patch.object(models.ESStorage, "is_mapping_same", return_value=True)
+    mocker.patch.object(models.ESStorage, "index_body", new_callable=mock.PropertyMock, return_value={})
+    return client
+
+
+@pytest.mark.parametrize("dry_run", [True, False])
+def test_es_lifecycle_planner(es_client, dry_run):
+    now = datetime.datetime.utcnow()
+    today = now.strftime(DATE_FORMAT)
+    tomorrow = (now + datetime.timedelta(days=1)).strftime(DATE_FORMAT)
+    expired_day = (now - datetime.timedelta(days=10)).strftime(DATE_FORMAT)
+
+    planner = ESLifecyclePlanner(
+        1, [make_es_storage("1_bklog.a"), make_es_storage("1_bklog.b")], dry_run=dry_run, concurrency=2
+    )
+    actions = planner.run()
+
+    # 集群状态只查询一次
+    es_client.indices.get_alias.assert_called_once_with(index="*")
+    es_client.indices.stats.assert_called_once_with(metric="store")
+
+    # 已有索引的结果表只补充未来的别名，并清理过期的索引
+    assert actions["1_bklog.a"] == [
+        {"action": "add_alias", "index": f"v2_1_bklog_a_{today}_0", "alias": f"write_{tomorrow}_1_bklog_a"},
+        {"action": "add_alias", "index": f"v2_1_bklog_a_{today}_0", "alias": f"1_bklog_a_{tomorrow}_read"},
+        {"action": "delete_index", "index": f"v2_1_bklog_a_{expired_day}_0"},
+    ]
+    # 没有索引的结果表新建索引及别名
+    assert actions["1_bklog.b"] == [
+        {"action": "create_index", "index": f"v2_1_bklog_b_{today}_0"},
+        {"action": "add_alias", "index": f"v2_1_bklog_b_{today}_0", "alias": f"write_{today}_1_bklog_b"},
+        {"action": "add_alias", "index": f"v2_1_bklog_b_{today}_0", "alias": f"1_bklog_b_{today}_read"},
+        {"action": "add_alias", "index": f"v2_1_bklog_b_{today}_0", "alias": f"write_{tomorrow}_1_bklog_b"},
+        {"action": "add_alias", "index": f"v2_1_bklog_b_{today}_0", "alias": f"1_bklog_b_{tomorrow}_read"},
+    ]
+    assert not planner.failed_table_ids
+
+    if dry_run:
+        es_client.indices.create.assert_not_called()
+        es_client.indices.update_aliases.assert_not_called()
+        es_client.indices.delete.assert_not_called()
+        return
+
+    es_client.indices.create.assert_called_once_with(
+        index=f"v2_1_bklog_b_{today}_0", body={}, params={"request_timeout": 30}
+    )
+    # 所有结果表的别名在一次请求中更新
+    es_client.indices.update_aliases.assert_called_once()
+    assert len(es_client.indices.update_aliases.call_args[1]["body"]["actions"]) == 6
+    es_client.indices.delete.assert_called_once_with(index=f"v2_1_bklog_a_{expired_day}_0")
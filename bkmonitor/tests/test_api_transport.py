@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+import time
+
+import mock
+import pytest
+
+from core.drf_resource.contrib import transport
+from core.drf_resource.contrib.transport import APISession, get_session
+from core.errors.api import BKAPIError
+
+
+@pytest.fixture
+def api_settings(settings):
+    settings.API_CONCURRENCY_LIMIT = 0
+    settings.API_CONCURRENCY_LIMITS = {"limited": 2}
+    settings.API_CONCURRENCY_WAIT_TIMEOUT = 0.1
+    transport._semaphores.clear()
+    yield settings
+    transport._semaphores.clear()
+
+
+def test_shared_session(api_settings):
+    assert get_session("cmdb") is get_session("cmdb")
+    assert get_session("cmdb") is not get_session("metadata")
+
+
+def test_concurrency_limit(api_settings):
+    running = []
+    max_running = []
+    lock = threading.Lock()
+
+    def fake_request(method, url, **kwargs):
+        with lock:
+            running.append(1)
+            max_running.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.pop()
+        return mock.MagicMock(status_code=200)
+
+    session = APISession(mock.MagicMock(module_name="limited", action="/test/"))
+    with mock.patch.object(get_session("limited"), "request", side_effect=fake_request):
+        threads = [threading.Thread(target=session.get, args=("http://127.0.0.1/test/",)) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert max(max_running) <= 2
+
+    # 等待并发限制超时时抛出异常
+    semaphore = transport.get_semaphore("limited")
+    semaphore.acquire()
+    semaphore.acquire()
+    try:
+        with pytest.raises(BKAPIError):
+            session.get("http://127.0.0.1/test/")
+    finally:
+        semaphore.release()
+        semaphore.release()
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Tencent is pleased to support the open source community by making 蓝鲸智云 - 监控平台 (BlueKing - Monitor) available.
+Copyright (C) 2017-2021 THL A29 Limited, a Tencent company. All rights reserved.
+Licensed under the MIT License (the "License"); you may not use this file except in compliance with the License.
+You may obtain a copy of the License at http://opensource.org/licenses/MIT
+Unless required by applicable law or agreed to in writing, software distributed under the License is distributed on
+an "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the License for the
+specific language governing permissions and limitations under the License.
+"""
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache.backends.locmem import LocMemCache
+
+from bkmonitor.utils import cache as cache_module
+from bkmonitor.utils.cache import CacheTypeItem, LRUCacheTier, using_cache
+
+
+@pytest.fixture
+def backend_cache(mocker, settings):
+    settings.ENVIRONMENT = "testing"
+    settings.RESOURCE_CACHE_BACKGROUND_REFRESH = False
+    backend = LocMemCache("test_resource_cache", {})
+    mocker.patch.object(cache_module, "cache", backend)
+    cache_module.lru_cache_tier.clear()
+    yield backend
+    cache_module.lru_cache_tier.clear()
+
+
+class TestLRUCacheTier:
+    def test_size_limit(self, settings):
+        settings.RESOURCE_CACHE_LRU_MAX_BYTES = 10
+        settings.RESOURCE_CACHE_LRU_MAX_ITEM_BYTES = 8
+        tier = LRUCacheTier()
+        tier.set("a", "1234", 60)
+        tier.set("b", "1234", 60)
+        assert tier.get("a") == "1234"
+
+        # 超出容量时淘汰最久未使用的数据
+        tier.set("c", "1234", 60)
+        assert tier.get("b") is None
+        assert tier.get("a") == "1234"
+        assert tier.size == 8
+
+        # 超出单条上限的数据不缓存
+        tier.set("a", "123456789", 60)
+        assert tier.get("a") is None
+        assert tier.size == 4
+
+
+class TestUsingCache:
+    def test_stale_while_revalidate(self, backend_cache, settings, monkeypatch):
+        settings.RESOURCE_CACHE_STALE_RATIO = 1
+        calls = []
+
+        @using_cache(CacheTypeItem(key="test", timeout=60, user_related=False))
+        def get_value(value):
+            calls.append(value)
+            return len(calls)
+
+        assert get_value(1) == 1
+        assert get_value(1) == 1
+        assert len(calls) == 1
+
+        # 软过期后由获取到刷新锁的请求刷新缓存
+        cache_module.lru_cache_tier.clear()
+        now = time.time()
+        # 只替换被测模块引用的 time，不影响全局
+        monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: now + 90, sleep=time.sleep))
+        assert get_value(1) == 2
+        assert get_value(1) == 2
+        monkeypatch.undo()
+        assert len(calls) == 2
+
+    def test_stale_value_when_locked(self, backend_cache, settings, monkeypatch):
+        settings.RESOURCE_CACHE_STALE_RATIO = 1
+        cache_type = CacheTypeItem(key="test", timeout=60, user_related=False)
+
+        def func():
+            return "new"
+
+        cached = using_cache(cache_type)
+        cache_key = cached._cache_key(func, (), {})
+        cached.set_value(cache_key, "old", 60)
+        cache_module.lru_cache_tier.clear()
+
+        # 其他进程正在刷新时直接返回旧数据
+        backend_cache.add(cached._lock_key(cache_key), "other", 30)
+        now = time.time()
+        monkeypatch.setattr(cache_module, "time", SimpleNamespace(time=lambda: now + 90, sleep=time.sleep))
+        assert cached(func)() == "old"
+
+    def test_single_flight(self, backend_cache):
+        calls = []
+        started = threading.Event()
+
+        @using_cache(CacheTypeItem(key="test", timeout=60, user_related=False))
+        def get_value():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "value"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(get_value())) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == ["value"] * 5
+        assert len(calls) == 1